@@ -24,6 +24,7 @@ from cmk.base.api.agent_based.plugin_classes import (
     AgentParseFunction,
     AgentSectionPlugin,
     HostLabelFunction,
+    SectionPlugin,
     SimpleSNMPParseFunction,
     SNMPParseFunction,
     SNMPSectionPlugin,
@@ -194,6 +195,10 @@ def _noop_host_label_function(section: Any) -> Generator[HostLabel, None, None]:
     yield from ()
 
 
+def has_host_label_function(section_plugin: SectionPlugin) -> bool:
+    return section_plugin.host_label_function is not _noop_host_label_function
+
+
 def _create_host_label_function(
     host_label_function: HostLabelFunction | None,
 ) -> HostLabelFunction:
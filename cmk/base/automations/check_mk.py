@@ -31,6 +31,7 @@ import cmk.utils.debug
 import cmk.utils.log as log
 import cmk.utils.man_pages as man_pages
 import cmk.utils.password_store
+import cmk.utils.piggyback as piggyback
 import cmk.utils.tty as tty
 from cmk.utils.agentdatatype import AgentRawData
 from cmk.utils.auto_queue import AutoQueue
@@ -985,15 +986,12 @@ class AutomationRenameHosts(Automation):
             if self._rename_host_file(str(tmp_dir / d), oldname, newname):
                 actions.append(d)
 
-        if self._rename_host_dir(str(tmp_dir / "piggyback"), oldname, newname):
+        if piggyback.rename_piggybacked_host(HostName(oldname), HostName(newname)):
             actions.append("piggyback-load")
 
         # Rename piggy files *created* by the host
-        piggybase = str(tmp_dir) + "/piggyback/"
-        if os.path.exists(piggybase):
-            for piggydir in os.listdir(piggybase):
-                if self._rename_host_file(piggybase + piggydir, oldname, newname):
-                    actions.append("piggyback-pig")
+        if piggyback.rename_source_host(HostName(oldname), HostName(newname)):
+            actions.append("piggyback-pig")
 
         # Logwatch
         if self._rename_host_dir(logwatch_dir, oldname, newname):
@@ -1001,11 +999,13 @@ class AutomationRenameHosts(Automation):
 
         # SNMP walks
         if self._rename_host_file(snmpwalks_dir, oldname, newname):
+            self._rename_host_file(snmpwalks_dir, oldname + ".walkidx", newname + ".walkidx")
             actions.append("snmpwalk")
 
         # HW/SW-Inventory
         if self._rename_host_file(var_dir + "/inventory", oldname, newname):
             self._rename_host_file(var_dir + "/inventory", oldname + ".gz", newname + ".gz")
+            self._rename_host_file(var_dir + "/inventory", oldname + ".sdi", newname + ".sdi")
             actions.append("inv")
 
         if self._rename_host_dir(var_dir + "/inventory_archive", oldname, newname):
@@ -1470,6 +1470,7 @@ class AutomationDeleteHosts(ABCDeleteHosts, Automation):
             f"{var_dir}/persisted/{hostname}",
             f"{var_dir}/inventory/{hostname}",
             f"{var_dir}/inventory/{hostname}.gz",
+            f"{var_dir}/inventory/{hostname}.sdi",
             f"{var_dir}/agent_deployment/{hostname}",
         ]
 
@@ -1511,6 +1512,7 @@ class AutomationDeleteHostsKnownRemote(ABCDeleteHosts, Automation):
             f"{var_dir}/persisted/{hostname}",
             f"{var_dir}/inventory/{hostname}",
             f"{var_dir}/inventory/{hostname}.gz",
+            f"{var_dir}/inventory/{hostname}.sdi",
         ]
 
     def _delete_host_files(self, hostname: HostName) -> None:
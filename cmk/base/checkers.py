@@ -71,6 +71,7 @@ import cmk.base.config as config
 from cmk.base import plugin_contexts
 from cmk.base.api.agent_based import cluster_mode, value_store
 from cmk.base.api.agent_based.plugin_classes import CheckPlugin as CheckPluginAPI
+from cmk.base.api.agent_based.register.section_plugins import has_host_label_function
 from cmk.base.api.agent_based.value_store import ValueStoreManager
 from cmk.base.config import ConfigCache
 from cmk.base.errorhandling import create_check_crash_dump
@@ -349,14 +350,22 @@ class HostLabelPluginMapper(SectionMap[HostLabelPlugin]):
             ),
         )
 
+    # Only the sections with a host label function, the others never contribute
+    # any labels and need not be parsed for the host label discovery.
     def __iter__(self) -> Iterator[SectionName]:
-        return iter(
-            frozenset(_api.registered_agent_sections) | frozenset(_api.registered_snmp_sections)
-        )
+        return iter(self._host_label_sections())
 
     def __len__(self) -> int:
-        return len(
-            frozenset(_api.registered_agent_sections) | frozenset(_api.registered_snmp_sections)
+        return len(self._host_label_sections())
+
+    @staticmethod
+    def _host_label_sections() -> frozenset[SectionName]:
+        return frozenset(
+            section_name
+            for section_name in itertools.chain(
+                _api.registered_agent_sections, _api.registered_snmp_sections
+            )
+            if has_host_label_function(_api.get_section_plugin(section_name))
         )
 
 
@@ -68,6 +68,7 @@ from cmk.utils.log import console
 from cmk.utils.macros import replace_macros_in_str
 from cmk.utils.regex import regex
 from cmk.utils.rulesets import RuleSetName
+from cmk.utils.rulesets.match_cache import RulesetMatchCache
 from cmk.utils.rulesets.ruleset_matcher import (
     LabelManager,
     LabelSources,
@@ -396,6 +397,10 @@ class _NestedExitSpec(ExitSpec, total=False):
 _ignore_ip_lookup_failures = False
 _failed_ip_lookups: list[HostName] = []
 
+# The configuration files the current configuration has been loaded from. Empty if it
+# has not been loaded from the configuration files, e.g. for the packed config.
+_loaded_config_files: Sequence[Path] = ()
+
 
 def ip_address_of(
     config_cache: ConfigCache, host_name: HostName, family: socket.AddressFamily | AddressFamily
@@ -508,6 +513,9 @@ def load_packed_config(config_path: ConfigPath) -> None:
         cmk.base.core_nagios._dump_precompiled_hostcheck()
 
     """
+    global _loaded_config_files
+    _loaded_config_files = ()
+
     _initialize_config()
     globals().update(PackedConfigStore.from_serial(config_path).read())
     _perform_post_config_loading_actions()
@@ -592,6 +600,7 @@ def _load_config(with_conf_d: bool, exclude_parents_mk: bool) -> set[str]:
 
     global all_hosts
     global clusters
+    global _loaded_config_files
 
     all_hosts = SetFolderPathList(all_hosts)
     clusters = SetFolderPathDict(clusters)
@@ -600,11 +609,13 @@ def _load_config(with_conf_d: bool, exclude_parents_mk: bool) -> set[str]:
     pre_load_vars = {**global_dict}
 
     global_dict |= helper_vars
+    loaded_config_files: list[Path] = []
 
     # Load assorted experimental parameters if any
     experimental_config = cmk.utils.paths.make_experimental_config_file()
     if experimental_config.exists():
         _load_config_file(experimental_config, global_dict)
+        loaded_config_files.append(experimental_config)
 
     host_storage_loaders = get_host_storage_loaders(config_storage_format)
     config_dir_path = Path(cmk.utils.paths.check_mk_config_dir)
@@ -633,6 +644,7 @@ def _load_config(with_conf_d: bool, exclude_parents_mk: bool) -> set[str]:
                 apply_hosts_file_to_object(path.with_suffix(""), host_storage_loaders, global_dict)
             else:
                 _load_config_file(path, global_dict)
+            loaded_config_files.append(path)
 
             if not isinstance(all_hosts, SetFolderPathList):
                 raise MKGeneralException(
@@ -659,6 +671,7 @@ def _load_config(with_conf_d: bool, exclude_parents_mk: bool) -> set[str]:
     # the lookup performance and the helper_vars are no longer available anyway..
     all_hosts = list(all_hosts)
     clusters = dict(clusters)
+    _loaded_config_files = loaded_config_files
 
     return {k for k, v in global_dict.items() if k not in pre_load_vars or v != pre_load_vars[k]}
 
@@ -1936,6 +1949,15 @@ class ConfigCache:
         tag_to_group_map = ConfigCache.get_tag_to_group_map()
         self._collect_hosttags(tag_to_group_map)
 
+        all_configured_hosts = list(
+            set(
+                itertools.chain(
+                    self.hosts_config.hosts,
+                    self.hosts_config.clusters,
+                    self.hosts_config.shadow_hosts,
+                )
+            )
+        )
         self.ruleset_matcher = ruleset_matcher.RulesetMatcher(
             host_tags=host_tags,
             host_paths=self._host_paths,
@@ -1947,14 +1969,15 @@ class ConfigCache:
             ),
             clusters_of=self._clusters_of_cache,
             nodes_of=self._nodes_of_cache,
-            all_configured_hosts=list(
-                set(
-                    itertools.chain(
-                        self.hosts_config.hosts,
-                        self.hosts_config.clusters,
-                        self.hosts_config.shadow_hosts,
-                    )
+            all_configured_hosts=all_configured_hosts,
+            match_cache=(
+                RulesetMatchCache(
+                    cmk.utils.paths.ruleset_match_cache_file,
+                    _loaded_config_files,
+                    all_configured_hosts,
                 )
+                if _loaded_config_files
+                else None
             ),
         )
 
@@ -3057,8 +3080,13 @@ class ConfigCache:
                 return SNMPBackendEnum.INLINE
             if host_backend == "classic":
                 return SNMPBackendEnum.CLASSIC
+            if host_backend == "native":
+                return SNMPBackendEnum.NATIVE
             raise MKGeneralException(f"Bad Host SNMP Backend configuration: {host_backend}")
 
+        if snmp_backend_default == "native":
+            return SNMPBackendEnum.NATIVE
+
         # TODO(sk): remove this when netsnmp is fixed
         # NOTE: Force usage of CLASSIC with SNMP-v1 to prevent memory leak in the netsnmp
         if self._is_host_snmp_v1(host_name):
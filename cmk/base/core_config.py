@@ -265,6 +265,7 @@ def do_create_config(
         _create_core_config(
             core, config_cache, hosts_to_update=hosts_to_update, duplicates=duplicates
         )
+        config_cache.ruleset_matcher.ruleset_optimizer.save_match_cache()
     except Exception as e:
         if cmk.utils.debug.enabled():
             raise
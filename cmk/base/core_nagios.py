@@ -5,16 +5,20 @@
 """Code for support of Nagios (and compatible) cores"""
 
 import base64
+import hashlib
 import itertools
+import multiprocessing
 import os
 import py_compile
 import socket
 import sys
 from collections import Counter
-from collections.abc import Mapping
+from collections.abc import Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import MAGIC_NUMBER
 from io import StringIO
 from pathlib import Path
-from typing import Any, cast, IO, Literal
+from typing import Any, cast, IO, Literal, NamedTuple
 
 import cmk.utils.config_path
 import cmk.utils.config_warnings as config_warnings
@@ -22,8 +26,9 @@ import cmk.utils.password_store
 import cmk.utils.paths
 import cmk.utils.store as store
 import cmk.utils.tty as tty
+import cmk.utils.version as cmk_version
 from cmk.utils.check_utils import section_name_of
-from cmk.utils.config_path import VersionedConfigPath
+from cmk.utils.config_path import ConfigPath, LATEST_CONFIG, VersionedConfigPath
 from cmk.utils.exceptions import MKGeneralException
 from cmk.utils.hostaddress import HostAddress, HostName, Hosts
 from cmk.utils.labels import Labels
@@ -140,6 +145,18 @@ class NagiosConfig:
         # TODO: Something seems to be mixed up in our call sites...
         self._outfile.write(x)
 
+    def merge(self, other: "NagiosConfig") -> None:
+        """Add the objects and the definitions of a configuration rendered separately"""
+        assert isinstance(other._outfile, StringIO)
+        self.write(other._outfile.getvalue())
+        self.hostgroups_to_define.update(other.hostgroups_to_define)
+        self.servicegroups_to_define.update(other.servicegroups_to_define)
+        self.contactgroups_to_define.update(other.contactgroups_to_define)
+        self.checknames_to_define.update(other.checknames_to_define)
+        self.active_checks_to_define.update(other.active_checks_to_define)
+        self.custom_commands_to_define.update(other.custom_commands_to_define)
+        self.hostcheck_commands_to_define.extend(other.hostcheck_commands_to_define)
+
 
 def _validate_licensing(
     hosts: Hosts, licensing_handler: LicensingHandler, licensing_counter: Counter
@@ -196,11 +213,9 @@ def create_config(
     stored_passwords = cmk.utils.password_store.load()
 
     licensing_counter = Counter("services")
-    all_host_labels: dict[HostName, CollectedHostLabels] = {}
-    for hostname in hostnames:
-        all_host_labels[hostname] = _create_nagios_config_host(
-            cfg, config_cache, hostname, stored_passwords, licensing_counter
-        )
+    all_host_labels = _create_nagios_config_hosts(
+        cfg, config_cache, hostnames, stored_passwords, licensing_counter
+    )
 
     _validate_licensing(config_cache.hosts_config, licensing_handler, licensing_counter)
 
@@ -228,6 +243,108 @@ def _output_conf_header(cfg: NagiosConfig) -> None:
     )
 
 
+def _create_nagios_config_hosts(
+    cfg: NagiosConfig,
+    config_cache: ConfigCache,
+    hostnames: Sequence[HostName],
+    stored_passwords: Mapping[str, str],
+    licensing_counter: Counter,
+) -> dict[HostName, CollectedHostLabels]:
+    processes = min(config.nagios_config_processes, len(hostnames))
+    if processes <= 1:
+        return {
+            hostname: _create_nagios_config_host(
+                cfg, config_cache, hostname, stored_passwords, licensing_counter
+            )
+            for hostname in hostnames
+        }
+
+    # The workers are forked, so they share the initialized config cache with us.
+    # The hosts are rendered in chunks, merged in the order of the host names and
+    # the result is the same as rendering them one after the other.
+    chunk_size = -(-len(hostnames) // (processes * 4))
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=_init_worker,
+        initargs=(config_cache,),
+    ) as executor:
+        chunks = executor.map(
+            _render_nagios_config_hosts,
+            (hostnames[i : i + chunk_size] for i in range(0, len(hostnames), chunk_size)),
+            itertools.repeat(stored_passwords),
+        )
+        all_host_labels: dict[HostName, CollectedHostLabels] = {}
+        for rendered in itertools.chain.from_iterable(chunks):
+            if rendered.cfg.hostcheck_commands_to_define:
+                # These commands are numbered across all hosts, render the host again.
+                all_host_labels[rendered.hostname] = _create_nagios_config_host(
+                    cfg, config_cache, rendered.hostname, stored_passwords, licensing_counter
+                )
+                continue
+            cfg.merge(rendered.cfg)
+            licensing_counter["services"] += rendered.services
+            config_warnings.g_configuration_warnings.extend(rendered.warnings)
+            all_host_labels[rendered.hostname] = rendered.labels
+
+    return all_host_labels
+
+
+class _RenderedHost(NamedTuple):
+    hostname: HostName
+    cfg: NagiosConfig
+    labels: CollectedHostLabels
+    services: int
+    warnings: Sequence[str]
+
+
+# The config cache of the parent process in a forked worker, see _init_worker()
+_worker_config_cache: ConfigCache | None = None
+
+
+def _init_worker(config_cache: ConfigCache) -> None:
+    """Initialize a forked worker with the config cache of the parent process
+
+    The arguments of the initializer are inherited by the forked worker, they are not pickled.
+    """
+    global _worker_config_cache
+    _worker_config_cache = config_cache
+
+
+def _get_worker_config_cache() -> ConfigCache:
+    if _worker_config_cache is None:
+        raise MKGeneralException("The worker has not been initialized with a config cache")
+    return _worker_config_cache
+
+
+def _render_nagios_config_hosts(
+    hostnames: Sequence[HostName], stored_passwords: Mapping[str, str]
+) -> Sequence[_RenderedHost]:
+    config_cache = _get_worker_config_cache()
+    return [
+        _render_nagios_config_host(config_cache, hostname, stored_passwords)
+        for hostname in hostnames
+    ]
+
+
+def _render_nagios_config_host(
+    config_cache: ConfigCache, hostname: HostName, stored_passwords: Mapping[str, str]
+) -> _RenderedHost:
+    cfg = NagiosConfig(StringIO(), None)
+    licensing_counter: Counter = Counter()
+    num_warnings = len(config_warnings.g_configuration_warnings)
+    labels = _create_nagios_config_host(
+        cfg, config_cache, hostname, stored_passwords, licensing_counter
+    )
+    return _RenderedHost(
+        hostname,
+        cfg,
+        labels,
+        licensing_counter["services"],
+        config_warnings.g_configuration_warnings[num_warnings:],
+    )
+
+
 def _create_nagios_config_host(
     cfg: NagiosConfig,
     config_cache: ConfigCache,
@@ -836,7 +953,7 @@ def _create_nagios_config_commands(cfg: NagiosConfig) -> None:
         cfg.write("\n# ------------------------------------------------------------\n")
         cfg.write("# Dummy check commands and active check commands\n")
         cfg.write("# ------------------------------------------------------------\n\n")
-        for checkname in cfg.checknames_to_define:
+        for checkname in sorted(cfg.checknames_to_define):
             cfg.write(
                 _format_nagios_object(
                     "command",
@@ -848,7 +965,7 @@ def _create_nagios_config_commands(cfg: NagiosConfig) -> None:
             )
 
     # active_checks
-    for acttype in cfg.active_checks_to_define:
+    for acttype in sorted(cfg.active_checks_to_define):
         command_line = (
             act_info["command_line"]
             if (act_info := config.active_check_info.get(acttype)) is not None
@@ -865,7 +982,7 @@ def _create_nagios_config_commands(cfg: NagiosConfig) -> None:
         )
 
     # custom_checks
-    for command_name in cfg.custom_commands_to_define:
+    for command_name in sorted(cfg.custom_commands_to_define):
         cfg.write(
             _format_nagios_object(
                 "command",
@@ -1084,15 +1201,54 @@ class HostCheckStore:
     """Caring about persistence of the precompiled host check files"""
 
     @staticmethod
-    def host_check_file_path(config_path: VersionedConfigPath, hostname: HostName) -> Path:
+    def host_check_file_path(config_path: ConfigPath, hostname: HostName) -> Path:
         return Path(config_path) / "host_checks" / hostname
 
     @staticmethod
-    def host_check_source_file_path(config_path: VersionedConfigPath, hostname: HostName) -> Path:
+    def host_check_source_file_path(config_path: ConfigPath, hostname: HostName) -> Path:
         # TODO: Use append_suffix(".py") once we are on Python 3.10
         path = HostCheckStore.host_check_file_path(config_path, hostname)
         return path.with_suffix(path.suffix + ".py")
 
+    @staticmethod
+    def manifest_file_path(config_path: ConfigPath) -> Path:
+        return Path(config_path) / "host_checks.mk"
+
+    @staticmethod
+    def digest(host_check: str) -> str:
+        """Identifies a host check: the source and what the compiled file depends on"""
+        return hashlib.sha256(
+            b"%s\0%s\0%s"
+            % (MAGIC_NUMBER, cmk_version.__version__.encode(), host_check.encode("utf-8"))
+        ).hexdigest()
+
+    def load_manifest(self, config_path: ConfigPath) -> Mapping[HostName, str]:
+        """The digests of the host checks of a configuration"""
+        return store.load_object_from_file(self.manifest_file_path(config_path), default={})
+
+    def save_manifest(
+        self, config_path: VersionedConfigPath, manifest: Mapping[HostName, str]
+    ) -> None:
+        store.save_object_to_file(self.manifest_file_path(config_path), dict(manifest))
+
+    def link(
+        self, previous_config_path: ConfigPath, config_path: VersionedConfigPath, hostname: HostName
+    ) -> bool:
+        """Reuse the unchanged host check files of a previous configuration"""
+        compiled_filename = self.host_check_file_path(config_path, hostname)
+        store.makedirs(compiled_filename.parent)
+        try:
+            os.link(
+                self.host_check_source_file_path(previous_config_path, hostname),
+                self.host_check_source_file_path(config_path, hostname),
+            )
+            os.link(self.host_check_file_path(previous_config_path, hostname), compiled_filename)
+        except OSError:
+            return False
+
+        console.verbose(" ==> %s (unchanged).\n", compiled_filename, stream=sys.stderr)
+        return True
+
     def write(self, config_path: VersionedConfigPath, hostname: HostName, host_check: str) -> None:
         compiled_filename = self.host_check_file_path(config_path, hostname)
         source_filename = self.host_check_source_file_path(config_path, hostname)
@@ -1126,36 +1282,102 @@ def _precompile_hostchecks(config_path: VersionedConfigPath) -> None:
     console.verbose("Precompiling host checks...\n")
 
     host_check_store = HostCheckStore()
-    for hostname in {
-        # Inconsistent with `create_config` above.
-        hn
-        for hn in itertools.chain(hosts_config.hosts, hosts_config.clusters)
-        if config_cache.is_active(hn) and config_cache.is_online(hn)
-    }:
-        try:
-            console.verbose(
-                "%s%s%-16s%s:",
-                tty.bold,
-                tty.blue,
-                hostname,
-                tty.normal,
-                stream=sys.stderr,
-            )
-            host_check = _dump_precompiled_hostcheck(
-                config_cache,
-                config_path,
-                hostname,
+    # The latest configuration is the previous one until the new one is complete.
+    previous_manifest = host_check_store.load_manifest(LATEST_CONFIG)
+    hostnames = sorted(
+        {
+            # Inconsistent with `create_config` above.
+            hn
+            for hn in itertools.chain(hosts_config.hosts, hosts_config.clusters)
+            if config_cache.is_active(hn) and config_cache.is_online(hn)
+        }
+    )
+    to_precompile = [(hostname, previous_manifest.get(hostname)) for hostname in hostnames]
+
+    processes = min(config.nagios_config_processes, len(hostnames))
+    if processes <= 1:
+        precompiled = _precompile_hostchecks_of(config_cache, config_path, to_precompile)
+    else:
+        # Forked like the workers rendering the hosts, see `create_config`.
+        chunk_size = -(-len(to_precompile) // (processes * 4))
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+            initargs=(config_cache,),
+        ) as executor:
+            precompiled = list(
+                itertools.chain.from_iterable(
+                    executor.map(
+                        _precompile_hostchecks_in_worker,
+                        itertools.repeat(config_path),
+                        (
+                            to_precompile[i : i + chunk_size]
+                            for i in range(0, len(to_precompile), chunk_size)
+                        ),
+                    )
+                )
             )
-            if host_check is None:
-                console.verbose("(no Checkmk checks)\n")
-                continue
 
+    host_check_store.save_manifest(
+        config_path,
+        {hostname: digest for hostname, digest in precompiled if digest is not None},
+    )
+
+
+def _precompile_hostchecks_in_worker(
+    config_path: VersionedConfigPath, to_precompile: Sequence[tuple[HostName, str | None]]
+) -> Sequence[tuple[HostName, str | None]]:
+    return _precompile_hostchecks_of(_get_worker_config_cache(), config_path, to_precompile)
+
+
+def _precompile_hostchecks_of(
+    config_cache: ConfigCache,
+    config_path: VersionedConfigPath,
+    to_precompile: Sequence[tuple[HostName, str | None]],
+) -> Sequence[tuple[HostName, str | None]]:
+    return [
+        (hostname, _precompile_hostcheck(config_cache, config_path, hostname, previous_digest))
+        for hostname, previous_digest in to_precompile
+    ]
+
+
+def _precompile_hostcheck(
+    config_cache: ConfigCache,
+    config_path: VersionedConfigPath,
+    hostname: HostName,
+    previous_digest: str | None,
+) -> str | None:
+    host_check_store = HostCheckStore()
+    try:
+        console.verbose(
+            "%s%s%-16s%s:",
+            tty.bold,
+            tty.blue,
+            hostname,
+            tty.normal,
+            stream=sys.stderr,
+        )
+        host_check = _dump_precompiled_hostcheck(
+            config_cache,
+            config_path,
+            hostname,
+        )
+        if host_check is None:
+            console.verbose("(no Checkmk checks)\n")
+            return None
+
+        digest = host_check_store.digest(host_check)
+        if digest != previous_digest or not host_check_store.link(
+            LATEST_CONFIG, config_path, hostname
+        ):
             host_check_store.write(config_path, hostname, host_check)
-        except Exception as e:
-            if cmk.utils.debug.enabled():
-                raise
-            console.error(f"Error precompiling checks for host {hostname}: {e}\n")
-            sys.exit(5)
+        return digest
+    except Exception as e:
+        if cmk.utils.debug.enabled():
+            raise
+        console.error(f"Error precompiling checks for host {hostname}: {e}\n")
+        sys.exit(5)
 
 
 def _dump_precompiled_hostcheck(  # pylint: disable=too-many-branches
@@ -83,7 +83,7 @@ http_proxies: dict[str, dict[str, str]] = {}
 # SNMP communities and encoding
 
 # Global config for SNMP Backend
-snmp_backend_default: Literal["inline", "classic"] = "inline"
+snmp_backend_default: Literal["inline", "classic", "native"] = "inline"
 # Deprecated: Replaced by snmp_backend_hosts
 use_inline_snmp: bool = True
 
@@ -171,6 +171,9 @@ summary_service_template = "check_mk_summarized"
 service_dependency_template = "check_mk"
 generate_hostconf = True
 generate_dummy_commands = True
+# Render the hosts of the Nagios configuration and precompile their host checks
+# in that many forked processes
+nagios_config_processes = 1
 dummy_check_commandline = 'echo "ERROR - you did an active check on this service - please disable active checks" && exit 1'
 nagios_illegal_chars = "`;~!$%^&*|'\"<>?,="
 cmc_illegal_chars = ";\t"  # Tab is an illegal character for CMC and semicolon breaks metric system
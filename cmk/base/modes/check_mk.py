@@ -48,10 +48,12 @@ from cmk.utils.resulttype import Result
 from cmk.utils.rulesets.ruleset_matcher import RulesetMatcher
 from cmk.utils.sectionname import SectionMap, SectionName
 from cmk.utils.structured_data import (
+    ARCHIVE_KEYFRAME_INTERVAL,
     ImmutableTree,
     load_tree,
     MutableTree,
     RawIntervalFromConfig,
+    TreeArchive,
     TreeOrArchiveStore,
     UpdateResult,
 )
@@ -72,6 +74,7 @@ import cmk.fetchers.snmp as snmp_factory
 from cmk.fetchers import FetcherType, get_raw_data
 from cmk.fetchers import Mode as FetchMode
 from cmk.fetchers.filecache import FileCacheOptions, MaxAge
+from cmk.fetchers.snmp_backend import compile_walk
 
 import cmk.checkengine.inventory as inventory
 from cmk.checkengine.checking import CheckPluginName, execute_checkmk_checks, make_timing_results
@@ -158,6 +161,8 @@ def parse_snmp_backend(backend: object) -> SNMPBackendEnum | None:
             return SNMPBackendEnum.INLINE
         case "classic":
             return SNMPBackendEnum.CLASSIC
+        case "native":
+            return SNMPBackendEnum.NATIVE
         case "stored-walk":
             return SNMPBackendEnum.STORED_WALK
         case _:
@@ -290,7 +295,7 @@ _SNMP_BACKEND_OPTION: Final = Option(
     long_option="snmp-backend",
     short_help="Override default SNMP backend",
     argument=True,
-    argument_descr="inline|classic|stored-walk",
+    argument_descr="inline|classic|native|stored-walk",
 )
 
 # .
@@ -1057,6 +1062,52 @@ modes.register(
     )
 )
 
+
+def mode_compile_snmpwalks(hostnames: list[str]) -> None:
+    walks_dir = Path(cmk.utils.paths.snmpwalks_dir)
+    if hostnames:
+        paths = [walks_dir / hostname for hostname in hostnames]
+    else:
+        paths = sorted(
+            path
+            for path in walks_dir.glob("*")
+            if path.is_file()
+            and not path.name.startswith(".")
+            and not path.name.endswith(".walkidx")
+        )
+
+    for path in paths:
+        if not path.exists():
+            raise MKGeneralException("The walk '%s' does not exist" % path)
+        try:
+            target = compile_walk(path)
+        except Exception as e:
+            console.error(f"Error compiling {path}: {e}\n")
+            if cmk.utils.debug.enabled():
+                raise
+            continue
+        console.verbose(f"Wrote compiled walk to {tty.bold}{target}{tty.normal}.\n")
+
+
+modes.register(
+    Mode(
+        long_option="compile-snmpwalks",
+        handler_function=mode_compile_snmpwalks,
+        needs_config=False,
+        needs_checks=False,
+        argument=True,
+        argument_descr="HOST1 HOST2...",
+        argument_optional=True,
+        short_help="Compile stored SNMP walks for fast lookups",
+        long_help=[
+            "Converts the walks of the specified hosts (or of all hosts) in the "
+            "directory '%s' into an indexed format, which is used by the stored walk "
+            "SNMP backend instead of searching the text walk. A compiled walk is "
+            "ignored once its text walk is changed." % cmk.utils.paths.snmpwalks_dir,
+        ],
+    )
+)
+
 # .
 #   .--snmpget-------------------------------------------------------------.
 #   |                                                   _                  |
@@ -2484,6 +2535,8 @@ def _execute_active_check_inventory(
     tree_or_archive_store = TreeOrArchiveStore(
         cmk.utils.paths.inventory_output_dir,
         cmk.utils.paths.inventory_archive_dir,
+        indexed=True,
+        delta_archive=True,
     )
     previous_tree = tree_or_archive_store.load_previous(host_name=host_name)
 
@@ -2823,6 +2876,39 @@ modes.register(
     )
 )
 
+
+def mode_compact_inventory_archive(args: list[str]) -> None:
+    archive_dir = Path(cmk.utils.paths.inventory_archive_dir)
+    if args:
+        host_names = [HostName(hn) for hn in args]
+    else:
+        try:
+            host_names = sorted(HostName(p.name) for p in archive_dir.iterdir() if p.is_dir())
+        except FileNotFoundError:
+            host_names = []
+
+    for host_name in host_names:
+        console.verbose("Compacting inventory archive of %s\n", host_name)
+        TreeArchive(archive_dir, host_name).compact(keyframe_interval=ARCHIVE_KEYFRAME_INTERVAL)
+
+
+modes.register(
+    Mode(
+        long_option="compact-inventory-archive",
+        handler_function=mode_compact_inventory_archive,
+        argument=True,
+        argument_descr="HOST1 HOST2...",
+        argument_optional=True,
+        short_help="Store archived HW/SW inventory trees as deltas",
+        long_help=[
+            "Replaces the archived HW/SW inventory trees of the given hosts (or of all "
+            "hosts) by deltas. Every %d-th tree is kept as a whole." % ARCHIVE_KEYFRAME_INTERVAL,
+        ],
+        needs_config=False,
+        needs_checks=False,
+    )
+)
+
 # .
 #   .--version-------------------------------------------------------------.
 #   |                                     _                                |
@@ -15,6 +15,7 @@
 #    => These already bear all information about the contact, the plugin
 #       to call and its parameters.
 
+import heapq
 import io
 import logging
 import os
@@ -24,10 +25,11 @@ import sys
 import time
 import traceback
 import uuid
-from collections.abc import Mapping, Sequence
+from collections.abc import Iterator, Mapping, Sequence
+from dataclasses import dataclass
 from functools import cache
 from pathlib import Path
-from typing import Any, cast, Literal, overload
+from typing import Any, cast, Final, Literal, overload
 
 import cmk.utils.debug
 import cmk.utils.log as log
@@ -56,6 +58,7 @@ from cmk.utils.notify_types import (
     NotificationContext,
     NotificationPluginNameStr,
     NotifyAnalysisInfo,
+    NotifyBulk,
     NotifyBulkParameters,
     NotifyBulks,
     NotifyPluginInfo,
@@ -391,6 +394,8 @@ def notification_analyse_backlog(nr: int) -> NotifyAnalysisInfo | None:
 
 # TODO: Make use of the generic do_keepalive() mechanism?
 def notify_keepalive() -> None:
+    global _bulk_index
+    _bulk_index = _BulkIndex()
     cmk.base.utils.register_sigint_handler()
     events.event_keepalive(
         event_function=notify_notify,
@@ -1571,6 +1576,8 @@ def do_bulk_notify(  # pylint: disable=too-many-branches
     filename_new.write_text(f"{(params, plugin_context)!r}\n")
     filename_new.rename(filename_final)  # We need an atomic creation!
     logger.info("        - stored in %s", filename_final)
+    if _bulk_index is not None:
+        _bulk_index.add(bulk_dir, notify_uuid, filename_final.stat().st_mtime)
 
 
 def _create_bulk_dir(bulk_path: Sequence[str]) -> Path:
@@ -1640,15 +1647,31 @@ def remove_if_orphaned(bulk_dir: str, max_age: float, ref_time: float | None = N
             logger.info("    -> Error removing it: %s", e)
 
 
-def find_bulks(only_ripe: bool) -> NotifyBulks:  # pylint: disable=too-many-branches
+@dataclass
+class _Bulk:
+    path: str
+    interval: int | None
+    timeperiod: str | None
+    count: int
+    uuids: UUIDs
+
+    @property
+    def oldest(self) -> float:
+        return min(mtime for mtime, _uuid in self.uuids)
+
+    def ripe_time(self) -> float:
+        """When the bulk is ripe, if that only depends on the age and the count"""
+        assert self.interval is not None
+        return 0.0 if len(self.uuids) >= self.count else self.oldest + self.interval
+
+
+def _scan_bulks(now: float) -> Iterator[_Bulk]:
     if not os.path.exists(notification_bulkdir):
-        return []
+        return
 
     def listdir_visible(path: str) -> list[str]:
         return [x for x in os.listdir(path) if not x.startswith(".")]
 
-    bulks: NotifyBulks = []
-    now = time.time()
     for contact in listdir_visible(notification_bulkdir):
         contact_dir = os.path.join(notification_bulkdir, contact)
         for method in listdir_visible(contact_dir):
@@ -1656,86 +1679,186 @@ def find_bulks(only_ripe: bool) -> NotifyBulks:  # pylint: disable=too-many-bran
             for bulk in listdir_visible(method_dir):
                 bulk_dir = os.path.join(method_dir, bulk)
 
-                uuids, oldest = bulk_uuids(bulk_dir)
+                uuids, _oldest = bulk_uuids(bulk_dir)
                 if not uuids:
                     remove_if_orphaned(bulk_dir, max_age=60, ref_time=now)
                     continue
-                age = now - oldest
 
                 # e.g. 60,10,host,localhost OR timeperiod:late_night,1000,host,localhost
                 parts = bulk_parts(method_dir, bulk)
                 if parts is None:
                     continue
-                interval, timeperiod, count = parts
+                yield _Bulk(bulk_dir, *parts, uuids)
 
-                if interval is not None:
-                    if age >= interval:
-                        logger.info("Bulk %s is ripe: age %d >= %d", bulk_dir, age, interval)
-                    elif len(uuids) >= count:
-                        logger.info("Bulk %s is ripe: count %d >= %d", bulk_dir, len(uuids), count)
-                    else:
-                        logger.info(
-                            "Bulk %s is not ripe yet (age: %d, count: %d)!",
-                            bulk_dir,
-                            age,
-                            len(uuids),
-                        )
-                        if only_ripe:
-                            continue
 
-                    bulks.append((bulk_dir, age, interval, "n.a.", count, uuids))
-                else:
-                    try:
-                        active = timeperiod_active(str(timeperiod))
-                    except Exception:
-                        # This prevents sending bulk notifications if a
-                        # livestatus connection error appears. It also implies
-                        # that an ongoing connection error will hold back bulk
-                        # notifications.
-                        logger.info(
-                            "Error while checking activity of time period %s: assuming active",
-                            timeperiod,
-                        )
-                        active = True
-
-                    if active is True and len(uuids) < count:
-                        # Only add a log entry every 10 minutes since timeperiods
-                        # can be very long (The default would be 10s).
-                        if now % 600 <= config.notification_bulk_interval:
-                            logger.info(
-                                "Bulk %s is not ripe yet (time period %s: active, count: %d)",
-                                bulk_dir,
-                                timeperiod,
-                                len(uuids),
-                            )
-
-                        if only_ripe:
-                            continue
-                    elif active is False:
-                        logger.info(
-                            "Bulk %s is ripe: time period %s has ended", bulk_dir, timeperiod
-                        )
-                    elif len(uuids) >= count:
-                        logger.info("Bulk %s is ripe: count %d >= %d", bulk_dir, len(uuids), count)
-                    else:
-                        logger.info(
-                            "Bulk %s is ripe: time period %s is not known anymore",
-                            bulk_dir,
-                            timeperiod,
-                        )
+def _check_bulk(bulk: _Bulk, now: float, only_ripe: bool) -> NotifyBulk | None:
+    bulk_dir, interval, timeperiod, count, uuids = (
+        bulk.path,
+        bulk.interval,
+        bulk.timeperiod,
+        bulk.count,
+        bulk.uuids,
+    )
+    age = now - bulk.oldest
+
+    if interval is not None:
+        if age >= interval:
+            logger.info("Bulk %s is ripe: age %d >= %d", bulk_dir, age, interval)
+        elif len(uuids) >= count:
+            logger.info("Bulk %s is ripe: count %d >= %d", bulk_dir, len(uuids), count)
+        else:
+            logger.info(
+                "Bulk %s is not ripe yet (age: %d, count: %d)!",
+                bulk_dir,
+                age,
+                len(uuids),
+            )
+            if only_ripe:
+                return None
+
+        return bulk_dir, age, interval, "n.a.", count, uuids
+
+    try:
+        active = timeperiod_active(str(timeperiod))
+    except Exception:
+        # This prevents sending bulk notifications if a
+        # livestatus connection error appears. It also implies
+        # that an ongoing connection error will hold back bulk
+        # notifications.
+        logger.info(
+            "Error while checking activity of time period %s: assuming active",
+            timeperiod,
+        )
+        active = True
+
+    if active is True and len(uuids) < count:
+        # Only add a log entry every 10 minutes since timeperiods
+        # can be very long (The default would be 10s).
+        if now % 600 <= config.notification_bulk_interval:
+            logger.info(
+                "Bulk %s is not ripe yet (time period %s: active, count: %d)",
+                bulk_dir,
+                timeperiod,
+                len(uuids),
+            )
+
+        if only_ripe:
+            return None
+    elif active is False:
+        logger.info("Bulk %s is ripe: time period %s has ended", bulk_dir, timeperiod)
+    elif len(uuids) >= count:
+        logger.info("Bulk %s is ripe: count %d >= %d", bulk_dir, len(uuids), count)
+    else:
+        logger.info(
+            "Bulk %s is ripe: time period %s is not known anymore",
+            bulk_dir,
+            timeperiod,
+        )
+
+    return bulk_dir, age, "n.a.", timeperiod, count, uuids
+
+
+def find_bulks(only_ripe: bool) -> NotifyBulks:
+    now = time.time()
+    return [
+        notify_bulk
+        for bulk in _scan_bulks(now)
+        if (notify_bulk := _check_bulk(bulk, now, only_ripe)) is not None
+    ]
+
+
+class _BulkIndex:
+    """The open bulks of the keepalive notification process
+
+    Instead of walking the bulk directories on every loop, the bulks are indexed
+    in memory. The index is updated with every notification stored for bulking
+    by this process. The bulks with an interval are ordered by the time they get
+    ripe, those with a time period are checked on every loop.
+
+    Other processes may store notifications for bulking, too (e.g. spool files),
+    so the index is rebuilt from the bulk directories every RESCAN_INTERVAL.
+    """
+
+    RESCAN_INTERVAL: Final = 60.0
+
+    def __init__(self) -> None:
+        self._bulks: dict[str, _Bulk] = {}
+        self._ripe_times: list[tuple[float, str]] = []
+        self._next_rescan = 0.0
+
+    def __len__(self) -> int:
+        return len(self._bulks)
+
+    def _rescan(self, now: float) -> None:
+        self._bulks = {bulk.path: bulk for bulk in _scan_bulks(now)}
+        self._ripe_times = [
+            (bulk.ripe_time(), bulk.path)
+            for bulk in self._bulks.values()
+            if bulk.interval is not None
+        ]
+        heapq.heapify(self._ripe_times)
+        self._next_rescan = now + self.RESCAN_INTERVAL
+
+    def add(self, bulk_dir: Path, notify_uuid: str, mtime: float) -> None:
+        if (bulk := self._bulks.get(str(bulk_dir))) is None:
+            if (parts := bulk_parts(str(bulk_dir.parent), bulk_dir.name)) is None:
+                return
+            bulk = self._bulks[str(bulk_dir)] = _Bulk(str(bulk_dir), *parts, [])
+
+        bulk.uuids.append((mtime, notify_uuid))
+        if bulk.interval is not None:
+            heapq.heappush(self._ripe_times, (bulk.ripe_time(), bulk.path))
+
+    def pop_ripe(self, now: float) -> NotifyBulks:
+        if now >= self._next_rescan:
+            self._rescan(now)
+
+        ripe: NotifyBulks = []
+        not_ripe = []
+        while self._ripe_times and self._ripe_times[0][0] <= now:
+            ripe_time, path = heapq.heappop(self._ripe_times)
+            # Bulks are scheduled again when they grow, skip the outdated entries.
+            if (bulk := self._bulks.get(path)) is None or bulk.ripe_time() != ripe_time:
+                continue
+            if (notify_bulk := _check_bulk(bulk, now, only_ripe=True)) is None:
+                not_ripe.append((ripe_time, path))
+                continue
+            del self._bulks[path]
+            ripe.append(notify_bulk)
+
+        # Check them again with the next loop
+        for entry in not_ripe:
+            heapq.heappush(self._ripe_times, entry)
+
+        for path, bulk in list(self._bulks.items()):
+            if bulk.timeperiod is None:
+                continue
+            if (notify_bulk := _check_bulk(bulk, now, only_ripe=True)) is not None:
+                del self._bulks[path]
+                ripe.append(notify_bulk)
+
+        return ripe
+
+    def readd(self, bulk_dir: str, uuids: UUIDs) -> None:
+        """Add a bulk again which could not be sent, it is retried with the next loop"""
+        for mtime, notify_uuid in uuids:
+            self.add(Path(bulk_dir), notify_uuid, mtime)
+
 
-                    bulks.append((bulk_dir, age, "n.a.", timeperiod, count, uuids))
-    return bulks
+# Only in keepalive mode, see notify_keepalive()
+_bulk_index: _BulkIndex | None = None
 
 
 def send_ripe_bulks() -> None:
-    ripe = find_bulks(True)
+    ripe = find_bulks(True) if _bulk_index is None else _bulk_index.pop_ripe(time.time())
     if ripe:
         logger.info("Sending out %d ripe bulk notifications", len(ripe))
         for bulk in ripe:
             try:
                 notify_bulk(bulk[0], bulk[-1])
             except Exception:
+                if _bulk_index is not None:
+                    _bulk_index.readd(bulk[0], bulk[-1])
                 if cmk.utils.debug.enabled():
                     raise
                 logger.exception("Error sending bulk %s:", bulk[0])
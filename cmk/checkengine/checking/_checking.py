@@ -33,6 +33,8 @@ from cmk.checkengine.inventory import (
 from cmk.checkengine.parser import group_by_host, ParserFunction
 from cmk.checkengine.sectionparser import (
     make_providers,
+    ParsedSectionName,
+    parsing_statistics,
     Provider,
     SectionPlugin,
     store_piggybacked_sections,
@@ -78,6 +80,13 @@ def execute_checkmk_checks(
         host_sections_by_host,
         section_plugins,
         error_handling=section_error_handling,
+        demanded=_demanded_sections(
+            services=services,
+            check_plugins=check_plugins,
+            inventory_plugins=inventory_plugins,
+            run_plugin_names=run_plugin_names,
+            params=params,
+        ),
     )
     service_results = list(
         check_host_services(
@@ -102,6 +111,9 @@ def execute_checkmk_checks(
             params=params,
             providers=providers,
         )
+    console.vverbose(
+        "Parsed %d raw sections, skipped %d\n" % parsing_statistics(providers.values())
+    )
     timed_results = itertools.chain(
         summarizer(host_sections),
         check_parsing_errors(
@@ -115,6 +127,31 @@ def execute_checkmk_checks(
     return ActiveCheckResult.from_subresults(*timed_results)
 
 
+def _demanded_sections(
+    *,
+    services: Sequence[ConfiguredService],
+    check_plugins: Mapping[CheckPluginName, CheckPlugin],
+    inventory_plugins: Mapping[InventoryPluginName, InventoryPlugin],
+    run_plugin_names: Container[CheckPluginName],
+    params: HWSWInventoryParameters,
+) -> frozenset[ParsedSectionName]:
+    """The parsed sections the plugins run during checking may ask for"""
+    demanded = {
+        section_name
+        for service in services
+        if service.check_plugin_name in run_plugin_names
+        and service.check_plugin_name in check_plugins
+        for section_name in check_plugins[service.check_plugin_name].sections
+    }
+    if run_plugin_names is EVERYTHING and params.status_data_inventory:
+        demanded.update(
+            section_name
+            for inventory_plugin in inventory_plugins.values()
+            for section_name in inventory_plugin.sections
+        )
+    return frozenset(demanded)
+
+
 def _do_inventory_actions_during_checking_for(
     host_name: HostName,
     *,
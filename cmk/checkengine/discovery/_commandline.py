@@ -23,6 +23,7 @@ from cmk.checkengine.fetcher import FetcherFunction, HostKey
 from cmk.checkengine.parser import group_by_host, ParserFunction
 from cmk.checkengine.sectionparser import (
     make_providers,
+    parsing_statistics,
     Provider,
     SectionPlugin,
     store_piggybacked_sections,
@@ -31,7 +32,7 @@ from cmk.checkengine.sectionparserutils import check_parsing_errors
 
 from ._autochecks import AutochecksStore
 from ._discovery import DiscoveryPlugin
-from ._host_labels import discover_host_labels, HostLabelPlugin
+from ._host_labels import discover_host_labels, host_label_sections, HostLabelPlugin
 from ._services import analyse_services, discover_services, find_plugins
 from ._utils import QualifiedDiscovery
 
@@ -72,6 +73,15 @@ def commandline_discovery(
             host_sections_by_host,
             section_plugins,
             error_handling=section_error_handling,
+            demanded=host_label_sections(host_label_plugins, section_plugins).union(
+                ()
+                if only_host_labels
+                else itertools.chain.from_iterable(
+                    plugin.sections
+                    for plugin_name, plugin in plugins.items()
+                    if plugin_name in run_plugin_names
+                )
+            ),
         )
         _commandline_discovery_on_host(
             real_host_name=host_name,
@@ -86,6 +96,9 @@ def commandline_discovery(
             only_host_labels=only_host_labels,
             on_error=on_error,
         )
+        console.vverbose(
+            "Parsed %d raw sections, skipped %d\n" % parsing_statistics(providers.values())
+        )
 
     except Exception as e:
         if cmk.utils.debug.enabled():
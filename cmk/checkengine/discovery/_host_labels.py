@@ -21,7 +21,7 @@ from cmk.utils.sectionname import SectionMap
 from cmk.checkengine.discovery._utils import QualifiedDiscovery
 from cmk.checkengine.fetcher import HostKey, SourceType
 from cmk.checkengine.parameters import Parameters
-from cmk.checkengine.sectionparser import Provider, ResolvedResult
+from cmk.checkengine.sectionparser import ParsedSectionName, Provider, ResolvedResult, SectionPlugin
 
 from cmk.agent_based.v1 import HostLabel
 
@@ -30,6 +30,7 @@ __all__ = [
     "discover_host_labels",
     "HostLabel",
     "HostLabelPlugin",
+    "host_label_sections",
 ]
 
 
@@ -92,6 +93,14 @@ def discover_host_labels(
     return list(labels_by_name.values())
 
 
+def host_label_sections(
+    host_label_plugins: SectionMap[HostLabelPlugin],
+    section_plugins: SectionMap[SectionPlugin],
+) -> frozenset[ParsedSectionName]:
+    """The parsed sections the host label plugins may be called with"""
+    return frozenset(section_plugins[name].parsed_section_name for name in host_label_plugins)
+
+
 def _all_parsing_results(
     host_key: HostKey,
     providers: Mapping[HostKey, Provider],
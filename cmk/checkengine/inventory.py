@@ -41,6 +41,7 @@ from .parser import group_by_host, HostSections, ParserFunction
 from .sectionparser import (
     make_providers,
     ParsedSectionName,
+    parsing_statistics,
     Provider,
     ResolvedResult,
     SectionPlugin,
@@ -128,6 +129,12 @@ def inventorize_host(
         host_sections_by_host,
         section_plugins,
         error_handling=section_error_handling,
+        demanded=frozenset(
+            section_name
+            for plugin_name, inventory_plugin in inventory_plugins.items()
+            if plugin_name in run_plugin_names
+            for section_name in inventory_plugin.sections
+        ),
     )
 
     trees, update_result = _inventorize_real_host(
@@ -152,6 +159,9 @@ def inventorize_host(
     parsing_errors: Sequence[str] = list(
         itertools.chain.from_iterable(resolver.parsing_errors for resolver in providers.values())
     )
+    console.vverbose(
+        "Parsed %d raw sections, skipped %d\n" % parsing_statistics(providers.values())
+    )
     processing_failed = any(
         host_section.is_error() for _source, host_section in host_sections
     ) or bool(parsing_errors)
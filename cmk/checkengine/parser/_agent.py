@@ -37,6 +37,10 @@ from ._parser import (
 # current users.
 is_valid_hostname = re.compile(rf"^\w[{REGEX_HOST_NAME_CHARS}]*$").match
 
+# Matches the lines `ParserState.__call__` treats as section or piggyback markers, but
+# also their tails.  Not anchored at the line start, so that the search runs on the literal.
+_MARKER_LINE: Final = re.compile(rb"<<<[^\n]*>>>\r*$", re.MULTILINE)
+
 
 class SectionWithHeader(NamedTuple):
     header: SectionMarker
@@ -569,7 +573,7 @@ class AgentParser(Parser[AgentRawData, AgentRawDataSection]):
 
         now = int(time.time())
 
-        raw_sections, piggyback_sections = self._parse_host_section(raw_data)
+        raw_sections, piggyback_sections = self._parse_host_section(raw_data, selection=selection)
         section_info = {
             header.name: header
             for header, _ in raw_sections
@@ -655,8 +659,17 @@ class AgentParser(Parser[AgentRawData, AgentRawDataSection]):
     def _parse_host_section(
         self,
         raw_data: AgentRawData,
+        *,
+        selection: SectionNameCollection = NO_SELECTION,
     ) -> tuple[ImmutableSection, Mapping[PiggybackMarker, ImmutableSection]]:
-        """Split agent output in chunks, splits lines by whitespaces."""
+        """Split agent output in chunks, splits lines by whitespaces.
+
+        Only the marker lines are fed to the state machine.  The data lines
+        between two markers never change its state, so they are attached to
+        the current section at once, and only split for the sections in the
+        selection.  The content of the other sections is left empty.
+
+        """
         parser: ParserState = NOOPParser(
             self.hostname,
             [],
@@ -665,7 +678,41 @@ class AgentParser(Parser[AgentRawData, AgentRawDataSection]):
             encoding_fallback=self.encoding_fallback,
             logger=self._logger,
         )
-        for line in raw_data.split(b"\n"):
-            parser = parser(line.rstrip(b"\r"))
+        start = 0
+        for marker in _MARKER_LINE.finditer(raw_data):
+            if marker.start() and raw_data[marker.start() - 1] != 0x0A:  # b"\n"
+                continue
+            _add_lines(parser, raw_data, start, marker.start(), selection=selection)
+            parser = parser(marker.group().rstrip(b"\r"))
+            start = marker.end() + 1
+        _add_lines(parser, raw_data, start, len(raw_data), selection=selection)
 
         return parser.sections, parser.piggyback_sections
+
+
+def _add_lines(
+    parser: ParserState,
+    raw_data: bytes,
+    start: int,
+    end: int,
+    *,
+    selection: SectionNameCollection,
+) -> None:
+    """Add the data lines in `raw_data[start:end]` as `parser.do_action()` would."""
+    if isinstance(parser, HostSectionParser):
+        section = parser.sections[-1]
+        strip = not parser.current_section.nostrip
+    elif isinstance(parser, PiggybackSectionParser):
+        section = parser.piggyback_sections[parser.current_host][-1]
+        strip = False
+    else:
+        return
+
+    if start >= end or not (selection is NO_SELECTION or section.header.name in selection):
+        return
+
+    lines = raw_data[start:end].split(b"\n")
+    if strip:
+        section.section.extend(AgentRawData(line) for line in map(bytes.strip, lines) if line)
+    else:
+        section.section.extend(AgentRawData(line.rstrip(b"\r")) for line in lines if line.strip())
@@ -5,11 +5,12 @@
 
 from __future__ import annotations
 
-from collections.abc import Callable, Iterable, Mapping, Sequence, Set
+from collections.abc import Callable, Container, Iterable, Mapping, Sequence, Set
 from dataclasses import dataclass
 from typing import Any, Final, Generic, NamedTuple, TypeVar
 
 import cmk.utils.piggyback
+from cmk.utils.everythingtype import EVERYTHING
 from cmk.utils.hostaddress import HostName
 from cmk.utils.sectionname import SectionMap, SectionName
 from cmk.utils.validatedstr import ValidatedString
@@ -42,6 +43,11 @@ class _ParsingResult(NamedTuple):
     cache_info: _CacheInfo | None
 
 
+class ParsingStatistics(NamedTuple):
+    parsed: int
+    skipped: int
+
+
 class ResolvedResult(NamedTuple):
     section_name: SectionName
     parsed_data: ParsedSectionContent
@@ -68,6 +74,7 @@ class SectionsParser(Generic[_TSeq]):
         self._host_sections: HostSections[SectionMap[_TSeq]] = host_sections
         self.parsing_errors: list[str] = []
         self._memoized_results: dict[SectionName, _ParsingResult | None] = {}
+        self._parse_function_calls = 0
         self._host_name = host_name
         self.error_handling: Final = error_handling
 
@@ -78,6 +85,14 @@ class SectionsParser(Generic[_TSeq]):
             self._host_name,
         )
 
+    @property
+    def statistics(self) -> ParsingStatistics:
+        """The number of raw sections parsed so far and of those not parsed (yet)"""
+        return ParsingStatistics(
+            parsed=self._parse_function_calls,
+            skipped=len(self._host_sections.sections) - self._parse_function_calls,
+        )
+
     def parse(
         self, section_name: SectionName, parse_function: Callable[[Sequence[_TSeq]], Any]
     ) -> _ParsingResult | None:
@@ -106,6 +121,7 @@ class SectionsParser(Generic[_TSeq]):
         except KeyError:
             return None
 
+        self._parse_function_calls += 1
         try:
             return parse_function(list(raw_data))
         except Exception:
@@ -140,6 +156,10 @@ class ParsedSectionsResolver:
     def parsing_errors(self) -> Sequence[str]:
         return self._parser.parsing_errors
 
+    @property
+    def statistics(self) -> ParsingStatistics:
+        return self._parser.statistics
+
     @staticmethod
     def _init_superseders(
         section_plugins: SectionMap[SectionPlugin],
@@ -210,7 +230,14 @@ def make_providers(
     section_plugins: SectionMap[SectionPlugin],
     *,
     error_handling: Callable[[SectionName, _TSeq], str],
+    demanded: Container[ParsedSectionName] = EVERYTHING,
 ) -> Mapping[HostKey, Provider]:
+    """Create the providers of the parsed sections
+
+    Only the raw sections needed to resolve the `demanded` parsed sections
+    will ever be parsed, see `demanded_section_plugins()`.
+
+    """
     return {
         host_key: ParsedSectionsResolver(
             SectionsParser(
@@ -218,10 +245,47 @@ def make_providers(
                 host_name=host_key.hostname,
                 error_handling=error_handling,
             ),
-            section_plugins={
-                section_name: section_plugins[section_name]
-                for section_name in host_sections.sections
-            },
+            section_plugins=demanded_section_plugins(
+                {
+                    section_name: section_plugins[section_name]
+                    for section_name in host_sections.sections
+                },
+                demanded,
+            ),
         )
         for host_key, host_sections in host_sections.items()
     }
+
+
+def demanded_section_plugins(
+    section_plugins: SectionMap[SectionPlugin],
+    demanded: Container[ParsedSectionName],
+) -> SectionMap[SectionPlugin]:
+    """Restrict the section plugins to those needed for the demanded parsed sections
+
+    These are the producers of the demanded parsed sections and the plugins
+    superseding any of the producers, as the latter must be parsed to decide
+    whether a producer is superseded.  Superseding is not transitive.
+
+    """
+    if demanded is EVERYTHING:
+        return section_plugins
+
+    producers = {
+        section_name
+        for section_name, section_plugin in section_plugins.items()
+        if section_plugin.parsed_section_name in demanded
+    }
+    return {
+        section_name: section_plugin
+        for section_name, section_plugin in section_plugins.items()
+        if section_name in producers or not section_plugin.supersedes.isdisjoint(producers)
+    }
+
+
+def parsing_statistics(providers: Iterable[Provider]) -> ParsingStatistics:
+    statistics = [provider.statistics for provider in providers]
+    return ParsingStatistics(
+        parsed=sum(s.parsed for s in statistics),
+        skipped=sum(s.skipped for s in statistics),
+    )
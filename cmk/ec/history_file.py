@@ -54,23 +54,12 @@ class FileHistory(History):
         """
         _log_event(self._config, self._logger, event, what, who, addinfo)
         with self._lock:
-            columns = [
-                quote_tab(str(time.time())),
-                quote_tab(scrub_string(what)),
-                quote_tab(scrub_string(who)),
-                quote_tab(scrub_string(addinfo)),
-            ]
-            columns += [
-                quote_tab(event.get(colname[6:], defval))  # drop "event_"
-                for colname, defval in self._event_columns
-            ]
-
             with get_logfile(
                 self._config,
                 self._settings.paths.history_dir.value,
                 self._active_history_period,
             ).open(mode="ab") as f:
-                f.write(b"\t".join(columns) + b"\n")
+                f.write(history_line(self._event_columns, event, what, who, addinfo))
 
     def get(self, query: QueryGET) -> Iterable[Sequence[object]]:
         if not self._settings.paths.history_dir.value.exists():
@@ -128,6 +117,23 @@ class FileHistory(History):
         _expire_logfiles(self._settings, self._config, self._logger, self._lock, False)
 
 
+def history_line(
+    event_columns: Columns, event: Event, what: HistoryWhat, who: str, addinfo: str
+) -> bytes:
+    """Tab-separated history entry, see FileHistory.add()"""
+    columns = [
+        quote_tab(str(time.time())),
+        quote_tab(scrub_string(what)),
+        quote_tab(scrub_string(who)),
+        quote_tab(scrub_string(addinfo)),
+    ]
+    columns += [
+        quote_tab(event.get(colname[6:], defval))  # drop "event_"
+        for colname, defval in event_columns
+    ]
+    return b"\t".join(columns) + b"\n"
+
+
 def _expire_logfiles(
     settings: Settings, config: Config, logger: Logger, lock_history: threading.Lock, flush: bool
 ) -> None:
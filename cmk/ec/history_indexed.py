@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""EC History backend with block indexes
+
+The history entries are appended to the same tab-separated log files as used by
+FileHistory. Every BLOCK_SIZE entries, a line describing the block is appended
+to a sidecar index file next to the log file (<period>.idx): its byte range,
+its line numbers, its time span and the sets of hosts and event IDs within the
+block. Queries with filters on the history time, the host or the event ID only
+read and parse the blocks which can contain matching entries.
+
+Entries written after the last indexed block (e.g. the currently open block or
+entries written by FileHistory) are always read. Log files without an index,
+e.g. from the file backend, are indexed incrementally, see index_history_file().
+"""
+
+import json
+import threading
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import asdict, dataclass, field
+from logging import Logger
+from pathlib import Path
+from typing import Any
+
+from cmk.utils.log import VERBOSE
+
+from .config import Config
+from .event import Event
+from .history import _log_event, ActiveHistoryPeriod, get_logfile, History, HistoryWhat
+from .history_file import (
+    _expire_logfiles,
+    _greatest_lower_bound_for_filters,
+    _intersects,
+    _least_upper_bound_for_filters,
+    convert_history_line,
+    history_line,
+)
+from .query import Columns, QueryFilter, QueryGET
+from .settings import Settings
+
+# Number of history entries described by one index entry
+BLOCK_SIZE = 256
+
+
+@dataclass
+class Block:
+    offset: int
+    length: int = 0
+    line: int = 1  # number of the first line in the log file, like "nl"
+    count: int = 0
+    first: float | None = None
+    last: float | None = None
+    hosts: set[str] = field(default_factory=set)
+    event_ids: set[int] = field(default_factory=set)
+
+    @property
+    def end(self) -> int:
+        return self.offset + self.length
+
+    def next_block(self) -> "Block":
+        return Block(offset=self.end, line=self.line + self.count)
+
+    def add(self, length: int, entry_time: float, host: str, event_id: int) -> None:
+        self.skip(length)
+        self.first = entry_time if self.first is None else min(self.first, entry_time)
+        self.last = entry_time if self.last is None else max(self.last, entry_time)
+        self.hosts.add(host.lower())
+        self.event_ids.add(event_id)
+
+    def skip(self, length: int) -> None:
+        """Add an invalid line, which is never part of a query result"""
+        self.length += length
+        self.count += 1
+
+    def serialize(self) -> bytes:
+        raw = asdict(self)
+        raw["hosts"] = sorted(self.hosts)
+        raw["event_ids"] = sorted(self.event_ids)
+        return json.dumps(raw).encode("utf-8") + b"\n"
+
+    @classmethod
+    def deserialize(cls, raw: bytes) -> "Block":
+        block = cls(**json.loads(raw))
+        block.hosts = set(block.hosts)
+        block.event_ids = set(block.event_ids)
+        return block
+
+
+@dataclass(frozen=True)
+class EntryKeys:
+    """Positions of the indexed values within a line of the log file"""
+
+    host: int
+    event_id: int
+
+    @classmethod
+    def from_history_columns(cls, history_columns: Columns) -> "EntryKeys":
+        names = [name for name, _default in history_columns]
+        # The log files don't contain the first column "history_line"
+        return cls(host=names.index("event_host") - 1, event_id=names.index("event_id") - 1)
+
+    def add_to_block(self, block: Block, line: bytes) -> None:
+        parts = line.split(b"\t")
+        try:
+            entry_time = float(parts[0])
+            host = parts[self.host].decode("utf-8")
+            event_id = int(parts[self.event_id])
+        except (IndexError, ValueError):
+            block.skip(len(line))
+            return
+        block.add(len(line), entry_time, host, event_id)
+
+
+def index_path(path: Path) -> Path:
+    return path.with_suffix(".idx")
+
+
+def read_index(path: Path) -> list[Block]:
+    """Read the index of the given log file, drop it if it does not fit the log file"""
+    try:
+        raw_index = index_path(path).read_bytes()
+    except FileNotFoundError:
+        return []
+    blocks: list[Block] = []
+    for raw in raw_index.splitlines():
+        try:
+            blocks.append(Block.deserialize(raw))
+        except (ValueError, TypeError):
+            break  # e.g. incompletely written last line, will be reindexed
+    if blocks and blocks[-1].end > path.stat().st_size:
+        index_path(path).unlink(missing_ok=True)  # The log file has been replaced
+        return []
+    return blocks
+
+
+def index_history_file(path: Path, keys: EntryKeys) -> Block:
+    """Index the entries of the log file which are not indexed yet
+
+    This is used to convert the log files of the file backend, too. Returns the
+    (empty) block following the last indexed one."""
+    blocks = read_index(path)
+    block = blocks[-1].next_block() if blocks else Block(offset=0)
+    with path.open("rb") as f:
+        f.seek(block.offset)
+        tail = f.read()
+    new_index = b""
+    # Only complete lines are indexed
+    for line in tail.splitlines(keepends=True)[: tail.count(b"\n")]:
+        keys.add_to_block(block, line)
+        if block.count >= BLOCK_SIZE:
+            new_index += block.serialize()
+            block = block.next_block()
+    if block.count:
+        new_index += block.serialize()
+        block = block.next_block()
+    if new_index:
+        with index_path(path).open("ab") as f:
+            f.write(new_index)
+    return block
+
+
+def convert_history_files(history_dir: Path, history_columns: Columns, logger: Logger) -> None:
+    """Create or update the indexes of all log files in the history directory"""
+    keys = EntryKeys.from_history_columns(history_columns)
+    for path in sorted(history_dir.glob("*.log")):
+        logger.log(VERBOSE, "Indexing history file %s", path)
+        index_history_file(path, keys)
+
+
+@dataclass(frozen=True)
+class _BlockFilter:
+    time_range: tuple[float | None, float | None]
+    hosts: Sequence[set[str]]
+    event_ids: Sequence[set[int]]
+
+    @classmethod
+    def from_query_filters(cls, filters: Iterable[QueryFilter]) -> "_BlockFilter":
+        time_filters = []
+        hosts = []
+        event_ids = []
+        for f in filters:
+            if f.column_name == "history_time":
+                time_filters.append((f.operator_name, f.argument))
+            elif f.column_name == "event_host" and f.operator_name in ("=", "=~"):
+                hosts.append({str(f.argument).lower()})
+            elif f.column_name == "event_host" and f.operator_name == "in":
+                hosts.append({str(a).lower() for a in f.argument})
+            elif f.column_name == "event_id" and f.operator_name == "=":
+                event_ids.append({int(f.argument)})
+            elif f.column_name == "event_id" and f.operator_name == "in":
+                event_ids.append({int(a) for a in f.argument})
+        return cls(
+            time_range=(
+                _greatest_lower_bound_for_filters(time_filters),
+                _least_upper_bound_for_filters(time_filters),
+            ),
+            hosts=hosts,
+            event_ids=event_ids,
+        )
+
+    def may_match(self, block: Block) -> bool:
+        return (
+            _intersects(self.time_range, (block.first, block.last))
+            and all(block.hosts & hosts for hosts in self.hosts)
+            and all(block.event_ids & event_ids for event_ids in self.event_ids)
+        )
+
+
+class IndexedHistory(History):
+    def __init__(
+        self,
+        settings: Settings,
+        config: Config,
+        logger: Logger,
+        event_columns: Columns,
+        history_columns: Columns,
+    ) -> None:
+        self._settings = settings
+        self._config = config
+        self._logger = logger
+        self._event_columns = event_columns
+        self._history_columns = history_columns
+        self._keys = EntryKeys.from_history_columns(history_columns)
+        self._lock = threading.Lock()
+        self._active_history_period = ActiveHistoryPeriod()
+        # The block currently written to, not yet in the index
+        self._open_path: Path | None = None
+        self._open_block: Block | None = None
+
+    def flush(self) -> None:
+        with self._lock:
+            self._open_path = self._open_block = None
+        _expire_logfiles(self._settings, self._config, self._logger, self._lock, True)
+        self._remove_orphaned_indexes()
+
+    def add(self, event: Event, what: HistoryWhat, who: str = "", addinfo: str = "") -> None:
+        _log_event(self._config, self._logger, event, what, who, addinfo)
+        with self._lock:
+            path = get_logfile(
+                self._config,
+                self._settings.paths.history_dir.value,
+                self._active_history_period,
+            )
+            if self._open_block is None or self._open_path != path or not path.exists():
+                if self._open_path is not None and self._open_path.exists():
+                    self._close_block()
+                self._open_path = path
+                path.touch()
+                self._open_block = index_history_file(path, self._keys)
+
+            line = history_line(self._event_columns, event, what, who, addinfo)
+            with path.open(mode="ab") as f:
+                f.write(line)
+            self._keys.add_to_block(self._open_block, line)
+            if self._open_block.count >= BLOCK_SIZE:
+                self._close_block()
+
+    def _close_block(self) -> None:
+        if self._open_path is None or self._open_block is None:
+            return
+        if self._open_block.count:
+            with index_path(self._open_path).open("ab") as f:
+                f.write(self._open_block.serialize())
+            self._open_block = self._open_block.next_block()
+
+    def get(self, query: QueryGET) -> Iterable[Sequence[object]]:
+        history_dir = self._settings.paths.history_dir.value
+        if not history_dir.exists():
+            return []
+
+        block_filter = _BlockFilter.from_query_filters(query.filters)
+        self._logger.debug("Block filter: %r", block_filter)
+        limit = query.limit
+
+        # Like the file backend: the younger entries first
+        history_entries: list[Any] = []
+        for path in sorted(history_dir.glob("*.log"), reverse=True):
+            for block, indexed in reversed(self._blocks(path)):
+                if indexed and not block_filter.may_match(block):
+                    continue
+                for entry in self._read_block(path, block):
+                    if query.filter_row(entry):
+                        history_entries.append(entry)
+                        if limit is not None and len(history_entries) >= limit:
+                            self._logger.debug("query limit reached")
+                            return history_entries
+        return history_entries
+
+    def _blocks(self, path: Path) -> list[tuple[Block, bool]]:
+        """The indexed blocks plus one unindexed block with all entries after them"""
+        try:
+            with self._lock:
+                if path != self._open_path:
+                    index_history_file(path, self._keys)
+                blocks = read_index(path)
+            tail = blocks[-1].next_block() if blocks else Block(offset=0)
+            tail.length = path.stat().st_size - tail.offset
+        except FileNotFoundError:
+            return []  # expired in the meantime
+        return [(block, True) for block in blocks] + ([(tail, False)] if tail.length > 0 else [])
+
+    def _read_block(self, path: Path, block: Block) -> Iterator[list[Any]]:
+        try:
+            with path.open("rb") as f:
+                f.seek(block.offset)
+                data = f.read(block.length)
+        except FileNotFoundError:
+            return
+        lines = data.split(b"\n")[: data.count(b"\n")]
+        for line_number, line in reversed(list(enumerate(lines, block.line))):
+            try:
+                parts: list[Any] = [line_number, *line.decode("utf-8").split("\t")]
+                convert_history_line(self._history_columns, parts)
+            except Exception:
+                self._logger.exception(f"Invalid line '{line!r}' in history file {path}")
+                continue
+            yield parts
+
+    def housekeeping(self) -> None:
+        _expire_logfiles(self._settings, self._config, self._logger, self._lock, False)
+        self._remove_orphaned_indexes()
+        # Convert the log files written by the file backend
+        with self._lock:
+            for path in self._settings.paths.history_dir.value.glob("*.log"):
+                if path != self._open_path:
+                    index_history_file(path, self._keys)
+
+    def _remove_orphaned_indexes(self) -> None:
+        with self._lock:
+            for path in self._settings.paths.history_dir.value.glob("*.idx"):
+                if not path.with_suffix(".log").exists():
+                    path.unlink(missing_ok=True)
+            if self._open_path is not None and not self._open_path.exists():
+                self._open_path = self._open_block = None
@@ -16,6 +16,7 @@ import abc
 import ast
 import contextlib
 import errno
+import functools
 import ipaddress
 import itertools
 import json
@@ -58,9 +59,11 @@ from .event import create_events_from_syslog_messages, Event, scrub_string
 from .helpers import ECLock, parse_bytes_into_syslog_messages
 from .history import ActiveHistoryPeriod, get_logfile, History, HistoryWhat, quote_tab
 from .history_file import FileHistory
+from .history_indexed import IndexedHistory
 from .history_mongo import MongoDBHistory
 from .host_config import HostConfig
 from .perfcounters import Perfcounters
+from .pipeline import EventPipeline
 from .query import (
     Columns,
     filter_operator_in,
@@ -71,6 +74,7 @@ from .query import (
     QueryREPLICATE,
     StatusTable,
 )
+from .rule_index import benchmark_rule_matching, RuleIndex
 from .rule_matcher import compile_rule, match, MatchFailure, MatchResult, MatchSuccess, RuleMatcher
 from .rule_packs import load_config as load_config_using
 from .settings import FileDescriptor, PortNumber, Settings
@@ -240,6 +244,8 @@ def create_history(
             return FileHistory(settings, config, logger, event_columns, history_columns)
         case "mongodb":
             return MongoDBHistory(settings, config, logger, event_columns, history_columns)
+        case "indexed":
+            return IndexedHistory(settings, config, logger, event_columns, history_columns)
         case _ as default:
             assert_never(default)
 
@@ -458,10 +464,12 @@ class EventServer(ECServerThread):
         self._syslog_udp: socket.socket | None = None
         self._syslog_tcp: socket.socket | None = None
         self._snmp_trap_socket: socket.socket | None = None
+        self._pipeline: EventPipeline | None = None
 
         self._rules: list[Rule] = []
         self._rule_by_id: dict[str | None, Rule] = {}
         self._rule_hash: dict[int, dict[int, Any]] = {}
+        self._rule_index = RuleIndex([])
         self._hash_stats: list[list[int]] = []  # facility/priority
         for _unused_facility in range(32):
             self._hash_stats.append([0] * 8)
@@ -490,9 +498,9 @@ class EventServer(ECServerThread):
         self.open_syslog_udp()
         self.open_syslog_tcp()
         self.open_snmptrap()
-        self._snmp_trap_parser = SNMPTrapParser(
-            self.settings, self._config, self._logger.getChild("snmp")
-        ).parse
+        self._create_events_from_trap = make_create_events_from_trap(
+            self.settings, self._config, self._logger
+        )
 
     @classmethod
     def status_columns(cls) -> Columns:
@@ -728,7 +736,25 @@ class EventServer(ECServerThread):
         # http://www.outflux.net/blog/archives/2008/03/09/using-select-on-a-fifo/
         return os.open(str(self.settings.paths.event_pipe.value), os.O_RDWR | os.O_NONBLOCK)
 
-    def serve(self) -> None:  # pylint: disable=too-many-branches
+    def serve(self) -> None:
+        if self.settings.options.parse_workers:
+            self._pipeline = EventPipeline(
+                self.settings.options.parse_workers,
+                functools.partial(
+                    make_create_events_from_trap, self.settings, self._config, self._logger
+                ),
+                self.process_potential_event_instrumented,
+                self._perfcounters,
+                self._logger.getChild("pipeline"),
+            )
+        try:
+            self._serve()
+        finally:
+            if self._pipeline is not None:
+                pipeline, self._pipeline = self._pipeline, None
+                pipeline.terminate()
+
+    def _serve(self) -> None:  # pylint: disable=too-many-branches
         pipe = self.open_pipe()
         listen_list = [
             f
@@ -738,6 +764,7 @@ class EventServer(ECServerThread):
                 self._syslog_tcp,
                 self._eventsocket,
                 self._snmp_trap_socket,
+                None if self._pipeline is None else self._pipeline.fileno(),
             )
             if f is not None
         ]
@@ -814,17 +841,30 @@ class EventServer(ECServerThread):
 
             # Read events from builtin syslog server
             if self._syslog_udp is not None and self._syslog_udp in readable:
-                message, address = self._syslog_udp.recvfrom(4096)
-                self.process_syslog_messages(
-                    [message], parse_address("syslog socket (UDP)", address)
-                )
+                if self._pipeline is not None:
+                    self._pipeline.submit_syslog_messages(
+                        self._receive_syslog_udp_batch(self._syslog_udp),
+                        self._logger if self._config["debug_rules"] else None,
+                    )
+                else:
+                    message, address = self._syslog_udp.recvfrom(4096)
+                    self.process_syslog_messages(
+                        [message], parse_address("syslog socket (UDP)", address)
+                    )
 
             # Read events from builtin snmptrap server
             if self._snmp_trap_socket is not None and self._snmp_trap_socket in readable:
                 message, address = self._snmp_trap_socket.recvfrom(65535)
-                self.process_potential_event_instrumented(
-                    self.create_events_from_trap(message, parse_address("SNMP trap", address))
-                )
+                if self._pipeline is not None:
+                    self._pipeline.submit_snmp_trap(message, parse_address("SNMP trap", address))
+                else:
+                    self.process_potential_event_instrumented(
+                        self._create_events_from_trap(message, parse_address("SNMP trap", address))
+                    )
+
+            # Process the events of the messages parsed by the workers
+            if self._pipeline is not None and self._pipeline.fileno() in readable:
+                self._pipeline.process_parsed()
 
             if spool_files := sorted(
                 self.settings.paths.spool_dir.value.glob("[!.]*"), key=lambda x: x.stat().st_mtime
@@ -835,12 +875,22 @@ class EventServer(ECServerThread):
             else:
                 select_timeout = 1  # restore default select timeout
 
-    def create_events_from_trap(self, data: bytes, address: tuple[str, int]) -> Iterator[Event]:
-        try:
-            if varbinds_and_ipaddress := self._snmp_trap_parser(data, address):
-                yield create_event_from_trap(varbinds_and_ipaddress[0], varbinds_and_ipaddress[1])
-        except Exception:
-            self._logger.exception("exception while handling an SNMP trap, skipping this one")
+    @staticmethod
+    def _receive_syslog_udp_batch(
+        syslog_udp: socket.socket,
+    ) -> list[tuple[bytes, tuple[str, int] | None]]:
+        """Receive all pending datagrams at once, the workers parse them as one batch"""
+        message, address = syslog_udp.recvfrom(4096)
+        batch: list[tuple[bytes, tuple[str, int] | None]] = [
+            (message, parse_address("syslog socket (UDP)", address))
+        ]
+        while len(batch) < 100:
+            try:
+                message, address = syslog_udp.recvfrom(4096, socket.MSG_DONTWAIT)
+            except BlockingIOError:
+                break
+            batch.append((message, parse_address("syslog socket (UDP)", address)))
+        return batch
 
     def process_potential_event_instrumented(self, events: Iterable[Event]) -> None:
         """
@@ -861,6 +911,12 @@ class EventServer(ECServerThread):
     def process_syslog_messages(
         self, messages: Iterable[bytes], address: tuple[str, int] | None
     ) -> None:
+        if self._pipeline is not None:
+            self._pipeline.submit_syslog_messages(
+                [(message, address) for message in messages],
+                self._logger if self._config["debug_rules"] else None,
+            )
+            return
         self.process_potential_event_instrumented(
             create_events_from_syslog_messages(
                 messages, address, self._logger if self._config["debug_rules"] else None
@@ -1195,9 +1251,15 @@ class EventServer(ECServerThread):
     def reload_configuration(self, config: Config, history: History) -> None:
         self._config = config
         self._history = history
-        self._snmp_trap_parser = SNMPTrapParser(
-            self.settings, self._config, self._logger.getChild("snmp")
-        ).parse
+        self._create_events_from_trap = make_create_events_from_trap(
+            self.settings, self._config, self._logger
+        )
+        if self._pipeline is not None:
+            self._pipeline.reload_configuration(
+                functools.partial(
+                    make_create_events_from_trap, self.settings, self._config, self._logger
+                )
+            )
         self.compile_rules(self._config["rule_packs"])
         self.host_config = HostConfig(self._logger)
         self._rule_matcher = RuleMatcher(
@@ -1212,6 +1274,7 @@ class EventServer(ECServerThread):
         self._rule_by_id = {}
         # Speedup-Hash for rule execution
         self._rule_hash = {}
+        self._rule_index = RuleIndex([])
         count_disabled = 0
         count_rules = 0
         count_unspecific = 0
@@ -1274,6 +1337,12 @@ class EventServer(ECServerThread):
                         for prio, entries in self._rule_hash[facility].items()
                     ]
                     self._logger.info(" %-12s: %s", SyslogFacility(facility), " ".join(stats))
+            self._rule_index = RuleIndex(self._rules)
+            self._logger.info(
+                "Rule index: %d of %d rules prefiltered by host, application and text",
+                self._rule_index.num_indexed_rules,
+                len(self._rules),
+            )
 
     def hash_rule(self, rule: Rule) -> None:
         """Construct rule hash for faster execution."""
@@ -1341,6 +1410,9 @@ class EventServer(ECServerThread):
         if self._config["rule_optimizer"]:
             self._hash_stats[event["facility"]][event["priority"]] += 1
             rule_candidates = self._rule_hash.get(event["facility"], {}).get(event["priority"], [])
+            # The index skips rules silently, don't hide them from the rule debugging
+            if not self._config["debug_rules"]:
+                rule_candidates = self._rule_index.candidates(rule_candidates, event)
         else:
             rule_candidates = self._rules
 
@@ -1856,6 +1928,22 @@ def create_event_from_trap(trap: Iterable[tuple[str, str]], ipaddress_: str) ->
     )
 
 
+def make_create_events_from_trap(
+    settings: Settings, config: Config, logger: Logger
+) -> Callable[[bytes, tuple[str, int]], Iterator[Event]]:
+    """The SNMP trap handling of the event server, also built in each of its parse workers"""
+    snmp_trap_parser = SNMPTrapParser(settings, config, logger.getChild("snmp")).parse
+
+    def create_events_from_trap(data: bytes, address: tuple[str, int]) -> Iterator[Event]:
+        try:
+            if varbinds_and_ipaddress := snmp_trap_parser(data, address):
+                yield create_event_from_trap(varbinds_and_ipaddress[0], varbinds_and_ipaddress[1])
+        except Exception:
+            logger.exception("exception while handling an SNMP trap, skipping this one")
+
+    return create_events_from_trap
+
+
 # .
 #   .--Status Queries------------------------------------------------------.
 #   |  ____  _        _                ___                  _              |
@@ -3446,6 +3534,47 @@ def reload_configuration(
     logger.info("Reloaded configuration.")
 
 
+def benchmark_rules(
+    settings: Settings, config: Config, logger: Logger, messages_path: Path
+) -> None:
+    """Measure the rule matching of the configured rules with and without the rule index
+
+    The syslog messages are read from the given file, one message per line. Only
+    the rule matching is measured, hostname translation and actions are skipped.
+    """
+    rules: list[Rule] = []
+    for rule_pack in config["rule_packs"]:
+        if rule_pack["disabled"]:
+            continue
+        for rule in rule_pack["rules"]:
+            if rule.get("disabled"):
+                continue
+            rule = rule.copy()
+            rule["pack"] = rule_pack["id"]
+            try:
+                compile_rule(rule)
+            except Exception:
+                if settings.options.debug:
+                    raise
+                logger.exception("Ignoring rule '%s/%s'", rule["pack"], rule["id"])
+                continue
+            rules.append(rule)
+
+    events = list(
+        create_events_from_syslog_messages(messages_path.read_bytes().splitlines(), None, None)
+    )
+    rule_matcher = RuleMatcher(
+        logger=None, omd_site_id=omd_site(), is_active_time_period=TimePeriods(logger).active
+    )
+    result = benchmark_rule_matching(rules, events, rule_matcher.event_rule_matches)
+    sys.stdout.write(
+        f"Matched {result.num_events} events against {result.num_rules} rules\n"
+        f"  without rule index: {result.plain_events_per_second:.1f} events/sec\n"
+        f"  with rule index:    {result.indexed_events_per_second:.1f} events/sec\n"
+        f"  differing results:  {result.mismatches}\n"
+    )
+
+
 # .
 #   .--Main----------------------------------------------------------------.
 #   |                        __  __       _                                |
@@ -3484,6 +3613,10 @@ def main() -> None:
 
         slave_status = default_slave_status_master()
         config = load_configuration(settings, logger, slave_status)
+        if settings.options.benchmark_rules:
+            benchmark_rules(settings, config, logger, settings.options.benchmark_rules)
+            sys.exit(0)
+
         history = create_history(
             settings, config, logger, StatusTableEvents.columns, StatusTableHistory.columns
         )
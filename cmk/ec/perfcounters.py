@@ -28,6 +28,7 @@ class Perfcounters:
         "overflows",
         "events",
         "connects",
+        "backpressure_waits",  # Receiver waited for the event processing (parse workers)
     ]
 
     # Average processing times
@@ -35,6 +36,7 @@ class Perfcounters:
         "processing": 0.99,  # event processing
         "sync": 0.95,  # Replication sync
         "request": 0.95,  # Client requests
+        "backpressure": 0.95,  # Waiting of the receiver for the event processing
     }
 
     # TODO: Why aren't self._times / self._rates / ... not initialized with their defaults?
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Staged event ingestion of the event server
+
+By default the event server receives, parses and processes all messages in its
+own thread. With parse workers enabled, the received syslog messages and SNMP
+traps are parsed into events by a pool of worker processes. The event server
+thread still processes all events, in the order the messages have been received,
+so the event processing shares its state with the other threads exactly as
+without workers. When too many parsed messages are waiting for the processing,
+the receiving has to wait, which is counted in the performance counters.
+
+The event server runs several threads, so the workers are not forked from it:
+they are started by a fork server and build their own SNMP trap parser.
+"""
+
+from __future__ import annotations
+
+import collections
+import contextlib
+import multiprocessing
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from logging import Logger
+
+from .event import create_event_from_syslog_message, Event
+from .perfcounters import Perfcounters
+
+Address = tuple[str, int]
+CreateEventsFromTrap = Callable[[bytes, Address], Iterable[Event]]
+
+# Number of message batches being parsed or waiting for the event processing
+QUEUE_SIZE = 1000
+
+# Set in each worker process by _initialize_worker()
+_create_events_from_trap: CreateEventsFromTrap | None = None
+
+
+def _initialize_worker(make_create_events_from_trap: Callable[[], CreateEventsFromTrap]) -> None:
+    global _create_events_from_trap
+    _create_events_from_trap = make_create_events_from_trap()
+
+
+def _parse_syslog_messages(
+    messages: Sequence[tuple[bytes, Address | None]], logger: Logger | None
+) -> list[Event]:
+    return [
+        create_event_from_syslog_message(message, address, logger) for message, address in messages
+    ]
+
+
+def _parse_snmp_trap(data: bytes, address: Address) -> list[Event]:
+    if _create_events_from_trap is None:
+        raise RuntimeError("worker process has not been initialized")
+    return list(_create_events_from_trap(data, address))
+
+
+class EventPipeline:
+    """Parses messages in worker processes, processes the events in the calling thread
+
+    make_create_events_from_trap is pickled and called once in each worker process.
+    The owner of the pipeline has to call process_parsed() whenever fileno() is
+    readable, terminate() processes the remaining events."""
+
+    def __init__(
+        self,
+        num_workers: int,
+        make_create_events_from_trap: Callable[[], CreateEventsFromTrap],
+        process_events: Callable[[Iterable[Event]], None],
+        perfcounters: Perfcounters,
+        logger: Logger,
+    ) -> None:
+        self._num_workers = num_workers
+        self._process_events = process_events
+        self._perfcounters = perfcounters
+        self._logger = logger
+        self._pending: collections.deque[Future[list[Event]]] = collections.deque()
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        os.set_blocking(self._wakeup_read, False)
+        self._executor_lock = threading.Lock()
+        self._executor = self._create_executor(make_create_events_from_trap)
+
+    def _create_executor(
+        self, make_create_events_from_trap: Callable[[], CreateEventsFromTrap]
+    ) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self._num_workers,
+            mp_context=multiprocessing.get_context("forkserver"),
+            initializer=_initialize_worker,
+            initargs=(make_create_events_from_trap,),
+        )
+
+    def fileno(self) -> int:
+        """Readable when parsed messages are waiting for the event processing"""
+        return self._wakeup_read
+
+    def reload_configuration(
+        self, make_create_events_from_trap: Callable[[], CreateEventsFromTrap]
+    ) -> None:
+        """Replace the workers, e.g. when the SNMP credentials have changed
+
+        The already submitted messages are still parsed by the old workers."""
+        with self._executor_lock:
+            old_executor, self._executor = self._executor, self._create_executor(
+                make_create_events_from_trap
+            )
+        old_executor.shutdown(wait=False)
+
+    def submit_syslog_messages(
+        self, messages: Sequence[tuple[bytes, Address | None]], logger: Logger | None
+    ) -> None:
+        if messages:
+            with self._executor_lock:
+                future = self._executor.submit(_parse_syslog_messages, messages, logger)
+            self._enqueue(future)
+
+    def submit_snmp_trap(self, data: bytes, address: Address) -> None:
+        with self._executor_lock:
+            future = self._executor.submit(_parse_snmp_trap, data, address)
+        self._enqueue(future)
+
+    def _enqueue(self, future: Future[list[Event]]) -> None:
+        """Keep the order of reception, process the oldest messages if too many are waiting"""
+        future.add_done_callback(self._wake_up)
+        self._pending.append(future)
+        if len(self._pending) <= QUEUE_SIZE:
+            return
+        self._perfcounters.count("backpressure_waits")
+        before = time.time()
+        self._process(self._pending.popleft())
+        self._perfcounters.count_time("backpressure", time.time() - before)
+
+    def _wake_up(self, _future: Future[list[Event]]) -> None:
+        # Called in a thread of the executor, maybe after the termination
+        with contextlib.suppress(OSError):
+            os.write(self._wakeup_write, b"\0")
+
+    def process_parsed(self) -> None:
+        """Process the events of the parsed messages, as long as no older ones are pending"""
+        with contextlib.suppress(BlockingIOError):
+            while os.read(self._wakeup_read, 4096):
+                pass
+        while self._pending and self._pending[0].done():
+            self._process(self._pending.popleft())
+
+    def _process(self, future: Future[list[Event]]) -> None:
+        try:
+            self._process_events(future.result())
+        except Exception:
+            self._logger.exception("Exception while processing events")
+
+    def terminate(self) -> None:
+        """Process all pending messages and stop the workers"""
+        while self._pending:
+            self._process(self._pending.popleft())
+        self._executor.shutdown()
+        os.close(self._wakeup_read)
+        os.close(self._wakeup_write)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Precompiled prefilter for the rule matching of the event console
+
+The rule matcher evaluates the rules one by one, which is slow for large rule
+sets. The index built here is evaluated once per event and determines the rules
+which can not possibly match the event, because their host, application or
+message conditions fail. Those rules are skipped, all other rules are handed to
+the rule matcher in their original order, so the outcome of the rule matching is
+exactly the same as without the index.
+
+Rules are identified by their position in the list of compiled rules and sets
+of rules are represented as int bitmasks.
+"""
+
+from __future__ import annotations
+
+import re
+import time
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from re import Pattern
+
+from .config import Rule, TextPattern
+from .event import Event
+from .rule_matcher import MatchSuccess
+
+# Python regexes are compiled in chunks. Huge alternations take long to compile
+# and a failing chunk falls back to the single patterns, so keep them moderate.
+_MAX_COMBINED_PATTERNS = 100
+
+# Only patterns compiled by compile_matching_value can safely be combined
+_COMBINABLE_FLAGS = re.IGNORECASE | re.UNICODE
+
+# Numbered back references and conditional groups break as soon as the group
+# numbers are shifted
+_GROUP_NUMBER_REFERENCE = re.compile(r"\\[0-9]|\(\?\([0-9]")
+
+
+class _TextFieldIndex:
+    """Determines the rules whose patterns for one event field all fail
+
+    A rule added with several patterns can match as long as one of its patterns
+    matches, e.g. the "match" and "match_ok" patterns for the message text.
+    Literal patterns are looked up in a dict, regex patterns are merged into
+    combined alternations, so a whole chunk of rules is checked with one search.
+    """
+
+    def __init__(self, complete: bool) -> None:
+        self._complete = complete
+        self._constrained = 0
+        self._literals: dict[str, int] = {}
+        self._patterns: dict[Pattern[str], int] = {}
+        self._searches: list[tuple[Pattern[str], int]] = []
+
+    def add(self, bit: int, patterns: Iterable[TextPattern]) -> None:
+        self._constrained |= bit
+        for pattern in patterns:
+            if isinstance(pattern, str):
+                self._literals[pattern] = self._literals.get(pattern, 0) | bit
+            else:
+                self._patterns[pattern] = self._patterns.get(pattern, 0) | bit
+
+    def compile(self) -> None:
+        combinable = []
+        for pattern, mask in self._patterns.items():
+            if pattern.flags == _COMBINABLE_FLAGS and not _GROUP_NUMBER_REFERENCE.search(
+                pattern.pattern
+            ):
+                combinable.append((pattern, mask))
+            else:
+                self._searches.append((pattern, mask))
+
+        for start in range(0, len(combinable), _MAX_COMBINED_PATTERNS):
+            chunk = combinable[start : start + _MAX_COMBINED_PATTERNS]
+            try:
+                combined = re.compile(
+                    "|".join(f"(?:{pattern.pattern})" for pattern, _mask in chunk),
+                    _COMBINABLE_FLAGS,
+                )
+            except re.error:
+                # e.g. duplicate group names or inline flags: search one by one
+                self._searches.extend(chunk)
+                continue
+            mask = 0
+            for _pattern, pattern_mask in chunk:
+                mask |= pattern_mask
+            self._searches.append((combined, mask))
+
+        self._patterns = {}
+
+    def failing(self, text: str) -> int:
+        """Returns the bitmask of the constrained rules none of whose patterns match"""
+        if not self._constrained:
+            return 0
+        lowered = text.lower()
+        if self._complete:
+            hits = self._literals.get(lowered, 0)
+        else:
+            hits = 0
+            for literal, mask in self._literals.items():
+                if literal in lowered:
+                    hits |= mask
+        for pattern, mask in self._searches:
+            # A combined search is only worth it if not all its rules are already hit
+            if mask & ~hits and pattern.search(text):
+                hits |= mask
+        return self._constrained & ~hits
+
+
+class RuleIndex:
+    """Prefilter for the rule candidates of an event
+
+    Inverted and disabled rules are never filtered, because the rule matcher has
+    to decide about them. Semantics of the conditions (see RuleMatcher):
+
+    * "match_host" must match the host completely (or be found by the regex)
+    * "match_application" or "cancel_application" must be found in the application
+    * "match" or "match_ok" must be found in the message text
+    """
+
+    def __init__(self, rules: Sequence[Rule]) -> None:
+        self._bits: dict[int, int] = {}
+        self._host = _TextFieldIndex(complete=True)
+        self._application = _TextFieldIndex(complete=False)
+        self._text = _TextFieldIndex(complete=False)
+
+        for position, rule in enumerate(rules):
+            if rule.get("invert_matching") or rule.get("disabled"):
+                continue
+            bit = 1 << position
+            self._bits[id(rule)] = bit
+            if "match_host" in rule:
+                self._host.add(bit, [rule["match_host"]])
+            if application_patterns := [
+                rule[key] for key in ("match_application", "cancel_application") if key in rule
+            ]:
+                self._application.add(bit, application_patterns)
+            if "match" in rule:
+                self._text.add(
+                    bit,
+                    [rule["match"], rule["match_ok"]] if "match_ok" in rule else [rule["match"]],
+                )
+
+        self._host.compile()
+        self._application.compile()
+        self._text.compile()
+
+    @property
+    def num_indexed_rules(self) -> int:
+        return len(self._bits)
+
+    def excluded(self, event: Event) -> int:
+        """Returns the bitmask of all rules which can not match the given event"""
+        return (
+            self._host.failing(event.get("host", ""))
+            | self._application.failing(event.get("application", ""))
+            | self._text.failing(event.get("text", ""))
+        )
+
+    def candidates(self, rules: Iterable[Rule], event: Event) -> Iterator[Rule]:
+        """Yields the rules which may match the event, keeping their order"""
+        if not (excluded := self.excluded(event)):
+            yield from rules
+            return
+        for rule in rules:
+            if not excluded & self._bits.get(id(rule), 0):
+                yield rule
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    num_events: int
+    num_rules: int
+    plain_seconds: float
+    indexed_seconds: float
+    mismatches: int
+
+    @property
+    def plain_events_per_second(self) -> float:
+        return self.num_events / self.plain_seconds if self.plain_seconds else 0.0
+
+    @property
+    def indexed_events_per_second(self) -> float:
+        return self.num_events / self.indexed_seconds if self.indexed_seconds else 0.0
+
+
+def benchmark_rule_matching(
+    rules: Sequence[Rule],
+    events: Sequence[Event],
+    event_rule_matches: Callable[[Rule, Event], object],
+) -> BenchmarkResult:
+    """Determines the first matching rule of every event with and without the index
+
+    Only the rule matching itself is measured, nothing is executed for the
+    matching rules. The number of events where both approaches determine
+    different rules is reported as well, it should always be zero.
+    """
+    index = RuleIndex(rules)
+
+    def first_match(candidates: Iterable[Rule], event: Event) -> Rule | None:
+        for rule in candidates:
+            if isinstance(event_rule_matches(rule, event), MatchSuccess):
+                return rule
+        return None
+
+    before = time.perf_counter()
+    plain_results = [first_match(rules, event) for event in events]
+    plain_seconds = time.perf_counter() - before
+
+    before = time.perf_counter()
+    indexed_results = [first_match(index.candidates(rules, event), event) for event in events]
+    indexed_seconds = time.perf_counter() - before
+
+    return BenchmarkResult(
+        num_events=len(events),
+        num_rules=len(rules),
+        plain_seconds=plain_seconds,
+        indexed_seconds=indexed_seconds,
+        mismatches=sum(1 for p, i in zip(plain_results, indexed_results) if p is not i),
+    )
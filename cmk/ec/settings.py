@@ -187,6 +187,36 @@ class ECArgumentParser(ArgumentParser):
             action="store_true",
             help="create performance profile for event thread",
         )
+        self.add_argument(
+            "--parse-workers",
+            metavar="N",
+            type=self._number_of_workers,
+            default=0,
+            help=(
+                "parse the received messages and SNMP traps in N worker processes "
+                "(default: 0, parse in the event server thread)"
+            ),
+        )
+        self.add_argument(
+            "--benchmark-rules",
+            metavar="FILE",
+            type=Path,
+            help=(
+                "match the syslog messages in FILE (one per line) against the configured rules "
+                "with and without the rule index, report the events per second and exit"
+            ),
+        )
+
+    @staticmethod
+    def _number_of_workers(value: str) -> int:
+        """A custom argument type for the number of worker processes"""
+        try:
+            num_workers = int(value)
+            if num_workers < 0:
+                raise ValueError
+        except ValueError as e:
+            raise ArgumentTypeError(f"invalid number of workers: {repr(value)}") from e
+        return num_workers
 
     @staticmethod
     def _file_descriptor(value: str) -> FileDescriptor:
@@ -226,6 +256,8 @@ class Options(NamedTuple):
     debug: bool
     profile_status: bool
     profile_event: bool
+    parse_workers: int
+    benchmark_rules: Path | None
 
 
 class Settings(NamedTuple):
@@ -250,6 +282,8 @@ def settings(version: str, omd_root: Path, default_config_dir: Path, argv: list[
         debug=args.debug,
         profile_status=args.profile_status,
         profile_event=args.profile_event,
+        parse_workers=args.parse_workers,
+        benchmark_rules=args.benchmark_rules,
     )
     return Settings(paths=paths, options=options)
 
@@ -3,15 +3,20 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import asyncio
 import copy
 import dataclasses
 import logging
+import pickle
+import shutil
+import struct
 import time
 from collections.abc import Collection, Iterable, Iterator, Mapping, MutableMapping, Sequence
 from pathlib import Path
-from typing import Any, Final
+from typing import Any, Final, NamedTuple
 
 import cmk.utils.debug
+import cmk.utils.resulttype as result
 import cmk.utils.store as store
 from cmk.utils.exceptions import MKFetcherError, MKTimeout, OnError
 from cmk.utils.hostaddress import HostName
@@ -21,21 +26,60 @@ from cmk.utils.sectionname import SectionMap, SectionName
 from cmk.snmplib import (
     BackendSNMPTree,
     get_snmp_table,
+    OID,
     SNMPBackend,
+    SNMPContext,
     SNMPHostConfig,
     SNMPRawData,
     SNMPRawDataElem,
     SNMPRowInfo,
+    SpecialColumn,
 )
 
 from ._abstract import Fetcher, Mode
 from ._snmpscan import gather_available_raw_section_names
 from .cache import SectionStore
 from .snmp import make_backend, SNMPPluginStore
+from .snmp_backend import NativeSNMPBackend, SNMPEngine
 
 __all__ = ["SNMPFetcher", "SNMPSectionMeta"]
 
 
+class _FetchPlan(NamedTuple):
+    section_names: Sequence[SectionName]
+    walk_cache: "WalkCache"
+    walk_cache_msg: str
+
+
+def _fetcher_error(exc: Exception) -> Exception:
+    # Same as Fetcher.fetch() and get_raw_data() do it
+    if isinstance(exc, MKFetcherError):
+        return exc
+    return MKFetcherError(repr(exc) if any(exc.args) else type(exc).__name__)
+
+
+async def _prefetch(
+    walks: Sequence[tuple[NativeSNMPBackend, Mapping[SNMPContext, Sequence[OID]]]],
+    *,
+    max_devices: int,
+) -> None:
+    devices = asyncio.Semaphore(max_devices)
+
+    async def prefetch(
+        backend: NativeSNMPBackend, oids: Mapping[SNMPContext, Sequence[OID]], engine: SNMPEngine
+    ) -> None:
+        async with devices:
+            await asyncio.gather(
+                *(
+                    backend.prefetch(oids_, context=context, engine=engine)
+                    for context, oids_ in oids.items()
+                )
+            )
+
+    async with SNMPEngine() as engine:
+        await asyncio.gather(*(prefetch(backend, oids, engine) for backend, oids in walks))
+
+
 class WalkCache(
     MutableMapping[str, tuple[bool, SNMPRowInfo]]
 ):  # pylint: disable=too-many-ancestors
@@ -47,59 +91,73 @@ class WalkCache(
     The fetched data is always saved to a file *if* the respective OID is marked as being cached
     by the plugin using `OIDCached` (that is: if the save_to_cache attribute of the OID object
     is true).
+
+    All walks of a host are stored in one file, see _serialize_walks(). Loading the
+    cache only reads the index of the file, a walk is unpickled when it is accessed.
     """
 
-    __slots__ = ("_store", "_path")
+    __slots__ = ("_store", "_path", "_data", "_stored", "_lazy")
 
     def __init__(self, host_name: HostName) -> None:
         self._store: MutableMapping[str, tuple[bool, SNMPRowInfo]] = {}
         self._path = Path(cmk.utils.paths.var_dir, "snmp_cache", host_name)
-
-    def _read_row(self, path: Path) -> SNMPRowInfo:
-        return store.load_object_from_file(path, default=None)
-
-    def _write_row(self, path: Path, rowinfo: SNMPRowInfo) -> None:
-        return store.save_object_to_file(path, rowinfo, pretty=False)
-
-    @staticmethod
-    def _oid2name(fetchoid: str) -> str:
-        return f"OID{fetchoid}"
-
-    @staticmethod
-    def _name2oid(basename: str) -> str:
-        return basename[3:]
-
-    def _iterfiles(self) -> Iterable[Path]:
-        return self._path.iterdir() if self._path.is_dir() else ()
+        # The content of the file and the positions of all walks in it
+        self._data = b""
+        self._stored: Mapping[str, tuple[int, int]] = {}
+        # The stored walks which are loaded but not yet unpickled
+        self._lazy: set[str] = set()
 
     def __repr__(self) -> str:
         return f"{type(self).__name__}({self._store!r})"
 
     def __getitem__(self, key: str) -> tuple[bool, SNMPRowInfo]:
+        if key in self._lazy:
+            self._lazy.discard(key)
+            start, end = self._stored[key]
+            try:
+                # 'False': no need to store this value: it is already stored!
+                self._store[key] = (False, _pickle_serializer.deserialize(self._data[start:end]))
+            except MKTimeout:
+                raise
+            except Exception:
+                console.vverbose(f"  Failed to load {key} from walk cache {self._path}\n")
+                if cmk.utils.debug.enabled():
+                    raise
         return self._store.__getitem__(key)
 
     def __setitem__(self, key: str, value: tuple[bool, SNMPRowInfo]) -> None:
+        self._lazy.discard(key)
         return self._store.__setitem__(key, value)
 
     def __delitem__(self, key: str) -> None:
+        if key in self._lazy:
+            self._lazy.discard(key)
+            return None
         return self._store.__delitem__(key)
 
     def __iter__(self) -> Iterator[str]:
-        return self._store.__iter__()
+        yield from self._store
+        yield from self._lazy - self._store.keys()
 
     def __len__(self) -> int:
-        return self._store.__len__()
+        return len(self._store.keys() | self._lazy)
 
     def clear(self) -> None:
-        for path in self._iterfiles():
-            path.unlink(missing_ok=True)
+        if self._path.is_dir():
+            # The file per OID layout of former versions
+            shutil.rmtree(self._path, ignore_errors=True)
+        else:
+            self._path.unlink(missing_ok=True)
+        self._data = b""
+        self._stored = {}
+        self._lazy.clear()
 
     def load(
         self,
         *,
         trees: Iterable[BackendSNMPTree],
     ) -> None:
-        """Try to read the OIDs data from cache files"""
+        """Try to read the OIDs data from the cache file"""
         # Do not load the cached data if *any* plugin needs live data
         do_not_load = {
             f"{tree.base}.{oid.column}"
@@ -108,36 +166,89 @@ class WalkCache(
             if not oid.save_to_cache
         }
 
-        for path in self._iterfiles():
-            fetchoid = self._name2oid(path.name)
+        if not self._path.is_file():
+            return
+
+        try:
+            self._data = store.load_bytes_from_file(self._path)
+            self._stored = _parse_walks_index(self._data)
+        except MKTimeout:
+            raise
+        except Exception:
+            console.vverbose(f"  Failed to load walk cache {self._path}\n")
+            if cmk.utils.debug.enabled():
+                raise
+            self._data, self._stored = b"", {}
+            return
+
+        for fetchoid in self._stored:
             if fetchoid in do_not_load:
                 continue
+            console.vverbose(f"  Loading {fetchoid} from walk cache {self._path}\n")
+            self._lazy.add(fetchoid)
 
-            console.vverbose(f"  Loading {fetchoid} from walk cache {path}\n")
-            try:
-                read_walk = self._read_row(path)
-            except MKTimeout:
-                raise
-            except Exception:
-                console.vverbose(f"  Failed to load {fetchoid} from walk cache {path}\n")
-                if cmk.utils.debug.enabled():
-                    raise
-                continue
+    def save(self) -> None:
+        walks = {
+            fetchoid: rowinfo for fetchoid, (save_flag, rowinfo) in self._store.items() if save_flag
+        }
+        if not walks:
+            return
+
+        # Keep the stored walks which have not been fetched again
+        blobs = {
+            fetchoid: self._data[start:end]
+            for fetchoid, (start, end) in self._stored.items()
+            if fetchoid not in walks
+        }
+        for fetchoid, rowinfo in walks.items():
+            console.vverbose(f"  Saving walk of {fetchoid} to walk cache {self._path}\n")
+            blobs[fetchoid] = pickle.dumps(rowinfo, protocol=pickle.HIGHEST_PROTOCOL)
 
-            if read_walk is not None:
-                # 'False': no need to store this value: it is already stored!
-                self._store[fetchoid] = (False, read_walk)
+        if self._path.is_dir():
+            shutil.rmtree(self._path, ignore_errors=True)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        store.save_bytes_to_file(self._path, _serialize_walks(blobs))
 
-    def save(self) -> None:
-        self._path.mkdir(parents=True, exist_ok=True)
 
-        for fetchoid, (save_flag, rowinfo) in self._store.items():
-            if not save_flag:
-                continue
+_WALKS_MAGIC: Final = b"CMKWALK1"
+# The walk cache files are read via the store, which refuses files writable by others
+_pickle_serializer: Final = store.PickleSerializer[Any]()
+_WALKS_HEADER: Final = struct.Struct(f">{len(_WALKS_MAGIC)}sI")
+
 
-            path = self._path / self._oid2name(fetchoid)
-            console.vverbose(f"  Saving walk of {fetchoid} to walk cache {path}\n")
-            self._write_row(path, rowinfo)
+def _serialize_walks(blobs: Mapping[str, bytes]) -> bytes:
+    """Serialize the pickled walks of a host
+
+    The file starts with a header (magic, length of the index) and the
+    index, a pickled dict of the positions of the walks relative to the
+    end of the index. The pickled walks follow.
+    """
+    index = {}
+    offset = 0
+    for fetchoid, blob in blobs.items():
+        index[fetchoid] = (offset, len(blob))
+        offset += len(blob)
+    pickled_index = pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL)
+    return b"".join(
+        (_WALKS_HEADER.pack(_WALKS_MAGIC, len(pickled_index)), pickled_index, *blobs.values())
+    )
+
+
+def _parse_walks_index(data: bytes) -> Mapping[str, tuple[int, int]]:
+    """Return the start and end of the walks in the data"""
+    if not data:
+        return {}
+    magic, index_length = _WALKS_HEADER.unpack_from(data)
+    if magic != _WALKS_MAGIC:
+        raise ValueError("Not a walk cache file")
+    data_start = _WALKS_HEADER.size + index_length
+    index = _pickle_serializer.deserialize(data[_WALKS_HEADER.size : data_start])
+    if data_start + sum(length for _offset, length in index.values()) != len(data):
+        raise ValueError("Truncated walk cache file")
+    return {
+        fetchoid: (data_start + offset, data_start + offset + length)
+        for fetchoid, (offset, length) in index.items()
+    }
 
 
 @dataclasses.dataclass(init=False)
@@ -341,17 +452,22 @@ class SNMPFetcher(Fetcher[SNMPRawData]):
         if self._backend is None:
             raise MKFetcherError("missing backend")
 
+        plan = self._plan(mode, self._backend)
+        return self._fetch_sections(plan, self._backend)
+
+    def _plan(self, mode: Mode, backend: SNMPBackend) -> _FetchPlan:
+        """Run the detection and determine what has to be walked"""
         now = int(time.time())
         persisted_sections = self._section_store.load() if mode is Mode.CHECKING else {}
         section_names = self._get_selection(mode)
         section_names |= self._detect(
-            select_from=self._get_detected_sections(mode) - section_names, backend=self._backend
+            select_from=self._get_detected_sections(mode) - section_names, backend=backend
         )
         if mode is Mode.DISCOVERY and not section_names:
             # Nothing to discover? That can't be right.
             raise MKFetcherError("Got no data")
 
-        walk_cache = WalkCache(self._backend.hostname)
+        walk_cache = WalkCache(backend.hostname)
         if mode is Mode.CHECKING:
             walk_cache_msg = "SNMP walk cache is enabled: Use any locally cached information"
             walk_cache.load(
@@ -365,29 +481,105 @@ class SNMPFetcher(Fetcher[SNMPRawData]):
             walk_cache.clear()
             walk_cache_msg = "SNMP walk cache cleared"
 
-        fetched_data: dict[SectionName, SNMPRawDataElem] = {}
+        to_fetch = []
         for section_name in self._sort_section_names(section_names):
             try:
                 _from, until, _section = persisted_sections[section_name]
                 if now > until:
                     raise LookupError(section_name)
             except LookupError:
-                self._logger.debug("%s: Fetching data (%s)", section_name, walk_cache_msg)
-
-                fetched_data[section_name] = [
-                    get_snmp_table(
-                        section_name=section_name,
-                        tree=tree,
-                        walk_cache=walk_cache,
-                        backend=self._backend,
-                    )
-                    for tree in self.plugin_store[section_name].trees
-                ]
+                to_fetch.append(section_name)
+
+        return _FetchPlan(to_fetch, walk_cache, walk_cache_msg)
+
+    def _walks(self, plan: _FetchPlan) -> Mapping[SNMPContext, Sequence[OID]]:
+        """The OIDs get_snmp_table() will walk for the plan, per SNMP context"""
+        walks: dict[SNMPContext, dict[OID, None]] = {}
+        for section_name in plan.section_names:
+            contexts = self.snmp_config.snmpv3_contexts_of(section_name)
+            for tree in self.plugin_store[section_name].trees:
+                for oid in tree.oids:
+                    fetchoid = f"{tree.base}.{oid.column}"
+                    if isinstance(oid.column, SpecialColumn) or fetchoid in plan.walk_cache:
+                        continue
+                    for context in contexts:
+                        walks.setdefault(context, {})[fetchoid] = None
+        return {context: list(oids) for context, oids in walks.items()}
+
+    def _fetch_sections(self, plan: _FetchPlan, backend: SNMPBackend) -> SNMPRawData:
+        fetched_data: dict[SectionName, SNMPRawDataElem] = {}
+        for section_name in plan.section_names:
+            self._logger.debug("%s: Fetching data (%s)", section_name, plan.walk_cache_msg)
+            fetched_data[section_name] = [
+                get_snmp_table(
+                    section_name=section_name,
+                    tree=tree,
+                    walk_cache=plan.walk_cache,
+                    backend=backend,
+                )
+                for tree in self.plugin_store[section_name].trees
+            ]
 
-        walk_cache.save()
+        plan.walk_cache.save()
 
         return fetched_data
 
+    @classmethod
+    def fetch_many(
+        cls,
+        fetchers: Sequence["SNMPFetcher"],
+        mode: Mode,
+        *,
+        max_devices: int = 256,
+    ) -> Sequence[result.Result[SNMPRawData, Exception]]:
+        """Fetch the data of many devices at once
+
+        The result of each fetcher is the same as the result of fetch(),
+        fetcher errors are returned instead of being raised.
+
+        The detection runs one device after the other. Then the walks of all
+        devices using the native backend are done concurrently on one event
+        loop, for up to max_devices devices at a time. The tables are built
+        from these walks afterwards. Other backends walk one device after the
+        other, just like fetch() does.
+        """
+        results: list[result.Result[SNMPRawData, Exception] | None] = [None] * len(fetchers)
+        plans: dict[int, _FetchPlan] = {}
+        for index, fetcher in enumerate(fetchers):
+            try:
+                fetcher.open()
+                assert fetcher._backend is not None
+                plans[index] = fetcher._plan(mode, fetcher._backend)
+            except MKTimeout:
+                raise
+            except Exception as exc:
+                results[index] = result.Error(_fetcher_error(exc))
+                fetcher.close()
+
+        asyncio.run(
+            _prefetch(
+                [
+                    (fetcher._backend, fetcher._walks(plans[index]))
+                    for index, fetcher in enumerate(fetchers)
+                    if index in plans and isinstance(fetcher._backend, NativeSNMPBackend)
+                ],
+                max_devices=max_devices,
+            )
+        )
+
+        for index, plan in plans.items():
+            fetcher = fetchers[index]
+            with fetcher:
+                try:
+                    assert fetcher._backend is not None
+                    results[index] = result.OK(fetcher._fetch_sections(plan, fetcher._backend))
+                except MKTimeout:
+                    raise
+                except Exception as exc:
+                    results[index] = result.Error(_fetcher_error(exc))
+
+        return [r for r in results if r is not None]
+
     @classmethod
     def _sort_section_names(
         cls,
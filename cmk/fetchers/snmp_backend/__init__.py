@@ -5,6 +5,13 @@
 """Home of our open source SNMP backends."""
 
 from .classic import ClassicSNMPBackend
-from .stored_walk import StoredWalkSNMPBackend
+from .native import NativeSNMPBackend, SNMPEngine
+from .stored_walk import compile_walk, StoredWalkSNMPBackend
 
-__all__ = ["ClassicSNMPBackend", "StoredWalkSNMPBackend"]
+__all__ = [
+    "ClassicSNMPBackend",
+    "compile_walk",
+    "NativeSNMPBackend",
+    "SNMPEngine",
+    "StoredWalkSNMPBackend",
+]
@@ -0,0 +1,959 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""SNMP backend speaking SNMP itself instead of calling the Net-SNMP tools
+
+The messages are BER encoded and exchanged via UDP within the process. Walks
+use GETBULK requests (GETNEXT for SNMPv1 and hosts without bulkwalk). All OIDs
+passed to walk_many() are walked at the same time, with up to
+max_requests_in_flight requests outstanding. The messages are exchanged by an
+SNMPEngine on an asyncio event loop, one engine can serve the walks of many
+hosts at once (see prefetch()). SNMPv3 supports the user based
+security model with the authentication and privacy protocols of the classic
+backend.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import random
+import socket
+import time
+from collections.abc import Iterable, Mapping, Sequence
+from typing import Any, Final, NamedTuple, Self
+
+from cryptography.hazmat.primitives.ciphers import algorithms, Cipher, modes
+
+try:
+    from cryptography.hazmat.decrepit.ciphers.algorithms import TripleDES
+except ImportError:  # cryptography < 43
+    from cryptography.hazmat.primitives.ciphers.algorithms import TripleDES
+
+from cmk.utils.exceptions import MKGeneralException, MKSNMPError
+from cmk.utils.log import console
+from cmk.utils.sectionname import SectionName
+
+from cmk.snmplib import (
+    OID,
+    SNMPBackend,
+    SNMPContext,
+    SNMPContextTimeout,
+    SNMPHostConfig,
+    SNMPRawValue,
+    SNMPRowInfo,
+)
+
+__all__ = ["NativeSNMPBackend", "SNMPEngine"]
+
+# BER tags, see _raw_value() for the tags of the values
+_INTEGER: Final = 0x02
+_OCTET_STRING: Final = 0x04
+_OBJECT_IDENTIFIER: Final = 0x06
+_SEQUENCE: Final = 0x30
+
+# PDU types
+_GET_REQUEST: Final = 0xA0
+_GET_NEXT_REQUEST: Final = 0xA1
+_RESPONSE: Final = 0xA2
+_GET_BULK_REQUEST: Final = 0xA5
+_REPORT: Final = 0xA8
+
+_ERROR_STATUS: Final = {
+    1: "tooBig",
+    2: "noSuchName",
+    3: "badValue",
+    4: "readOnly",
+    5: "genErr",
+    6: "noAccess",
+    16: "authorizationError",
+}
+
+_DEFAULT_TIMEOUT: Final = 1.0
+_DEFAULT_RETRIES: Final = 5
+# Reports requesting to repeat a request (engine discovery, time window) are no retries
+_MAX_REPORTS: Final = 3
+_DEFAULT_BULK_SIZE: Final = 10
+_MAX_MESSAGE_SIZE: Final = 65507
+
+# Net-SNMP prints octet strings consisting of these characters as text
+_PRINTABLE: Final = frozenset(range(0x20, 0x7F)) | frozenset(b"\t\n\v\f\r")
+
+
+class MalformedMessage(MKSNMPError):
+    pass
+
+
+class _Element(NamedTuple):
+    tag: int
+    start: int
+    end: int
+
+
+class PDU(NamedTuple):
+    tag: int
+    request_id: int
+    error_status: int
+    error_index: int
+    varbinds: Sequence[tuple[OID, int, bytes]]
+
+
+def _encode(tag: int, payload: bytes) -> bytes:
+    length = len(payload)
+    if length < 0x80:
+        return bytes((tag, length)) + payload
+    length_bytes = length.to_bytes((length.bit_length() + 7) // 8, "big")
+    return bytes((tag, 0x80 | len(length_bytes))) + length_bytes + payload
+
+
+def _encode_integer(value: int, tag: int = _INTEGER) -> bytes:
+    return _encode(tag, value.to_bytes(value.bit_length() // 8 + 1, "big", signed=True))
+
+
+def _encode_oid(oid: OID) -> bytes:
+    try:
+        first, second, *rest = (int(sub_id) for sub_id in oid.strip(".").split("."))
+    except ValueError:
+        raise MKSNMPError(f"Invalid OID: {oid}")
+    payload = bytearray()
+    for sub_id in (first * 40 + second, *rest):
+        chunk = [sub_id & 0x7F]
+        while sub_id := sub_id >> 7:
+            chunk.append(0x80 | sub_id & 0x7F)
+        payload += bytes(reversed(chunk))
+    return _encode(_OBJECT_IDENTIFIER, bytes(payload))
+
+
+def _decode(data: bytes, offset: int = 0) -> _Element:
+    try:
+        tag, length = data[offset], data[offset + 1]
+        start = offset + 2
+        if length & 0x80:
+            num_bytes = length & 0x7F
+            length = int.from_bytes(data[start : start + num_bytes], "big")
+            start += num_bytes
+    except IndexError:
+        raise MalformedMessage("Truncated SNMP message")
+    if start + length > len(data):
+        raise MalformedMessage("Truncated SNMP message")
+    return _Element(tag, start, start + length)
+
+
+def _elements(data: bytes, element: _Element) -> list[_Element]:
+    elements = []
+    offset = element.start
+    while offset < element.end:
+        elements.append(_decode(data, offset))
+        offset = elements[-1].end
+    return elements
+
+
+def _payload(data: bytes, element: _Element) -> bytes:
+    return data[element.start : element.end]
+
+
+def _decode_integer(data: bytes, element: _Element) -> int:
+    return int.from_bytes(_payload(data, element), "big", signed=True)
+
+
+def _decode_oid(payload: bytes) -> OID:
+    sub_ids = []
+    value = 0
+    for byte in payload:
+        value = value << 7 | byte & 0x7F
+        if not byte & 0x80:
+            sub_ids.append(value)
+            value = 0
+    if not sub_ids:
+        raise MalformedMessage("Empty OID")
+    first = min(sub_ids[0] // 40, 2)
+    return "." + ".".join(map(str, (first, sub_ids[0] - 40 * first, *sub_ids[1:])))
+
+
+def _raw_value(tag: int, payload: bytes) -> SNMPRawValue | None:
+    """Return the value the classic backend would create from the output of Net-SNMP"""
+    match tag:
+        case 0x04:  # OCTET STRING
+            return payload.strip() if _PRINTABLE.issuperset(payload) else payload
+        case 0x02:  # INTEGER
+            return b"%d" % int.from_bytes(payload, "big", signed=True)
+        # Counter32, Gauge32, TimeTicks, Counter64, UInteger32
+        case 0x41 | 0x42 | 0x43 | 0x46 | 0x47:
+            return b"%d" % int.from_bytes(payload, "big")
+        case 0x06:  # OBJECT IDENTIFIER
+            return _decode_oid(payload).encode()
+        case 0x40:  # IpAddress
+            return ".".join(map(str, payload)).encode()
+        case 0x05:  # NULL
+            return b""
+        case 0x80 | 0x81 | 0x82:  # noSuchObject, noSuchInstance, endOfMibView
+            return None
+    return payload
+
+
+def encode_pdu(
+    tag: int,
+    request_id: int,
+    varbinds: Iterable[tuple[OID, bytes]],
+    *,
+    error_status: int = 0,
+    error_index: int = 0,
+) -> bytes:
+    """Encode a PDU, the values of the varbinds are BER encoded already
+
+    For GETBULK requests error_status and error_index are the non-repeaters
+    and max-repetitions.
+    """
+    return _encode(
+        tag,
+        _encode_integer(request_id)
+        + _encode_integer(error_status)
+        + _encode_integer(error_index)
+        + _encode(
+            _SEQUENCE,
+            b"".join(_encode(_SEQUENCE, _encode_oid(oid) + value) for oid, value in varbinds),
+        ),
+    )
+
+
+def decode_pdu(data: bytes, element: _Element) -> PDU:
+    try:
+        request_id, error_status, error_index, varbind_list = _elements(data, element)
+        varbinds = []
+        for varbind in _elements(data, varbind_list):
+            name, value = _elements(data, varbind)
+            varbinds.append((_decode_oid(_payload(data, name)), value.tag, _payload(data, value)))
+    except ValueError:
+        raise MalformedMessage("Malformed SNMP PDU")
+    return PDU(
+        element.tag,
+        _decode_integer(data, request_id),
+        _decode_integer(data, error_status),
+        _decode_integer(data, error_index),
+        varbinds,
+    )
+
+
+class CommunityMessages:
+    """SNMPv1 and SNMPv2c messages"""
+
+    def __init__(self, version: int, community: str) -> None:
+        self._version: Final = _encode_integer(version)
+        self._community: Final = _encode(_OCTET_STRING, community.encode())
+
+    def encode(self, pdu: bytes, request_id: int, context: SNMPContext) -> bytes:
+        return _encode(_SEQUENCE, self._version + self._community + pdu)
+
+    def decode(self, data: bytes) -> PDU:
+        try:
+            _version, _community, pdu = _elements(data, _decode(data))
+        except ValueError:
+            raise MalformedMessage("Malformed SNMP message")
+        return decode_pdu(data, pdu)
+
+
+#   .--USM-----------------------------------------------------------------.
+#   |                        _   _ ____  __  __                            |
+#   |                       | | | / ___||  \/  |                           |
+#   |                       | | | \___ \| |\/| |                           |
+#   |                       | |_| |___) | |  | |                           |
+#   |                        \___/|____/|_|  |_|                           |
+#   |                                                                      |
+#   +----------------------------------------------------------------------+
+#   | The user based security model of SNMPv3 (RFC 3414, 3826 and 7860)    |
+#   '----------------------------------------------------------------------'
+
+# auth protocol: (hash, length of the authentication parameters)
+_AUTH_PROTOCOLS: Final = {
+    "md5": ("md5", 12),
+    "sha": ("sha1", 12),
+    "SHA-224": ("sha224", 16),
+    "SHA-256": ("sha256", 24),
+    "SHA-384": ("sha384", 32),
+    "SHA-512": ("sha512", 48),
+}
+# priv protocol: key length
+_PRIV_PROTOCOLS: Final = {"DES": 16, "AES": 16, "AES-192": 24, "AES-256": 32}
+
+_FLAG_AUTH: Final = 0x01
+_FLAG_PRIV: Final = 0x02
+_FLAG_REPORTABLE: Final = 0x04
+
+_USM_STATS: Final = ".1.3.6.1.6.3.15.1.1"
+_NOT_IN_TIME_WINDOWS: Final = f"{_USM_STATS}.2.0"
+_UNKNOWN_ENGINE_IDS: Final = f"{_USM_STATS}.4.0"
+_USM_ERRORS: Final = {
+    f"{_USM_STATS}.1.0": "Unsupported security level",
+    f"{_USM_STATS}.3.0": "Unknown user name",
+    f"{_USM_STATS}.5.0": "Authentication failure (incorrect password, community or key)",
+    f"{_USM_STATS}.6.0": "Decryption error",
+}
+
+
+def password_to_key(password: str, hash_name: str) -> bytes:
+    """Create the key of a password, see RFC 3414, A.2"""
+    if not password:
+        raise MKSNMPError("Empty SNMPv3 password")
+    password_bytes = password.encode()
+    data = password_bytes * (1048576 // len(password_bytes) + 1)
+    return hashlib.new(hash_name, data[:1048576]).digest()
+
+
+def localize_key(key: bytes, engine_id: bytes, hash_name: str, length: int = 0) -> bytes:
+    """Localize a key for an engine, see RFC 3414, 2.6
+
+    Keys shorter than the requested length are extended like Net-SNMP does
+    it for AES-192 and AES-256 (draft-blumenthal-aes-usm-04).
+    """
+    localized = hashlib.new(hash_name, key + engine_id + key).digest()
+    while len(localized) < length:
+        localized += hashlib.new(hash_name, localized).digest()
+    return localized
+
+
+class _Engine(NamedTuple):
+    engine_id: bytes
+    boots: int
+    time: int
+    received_at: float
+
+    def now(self) -> tuple[int, int]:
+        return self.boots, self.time + int(time.monotonic() - self.received_at)
+
+
+class USMMessages:
+    """SNMPv3 messages of the user based security model
+
+    The engine is discovered via a report of the agent on the first request.
+    An agent (or a stand-in of it) passes its own engine.
+    """
+
+    def __init__(
+        self,
+        credentials: tuple[str, ...],
+        *,
+        engine_id: bytes | None = None,
+        boots: int = 0,
+    ) -> None:
+        self._sec_level: Final = credentials[0]
+        self._user: Final = credentials[2 if len(credentials) >= 4 else 1].encode()
+        self._auth: tuple[str, int, str] | None = None
+        self._priv: tuple[str, str] | None = None
+        if len(credentials) >= 4 and self._sec_level in ("authNoPriv", "authPriv"):
+            auth_proto, auth_pass = credentials[1], credentials[3]
+            if auth_proto not in _AUTH_PROTOCOLS:
+                raise MKGeneralException(f"Invalid SNMP auth protocol: {auth_proto}")
+            self._auth = (*_AUTH_PROTOCOLS[auth_proto], auth_pass)
+        if len(credentials) == 6 and self._sec_level == "authPriv":
+            if credentials[4] not in _PRIV_PROTOCOLS:
+                raise MKGeneralException(f"Invalid SNMP priv protocol: {credentials[4]}")
+            self._priv = (credentials[4], credentials[5])
+        if (
+            self._sec_level == "authPriv"
+            and self._priv is None
+            or (self._sec_level == "authNoPriv" and self._auth is None)
+        ):
+            raise MKGeneralException(f"Invalid SNMPv3 credentials for {self._sec_level}")
+
+        self._flags: Final = (_FLAG_AUTH if self._auth else 0) | (_FLAG_PRIV if self._priv else 0)
+        self.engine: _Engine | None = None
+        self._auth_key = b""
+        self._priv_key = b""
+        self._salt = random.getrandbits(64)
+        if engine_id is not None:
+            self._set_engine(_Engine(engine_id, boots, 0, time.monotonic()))
+
+    def _set_engine(self, engine: _Engine) -> None:
+        if self.engine is None or engine.engine_id != self.engine.engine_id:
+            if self._auth is not None:
+                hash_name, _length, auth_pass = self._auth
+                self._auth_key = localize_key(
+                    password_to_key(auth_pass, hash_name), engine.engine_id, hash_name
+                )
+            if self._auth is not None and self._priv is not None:
+                hash_name = self._auth[0]
+                priv_proto, priv_pass = self._priv
+                self._priv_key = localize_key(
+                    password_to_key(priv_pass, hash_name),
+                    engine.engine_id,
+                    hash_name,
+                    _PRIV_PROTOCOLS[priv_proto],
+                )
+        self.engine = engine
+
+    def encode(self, pdu: bytes, request_id: int, context: SNMPContext) -> bytes:
+        if self.engine is None:
+            # Discovery: An unauthenticated request without engine makes the
+            # agent send a report with its engine
+            return self._encode_message(
+                request_id,
+                _FLAG_REPORTABLE,
+                b"",
+                0,
+                0,
+                b"",
+                b"",
+                _scoped_pdu(b"", "", encode_pdu(_GET_REQUEST, request_id, [])),
+            )
+        engine_id = self.engine.engine_id
+        boots, engine_time = self.engine.now()
+        scoped_pdu = _scoped_pdu(engine_id, context, pdu)
+        priv_params = b""
+        if self._priv is not None:
+            priv_params, scoped_pdu = self._encrypt(scoped_pdu, boots, engine_time)
+        auth_length = self._auth[1] if self._auth else 0
+        message = self._encode_message(
+            request_id,
+            self._flags if pdu[0] in (_RESPONSE, _REPORT) else self._flags | _FLAG_REPORTABLE,
+            engine_id,
+            boots,
+            engine_time,
+            bytes(auth_length),
+            priv_params,
+            scoped_pdu,
+        )
+        if not self._auth:
+            return message
+        auth_end = len(message) - len(scoped_pdu) - len(_encode(_OCTET_STRING, priv_params))
+        return message[: auth_end - auth_length] + self._digest(message) + message[auth_end:]
+
+    def _encode_message(
+        self,
+        msg_id: int,
+        flags: int,
+        engine_id: bytes,
+        boots: int,
+        engine_time: int,
+        auth_params: bytes,
+        priv_params: bytes,
+        scoped_pdu: bytes,
+    ) -> bytes:
+        return _encode(
+            _SEQUENCE,
+            _encode_integer(3)
+            + _encode(
+                _SEQUENCE,
+                _encode_integer(msg_id)
+                + _encode_integer(_MAX_MESSAGE_SIZE)
+                + _encode(_OCTET_STRING, bytes((flags,)))
+                + _encode_integer(3),
+            )
+            + _encode(
+                _OCTET_STRING,
+                _encode(
+                    _SEQUENCE,
+                    _encode(_OCTET_STRING, engine_id)
+                    + _encode_integer(boots)
+                    + _encode_integer(engine_time)
+                    + _encode(_OCTET_STRING, self._user)
+                    + _encode(_OCTET_STRING, auth_params)
+                    + _encode(_OCTET_STRING, priv_params),
+                ),
+            )
+            + scoped_pdu,
+        )
+
+    def decode(self, data: bytes) -> PDU:
+        """Decode a message, the request id of the PDU is the message id
+
+        Reports do not necessarily carry the request id of the request.
+        """
+        try:
+            _version, header, security, scoped_pdu = _elements(data, _decode(data))
+            msg_id, _max_size, flags, _model = _elements(data, header)
+            (usm,) = _elements(data, security)
+            engine_id, boots, engine_time, _user, auth_params, priv_params = _elements(data, usm)
+        except ValueError:
+            raise MalformedMessage("Malformed SNMPv3 message")
+        request_id = _decode_integer(data, msg_id)
+        msg_flags = _payload(data, flags)[:1]
+        engine = _Engine(
+            _payload(data, engine_id),
+            _decode_integer(data, boots),
+            _decode_integer(data, engine_time),
+            time.monotonic(),
+        )
+
+        security_flags = msg_flags[0] & (_FLAG_AUTH | _FLAG_PRIV) if msg_flags else 0
+
+        if security_flags & _FLAG_AUTH:
+            if self._auth is None or self.engine is None:
+                raise MalformedMessage("Unexpected authenticated SNMPv3 message")
+            if engine.engine_id != self.engine.engine_id:
+                raise MalformedMessage("SNMPv3 message of an unknown engine")
+            received_digest = _payload(data, auth_params)
+            unauthenticated = (
+                data[: auth_params.start] + bytes(len(received_digest)) + data[auth_params.end :]
+            )
+            if not hmac.compare_digest(received_digest, self._digest(unauthenticated)):
+                raise MalformedMessage("Wrong digest of SNMPv3 message")
+
+        if security_flags & _FLAG_PRIV:
+            if self._priv is None or not security_flags & _FLAG_AUTH:
+                raise MalformedMessage("Unexpected encrypted SNMPv3 message")
+            plain = self._decrypt(
+                _payload(data, scoped_pdu), _payload(data, priv_params), engine.boots, engine.time
+            )
+            scoped_pdu = _decode(plain)
+            data = plain
+
+        try:
+            _context_engine_id, _context_name, pdu = _elements(data, scoped_pdu)
+        except ValueError:
+            raise MalformedMessage("Malformed scoped PDU")
+        decoded = decode_pdu(data, pdu)._replace(request_id=request_id)
+
+        # Only reports may have a lower security level, e.g. the ones of the engine discovery
+        if decoded.tag != _REPORT and security_flags != self._flags:
+            raise MalformedMessage(f"SNMPv3 message without security level {self._sec_level}")
+        if security_flags & _FLAG_AUTH or self.engine is None or not self._auth:
+            self._set_engine(engine)
+        return decoded
+
+    def handle_report(self, pdu: PDU) -> None:
+        """Raise an error unless the request has to be repeated with the new engine"""
+        for oid, _tag, _value in pdu.varbinds:
+            if oid in (_NOT_IN_TIME_WINDOWS, _UNKNOWN_ENGINE_IDS):
+                return
+            if oid in _USM_ERRORS:
+                raise MKSNMPError(_USM_ERRORS[oid])
+        raise MKSNMPError(f"Unexpected report: {', '.join(oid for oid, *_ in pdu.varbinds)}")
+
+    def _digest(self, message: bytes) -> bytes:
+        assert self._auth is not None
+        hash_name, length, _auth_pass = self._auth
+        return hmac.new(self._auth_key, message, hash_name).digest()[:length]
+
+    def _encrypt(self, scoped_pdu: bytes, boots: int, engine_time: int) -> tuple[bytes, bytes]:
+        assert self._priv is not None
+        self._salt = (self._salt + 1) & 0xFFFFFFFFFFFFFFFF
+        if self._priv[0] == "DES":
+            salt = boots.to_bytes(4, "big") + (self._salt & 0xFFFFFFFF).to_bytes(4, "big")
+            scoped_pdu += bytes(-len(scoped_pdu) % 8)
+        else:
+            salt = self._salt.to_bytes(8, "big")
+        encryptor = self._cipher(salt, boots, engine_time).encryptor()
+        return salt, _encode(_OCTET_STRING, encryptor.update(scoped_pdu) + encryptor.finalize())
+
+    def _decrypt(self, encrypted: bytes, salt: bytes, boots: int, engine_time: int) -> bytes:
+        if len(salt) != 8 or (self._priv and self._priv[0] == "DES" and len(encrypted) % 8):
+            raise MalformedMessage("Malformed encrypted SNMPv3 message")
+        decryptor = self._cipher(salt, boots, engine_time).decryptor()
+        return decryptor.update(encrypted) + decryptor.finalize()
+
+    def _cipher(self, salt: bytes, boots: int, engine_time: int) -> Cipher:
+        assert self._priv is not None
+        if self._priv[0] == "DES":
+            iv = bytes(a ^ b for a, b in zip(self._priv_key[8:16], salt))
+            # TripleDES with a key of 8 bytes is DES
+            return Cipher(TripleDES(self._priv_key[:8]), modes.CBC(iv))  # nosec B304 # BNS:3a7de8
+        iv = boots.to_bytes(4, "big") + engine_time.to_bytes(4, "big") + salt
+        return Cipher(
+            algorithms.AES(self._priv_key[: _PRIV_PROTOCOLS[self._priv[0]]]), modes.CFB(iv)
+        )
+
+
+def _scoped_pdu(engine_id: bytes, context: SNMPContext, pdu: bytes) -> bytes:
+    return _encode(
+        _SEQUENCE,
+        _encode(_OCTET_STRING, engine_id) + _encode(_OCTET_STRING, context.encode()) + pdu,
+    )
+
+
+# .
+#   .--Backend-------------------------------------------------------------.
+#   |                ____             _                  _                 |
+#   |               | __ )  __ _  ___| | _____ _ __   __| |                |
+#   |               |  _ \ / _` |/ __| |/ / _ \ '_ \ / _` |                |
+#   |               | |_) | (_| | (__|   <  __/ | | | (_| |                |
+#   |               |____/ \__,_|\___|_|\_\___|_| |_|\__,_|                |
+#   |                                                                      |
+#   '----------------------------------------------------------------------'
+
+
+class _Request(NamedTuple):
+    tag: int
+    oid: OID
+    max_repetitions: int = 0
+
+
+class _Get:
+    def __init__(self, oid: OID, *, get_next: bool) -> None:
+        self.prefix: Final = f".{oid.strip('.')}."
+        self.oid: Final = oid
+        self.get_next: Final = get_next
+        self.value: SNMPRawValue | None = None
+        self._sent = False
+
+    def next_request(self) -> _Request | None:
+        if self._sent:
+            return None
+        self._sent = True
+        return _Request(_GET_NEXT_REQUEST if self.get_next else _GET_REQUEST, self.oid)
+
+    def handle(self, pdu: PDU) -> None:
+        if pdu.error_status or not pdu.varbinds:
+            return
+        oid, tag, payload = pdu.varbinds[0]
+        # In case of .*, check if prefix is the one we are looking for
+        if self.get_next and not oid.startswith(self.prefix):
+            return
+        self.value = _raw_value(tag, payload)
+
+
+class _Walk:
+    """Walks the subtree of an OID
+
+    Like snmpwalk, the OID itself is fetched in case the subtree is empty.
+    """
+
+    def __init__(self, oid: OID, *, bulk_size: int) -> None:
+        self.oid: Final = f".{oid.strip('.')}"
+        self.rows: SNMPRowInfo = []
+        self._prefix: Final = f"{self.oid}."
+        self._bulk_size: Final = bulk_size
+        self._last = self.oid
+        self._seen: set[OID] = set()
+        self._walking = True
+        self._get: _Get | None = None
+
+    def next_request(self) -> _Request | None:
+        if self._walking:
+            if self._bulk_size:
+                return _Request(_GET_BULK_REQUEST, self._last, self._bulk_size)
+            return _Request(_GET_NEXT_REQUEST, self._last)
+        if self.rows:
+            return None
+        if self._get is None:
+            self._get = _Get(self.oid, get_next=False)
+        return self._get.next_request()
+
+    def handle(self, pdu: PDU) -> None:
+        if self._get is not None:
+            self._get.handle(pdu)
+            if self._get.value is not None:
+                self.rows.append((self.oid, self._get.value))
+            return
+
+        if pdu.error_status:
+            # SNMPv1 agents answer noSuchName at the end of the MIB
+            if pdu.error_status != 2:
+                raise MKSNMPError(
+                    "SNMP error: %s" % _ERROR_STATUS.get(pdu.error_status, pdu.error_status)
+                )
+            self._walking = False
+            return
+
+        for oid, tag, payload in pdu.varbinds:
+            if (
+                not oid.startswith(self._prefix)
+                or (value := _raw_value(tag, payload)) is None
+                # Some agents run in circles, stop when we have been there
+                or oid in self._seen
+            ):
+                self._walking = False
+                return
+            self._seen.add(oid)
+            self.rows.append((oid, value))
+            self._last = oid
+
+        if not pdu.varbinds:
+            self._walking = False
+
+
+class _Device:
+    """The state of one backend within an engine"""
+
+    def __init__(
+        self,
+        messages: CommunityMessages | USMMessages,
+        family: socket.AddressFamily,
+        sockaddr: tuple[Any, ...],
+        *,
+        max_requests_in_flight: int,
+    ) -> None:
+        self.messages: Final = messages
+        self.family: Final = family
+        self.sockaddr: Final = sockaddr
+        self.requests: Final = asyncio.Semaphore(max_requests_in_flight)
+        self.pending: Final[dict[int, asyncio.Future[PDU]]] = {}
+
+
+class _Protocol(asyncio.DatagramProtocol):
+    def __init__(self, devices: Mapping[tuple[str, int], Sequence[_Device]]) -> None:
+        self._devices: Final = devices
+
+    def datagram_received(self, data: bytes, addr: tuple[Any, ...]) -> None:
+        # Several hosts may share an address, the one waiting for the request id wins.
+        for device in self._devices.get(addr[:2], ()):
+            try:
+                pdu = device.messages.decode(data)
+            except MalformedMessage as e:
+                console.vverbose(f"Dropping SNMP message: {e}\n")
+                continue
+            # None: The answer to a request that has been repeated meanwhile
+            if (future := device.pending.pop(pdu.request_id, None)) is not None:
+                if not future.done():
+                    future.set_result(pdu)
+                return
+
+    def error_received(self, exc: Exception) -> None:
+        # ICMP errors are not attributable to a request, the request times out.
+        console.vverbose(f"SNMP socket error: {exc}\n")
+
+
+class SNMPEngine:
+    """Exchanges the SNMP messages of any number of backends on one event loop
+
+    All devices share one UDP socket per address family. The requests are
+    limited per device by max_requests_in_flight of the backend, timeouts and
+    retries are applied per request as configured for the host.
+    """
+
+    def __init__(self) -> None:
+        self._devices: Final[dict[tuple[str, int], list[_Device]]] = {}
+        self._backends: Final[dict[NativeSNMPBackend, _Device]] = {}
+        self._transports: Final[
+            dict[socket.AddressFamily, asyncio.Future[asyncio.DatagramTransport]]
+        ] = {}
+        self._request_id = random.randrange(1, 1 << 30)
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        for transport in self._transports.values():
+            if transport.done() and not transport.cancelled() and not transport.exception():
+                transport.result().close()
+        self._transports.clear()
+
+    async def _device(self, backend: "NativeSNMPBackend") -> _Device:
+        if (device := self._backends.get(backend)) is not None:
+            return device
+        config = backend.config
+        if (address := config.ipaddress) is None:
+            raise MKSNMPError(f"SNMP Error on {config.hostname}: No IP address")
+        family = socket.AF_INET6 if config.is_ipv6_primary else socket.AF_INET
+        try:
+            # Resolve once to get the address in the form of the received datagrams
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                address, config.port, family=family, type=socket.SOCK_DGRAM
+            )
+        except OSError as e:
+            raise MKSNMPError(f"SNMP Error on {address}: {e}")
+        sockaddr: tuple[Any, ...] = infos[0][4]
+        device = self._backends.setdefault(
+            backend,
+            _Device(
+                backend._messages,  # pylint: disable=protected-access
+                family,
+                sockaddr,
+                max_requests_in_flight=backend.max_requests_in_flight,
+            ),
+        )
+        if device not in (devices := self._devices.setdefault(sockaddr[:2], [])):
+            devices.append(device)
+        return device
+
+    async def _transport(self, family: socket.AddressFamily) -> asyncio.DatagramTransport:
+        if (transport := self._transports.get(family)) is None:
+            transport = self._transports[family] = asyncio.ensure_future(self._open(family))
+        try:
+            return await asyncio.shield(transport)
+        except OSError as e:
+            raise MKSNMPError(f"SNMP Error: {e}")
+
+    async def _open(self, family: socket.AddressFamily) -> asyncio.DatagramTransport:
+        transport, _protocol = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: _Protocol(self._devices), family=family
+        )
+        return transport
+
+    async def run(
+        self,
+        backend: "NativeSNMPBackend",
+        jobs: Sequence[_Get | _Walk],
+        context: SNMPContext,
+    ) -> None:
+        """Process the requests of the jobs until all of them are done"""
+        device = await self._device(backend)
+        transport = await self._transport(device.family)
+
+        async def process(job: _Get | _Walk) -> None:
+            while (request := job.next_request()) is not None:
+                async with device.requests:
+                    job.handle(await self._exchange(backend, device, transport, request, context))
+
+        tasks = [asyncio.ensure_future(process(job)) for job in jobs]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _exchange(
+        self,
+        backend: "NativeSNMPBackend",
+        device: _Device,
+        transport: asyncio.DatagramTransport,
+        request: _Request,
+        context: SNMPContext,
+    ) -> PDU:
+        timeout = float(backend.config.timing.get("timeout", _DEFAULT_TIMEOUT))
+        retries = int(backend.config.timing.get("retries", _DEFAULT_RETRIES))
+        loop = asyncio.get_running_loop()
+        tries = reports = 0
+        while tries <= retries:
+            request_id = self._next_id()
+            pdu = encode_pdu(
+                request.tag,
+                request_id,
+                [(request.oid, b"\x05\x00")],
+                error_index=request.max_repetitions,
+            )
+            device.pending[request_id] = future = loop.create_future()
+            try:
+                transport.sendto(device.messages.encode(pdu, request_id, context), device.sockaddr)
+                answer = await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                tries += 1
+                continue
+            finally:
+                device.pending.pop(request_id, None)
+            if answer.tag == _REPORT and isinstance(device.messages, USMMessages):
+                device.messages.handle_report(answer)
+                reports += 1
+                if reports > _MAX_REPORTS:
+                    raise MKSNMPError(f"SNMP Error on {backend.config.ipaddress}: Too many reports")
+                continue
+            return answer
+
+        address = backend.config.ipaddress
+        message = f"SNMP Error on {address}: Timeout: No Response from {address}"
+        if backend.config.is_snmpv3_host:
+            raise SNMPContextTimeout(f"{message} (context {context!r})")
+        raise MKSNMPError(message)
+
+    def _next_id(self) -> int:
+        self._request_id = self._request_id % 0x7FFFFFFF + 1
+        return self._request_id
+
+
+class NativeSNMPBackend(SNMPBackend):
+    def __init__(
+        self,
+        snmp_config: SNMPHostConfig,
+        logger: logging.Logger,
+        *,
+        max_requests_in_flight: int = 4,
+    ) -> None:
+        super().__init__(snmp_config, logger)
+        self.max_requests_in_flight: Final = max_requests_in_flight
+        self._messages = self._make_messages(snmp_config)
+        self._prefetched: dict[tuple[SNMPContext, OID], SNMPRowInfo | MKSNMPError] = {}
+
+    @staticmethod
+    def _make_messages(config: SNMPHostConfig) -> CommunityMessages | USMMessages:
+        if isinstance(config.credentials, tuple):
+            if len(config.credentials) not in (2, 4, 6):
+                raise MKGeneralException(
+                    "Invalid SNMP credentials '%r' for host %s: must be "
+                    "string, 2-tuple, 4-tuple or 6-tuple" % (config.credentials, config.hostname)
+                )
+            return USMMessages(config.credentials)
+        if config.is_bulkwalk_host or config.is_snmpv2or3_without_bulkwalk_host:
+            return CommunityMessages(1, config.credentials)
+        return CommunityMessages(0, config.credentials)
+
+    @property
+    def _bulk_size(self) -> int:
+        if not self.config.is_bulkwalk_host:
+            return 0
+        return self.config.bulk_walk_size_of or _DEFAULT_BULK_SIZE
+
+    def get(self, /, oid: OID, *, context: SNMPContext) -> SNMPRawValue | None:
+        if oid.endswith(".*"):
+            job = _Get(oid[:-2], get_next=True)
+        else:
+            job = _Get(oid, get_next=False)
+        try:
+            self._run([job], context)
+        except MKSNMPError as e:
+            console.verbose(f"SNMP error: {e}\n")
+            return None
+        console.vverbose("SNMP answer: ==> [%r]\n" % job.value)
+        return job.value
+
+    def walk(
+        self,
+        /,
+        oid: OID,
+        *,
+        context: SNMPContext,
+        section_name: SectionName | None = None,
+        table_base_oid: OID | None = None,
+    ) -> SNMPRowInfo:
+        return self.walk_many([oid], context=context)[0]
+
+    def walk_many(
+        self,
+        /,
+        oids: Sequence[OID],
+        *,
+        context: SNMPContext,
+        section_name: SectionName | None = None,
+        table_base_oid: OID | None = None,
+    ) -> Sequence[SNMPRowInfo]:
+        """Walk the OIDs, the ones walked by prefetch() are served from memory"""
+        rowinfos: dict[OID, SNMPRowInfo] = {}
+        for oid in oids:
+            if (prefetched := self._prefetched.pop((context, oid), None)) is None:
+                continue
+            if isinstance(prefetched, MKSNMPError):
+                raise prefetched
+            rowinfos[oid] = prefetched
+        if missing := [oid for oid in oids if oid not in rowinfos]:
+            console.vverbose(f"Walking {', '.join(missing)}\n")
+            walks = [_Walk(oid, bulk_size=self._bulk_size) for oid in missing]
+            self._run(walks, context)
+            rowinfos.update((oid, walk.rows) for oid, walk in zip(missing, walks))
+        return [rowinfos[oid] for oid in oids]
+
+    async def walk_many_async(
+        self,
+        oids: Sequence[OID],
+        *,
+        context: SNMPContext,
+        engine: SNMPEngine,
+    ) -> Sequence[SNMPRowInfo]:
+        """Walk the OIDs with the given engine, concurrently with the walks of other hosts"""
+        walks = [_Walk(oid, bulk_size=self._bulk_size) for oid in oids]
+        await engine.run(self, walks, context)
+        return [walk.rows for walk in walks]
+
+    async def prefetch(
+        self,
+        oids: Sequence[OID],
+        *,
+        context: SNMPContext,
+        engine: SNMPEngine,
+    ) -> None:
+        """Walk the OIDs now and keep the result for walk_many()
+
+        Errors are kept as well and raised by walk_many(), so the caller
+        sees them where it would have seen them without prefetching.
+        """
+        try:
+            rowinfos = await self.walk_many_async(oids, context=context, engine=engine)
+        except MKSNMPError as e:
+            self._prefetched.update(((context, oid), e) for oid in oids)
+        else:
+            self._prefetched.update(((context, oid), rows) for oid, rows in zip(oids, rowinfos))
+
+    def _run(self, jobs: Sequence[_Get | _Walk], context: SNMPContext) -> None:
+        async def run() -> None:
+            async with SNMPEngine() as engine:
+                await engine.run(self, jobs, context)
+
+        asyncio.run(run())
@@ -4,13 +4,17 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 """Abstract classes and types."""
 
+import bisect
 import logging
-from collections.abc import Sequence
+import mmap
+import struct
+from collections.abc import Iterable, Sequence
 from pathlib import Path
-from typing import Final
+from typing import Final, overload, Self
 
 import cmk.utils.agent_simulator as agent_simulator
 import cmk.utils.paths
+import cmk.utils.store as store
 from cmk.utils.agentdatatype import AgentRawData
 from cmk.utils.exceptions import MKException, MKGeneralException, MKSNMPError
 from cmk.utils.log import console
@@ -20,7 +24,7 @@ from cmk.snmplib import OID, SNMPBackend, SNMPContext, SNMPHostConfig, SNMPRawVa
 
 from ._utils import strip_snmp_value
 
-__all__ = ["StoredWalkSNMPBackend"]
+__all__ = ["compile_walk", "StoredWalkSNMPBackend"]
 
 
 class StoredWalkSNMPBackend(SNMPBackend):
@@ -33,6 +37,7 @@ class StoredWalkSNMPBackend(SNMPBackend):
         )
         if not self.path.exists():
             raise MKSNMPError(f"No snmpwalk file {self.path}")
+        self._compiled: CompiledWalk | None = CompiledWalk.open_for(self.path)
 
     def get(self, /, oid: OID, *, context: SNMPContext) -> SNMPRawValue | None:
         walk = self.walk(oid, context=context)
@@ -64,6 +69,9 @@ class StoredWalkSNMPBackend(SNMPBackend):
             dot_star = False
 
         console.vverbose(f"  Loading {oid}")
+        if self._compiled is not None:
+            return self._compiled.walk(oid_prefix, dot_star=dot_star)
+
         lines = self.read_walk_data()
 
         begin = 0
@@ -149,20 +157,177 @@ class StoredWalkSNMPBackend(SNMPBackend):
             if o.startswith("."):
                 o = o[1:]
             if o == oid or o.startswith(oid_prefix + "."):
-                if len(parts) > 1:
-                    # FIXME: This encoding ping-pong is horrible...
-                    value = agent_simulator.process(
-                        AgentRawData(
-                            parts[1].encode(),
-                        ),
-                    ).decode()
-                else:
-                    value = ""
                 # Fix for missing starting oids
-                rows.append(("." + o, strip_snmp_value(value)))
+                rows.append(("." + o, _value(parts)))
                 index += direction
                 if index < 0 or index >= len(lines):
                     break
             else:
                 break
         return rows
+
+
+def _value(parts: Sequence[str]) -> SNMPRawValue:
+    if len(parts) > 1:
+        # FIXME: This encoding ping-pong is horrible...
+        value = agent_simulator.process(
+            AgentRawData(
+                parts[1].encode(),
+            ),
+        ).decode()
+    else:
+        value = ""
+    return strip_snmp_value(value)
+
+
+# magic, size and mtime of the text walk, number of lines
+_HEADER: Final = struct.Struct("<8sQQQ")
+_MAGIC: Final = b"CMKSWLK1"
+_OFFSET: Final = struct.Struct("<Q")
+_COMPILED_SUFFIX: Final = ".walkidx"
+
+
+def _key(oid: str) -> bytes:
+    """Encode the OID so that comparing the keys compares the OIDs numerically
+
+    A subtree is a range of keys starting with the key of its root.
+    """
+    try:
+        return b"".join(int(part).to_bytes(4, "big") for part in oid.strip(".").split("."))
+    except (ValueError, OverflowError):
+        raise MKGeneralException("Invalid OID %s" % oid)
+
+
+def compiled_path(path: Path) -> Path:
+    return path.with_name(path.name + _COMPILED_SUFFIX)
+
+
+def compile_walk(path: Path) -> Path:
+    """Write the compiled walk of the text walk at path next to it
+
+    The compiled walk consists of a header, the offsets of the keys and of the
+    lines, the sorted keys and the lines of the walk. The header contains the
+    size and mtime of the text walk, the compiled walk is only used while they
+    match. Returns the path of the compiled walk.
+    """
+    stat = path.stat()
+    entries = sorted(
+        (
+            (_key(line.split(None, 1)[0]), line.rstrip("\n").encode())
+            for line in StoredWalkSNMPBackend.read_walk_from_path(path)
+        ),
+        key=lambda entry: entry[0],
+    )
+    target = compiled_path(path)
+    store.save_bytes_to_file(
+        target,
+        b"".join(
+            (
+                _HEADER.pack(_MAGIC, stat.st_size, stat.st_mtime_ns, len(entries)),
+                *_offsets(key for key, _line in entries),
+                *_offsets(line for _key, line in entries),
+                *(key for key, _line in entries),
+                *(line for _key, line in entries),
+            )
+        ),
+    )
+    return target
+
+
+def _offsets(chunks: Iterable[bytes]) -> Iterable[bytes]:
+    offset = 0
+    yield _OFFSET.pack(offset)
+    for chunk in chunks:
+        offset += len(chunk)
+        yield _OFFSET.pack(offset)
+
+
+class _Chunks(Sequence[bytes]):
+    """The n-th chunk of a region, located by a table of n + 1 offsets"""
+
+    def __init__(self, data: mmap.mmap, table: int, start: int, length: int) -> None:
+        self._data: Final = data
+        self._table: Final = table
+        self._start: Final = start
+        self._length: Final = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    @overload
+    def __getitem__(self, index: int) -> bytes:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[bytes]:
+        ...
+
+    def __getitem__(self, index: int | slice) -> bytes | Sequence[bytes]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        begin, end = struct.unpack_from("<QQ", self._data, self._table + index * _OFFSET.size)
+        return self._data[self._start + begin : self._start + end]
+
+
+class CompiledWalk:
+    """A memory mapped compiled walk, see compile_walk()
+
+    Looking up an OID is a binary search on the sorted keys, only the lines of
+    the result are parsed.
+    """
+
+    def __init__(self, data: mmap.mmap) -> None:
+        magic, _size, _mtime, length = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("Not a compiled walk")
+        key_table = _HEADER.size
+        line_table = key_table + (length + 1) * _OFFSET.size
+        keys_start = line_table + (length + 1) * _OFFSET.size
+        (keys_length,) = _OFFSET.unpack_from(data, line_table - _OFFSET.size)
+        (lines_length,) = _OFFSET.unpack_from(data, keys_start - _OFFSET.size)
+        if keys_start + keys_length + lines_length != len(data):
+            raise ValueError("Truncated compiled walk")
+        self._keys: Final = _Chunks(data, key_table, keys_start, length)
+        self._lines: Final = _Chunks(data, line_table, keys_start + keys_length, length)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @classmethod
+    def open_for(cls, path: Path) -> Self | None:
+        """Open the compiled walk of the text walk at path, if it is up to date"""
+        try:
+            with compiled_path(path).open("rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            stat = path.stat()
+        except (OSError, ValueError):
+            return None
+
+        try:
+            magic, size, mtime, _length = _HEADER.unpack_from(data)
+            if magic != _MAGIC or (size, mtime) != (stat.st_size, stat.st_mtime_ns):
+                console.vverbose(f"  Ignoring outdated compiled walk of {path}\n")
+                return None
+            console.vverbose(f"  Opening compiled walk of {path}\n")
+            return cls(data)
+        except (struct.error, ValueError):
+            console.vverbose(f"  Ignoring broken compiled walk of {path}\n")
+            return None
+
+    def walk(self, oid: OID, *, dot_star: bool = False) -> SNMPRowInfo:
+        """Return the rows of the subtree of oid, or only the first row below it"""
+        prefix = _key(oid)
+        rows = []
+        for index in range(bisect.bisect_left(self._keys, prefix), len(self._keys)):
+            key = self._keys[index]
+            if not key.startswith(prefix):
+                break
+            if dot_star and key == prefix:
+                continue
+            parts = self._lines[index].decode().split(None, 1)
+            rows.append((parts[0], _value(parts)))
+            if dot_star:
+                break
+        return rows
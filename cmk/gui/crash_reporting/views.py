@@ -4,7 +4,7 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 
 import json
-from collections.abc import Mapping, Sequence
+from collections.abc import Callable, Mapping, Sequence
 from typing import Any, Literal
 
 import livestatus
@@ -25,7 +25,7 @@ from cmk.gui.utils.speaklater import LazyString
 from cmk.gui.utils.urls import makeuri_contextless
 from cmk.gui.view_utils import CellSpec
 from cmk.gui.views.command import Command, CommandActionResult, PermissionSectionAction
-from cmk.gui.views.sorter import cmp_simple_number, Sorter
+from cmk.gui.views.sorter import cmp_simple_number, key_simple_number, Sorter
 from cmk.gui.visuals.filter import Filter
 
 from .helpers import local_files_involved_in_crash
@@ -303,6 +303,9 @@ class SorterCrashTime(Sorter):
     def cmp(self, r1: Row, r2: Row, parameters: Mapping[str, Any] | None) -> int:
         return cmp_simple_number("crash_time", r1, r2)
 
+    def key(self, parameters: Mapping[str, Any] | None) -> Callable[[Row], Any]:
+        return lambda row: key_simple_number("crash_time", row)
+
 
 PermissionActionDeleteCrashReport = permission_registry.register(
     Permission(
@@ -35,6 +35,7 @@ from cmk.utils.structured_data import (
     SDKey,
     SDPath,
     SDRawTree,
+    TreeArchive,
 )
 
 import cmk.gui.sites as sites
@@ -295,7 +296,9 @@ def _get_history(
     except FilterInventoryHistoryPathsError:
         return [], []
 
-    cached_tree_loader = _CachedTreeLoader()
+    cached_tree_loader = _CachedTreeLoader(
+        TreeArchive(cmk.utils.paths.inventory_archive_dir, hostname)
+    )
     corrupted_history_files: set[Path] = set()
     history: list[HistoryEntry] = []
     filters = (
@@ -338,19 +341,19 @@ def _get_history(
 
 def _get_inventory_history_paths(hostname: HostName) -> Sequence[InventoryHistoryPath]:
     inventory_path = Path(cmk.utils.paths.inventory_output_dir, hostname)
-    inventory_archive_dir = Path(cmk.utils.paths.inventory_archive_dir, hostname)
 
-    try:
-        archived_tree_paths = [
-            InventoryHistoryPath(
-                path=filepath,
-                timestamp=int(filepath.name),
-            )
-            for filepath in sorted(inventory_archive_dir.iterdir())
-        ]
-    except FileNotFoundError:
+    if not Path(cmk.utils.paths.inventory_archive_dir, hostname).exists():
         return []
 
+    tree_archive = TreeArchive(cmk.utils.paths.inventory_archive_dir, hostname)
+    archived_tree_paths = [
+        InventoryHistoryPath(
+            path=filepath,
+            timestamp=timestamp,
+        )
+        for timestamp, filepath in tree_archive.files().items()
+    ]
+
     try:
         archived_tree_paths.append(
             InventoryHistoryPath(
@@ -379,6 +382,7 @@ def _get_pairs(
 
 @dataclass(frozen=True)
 class _CachedTreeLoader:
+    archive: TreeArchive
     _lookup: dict[Path, ImmutableTree] = field(default_factory=dict)
 
     def get_tree(self, filepath: Path) -> ImmutableTree:
@@ -392,7 +396,7 @@ class _CachedTreeLoader:
 
     def _load_tree_from_file(self, filepath: Path) -> ImmutableTree:
         try:
-            tree = load_tree(filepath)
+            tree = self.archive.load_file(filepath)
         except FileNotFoundError:
             raise LoadStructuredDataError()
 
@@ -754,10 +758,10 @@ class InventoryHousekeeping:
         except OSError:
             pass
 
-        for filename in [
-            x for x in (self._inventory_archive_path / hostname).iterdir() if not x.is_dir()
-        ]:
-            timestamps.add(filename.name)
+        timestamps.update(
+            str(timestamp)
+            for timestamp in TreeArchive(self._inventory_archive_path, hostname).files()
+        )
         return timestamps
 
 
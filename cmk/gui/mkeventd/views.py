@@ -144,7 +144,7 @@ def register(
     declare_1to1_sorter("event_priority", cmp_simple_number)
     declare_1to1_sorter("event_facility", cmp_simple_number)  # maybe convert to text
     declare_1to1_sorter("event_rule_id", cmp_simple_string)
-    declare_1to1_sorter("event_state", cmp_simple_state)
+    declare_1to1_sorter("event_state", cmp_simple_state, key=key_simple_state)
     declare_1to1_sorter("event_phase", cmp_simple_string)
     declare_1to1_sorter("event_owner", cmp_simple_string)
 
@@ -1603,6 +1603,9 @@ class SorterServicelevel(Sorter):
     def cmp(self, r1: Row, r2: Row, parameters: Mapping[str, Any] | None) -> int:
         return cmp_custom_variable(r1, r2, "EC_SL", cmp_simple_number)
 
+    def key(self, parameters: Mapping[str, Any] | None) -> Callable[[Row], Any]:
+        return lambda row: row["custom_variables"].get("EC_SL", "")
+
 
 def cmp_simple_state(column, ra, rb):
     a = ra.get(column, -1)
@@ -1614,6 +1617,11 @@ def cmp_simple_state(column, ra, rb):
     return (a > b) - (a < b)
 
 
+def key_simple_state(column, row):
+    state = row.get(column, -1)
+    return 1.5 if state == 3 else state
+
+
 # .
 #   .--Views---------------------------------------------------------------.
 #   |                    __     ___                                        |
@@ -479,6 +479,7 @@ AllViewSpecs = dict[tuple[UserId, ViewName], ViewSpec]
 PermittedViewSpecs = dict[ViewName, ViewSpec]
 
 SorterFunction = Callable[[ColumnName, Row, Row], int]
+SorterKeyFunction = Callable[[ColumnName, Row], Any]
 FilterHeader = str
 
 
@@ -648,11 +649,28 @@ class ViewProcessTracking:
     amount_unfiltered_rows: int = 0
     amount_filtered_rows: int = 0
     amount_rows_after_limit: int = 0
+    livestatus_limit: int | None = None
     duration_fetch_rows: Snapshot = Snapshot.null()
     duration_filter_rows: Snapshot = Snapshot.null()
+    duration_sort_rows: Snapshot = Snapshot.null()
     duration_view_render: Snapshot = Snapshot.null()
 
 
+class ViewPage(NamedTuple):
+    """The rows of a view shown page by page: Page number (starting with 0) and page size"""
+
+    number: int
+    size: int
+
+    @property
+    def start(self) -> int:
+        return self.number * self.size
+
+    @property
+    def end(self) -> int:
+        return self.start + self.size
+
+
 class CustomAttr(TypedDict):
     title: str
     help: str
@@ -26,6 +26,7 @@ from cmk.gui.type_defs import (
     FilterName,
     HTTPVariables,
     SorterSpec,
+    ViewPage,
     ViewProcessTracking,
     ViewSpec,
     VisualContext,
@@ -47,6 +48,7 @@ class View:
         self.spec = view_spec
         self.context: VisualContext = context
         self._row_limit: int | None = None
+        self._page: ViewPage | None = None
         self._only_sites: list[SiteId] | None = None
         self._user_sorters: list[SorterSpec] | None = None
         self._want_checkboxes: bool = False
@@ -155,6 +157,18 @@ class View:
     def row_limit(self, row_limit: int | None) -> None:
         self._row_limit = row_limit
 
+    @property
+    def page(self) -> ViewPage | None:
+        """The page of rows to show, in case the user browses the rows page by page
+
+        Only the rows of this page are rendered. In case the rows need no sorting, livestatus is
+        only queried for the rows up to this page."""
+        return self._page
+
+    @page.setter
+    def page(self, page: ViewPage | None) -> None:
+        self._page = page
+
     @property
     def only_sites(self) -> list[SiteId] | None:
         """Optional list of sites to query instead of all sites
@@ -43,7 +43,7 @@ from cmk.gui.page_menu import (
 from cmk.gui.page_menu_entry import toggle_page_menu_entries
 from cmk.gui.page_menu_utils import collect_context_links, get_context_page_menu_dropdowns
 from cmk.gui.painter_options import PainterOptions
-from cmk.gui.type_defs import HTTPVariables, InfoName, Rows, ViewSpec
+from cmk.gui.type_defs import HTTPVariables, InfoName, Rows, ViewPage, ViewSpec
 from cmk.gui.utils.html import HTML
 from cmk.gui.utils.output_funnel import output_funnel
 from cmk.gui.utils.transaction_manager import transactions
@@ -133,6 +133,16 @@ class GUIViewRenderer(ABCViewRenderer):
             )
             html.begin_page_content()
 
+        if (page := self.view.page) is not None:
+            # Only the rows of the page are shown, so only they are counted and affected by
+            # commands. The rows beyond the row limit only tell that it has been exceeded.
+            row_limit = None if self.view.datasource.ignore_limit else self.view.row_limit
+            has_next_page = (
+                len(rows) if row_limit is None else min(len(rows), row_limit)
+            ) > page.end
+            rows = rows[page.start : page.end]
+            self.view.process_tracking.amount_rows_after_limit = len(rows)
+
         has_done_actions = False
         row_count = len(rows)
 
@@ -245,10 +255,15 @@ class GUIViewRenderer(ABCViewRenderer):
                     len(rows),
                     row_limit,
                 ):
-                    cmk.gui.view_utils.query_limit_exceeded_warn(row_limit, user)
+                    cmk.gui.view_utils.query_limit_exceeded_warn(
+                        row_limit, user, offer_paging=page is None
+                    )
                     del rows[row_limit:]
                     self.view.process_tracking.amount_rows_after_limit = len(rows)
 
+            if page is not None:
+                self._show_page_controls(page, has_next_page)
+
             layout.render(
                 rows,
                 view_spec,
@@ -257,6 +272,9 @@ class GUIViewRenderer(ABCViewRenderer):
                 num_columns,
                 show_checkboxes and not html.do_actions(),
             )
+
+            if page is not None:
+                self._show_page_controls(page, has_next_page)
             row_info = "%d %s" % (row_count, _("row") if row_count == 1 else _("rows"))
             if show_checkboxes:
                 selected = _filter_selected_rows(
@@ -293,6 +311,31 @@ class GUIViewRenderer(ABCViewRenderer):
         if display_options.enabled(display_options.H):
             html.body_end()
 
+    def _show_page_controls(self, page: ViewPage, has_next_page: bool) -> None:
+        html.open_div(class_="paged_controls")
+
+        if page.number > 0:
+            html.icon_button(makeuri(request, [("view_page", 0)]), _("First page"), "start")
+            html.icon_button(
+                makeuri(request, [("view_page", page.number - 1)]),
+                _("Previous page (%d)") % page.number,
+                "back",
+            )
+        else:
+            html.empty_icon_button()
+            html.empty_icon_button()
+
+        if has_next_page:
+            html.icon_button(
+                makeuri(request, [("view_page", page.number + 1)]),
+                _("Next page (%d)") % (page.number + 2),
+                "forth",
+            )
+        else:
+            html.empty_icon_button()
+
+        html.close_div()
+
     def _should_show_filter_form(self) -> bool:
         """Whether or not the filter form should be displayed on page load
 
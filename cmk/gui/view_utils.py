@@ -151,8 +151,12 @@ def row_limit_exceeded(row_count: int, limit: int | None) -> bool:
     return limit is not None and row_count >= limit + 1
 
 
-def query_limit_exceeded_warn(limit: int | None, user_config: LoggedInUser) -> None:
-    """Compare query reply against limits, warn in the GUI about incompleteness"""
+def query_limit_exceeded_warn(
+    limit: int | None, user_config: LoggedInUser, offer_paging: bool = False
+) -> None:
+    """Compare query reply against limits, warn in the GUI about incompleteness
+
+    Paging shows the rows up to the hard limit, so it is offered together with the hard limit."""
     text = HTML(_("Your query produced more than %d results. ") % limit)
 
     if request.get_ascii_input("limit", "soft") == "soft" and user_config.may(
@@ -163,6 +167,12 @@ def query_limit_exceeded_warn(limit: int | None, user_config: LoggedInUser) -> N
             target="_self",
             href=makeuri(request, [("limit", "hard")]),
         )
+        if offer_paging:
+            text += " " + HTMLWriter.render_a(
+                _("Show the results page by page."),
+                target="_self",
+                href=makeuri(request, [("view_page", 0)]),
+            )
     elif request.get_ascii_input("limit") == "hard" and user_config.may(
         "general.ignore_hard_limit"
     ):
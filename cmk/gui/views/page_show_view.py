@@ -9,7 +9,7 @@ from __future__ import annotations
 
 import functools
 import json
-from collections.abc import Callable, Iterable, Mapping, Sequence
+from collections.abc import Callable, Iterable, Sequence
 from itertools import chain
 from typing import Any
 from urllib.parse import quote_plus
@@ -44,11 +44,13 @@ from cmk.gui.type_defs import (
     Rows,
     SorterName,
     SorterSpec,
+    ViewPage,
     ViewSpec,
 )
 from cmk.gui.utils.urls import makeuri_contextless
 from cmk.gui.view import View
 from cmk.gui.view_renderer import ABCViewRenderer, GUIViewRenderer
+from cmk.gui.view_utils import row_limit_exceeded
 from cmk.gui.visuals import (
     filters_allowed_for_infos,
     get_livestatus_filter_headers,
@@ -79,7 +81,8 @@ def page_show_view() -> None:
         context = visuals.active_context_from_request(datasource.infos, view_spec["context"])
 
         view = View(view_name, view_spec, context)
-        view.row_limit = get_limit()
+        view.page = get_page()
+        view.row_limit = get_limit(paged=view.page is not None)
 
         view.only_sites = get_only_sites_from_context(context)
 
@@ -110,9 +113,10 @@ def _may_create_slow_view_log_entry(page_view_tracker: CPUTracker, view: View) -
     logger = log.logger.getChild("slow-views")
     logger.debug(
         (
-            "View name: %s, User: %s, Row limit: %s, Limit type: %s, URL variables: %s"
-            ", View context: %s, Unfiltered rows: %s, Filtered rows: %s, Rows after limit: %s"
-            ", Duration fetching rows: %s, Duration filtering rows: %s, Duration rendering view: %s"
+            "View name: %s, User: %s, Row limit: %s, Limit type: %s, Page: %s, URL variables: %s"
+            ", View context: %s, Livestatus limit: %s, Unfiltered rows: %s, Filtered rows: %s"
+            ", Rows after limit: %s, Duration fetching rows: %s, Duration filtering rows: %s"
+            ", Duration sorting rows: %s, Duration rendering view: %s"
             ", Rendering page exceeds %ss: %s"
         ),
         view.name,
@@ -120,13 +124,16 @@ def _may_create_slow_view_log_entry(page_view_tracker: CPUTracker, view: View) -
         view.row_limit,
         # as in get_limit()
         request.var("limit", "soft"),
+        view.page,
         [f"{k}={v}" for k, v in request.itervars() if k != "selection" and v != ""],
         view.context,
+        view.process_tracking.livestatus_limit,
         view.process_tracking.amount_unfiltered_rows,
         view.process_tracking.amount_filtered_rows,
         view.process_tracking.amount_rows_after_limit,
         _format_snapshot_duration(view.process_tracking.duration_fetch_rows),
         _format_snapshot_duration(view.process_tracking.duration_filter_rows),
+        _format_snapshot_duration(view.process_tracking.duration_sort_rows),
         _format_snapshot_duration(view.process_tracking.duration_view_render),
         duration_threshold,
         _format_snapshot_duration(page_view_tracker.duration),
@@ -316,47 +323,98 @@ def get_row_count(view: View) -> int:
 
 def _get_view_rows(
     view: View, all_active_filters: list[Filter], only_count: bool = False
+) -> tuple[int, Rows]:
+    # Fetch data. Some views show data only after pressing [Search]
+    fetch = (
+        only_count
+        or (not view.spec.get("mustsearch"))
+        or request.var("filled_in") in ["filter", "actions", "confirm", "painteroptions"]
+    )
+    limit = _get_livestatus_limit(view, only_count)
+    view.process_tracking.duration_fetch_rows = Snapshot.null()
+    view.process_tracking.duration_filter_rows = Snapshot.null()
+    unfiltered_amount_of_rows, rows = _get_filtered_rows(
+        view, all_active_filters, limit, fetch=fetch
+    )
+
+    if (
+        view.page is not None
+        and limit != _get_row_limit(view)
+        and row_limit_exceeded(unfiltered_amount_of_rows, limit)
+        and len(rows) <= view.page.end
+    ):
+        # The non-Livestatus filters dropped rows needed for the page: Fetch all rows
+        limit = _get_row_limit(view)
+        unfiltered_amount_of_rows, rows = _get_filtered_rows(
+            view, all_active_filters, limit, fetch=fetch
+        )
+
+    # Sorting - use view sorters and URL supplied sorters
+    with CPUTracker() as sort_rows_tracker:
+        _sort_data(rows, view.sorters)
+
+    view.process_tracking.livestatus_limit = limit
+    view.process_tracking.amount_unfiltered_rows = unfiltered_amount_of_rows
+    view.process_tracking.amount_filtered_rows = len(rows)
+    view.process_tracking.duration_sort_rows = sort_rows_tracker.duration
+
+    return unfiltered_amount_of_rows, rows
+
+
+def _get_row_limit(view: View) -> int | None:
+    # We test for limit here and not inside view.row_limit, because view.row_limit is used
+    # for rendering limits.
+    return None if view.datasource.ignore_limit else view.row_limit
+
+
+def _get_livestatus_limit(view: View, only_count: bool) -> int | None:
+    """The number of rows to fetch from livestatus
+
+    When the user browses the rows page by page and the rows need no sorting, only the rows up to
+    the shown page are fetched. Livestatus can not sort rows."""
+    row_limit = _get_row_limit(view)
+    if only_count or view.page is None or view.sorters or view.datasource.merge_by:
+        return row_limit
+    if row_limit is None:
+        return view.page.end
+    return min(row_limit, view.page.end)
+
+
+def _get_filtered_rows(
+    view: View, all_active_filters: list[Filter], limit: int | None, *, fetch: bool
 ) -> tuple[int, Rows]:
     with CPUTracker() as fetch_rows_tracker:
-        # Fetch data. Some views show data only after pressing [Search]
-        if (
-            only_count
-            or (not view.spec.get("mustsearch"))
-            or request.var("filled_in") in ["filter", "actions", "confirm", "painteroptions"]
-        ):
-            rows, unfiltered_amount_of_rows = _fetch_rows_from_livestatus(view, all_active_filters)
+        if fetch:
+            rows, unfiltered_amount_of_rows = _fetch_rows_from_livestatus(
+                view, all_active_filters, limit
+            )
         else:
             rows = []
             unfiltered_amount_of_rows = 0
 
         post_process_rows(view, all_active_filters, rows)
 
-    # Sorting - use view sorters and URL supplied sorters
-    _sort_data(rows, view.sorters)
-
+    # Apply non-Livestatus filters. They only drop rows, so they are applied before sorting.
     with CPUTracker() as filter_rows_tracker:
-        # Apply non-Livestatus filters
         for filter_ in all_active_filters:
             try:
                 rows = filter_.filter_table(view.context, rows)
             except MKMissingDataError as e:
                 view.add_warning_message(str(e))
 
-    view.process_tracking.amount_unfiltered_rows = unfiltered_amount_of_rows
-    view.process_tracking.amount_filtered_rows = len(rows)
-    view.process_tracking.duration_fetch_rows = fetch_rows_tracker.duration
-    view.process_tracking.duration_filter_rows = filter_rows_tracker.duration
+    view.process_tracking.duration_fetch_rows += fetch_rows_tracker.duration
+    view.process_tracking.duration_filter_rows += filter_rows_tracker.duration
 
     return unfiltered_amount_of_rows, rows
 
 
-def _fetch_rows_from_livestatus(view: View, all_active_filters: list[Filter]) -> tuple[Rows, int]:
+def _fetch_rows_from_livestatus(
+    view: View, all_active_filters: list[Filter], limit: int | None
+) -> tuple[Rows, int]:
     """Fetches the view rows from livestatus
 
     Besides gathering the information from livestatus it performs livestatus table joining
     (e.g. Adding service row info to host rows (For join painters))"""
-    # We test for limit here and not inside view.row_limit, because view.row_limit is used
-    # for rendering limits.
     row_data: Rows | tuple[Rows, int] = view.datasource.table.query(
         view.datasource,
         view.row_cells,
@@ -370,7 +428,7 @@ def _fetch_rows_from_livestatus(view: View, all_active_filters: list[Filter]) ->
             + view.spec.get("add_headers", "")
         ),
         view.only_sites,
-        None if view.datasource.ignore_limit else view.row_limit,
+        limit,
         all_active_filters,
     )
 
@@ -602,16 +660,29 @@ def get_want_checkboxes() -> bool:
     return request.get_integer_input_mandatory("show_checkboxes", 0) == 1
 
 
-def get_limit() -> int | None:
-    """How many data rows may the user query?"""
+def get_limit(paged: bool = False) -> int | None:
+    """How many data rows may the user query?
+
+    Paged views only render the rows of one page, so users allowed to ignore the soft limit may
+    browse them up to the hard limit."""
     limitvar = request.var("limit", "soft")
-    if limitvar == "hard" and user.may("general.ignore_soft_limit"):
-        return active_config.hard_query_limit
     if limitvar == "none" and user.may("general.ignore_hard_limit"):
         return None
+    if (paged or limitvar == "hard") and user.may("general.ignore_soft_limit"):
+        return active_config.hard_query_limit
     return active_config.soft_query_limit
 
 
+def get_page() -> ViewPage | None:
+    """Which page of rows does the user browse? None shows all rows (up to the limit)"""
+    if html.output_format != "html" or (number := request.get_integer_input("view_page")) is None:
+        return None
+    return ViewPage(
+        number=max(number, 0),
+        size=max(request.get_integer_input_mandatory("view_page_size", 100), 1),
+    )
+
+
 def _link_to_folder_by_path(path: str) -> str:
     """Return an URL to a certain Setup folder when we just know its path"""
     return makeuri_contextless(
@@ -622,45 +693,31 @@ def _link_to_folder_by_path(path: str) -> str:
 
 
 def _sort_data(data: Rows, sorters: list[SorterEntry]) -> None:
-    """Sort data according to list of sorters."""
-    if not sorters:
-        return
+    """Sort data according to list of sorters.
 
-    # Handle case where join columns are not present for all rows
-    def safe_compare(
-        compfunc: Callable[[Row, Row, Mapping[str, Any] | None], int],
-        row1: Row,
-        row2: Row,
-        parameters: Mapping[str, Any] | None,
-    ) -> int:
-        if row1 is None and row2 is None:
-            return 0
-        if row1 is None:
-            return -1
-        if row2 is None:
-            return 1
-        return compfunc(
-            row1,
-            row2,
-            parameters,
-        )
+    The data is sorted once per sorter, the last sorter first. Since sorting is stable, the rows
+    end up ordered by the first sorter, rows equal in it by the second sorter and so on."""
+    for entry in reversed(sorters):
+        data.sort(key=_sort_key(entry), reverse=entry.negate)
+
+
+def _sort_key(entry: SorterEntry) -> Callable[[Row], Any]:
+    key = entry.sorter.key(entry.parameters)
+    if key is None:
+        compfunc = entry.sorter.cmp
+        parameters = entry.parameters
+        key = functools.cmp_to_key(lambda r1, r2: compfunc(r1, r2, parameters))
+
+    if not entry.join_key:
+        return key
+
+    join_key = entry.join_key
+    row_key = key
+
+    # Sorter for join column, use JOIN info. Handle case where join columns are not present for
+    # all rows: Those are sorted first.
+    def join_row_key(row: Row) -> tuple[bool, Any]:
+        joined_row = row["JOIN"].get(join_key)
+        return (False, None) if joined_row is None else (True, row_key(joined_row))
 
-    def multisort(e1: Row, e2: Row) -> int:
-        for entry in sorters:
-            neg = -1 if entry.negate else 1
-
-            if entry.join_key:  # Sorter for join column, use JOIN info
-                c = neg * safe_compare(
-                    entry.sorter.cmp,
-                    e1["JOIN"].get(entry.join_key),
-                    e2["JOIN"].get(entry.join_key),
-                    entry.parameters,
-                )
-            else:
-                c = neg * entry.sorter.cmp(e1, e2, entry.parameters)
-
-            if c != 0:
-                return c
-        return 0  # equal
-
-    data.sort(key=functools.cmp_to_key(multisort))
+    return join_row_key
@@ -3,8 +3,11 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+from typing import Any
+
 from cmk.gui.num_split import cmp_num_split as _cmp_num_split
-from cmk.gui.type_defs import ColumnName, Row, SorterFunction
+from cmk.gui.num_split import num_split
+from cmk.gui.type_defs import ColumnName, Row, SorterFunction, SorterKeyFunction
 
 
 def cmp_simple_number(column: ColumnName, r1: Row, r2: Row) -> int:
@@ -48,16 +51,60 @@ def cmp_ip_address(column: ColumnName, r1: Row, r2: Row) -> int:
 
 
 def compare_ips(ip1: str, ip2: str) -> int:
-    def split_ip(ip: str) -> tuple:
-        try:
-            return tuple(int(part) for part in ip.split("."))
-        except ValueError:
-            # Make hostnames comparable with IPv4 address representations
-            return (255, 255, 255, 255, ip)
-
-    v1, v2 = split_ip(ip1), split_ip(ip2)
+    v1, v2 = key_ip(ip1), key_ip(ip2)
     return (v1 > v2) - (v1 < v2)
 
 
 def _get_custom_var(row: Row, key: str) -> str:
     return row["custom_variables"].get(key, "")
+
+
+# The key functions below order the rows like the compare functions of the same name. Sorting by
+# keys computes them once per row instead of calling the compare function for each comparison.
+
+
+def key_simple_number(column: ColumnName, row: Row) -> Any:
+    return row[column]
+
+
+def key_num_split(column: ColumnName, row: Row) -> tuple[int | str, ...]:
+    return num_split(row[column].lower())
+
+
+def key_simple_string(column: ColumnName, row: Row) -> tuple[str, str]:
+    return key_insensitive_string(row.get(column, ""))
+
+
+def key_insensitive_string(v: str) -> tuple[str, str]:
+    # The original spelling forces a strict order in case of equal spelling but different case
+    return v.lower(), v
+
+
+def key_string_list(column: ColumnName, row: Row) -> tuple[str, str]:
+    return key_insensitive_string("".join(row.get(column, [])))
+
+
+def key_ip_address(column: ColumnName, row: Row) -> tuple:
+    return key_ip(row.get(column, ""))
+
+
+def key_ip(ip: str) -> tuple:
+    try:
+        return tuple(int(part) for part in ip.split("."))
+    except ValueError:
+        # Make hostnames comparable with IPv4 address representations
+        return (255, 255, 255, 255, ip)
+
+
+_KEY_FUNCTIONS: dict[SorterFunction, SorterKeyFunction] = {
+    cmp_simple_number: key_simple_number,
+    cmp_num_split: key_num_split,
+    cmp_simple_string: key_simple_string,
+    cmp_string_list: key_string_list,
+    cmp_ip_address: key_ip_address,
+}
+
+
+def key_function(func: SorterFunction) -> SorterKeyFunction | None:
+    """The key function of one of the compare functions above, if there is one"""
+    return _KEY_FUNCTIONS.get(func)
@@ -8,9 +8,10 @@ from typing import Any
 from cmk.utils.plugin_registry import Registry
 
 from cmk.gui.painter.v0.base import painter_registry
-from cmk.gui.type_defs import ColumnName, PainterName, SorterFunction
+from cmk.gui.type_defs import ColumnName, PainterName, SorterFunction, SorterKeyFunction
 
 from .base import Sorter
+from .helpers import key_function
 
 
 class SorterRegistry(Registry[type[Sorter]]):
@@ -35,22 +36,47 @@ def register_sorter(ident: str, spec: dict[str, Any]) -> None:
             "columns": property(lambda s: s._spec["columns"]),
             "load_inv": property(lambda s: s._spec.get("load_inv", False)),
             "cmp": lambda self, r1, r2, p: spec["cmp"](r1, r2),
+            "key": lambda self, p: spec.get("key"),
         },
     )
     sorter_registry.register(cls)
 
 
-def declare_simple_sorter(name: str, title: str, column: ColumnName, func: SorterFunction) -> None:
+def declare_simple_sorter(
+    name: str,
+    title: str,
+    column: ColumnName,
+    func: SorterFunction,
+    key: SorterKeyFunction | None = None,
+) -> None:
+    """Declare a sorter of one column
+
+    The key function defaults to the one of func, in case it is one of the helper functions."""
+    key = key or key_function(func)
     register_sorter(
         name,
-        {"title": title, "columns": [column], "cmp": lambda r1, r2: func(column, r1, r2)},
+        {
+            "title": title,
+            "columns": [column],
+            "cmp": lambda r1, r2: func(column, r1, r2),
+            "key": None if key is None else lambda row: key(column, row),
+        },
     )
 
 
 def declare_1to1_sorter(
-    painter_name: PainterName, func: SorterFunction, col_num: int = 0, reverse: bool = False
+    painter_name: PainterName,
+    func: SorterFunction,
+    col_num: int = 0,
+    reverse: bool = False,
+    key: SorterKeyFunction | None = None,
 ) -> PainterName:
+    """Declare a sorter of one column of a painter
+
+    The key function defaults to the one of func, in case it is one of the helper functions. It
+    is not used for reversed sorters, they are sorted with func."""
     painter = painter_registry[painter_name]()
+    key = key or key_function(func)
 
     register_sorter(
         painter_name,
@@ -60,6 +86,9 @@ def declare_1to1_sorter(
             "cmp": (lambda r1, r2: func(painter.columns[col_num], r2, r1))
             if reverse
             else lambda r1, r2: func(painter.columns[col_num], r1, r2),
+            "key": None
+            if key is None or reverse
+            else lambda row: key(painter.columns[col_num], row),
         },
     )
     return painter_name
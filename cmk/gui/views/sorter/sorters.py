@@ -5,12 +5,13 @@
 
 import abc
 import time
-from collections.abc import Mapping, Sequence
+from collections.abc import Callable, Mapping, Sequence
 from typing import Any
 
 import cmk.gui.utils as utils
 from cmk.gui.config import active_config
 from cmk.gui.i18n import _
+from cmk.gui.num_split import num_split
 from cmk.gui.painter.v0.helpers import get_tag_groups
 from cmk.gui.painter.v1.helpers import get_perfdata_nth_value
 from cmk.gui.site_config import get_site_config
@@ -27,6 +28,8 @@ from .helpers import (
     cmp_simple_string,
     cmp_string_list,
     compare_ips,
+    key_insensitive_string,
+    key_ip,
 )
 from .registry import declare_1to1_sorter, declare_simple_sorter, SorterRegistry
 
@@ -56,7 +59,11 @@ def register_sorters(registry: SorterRegistry) -> None:
     registry.register(SorterNumProblems)
 
     declare_simple_sorter(
-        "svcdescr", _("Service description"), "service_description", cmp_service_name
+        "svcdescr",
+        _("Service description"),
+        "service_description",
+        cmp_service_name,
+        key=key_service_name,
     )
     declare_simple_sorter(
         "svcdispname",
@@ -206,9 +213,9 @@ def register_sorters(registry: SorterRegistry) -> None:
     declare_1to1_sorter("log_time", cmp_simple_number)
     declare_1to1_sorter("log_lineno", cmp_simple_number)
 
-    declare_1to1_sorter("log_what", cmp_log_what)
+    declare_1to1_sorter("log_what", cmp_log_what, key=key_log_what)
 
-    declare_1to1_sorter("log_date", cmp_date)
+    declare_1to1_sorter("log_date", cmp_date, key=key_date)
 
     # Alert statistics
     declare_simple_sorter(
@@ -271,6 +278,9 @@ class SorterSvcstate(Sorter):
             cmp_state_equiv(r1) < cmp_state_equiv(r2)
         )
 
+    def key(self, parameters: Mapping[str, Any] | None) -> Callable[[Row], Any]:
+        return cmp_state_equiv
+
 
 class SorterHoststate(Sorter):
     @property
@@ -290,6 +300,9 @@ class SorterHoststate(Sorter):
             cmp_host_state_equiv(r1) < cmp_host_state_equiv(r2)
         )
 
+    def key(self, parameters: Mapping[str, Any] | None) -> Callable[[Row], Any]:
+        return cmp_host_state_equiv
+
 
 class SorterSiteHost(Sorter):
     @property
@@ -309,6 +322,9 @@ class SorterSiteHost(Sorter):
             "host_name", r1, r2
         )
 
+    def key(self, parameters: Mapping[str, Any] | None) -> Callable[[Row], Any]:
+        return lambda row: (row["site"], num_split(row["host_name"].lower()))
+
 
 class SorterHostName(Sorter):
     @property
@@ -326,6 +342,9 @@ class SorterHostName(Sorter):
     def cmp(self, r1: Row, r2: Row, parameters: Mapping[str, Any] | None) -> int:
         return cmp_num_split("host_name", r1, r2)
 
+    def key(self, parameters: Mapping[str, Any] | None) -> Callable[[Row], Any]:
+        return lambda row: num_split(row["host_name"].lower())
+
 
 class SorterSitealias(Sorter):
     @property
@@ -345,6 +364,9 @@ class SorterSitealias(Sorter):
             get_site_config(r1["site"])["alias"] < get_site_config(r2["site"])["alias"]
         )
 
+    def key(self, parameters: Mapping[str, Any] | None) -> Callable[[Row], Any]:
+        return lambda row: get_site_config(row["site"])["alias"]
+
 
 class ABCTagSorter(Sorter, abc.ABC):
     @property
@@ -357,6 +379,9 @@ class ABCTagSorter(Sorter, abc.ABC):
         tag_groups_2 = sorted(get_tag_groups(r2, self.object_type).items())
         return (tag_groups_1 > tag_groups_2) - (tag_groups_1 < tag_groups_2)
 
+    def key(self, parameters: Mapping[str, Any] | None) -> Callable[[Row], Any]:
+        return lambda row: sorted(get_tag_groups(row, self.object_type).items())
+
 
 class SorterHost(ABCTagSorter):
     @property
@@ -405,6 +430,9 @@ class ABCLabelSorter(Sorter, abc.ABC):
         labels_2 = sorted(get_labels(r2, self.object_type).items())
         return (labels_1 > labels_2) - (labels_1 < labels_2)
 
+    def key(self, parameters: Mapping[str, Any] | None) -> Callable[[Row], Any]:
+        return lambda row: sorted(get_labels(row, self.object_type).items())
+
 
 class SorterHostLabels(ABCLabelSorter):
     @property
@@ -448,6 +476,10 @@ def cmp_service_name(column, r1, r2):
     ) or cmp_num_split(column, r1, r2)
 
 
+def key_service_name(column, row):
+    return utils.cmp_service_name_equiv(row[column]), num_split(row[column].lower())
+
+
 class PerfValSorter(Sorter):
     _num = 0
 
@@ -468,6 +500,9 @@ class PerfValSorter(Sorter):
         v2 = utils.savefloat(get_perfdata_nth_value(r2, self._num - 1, True))
         return (v1 > v2) - (v1 < v2)
 
+    def key(self, parameters: Mapping[str, Any] | None) -> Callable[[Row], Any]:
+        return lambda row: utils.savefloat(get_perfdata_nth_value(row, self._num - 1, True))
+
 
 class SorterSvcPerfVal01(PerfValSorter):
     _num = 1
@@ -544,15 +579,22 @@ class SorterCustomHostVariable(ParameterizedSorter):
     def cmp(self, r1: Row, r2: Row, parameters: Mapping[str, Any] | None) -> int:
         assert parameters is not None
         variable_name = parameters["ident"].upper()
+        return cmp_insensitive_string(
+            _get_custom_variable(r1, variable_name), _get_custom_variable(r2, variable_name)
+        )
+
+    def key(self, parameters: Mapping[str, Any] | None) -> Callable[[Row], Any]:
+        assert parameters is not None
+        variable_name = parameters["ident"].upper()
+        return lambda row: key_insensitive_string(_get_custom_variable(row, variable_name))
 
-        def _get_value(row: Row) -> str:
-            try:
-                index = row["host_custom_variable_names"].index(variable_name)
-            except ValueError:
-                return ""
-            return row["host_custom_variable_values"][index]
 
-        return cmp_insensitive_string(_get_value(r1), _get_value(r2))
+def _get_custom_variable(row: Row, variable_name: str) -> str:
+    try:
+        index = row["host_custom_variable_names"].index(variable_name)
+    except ValueError:
+        return ""
+    return row["host_custom_variable_values"][index]
 
 
 class SorterHostIpv4Address(Sorter):
@@ -569,13 +611,15 @@ class SorterHostIpv4Address(Sorter):
         return ["host_custom_variable_names", "host_custom_variable_values"]
 
     def cmp(self, r1: Row, r2: Row, parameters: Mapping[str, Any] | None) -> int:
-        def get_address(row):
-            custom_vars = dict(
-                zip(row["host_custom_variable_names"], row["host_custom_variable_values"])
-            )
-            return custom_vars.get("ADDRESS_4", "")
+        return compare_ips(_get_ipv4_address(r1), _get_ipv4_address(r2))
 
-        return compare_ips(get_address(r1), get_address(r2))
+    def key(self, parameters: Mapping[str, Any] | None) -> Callable[[Row], Any]:
+        return lambda row: key_ip(_get_ipv4_address(row))
+
+
+def _get_ipv4_address(row: Row) -> str:
+    custom_vars = dict(zip(row["host_custom_variable_names"], row["host_custom_variable_values"]))
+    return custom_vars.get("ADDRESS_4", "")
 
 
 class SorterNumProblems(Sorter):
@@ -600,11 +644,22 @@ class SorterNumProblems(Sorter):
             < r2["host_num_services"] - r2["host_num_services_ok"] - r2["host_num_services_pending"]
         )
 
+    def key(self, parameters: Mapping[str, Any] | None) -> Callable[[Row], Any]:
+        return lambda row: (
+            row["host_num_services"]
+            - row["host_num_services_ok"]
+            - row["host_num_services_pending"]
+        )
+
 
 def cmp_log_what(col, a, b):
     return (log_what(a[col]) > log_what(b[col])) - (log_what(a[col]) < log_what(b[col]))
 
 
+def key_log_what(col, row):
+    return log_what(row[col])
+
+
 def log_what(t):
     if "HOST" in t:
         return 1
@@ -626,3 +681,8 @@ def cmp_date(column, r1, r2):
     r1_date = get_day_start_timestamp(r1[column])
     r2_date = get_day_start_timestamp(r2[column])
     return (r2_date > r1_date) - (r2_date < r1_date)
+
+
+def key_date(column, row):
+    # Newest day first, see cmp_date
+    return -get_day_start_timestamp(row[column])[0]
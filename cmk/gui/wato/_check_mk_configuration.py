@@ -3120,20 +3120,25 @@ class ConfigVariableUseDNSCache(ConfigVariable):
 
 
 def transform_snmp_backend_default_to_valuespec(
-    backend: Literal["classic", "inline"]
+    backend: Literal["classic", "inline", "native"]
 ) -> SNMPBackendEnum:
     return {
         "classic": SNMPBackendEnum.CLASSIC,
         "inline": SNMPBackendEnum.INLINE,
+        "native": SNMPBackendEnum.NATIVE,
     }[backend]
 
 
-def transform_snmp_backend_from_valuespec(backend: SNMPBackendEnum) -> Literal["classic", "inline"]:
+def transform_snmp_backend_from_valuespec(
+    backend: SNMPBackendEnum,
+) -> Literal["classic", "inline", "native"]:
     match backend:
         case SNMPBackendEnum.CLASSIC:
             return "classic"
         case SNMPBackendEnum.INLINE:
             return "inline"
+        case SNMPBackendEnum.NATIVE:
+            return "native"
         case _:
             raise MKConfigError("SNMPBackendEnum %r not implemented" % backend)
 
@@ -3157,6 +3162,7 @@ class ConfigVariableChooseSNMPBackend(ConfigVariable):
                 choices=[
                     (SNMPBackendEnum.CLASSIC, _("Use Classic SNMP Backend")),
                     (SNMPBackendEnum.INLINE, _("Use Inline SNMP Backend")),
+                    (SNMPBackendEnum.NATIVE, _("Use Native SNMP Backend")),
                 ],
                 help=_(
                     "By default Checkmk uses command line calls of Net-SNMP tools like snmpget or "
@@ -5458,6 +5464,8 @@ def transform_snmp_backend_hosts_to_valuespec(backend):
         # We dropped pysnmp during the 2.1 beta because it is currently slow
         # and unreliable.
         return SNMPBackendEnum.CLASSIC
+    if backend == "native":
+        return SNMPBackendEnum.NATIVE
     raise MKConfigError("SNMPBackendEnum %r not implemented" % backend)
 
 
@@ -5468,6 +5476,7 @@ def _valuespec_snmp_backend():
             choices=[
                 (SNMPBackendEnum.INLINE, _("Use Inline SNMP Backend")),
                 (SNMPBackendEnum.CLASSIC, _("Use Classic Backend")),
+                (SNMPBackendEnum.NATIVE, _("Use Native SNMP Backend")),
             ],
         ),
         to_valuespec=transform_snmp_backend_hosts_to_valuespec,
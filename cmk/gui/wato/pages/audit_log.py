@@ -45,7 +45,12 @@ from cmk.gui.valuespec import (
     TextInput,
 )
 from cmk.gui.wato.pages.activate_changes import render_object_ref
-from cmk.gui.watolib.audit_log import AuditLogFilterRaw, AuditLogStore, build_audit_log_filter
+from cmk.gui.watolib.audit_log import (
+    AuditLogFilter,
+    AuditLogFilterRaw,
+    AuditLogStore,
+    build_audit_log_filter,
+)
 from cmk.gui.watolib.hosts_and_folders import folder_preserving_link
 from cmk.gui.watolib.mode import ModeRegistry, redirect, WatoMode
 from cmk.gui.watolib.objref import ObjectRefType
@@ -318,16 +323,13 @@ class ModeAuditLog(WatoMode):
         )
 
     def _show_audit_log(self) -> None:
-        audit = self._parse_audit_log()
-
-        if not audit:
-            html.show_message(_("Found no matching entry."))
+        store, entries_filter = self._audit_log_store_and_filter()
 
-        elif self._options["display"] == "daily":
-            self._display_daily_audit_log(audit)
+        if self._options["display"] == "daily":
+            self._display_daily_audit_log(store, entries_filter)
 
         else:
-            self._display_multiple_days_audit_log(audit)
+            self._display_multiple_days_audit_log(store, entries_filter)
 
     def _get_audit_log_options_from_request(self):
         options = {}
@@ -343,8 +345,12 @@ class ModeAuditLog(WatoMode):
                 user_errors.add(e)
         return options
 
-    def _display_daily_audit_log(self, log):
-        log, times = self._get_next_daily_paged_log(log)
+    def _display_daily_audit_log(self, store, entries_filter):
+        log, times = self._get_next_daily_paged_log(store, entries_filter)
+
+        if not log:
+            html.show_message(_("Found no matching entry."))
+            return
 
         self._display_page_controls(*times)
 
@@ -355,8 +361,12 @@ class ModeAuditLog(WatoMode):
 
         self._display_page_controls(*times)
 
-    def _display_multiple_days_audit_log(self, log):
-        log = self._get_multiple_days_log_entries(log)
+    def _display_multiple_days_audit_log(self, store, entries_filter):
+        log = self._get_multiple_days_log_entries(store, entries_filter)
+
+        if not log:
+            html.show_message(_("Found no matching entry."))
+            return
 
         if display_options.enabled(display_options.T):
             html.h3(
@@ -402,15 +412,15 @@ class ModeAuditLog(WatoMode):
                     )
                     table.cell(_("Details"), diff_text)
 
-    def _get_next_daily_paged_log(self, log):
-        start = self._get_start_date()
-
-        while True:
-            log_today, times = self._paged_log_from(log, start)
-            if len(log) == 0 or len(log_today) > 0:
-                return log_today, times
-            # No entries today, but log not empty -> go back in time
-            start -= 24 * 3600
+    def _get_next_daily_paged_log(self, store, entries_filter):
+        start_time, end_time = self._get_timerange(self._get_start_date())
+        # No entries on the start day -> go back in time to the latest day with entries
+        latest = next(
+            store.iter_filtered_entries(entries_filter, end=end_time + 1, reverse=True), None
+        )
+        if latest is None:
+            return [], (start_time, end_time, None, None)
+        return self._paged_log_from(store, entries_filter, latest.time)
 
     def _get_start_date(self):
         if self._options["start"] == "now":
@@ -420,52 +430,27 @@ class ModeAuditLog(WatoMode):
             )
         return int(self._options["start"][1])
 
-    def _get_multiple_days_log_entries(self, log):
-        start_time = self._get_start_date() + 86399
-        end_time = start_time - ((self._options["display"][1] * 86400) + 86399)
-
-        logs = []
-
-        for entry in log:
-            if entry[0] <= start_time and entry[0] >= end_time:
-                logs.append(entry)
-
-        return logs
+    def _get_multiple_days_log_entries(self, store, entries_filter):
+        end_time = self._get_start_date() + 86400
+        start_time = end_time - (self._options["display"][1] + 1) * 86400
+        return list(store.iter_filtered_entries(entries_filter, start_time, end_time, reverse=True))
 
-    def _paged_log_from(self, log, start):
+    def _paged_log_from(self, store, entries_filter, start):
         start_time, end_time = self._get_timerange(start)
-        previous_log_time = None
-        next_log_time = None
-        first_log_index = None
-        last_log_index = None
-        for index, entry in enumerate(log):
-            if entry.time >= end_time:
-                # This log is too new
-                continue
-            if first_log_index is None and start_time <= entry.time < end_time:
-                # This is a log for this day. Save the first index
-                if first_log_index is None:
-                    first_log_index = index
-
-                    # When possible save the timestamp of the previous log
-                    if index > 0:
-                        next_log_time = int(log[index - 1][0])
-
-            elif entry.time < start_time and last_log_index is None:
-                last_log_index = index
-                # This is the next log after this day
-                previous_log_time = int(entry[0])
-                # Finished!
-                break
-
-        if last_log_index is None:
-            last_log_index = len(log)
-
-        return log[first_log_index:last_log_index], (
+        log = list(
+            store.iter_filtered_entries(entries_filter, start_time, end_time + 1, reverse=True)
+        )
+        # The latest log before and the first log after this day
+        previous_entry = next(
+            store.iter_filtered_entries(entries_filter, end=start_time, reverse=True), None
+        )
+        next_entry = next(store.iter_filtered_entries(entries_filter, start=end_time + 1), None)
+
+        return log, (
             start_time,
             end_time,
-            previous_log_time,
-            next_log_time,
+            None if previous_entry is None else int(previous_entry.time),
+            None if next_entry is None else int(next_entry.time),
         )
 
     def _display_page_controls(self, start_time, end_time, previous_log_time, next_log_time):
@@ -693,6 +678,10 @@ class ModeAuditLog(WatoMode):
         return FinalizeRequest(code=200)
 
     def _parse_audit_log(self) -> list[AuditLogStore.Entry]:
+        store, entries_filter = self._audit_log_store_and_filter()
+        return list(reversed(store.read(entries_filter)))
+
+    def _audit_log_store_and_filter(self) -> tuple[AuditLogStore, AuditLogFilter]:
         vs_file_selection = self._vs_file_selection()
         file_selection = vs_file_selection.from_html_vars("file_selection")
         vs_file_selection.validate_value(file_selection, "file_selection")
@@ -704,7 +693,6 @@ class ModeAuditLog(WatoMode):
             "filter_regex": self._options.get("filter_regex"),
         }
 
-        entries_filter = build_audit_log_filter(options)
-        return list(
-            reversed(AuditLogStore(wato_var_dir() / "log" / file_selection).read(entries_filter))
+        return AuditLogStore(wato_var_dir() / "log" / file_selection), build_audit_log_filter(
+            options
         )
@@ -19,13 +19,14 @@ import ast
 import enum
 import errno
 import hashlib
-import io
 import logging
 import multiprocessing
 import os
 import re
 import shutil
+import struct
 import subprocess
+import threading
 import time
 import traceback
 from collections.abc import Callable, Iterable, Iterator, Mapping, MutableMapping, Sequence
@@ -34,6 +35,7 @@ from datetime import datetime
 from itertools import filterfalse
 from multiprocessing.pool import AsyncResult, ThreadPool
 from pathlib import Path
+from stat import S_ISLNK
 from typing import Any, Literal, NamedTuple
 
 from setproctitle import setthreadtitle
@@ -646,11 +648,12 @@ def _set_sync_state(
 
 def _get_config_sync_state(
     site_id: SiteId, replication_paths: Sequence[ReplicationPath]
-) -> tuple[ConfigSyncFileInfos, int]:
+) -> tuple[ConfigSyncFileInfos, int, bool]:
     """Get the config file states from the remote sites
 
     Calls the automation call "get-config-sync-state" on the remote site,
-    which is handled by AutomationGetConfigSyncState."""
+    which is handled by AutomationGetConfigSyncState. Remote sites of former
+    versions do not tell whether they accept compressed sync archives."""
     site = get_site_config(site_id)
     response = cmk.gui.watolib.automations.do_remote_automation(
         site,
@@ -659,45 +662,87 @@ def _get_config_sync_state(
     )
 
     assert isinstance(response, tuple)
-    return {k: ConfigSyncFileInfo(*v) for k, v in response[0].items()}, response[1]
+    return (
+        {k: ConfigSyncFileInfo(*v) for k, v in response[0].items()},
+        response[1],
+        response[2] if len(response) > 2 else False,
+    )
 
 
 def _synchronize_files(
     site_id: SiteId,
     files_to_sync: list[str],
     files_to_delete: list[str],
-    remote_config_generation: int,
+    sync_state: SyncState,
     site_config_dir: Path,
+    sync_archives: SyncArchiveCache,
 ) -> None:
-    """Pack the files in a simple tar archive and send it to the remote site
+    """Pack the files in a tar archive and send it to the remote site
 
-    We build a simple tar archive containing all files to be synchronized.  The list of file to
-    be deleted and the current config generation is handed over using dedicated HTTP parameters.
+    We build a tar archive containing all files to be synchronized, compressed in case the remote
+    site accepts it. The archive is taken from the sync archive cache of the activation, so sites
+    needing the same files share it, and it is streamed from disk to the remote site. The list of
+    files to be deleted and the current config generation is handed over using dedicated HTTP
+    parameters.
     """
+    compressed = sync_state.remote_accepts_compressed_sync_archive
+    sync_archive_path = sync_archives.get(
+        files_to_sync, sync_state.central_file_infos, site_config_dir, compressed=compressed
+    )
 
-    sync_archive = _get_sync_archive(files_to_sync, site_config_dir)
+    vars_ = [
+        ("site_id", site_id),
+        ("to_delete", repr(files_to_delete)),
+        ("config_generation", "%d" % sync_state.remote_config_generation),
+    ]
+    if compressed:
+        vars_.append(("sync_archive_compression", "gzip"))
 
     site = get_site_config(site_id)
-    response = cmk.gui.watolib.automations.do_remote_automation(
-        site,
-        "receive-config-sync",
-        [
-            ("site_id", site_id),
-            ("to_delete", repr(files_to_delete)),
-            ("config_generation", "%d" % remote_config_generation),
-        ],
-        files={"sync_archive": io.BytesIO(sync_archive)},
-    )
+    transfer_start = time.time()
+    with sync_archive_path.open("rb") as sync_archive:
+        response = cmk.gui.watolib.automations.do_remote_automation(
+            site,
+            "receive-config-sync",
+            vars_,
+            files={"sync_archive": sync_archive},
+        )
 
     if response is not True:
         raise MKGeneralException(_("Failed to synchronize with site: %s") % response)
 
+    _update_sync_transfer_stats(
+        site_id, sync_archive_path.stat().st_size, time.time() - transfer_start
+    )
+
+
+def _update_sync_transfer_stats(site_id: SiteId, size: int, duration: float) -> None:
+    """Remember the size and duration of the last transfer and the average throughput
+
+    The duration includes the processing of the archive on the remote site."""
+    logger.getChild(f"site[{site_id}]").debug(
+        "Transferred sync archive of %s in %.2f s", render.fmt_bytes(size), duration
+    )
+    repl_status = _load_site_replication_status(site_id, lock=True)
+    try:
+        stats = repl_status.setdefault("sync_transfer", {})
+        stats["last_size"] = size
+        stats["last_duration"] = duration
+        throughput = size / duration if duration > 0 else 0.0
+        if "throughput" not in stats:
+            stats["throughput"] = throughput
+        else:
+            stats["throughput"] = 0.8 * stats["throughput"] + 0.2 * throughput
+    finally:
+        _save_site_replication_status(site_id, repl_status)
+
 
 @dataclass(frozen=True)
 class SyncState:
     central_file_infos: ConfigSyncFileInfos
     remote_file_infos: ConfigSyncFileInfos
     remote_config_generation: int
+    remote_accepts_compressed_sync_archive: bool = False
 
 
 def fetch_sync_state(
@@ -715,9 +760,11 @@ def fetch_sync_state(
         _set_sync_state(site_activation_state, _("Fetching sync state"))
         site_logger.debug(site_activation_state, "Starting config sync")
 
-        remote_file_infos, remote_config_generation = _get_config_sync_state(
-            site_id, replication_paths
-        )
+        (
+            remote_file_infos,
+            remote_config_generation,
+            remote_accepts_compressed_sync_archive,
+        ) = _get_config_sync_state(site_id, replication_paths)
         site_logger.debug("Received %d file infos from remote", len(remote_file_infos))
 
         return (
@@ -725,6 +772,7 @@ def fetch_sync_state(
                 central_file_infos=central_file_infos,
                 remote_file_infos=remote_file_infos,
                 remote_config_generation=remote_config_generation,
+                remote_accepts_compressed_sync_archive=remote_accepts_compressed_sync_archive,
             ),
             site_activation_state,
             sync_start,
@@ -763,10 +811,11 @@ def calc_sync_delta(
 
 def synchronize_files(
     sync_delta: SyncDelta,
-    remote_config_generation: int,
+    sync_state: SyncState,
     site_config_dir: Path,
     site_activation_state: SiteActivationState,
     sync_start: float,
+    sync_archives: SyncArchiveCache,
 ) -> SiteActivationState | None:
     site_id = site_activation_state["_site_id"]
     site_logger = logger.getChild(f"site[{site_id}]")
@@ -793,8 +842,9 @@ def synchronize_files(
             site_id,
             sync_delta.to_sync_new + sync_delta.to_sync_changed,
             sync_delta.to_delete,
-            remote_config_generation,
+            sync_state,
             site_config_dir,
+            sync_archives,
         )
         site_logger.debug("Finished config sync")
         return site_activation_state
@@ -2057,6 +2107,7 @@ class ReplicationPathType(enum.StrEnum):
 
 def _get_config_sync_file_infos_per_inode(
     replication_paths: Sequence[ReplicationPath],
+    file_hashes: ConfigSyncFileHashes | None = None,
 ) -> Mapping[int, ConfigSyncFileInfo]:
     inode_sync_states = {}
 
@@ -2068,11 +2119,11 @@ def _get_config_sync_file_infos_per_inode(
 
         if replication_path.ty == ReplicationPathType.FILE:
             inode_sync_states[os.stat(replication_path_full).st_ino] = _get_config_sync_file_info(
-                replication_path_full
+                replication_path_full, file_hashes
             )
         elif replication_path.ty == ReplicationPathType.DIR:
             _get_replication_dir_config_sync_file_infos_per_inode(
-                inode_sync_states, replication_path_full, replication_path.excludes
+                inode_sync_states, replication_path_full, replication_path.excludes, file_hashes
             )
         else:
             raise NotImplementedError()
@@ -2084,6 +2135,7 @@ def _get_replication_dir_config_sync_file_infos_per_inode(
     inode_sync_states: MutableMapping[int, ConfigSyncFileInfo],
     replication_path: str,
     replication_path_excludes: Sequence[str],
+    file_hashes: ConfigSyncFileHashes | None = None,
 ) -> None:
     # Use os functionality instead of pathlib since it is faster
     for root, dir_names, file_names in os.walk(replication_path):
@@ -2098,12 +2150,16 @@ def _get_replication_dir_config_sync_file_infos_per_inode(
                 and os.path.islink(dir_path)
                 and not dir_name == GENERAL_DIR_EXCLUDE
             ):
-                inode_sync_states[os.stat(dir_path).st_ino] = _get_config_sync_file_info(dir_path)
+                inode_sync_states[os.stat(dir_path).st_ino] = _get_config_sync_file_info(
+                    dir_path, file_hashes
+                )
 
         for file_name in file_names:
             file_path = os.path.join(root, file_name)
             if os.path.exists(file_path):
-                inode_sync_states[os.stat(file_path).st_ino] = _get_config_sync_file_info(file_path)
+                inode_sync_states[os.stat(file_path).st_ino] = _get_config_sync_file_info(
+                    file_path, file_hashes
+                )
 
 
 def _prepare_for_activation_tasks(
@@ -2113,8 +2169,9 @@ def _prepare_for_activation_tasks(
     time_started: float,
     source: ActivationSource,
 ) -> tuple[Mapping[SiteId, ConfigSyncFileInfos], Mapping[SiteId, SiteActivationState]]:
+    file_hashes = ConfigSyncFileHashes.load()
     config_sync_file_infos_per_inode = _get_config_sync_file_infos_per_inode(
-        get_replication_paths()
+        get_replication_paths(), file_hashes
     )
     central_file_infos_per_site = {}
     site_activation_states_per_site = {}
@@ -2132,13 +2189,14 @@ def _prepare_for_activation_tasks(
 
             if activate_changes.is_sync_needed(site_id):
                 central_file_infos_per_site[site_id] = _get_site_central_file_infos(
-                    site_id, snapshot_settings, config_sync_file_infos_per_inode
+                    site_id, snapshot_settings, config_sync_file_infos_per_inode, file_hashes
                 )
         except Exception as e:
             _handle_activation_changes_exception(
                 logger.getChild(f"site[{site_id}]"), str(e), site_activation_state
             )
             _cleanup_activation(site_id, activation_id, source)
+    file_hashes.save()
     return central_file_infos_per_site, site_activation_states_per_site
 
 
@@ -2146,6 +2204,7 @@ def _get_site_central_file_infos(
     site_id: SiteId,
     snapshot_settings: SnapshotSettings,
     config_sync_file_infos_per_inode: Mapping[int, ConfigSyncFileInfo],
+    file_hashes: ConfigSyncFileHashes | None = None,
 ) -> ConfigSyncFileInfos:
     # In case we experience performance issues here, we could postpone the hashing of the
     # central files to only be done ad-hoc in get_file_names_to_sync when the other attributes
@@ -2156,6 +2215,7 @@ def _get_site_central_file_infos(
         snapshot_settings.snapshot_components,
         site_config_dir,
         config_sync_file_infos_per_inode,
+        file_hashes,
     )
 
     logger.getChild(f"site[{site_id}]").debug(
@@ -2200,6 +2260,7 @@ def sync_and_activate(
     5. Raise when something failed on the remote site while applying the sent files
     """
     site_activation_states: Mapping[SiteId, SiteActivationState] = {}
+    sync_archives: SyncArchiveCache | None = None
     try:
         time_started = time.time()
 
@@ -2223,6 +2284,9 @@ def sync_and_activate(
         )
 
         task_pool = ThreadPool(processes=len(site_snapshot_settings))
+        sync_archives = SyncArchiveCache(
+            cmk.utils.paths.site_config_dir / activation_id / ".sync_archives"
+        )
 
         active_tasks = ActiveTasks(
             fetch_sync_state={},
@@ -2251,7 +2315,7 @@ def sync_and_activate(
                 )
                 active_tasks["activate_remote_changes"][site_id] = async_result
 
-        remote_config_generation_per_site: MutableMapping[SiteId, int] = {}
+        sync_state_per_site: MutableMapping[SiteId, SyncState] = {}
         # we want to mostly parallelize the activation steps, but if one site takes longer,
         # it should not hold up the other sites
         # -> monitor active tasks to handle results as soon as one finishes and start a task for
@@ -2268,14 +2332,17 @@ def sync_and_activate(
                 activate_changes,
                 file_filter_func,
                 prevent_activate,
-                remote_config_generation_per_site,
+                sync_state_per_site,
                 site_snapshot_settings,
                 task_pool,
+                sync_archives,
             )
 
     except Exception:
         logger.exception("error activating changes")
     finally:
+        if sync_archives is not None:
+            sync_archives.clear()
         for activation_site_id in site_activation_states:
             _cleanup_activation(activation_site_id, activation_id, source)
 
@@ -2296,9 +2363,10 @@ def _handle_active_tasks(
     activate_changes: ActivateChanges,
     file_filter_func: FileFilterFunc,
     prevent_activate: bool,
-    remote_config_generation_per_site: MutableMapping[SiteId, int],
+    sync_state_per_site: MutableMapping[SiteId, SyncState],
     site_snapshot_settings: Mapping[SiteId, SnapshotSettings],
     task_pool: ThreadPool,
+    sync_archives: SyncArchiveCache,
 ) -> None:
     for site_id, async_result in list(active_tasks["fetch_sync_state"].items()):
         if not async_result.ready():
@@ -2309,7 +2377,7 @@ def _handle_active_tasks(
             return  # exception handling happens in thread
 
         sync_state, activation_state, sync_start_time = fetch_sync_state_results
-        remote_config_generation_per_site[site_id] = sync_state.remote_config_generation
+        sync_state_per_site[site_id] = sync_state
 
         active_tasks["calc_sync_delta"][site_id] = task_pool.apply_async(
             func=copy_request_context(calc_sync_delta),
@@ -2330,10 +2398,11 @@ def _handle_active_tasks(
             func=copy_request_context(synchronize_files),
             args=(
                 sync_delta,
-                remote_config_generation_per_site[site_id],
+                sync_state_per_site[site_id],
                 Path(site_snapshot_settings[site_id].work_dir),
                 activation_state,
                 sync_start_time,
+                sync_archives,
             ),
             error_callback=_error_callback,
         )
@@ -2804,8 +2873,56 @@ def _filter_remote_files(remote_files: set[str]) -> set[str]:
     return remote_files_to_keep
 
 
-def _get_sync_archive(to_sync: list[str], base_dir: Path) -> bytes:
-    # Use native tar instead of python tarfile for performance reasons
+class SyncArchiveCache:
+    """The sync archives of an activation, addressed by the content of the archived files
+
+    The archives are identified by the file infos of all files to be synchronized, which include
+    the file hashes, so each distinct archive is only created once per activation. Sites only share
+    an archive when all of their files to be synchronized are the same. Site specific files (e.g.
+    sitespecific.mk) differ between the sites, so sites needing them get archives of their own.
+    """
+
+    def __init__(self, base_dir: Path) -> None:
+        self._base_dir = base_dir
+        self._lock = threading.Lock()
+        self._archive_locks: dict[str, threading.Lock] = {}
+
+    def get(
+        self,
+        to_sync: Sequence[str],
+        file_infos: ConfigSyncFileInfos,
+        site_config_dir: Path,
+        *,
+        compressed: bool,
+    ) -> Path:
+        to_sync = sorted(to_sync)
+        archived_infos = [(f, file_infos.get(f)) for f in to_sync]
+        # Without the file infos, the archive can not be shared with other sites
+        origin = str(site_config_dir) if any(i is None for _f, i in archived_infos) else None
+        key = hashlib.sha256(repr((compressed, origin, archived_infos)).encode()).hexdigest()
+        path = self._base_dir / (f"{key}.tar.gz" if compressed else f"{key}.tar")
+
+        with self._lock:
+            archive_lock = self._archive_locks.setdefault(key, threading.Lock())
+        with archive_lock:
+            if path.exists():
+                logger.debug("Using cached sync archive %s", path.name)
+                return path
+            store.makedirs(self._base_dir)
+            tmp_path = path.with_name(f".{path.name}.new")
+            _create_sync_archive(to_sync, site_config_dir, tmp_path, compressed=compressed)
+            tmp_path.rename(path)
+        return path
+
+    def clear(self) -> None:
+        shutil.rmtree(self._base_dir, ignore_errors=True)
+
+
+def _create_sync_archive(
+    to_sync: Sequence[str], base_dir: Path, archive_path: Path, *, compressed: bool
+) -> None:
+    # Use native tar instead of python tarfile for performance reasons. It writes the archive to
+    # disk, so the archive does not need to be kept in memory.
     completed_process = subprocess.run(
         [
             "tar",
@@ -2813,7 +2930,8 @@ def _get_sync_archive(to_sync: list[str], base_dir: Path) -> bytes:
             "-C",
             str(base_dir),
             "-f",
-            "-",
+            str(archive_path),
+            *(["-z"] if compressed else []),
             "--null",
             "-T",
             "-",
@@ -2826,19 +2944,14 @@ def _get_sync_archive(to_sync: list[str], base_dir: Path) -> bytes:
         check=False,
     )
 
-    # Since we don't stream the archive to the remote site (we could probably do this) it should be
-    # no problem to buffer it in memory for the moment
-
     if completed_process.returncode:
         raise MKGeneralException(
             _("Failed to create sync archive [%d]: %s")
             % (completed_process.returncode, completed_process.stderr.decode())
         )
 
-    return completed_process.stdout
-
 
-def _unpack_sync_archive(sync_archive: bytes, base_dir: Path) -> None:
+def _unpack_sync_archive(sync_archive: bytes, base_dir: Path, *, compressed: bool) -> None:
     completed_process = subprocess.run(
         [
             "tar",
@@ -2847,6 +2960,7 @@ def _unpack_sync_archive(sync_archive: bytes, base_dir: Path) -> None:
             str(base_dir),
             "-f",
             "-",
+            *(["-z"] if compressed else []),
             "-U",
             "--recursive-unlink",
             "--preserve-permissions",
@@ -2878,7 +2992,7 @@ class ConfigSyncFileInfo(NamedTuple):
 #    ("file_infos", dict[str, ConfigSyncFileInfo]),
 #    ("config_generation", int),
 # ])
-GetConfigSyncStateResponse = tuple[dict[str, tuple[int, int, str | None, str | None]], int]
+GetConfigSyncStateResponse = tuple[dict[str, tuple[int, int, str | None, str | None]], int, bool]
 
 ConfigSyncFileInfos = dict[str, ConfigSyncFileInfo]
 
@@ -2896,7 +3010,8 @@ class AutomationGetConfigSyncState(AutomationCommand):
     The central site hands over the list of replication paths it will try to synchronize later.  The
     remote site computes the list of replication files and sends it back together with the current
     configuration generation ID. The config generation ID is increased on every Setup modification
-    and ensures that nothing is changed between the two config sync steps.
+    and ensures that nothing is changed between the two config sync steps. The last element of the
+    response tells the central site that gzip compressed sync archives are accepted.
     """
 
     def command_name(self):
@@ -2910,11 +3025,15 @@ class AutomationGetConfigSyncState(AutomationCommand):
 
     def execute(self, api_request: list[ReplicationPath]) -> GetConfigSyncStateResponse:
         with store.lock_checkmk_configuration():
-            file_infos = _get_config_sync_file_infos(api_request, base_dir=cmk.utils.paths.omd_root)
+            file_hashes = ConfigSyncFileHashes.load()
+            file_infos = _get_config_sync_file_infos(
+                api_request, base_dir=cmk.utils.paths.omd_root, file_hashes=file_hashes
+            )
+            file_hashes.save()
             transport_file_infos = {
                 k: (v.st_mode, v.st_size, v.link_target, v.file_hash) for k, v in file_infos.items()
             }
-            return (transport_file_infos, _get_current_config_generation())
+            return (transport_file_infos, _get_current_config_generation(), True)
 
 
 def _get_config_sync_paths(
@@ -2950,13 +3069,15 @@ def _get_config_sync_file_infos(
     replication_paths: list[ReplicationPath],
     base_dir: Path,
     config_sync_file_infos_per_inode: Mapping[int, ConfigSyncFileInfo] | None = None,
+    file_hashes: ConfigSyncFileHashes | None = None,
 ) -> ConfigSyncFileInfos:
     """Scans the given replication paths for the information needed for the config sync
 
     It produces a dictionary of sync file infos. One entry is created for each file.  Directories
     are not added to the dictionary unless it is a symlink.
     Since files to be synced for different site are copied as hardlink, the sync file infos can be
-    precomputed and the relevant info then identified via the files inode
+    precomputed and the relevant info then identified via the files inode. The file hashes are
+    taken from the given ConfigSyncFileHashes as far as possible.
     """
     if config_sync_file_infos_per_inode is None:
         config_sync_file_infos_per_inode = {}
@@ -2969,7 +3090,9 @@ def _get_config_sync_file_infos(
             continue  # Only report back existing things
 
         if replication_path.ty == ReplicationPathType.FILE:
-            infos[replication_path.site_path] = _get_config_sync_file_info(replication_path_full)
+            infos[replication_path.site_path] = _get_config_sync_file_info(
+                replication_path_full, file_hashes
+            )
 
         elif replication_path.ty == ReplicationPathType.DIR:
             _get_replication_dir_config_sync_file_infos(
@@ -2978,6 +3101,7 @@ def _get_config_sync_file_infos(
                 base_dir,
                 replication_path_full,
                 replication_path.excludes,
+                file_hashes,
             )
         else:
             raise NotImplementedError()
@@ -2990,6 +3114,7 @@ def _get_replication_dir_config_sync_file_infos(
     base_dir: Path,
     replication_path: str,
     replication_path_excludes: Sequence[str],
+    file_hashes: ConfigSyncFileHashes | None = None,
 ) -> None:
     # Use os functionality instead of pathlib since it is faster
     for root, dir_names, file_names in os.walk(replication_path):
@@ -3001,31 +3126,49 @@ def _get_replication_dir_config_sync_file_infos(
         config_sync_paths = _get_config_sync_paths(
             root, dir_names, file_names, GENERAL_DIR_EXCLUDE, replication_path_excludes
         )
+        # Computing the relative path once per directory is considerably faster than per file
+        site_root = os.path.relpath(root, base_dir)
         for config_sync_path in config_sync_paths:
-            valid_site_path = os.path.relpath(config_sync_path, base_dir)
+            valid_site_path = os.path.normpath(
+                os.path.join(site_root, os.path.basename(config_sync_path))
+            )
             try:
                 if sync_file_info := config_sync_file_infos_per_inode.get(
                     os.stat(config_sync_path).st_ino, None
                 ):
                     infos[valid_site_path] = sync_file_info
                 else:
-                    infos[valid_site_path] = _get_config_sync_file_info(config_sync_path)
+                    infos[valid_site_path] = _get_config_sync_file_info(
+                        config_sync_path, file_hashes
+                    )
             except FileNotFoundError:  # e.g. broken symlinks
-                infos[valid_site_path] = _get_config_sync_file_info(config_sync_path)
+                infos[valid_site_path] = _get_config_sync_file_info(config_sync_path, file_hashes)
 
 
-def _get_config_sync_file_info(file_path: str) -> ConfigSyncFileInfo:
+def _get_config_sync_file_info(
+    file_path: str, file_hashes: ConfigSyncFileHashes | None = None
+) -> ConfigSyncFileInfo:
     stat = os.lstat(file_path)
-    is_symlink = os.path.islink(file_path)
+    is_symlink = S_ISLNK(stat.st_mode)
+    if is_symlink:
+        file_hash = None
+    elif file_hashes is None:
+        file_hash = _create_config_sync_file_hash(file_path)
+    else:
+        file_hash = file_hashes.file_hash(file_path, stat)
     return ConfigSyncFileInfo(
         stat.st_mode,
         stat.st_size,
         os.readlink(str(file_path)) if is_symlink else None,
-        _create_config_sync_file_hash(file_path) if not is_symlink else None,
+        file_hash,
     )
 
 
 def _create_config_sync_file_hash(file_path: str) -> str:
+    return _create_config_sync_file_digest(file_path).hex()
+
+
+def _create_config_sync_file_digest(file_path: str) -> bytes:
     sha256 = hashlib.sha256()
     with open(file_path, "rb") as f:
         while True:
@@ -3033,7 +3176,76 @@ def _create_config_sync_file_hash(file_path: str) -> str:
             if not chunk:
                 break
             sha256.update(chunk)
-    return sha256.hexdigest()
+    return sha256.digest()
+
+
+class ConfigSyncFileHashes:
+    """Persistent cache of the file hashes needed for the config sync
+
+    Hashing all replicated files dominates the computation of the sync state on the central site
+    and on the remote sites. The hashes are cached keyed by the inode, the modification and
+    status change times and the size of the files, so only new or modified files are hashed again.
+    The status change time cannot be set back, so it also reveals rewrites which keep the size
+    and restore the modification time. Saving keeps only the hashes of the files seen since
+    loading.
+
+    Files modified within the last seconds are not cached: A modification within the
+    granularity of the file system timestamps would otherwise go unnoticed.
+    """
+
+    _RECORD = struct.Struct("=QqqQ32s")
+    _RACY_NS = 2 * 10**9
+
+    def __init__(self, path: Path, stored: Mapping[tuple[int, int, int, int], bytes]) -> None:
+        self._path = path
+        self._stored = stored
+        self._hashes: dict[tuple[int, int, int, int], bytes] = {}
+        self._racy_after_ns = time.time_ns() - self._RACY_NS
+
+    @classmethod
+    def load(cls, path: Path | None = None) -> ConfigSyncFileHashes:
+        path = _config_sync_file_hashes_path() if path is None else path
+        try:
+            content = path.read_bytes()
+        except FileNotFoundError:
+            content = b""
+        if len(content) % cls._RECORD.size:
+            logger.warning("Ignoring broken config sync file hashes in %s", path)
+            content = b""
+        return cls(
+            path,
+            {
+                (inode, mtime_ns, ctime_ns, size): digest
+                for inode, mtime_ns, ctime_ns, size, digest in cls._RECORD.iter_unpack(content)
+            },
+        )
+
+    def file_hash(self, file_path: str, stat: os.stat_result) -> str:
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_ctime_ns, stat.st_size)
+        if (digest := self._hashes.get(key)) is not None:
+            return digest.hex()
+        if (digest := self._stored.get(key)) is None:
+            digest = _create_config_sync_file_digest(file_path)
+        if stat.st_mtime_ns < self._racy_after_ns:
+            self._hashes[key] = digest
+        return digest.hex()
+
+    def save(self) -> None:
+        if self._hashes == self._stored:
+            return
+        store.makedirs(self._path.parent)
+        store.save_bytes_to_file(
+            self._path,
+            b"".join(
+                self._RECORD.pack(inode, mtime_ns, ctime_ns, size, digest)
+                for (inode, mtime_ns, ctime_ns, size), digest in self._hashes.items()
+            ),
+        )
+        self._stored = dict(self._hashes)
+
+
+def _config_sync_file_hashes_path() -> Path:
+    return wato_var_dir() / "config_sync_file_hashes"
 
 
 def update_config_generation() -> None:
@@ -3061,6 +3273,7 @@ class ReceiveConfigSyncRequest(NamedTuple):
     sync_archive: bytes
     to_delete: list[str]
     config_generation: int
+    compressed: bool = False
 
 
 class AutomationReceiveConfigSync(AutomationCommand):
@@ -3083,6 +3296,7 @@ class AutomationReceiveConfigSync(AutomationCommand):
             _request.uploaded_file("sync_archive")[2],
             ast.literal_eval(_request.get_str_input_mandatory("to_delete")),
             _request.get_integer_input_mandatory("config_generation"),
+            _request.get_ascii_input("sync_archive_compression") == "gzip",
         )
 
     def execute(self, api_request: ReceiveConfigSyncRequest) -> bool:
@@ -3097,7 +3311,9 @@ class AutomationReceiveConfigSync(AutomationCommand):
                 )
 
             logger.debug("Updating configuration from sync snapshot")
-            self._update_config_on_remote_site(api_request.sync_archive, api_request.to_delete)
+            self._update_config_on_remote_site(
+                api_request.sync_archive, api_request.to_delete, api_request.compressed
+            )
 
             logger.debug("Executing post sync actions")
             _execute_post_config_sync_actions(api_request.site_id)
@@ -3105,7 +3321,9 @@ class AutomationReceiveConfigSync(AutomationCommand):
             logger.debug("Done")
             return True
 
-    def _update_config_on_remote_site(self, sync_archive: bytes, to_delete: list[str]) -> None:
+    def _update_config_on_remote_site(
+        self, sync_archive: bytes, to_delete: list[str], compressed: bool
+    ) -> None:
         """Use the given tar archive and list of files to be deleted to update the local files"""
         base_dir = cmk.utils.paths.omd_root
 
@@ -3131,7 +3349,7 @@ class AutomationReceiveConfigSync(AutomationCommand):
                     # errno.ENOTDIR - dir with files was replaced by e.g. symlink
                     pass
 
-            _unpack_sync_archive(sync_archive, base_dir)
+            _unpack_sync_archive(sync_archive, base_dir, compressed=compressed)
         finally:
             if keep_local_users:
                 _reintegrate_site_local_users(current_users, active_connectors)
@@ -3,13 +3,19 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+from __future__ import annotations
+
 import abc
 import ast
+import json
 import os
+import struct
+import zlib
+from bisect import bisect_left
 from collections.abc import Iterator, Sequence
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Generic, TypeVar
+from typing import BinaryIO, Generic, TypeVar
 
 import cmk.utils.store as store
 from cmk.utils.exceptions import MKGeneralException
@@ -23,9 +29,15 @@ _VT = TypeVar("_VT")
 class ABCAppendStore(Generic[_VT], abc.ABC):
     """Managing a file with structured data that can be appended in a cheap way
 
-    The file holds basic python structures separated by "\\0".
+    The file holds JSON encoded entries separated by "\\0". Entries written by former versions
+    are Python structures, which are still read.
+
+    An index next to the file (see _AppendStoreIndex) allows to read the entries of a time range or
+    the latest entries without parsing the whole file.
     """
 
+    _ITER_BATCH_SIZE = 1000
+
     @staticmethod
     @abc.abstractmethod
     def _serialize(entry: _VT) -> object:
@@ -35,7 +47,7 @@ class ABCAppendStore(Generic[_VT], abc.ABC):
             Abstract static methods do not make any sense.  This should
             either be a free function or on `entry : _VT`.
 
-        Override this to execute some logic before repr()"""
+        Override this to execute some logic before json.dumps()"""
         raise NotImplementedError()
 
     @staticmethod
@@ -47,12 +59,22 @@ class ABCAppendStore(Generic[_VT], abc.ABC):
             Abstract static methods do not make any sense.  This should
             either be a free function or on `entry : _VT`.
 
-        Override this to execute some logic after literal_eval() to produce _VT objects"""
+        Override this to execute some logic after json.loads() to produce _VT objects"""
+        raise NotImplementedError()
+
+    @staticmethod
+    @abc.abstractmethod
+    def _entry_time(entry: _VT) -> float:
+        """The time of the entry, used for seeking in the file"""
         raise NotImplementedError()
 
     def __init__(self, path: Path) -> None:
         self._path = path
 
+    @property
+    def _index_path(self) -> Path:
+        return self._path.with_name(f".{self._path.name}.idx")
+
     def exists(self) -> bool:
         return self._path.exists()
 
@@ -60,13 +82,17 @@ class ABCAppendStore(Generic[_VT], abc.ABC):
         """Parse the file and return the entries"""
         try:
             with self._path.open("rb") as f:
-                return [
-                    self._deserialize(ast.literal_eval(entry.decode("utf-8")))
-                    for entry in f.read().split(b"\0")
-                    if entry
-                ]
+                return [self._parse(entry) for entry in f.read().split(b"\0") if entry]
         except FileNotFoundError:
             return []
+
+    def _parse(self, entry: bytes) -> _VT:
+        try:
+            return self._deserialize(json.loads(entry))
+        except ValueError:
+            pass  # Written by a former version
+        try:
+            return self._deserialize(ast.literal_eval(entry.decode("utf-8")))
         except SyntaxError as e:
             raise MKUserError(
                 None,
@@ -76,20 +102,96 @@ class ABCAppendStore(Generic[_VT], abc.ABC):
                     "content or remove the file before you visit this page "
                     "again.<br><br>The problematic entry is:<br>%s"
                 )
-                % (f.name, e.text),
+                % (self._path, e.text),
             )
 
     def read(self) -> Sequence[_VT]:
         with store.locked(self._path):
             return self.__read()
 
+    def iter_entries(
+        self, start: float | None = None, end: float | None = None, *, reverse: bool = False
+    ) -> Iterator[_VT]:
+        """Iterate over the entries with start <= time < end, optionally the newest first
+
+        Only the entries of the time range are read and parsed, batch by batch. The store is only
+        locked while reading a batch.
+        """
+        try:
+            f = self._path.open("rb")
+        except FileNotFoundError:
+            return
+        with f:
+            with store.locked(self._path):
+                index = self._load_index(f)
+            first = 0 if start is None else bisect_left(index.times, start)
+            last = len(index.offsets) if end is None else bisect_left(index.times, end)
+            batches = [
+                (batch_start, min(batch_start + self._ITER_BATCH_SIZE, last))
+                for batch_start in range(first, last, self._ITER_BATCH_SIZE)
+            ]
+            for batch_start, batch_end in reversed(batches) if reverse else batches:
+                with store.locked(self._path):
+                    if not index.describes(f):
+                        raise MKGeneralException(
+                            _('The file "%s" has been rewritten while reading it') % self._path
+                        )
+                    entries = self._read_entries(f, index, batch_start, batch_end)
+                for entry in reversed(entries) if reverse else entries:
+                    entry_time = self._entry_time(entry)
+                    if (start is None or entry_time >= start) and (end is None or entry_time < end):
+                        yield entry
+
+    def _read_entries(
+        self, f: BinaryIO, index: _AppendStoreIndex, first: int, last: int
+    ) -> list[_VT]:
+        end = index.offsets[last] if last < len(index.offsets) else index.size
+        f.seek(index.offsets[first])
+        return [self._parse(entry) for entry in f.read(end - f.tell()).split(b"\0") if entry]
+
+    def _load_index(self, f: BinaryIO) -> _AppendStoreIndex:
+        """Load the index of the file and bring it up to date, the caller has to lock the store"""
+        if (index := _AppendStoreIndex.load(self._index_path)) is None or not index.describes(f):
+            index = _AppendStoreIndex.empty()
+
+        size = os.fstat(f.fileno()).st_size
+        if index.size == size:
+            return index
+
+        f.seek(index.size)
+        offset = index.size
+        records = []
+        latest = index.times[-1] if index.times else float("-inf")
+        for entry in f.read(size - index.size).split(b"\0"):
+            if entry:
+                latest = max(latest, self._entry_time(self._parse(entry)))
+                records.append((offset, latest))
+            offset += len(entry) + 1
+
+        index = index.extended(f, records, size)
+        try:
+            store.save_bytes_to_file(self._index_path, index.serialize())
+        except MKGeneralException:
+            pass  # The index is recreated with the next read
+        return index
+
+    def _update_index(self, f: BinaryIO, offset: int, entry_time: float) -> None:
+        """Add an entry appended at offset to the index, in case the index is up to date"""
+        try:
+            with self._index_path.open("r+b") as index_file:
+                _AppendStoreIndex.append(index_file, f, offset, entry_time)
+        except FileNotFoundError:
+            pass  # The index is created with the next read
+
     def append(self, entry: _VT) -> None:
         with store.locked(self._path):
             try:
                 with self._path.open("ab+") as f:
-                    f.write(repr(self._serialize(entry)).encode("utf-8") + b"\0")
+                    offset = f.tell()
+                    f.write(json.dumps(self._serialize(entry)).encode("utf-8") + b"\0")
                     f.flush()
                     os.fsync(f.fileno())
+                    self._update_index(f, offset, self._entry_time(entry))
                 self._path.chmod(0o660)
             except Exception as e:
                 raise MKGeneralException(_('Cannot write file "%s": %s') % (self._path, e))
@@ -105,3 +207,108 @@ class ABCAppendStore(Generic[_VT], abc.ABC):
                     pass
                 for entry in entries:
                     self.append(entry)
+
+
+class _AppendStoreIndex:
+    """The offsets and times of the entries of an append store file
+
+    The header holds the inode and the size of the indexed file together with a checksum of its
+    last bytes, so an index not describing the file is detected. Each record holds the offset of
+    an entry and the latest time of all entries up to it. These times never decrease, so the
+    entries starting from a given time can be found by bisection, even when the clock was set
+    back. Seeking the end of a time range may miss entries written after the clock was set back.
+    """
+
+    _HEADER = struct.Struct("=8sQQI")
+    _RECORD = struct.Struct("=Qd")
+    _MAGIC = b"CMKASIX1"
+    _CHECKED_BYTES = 64
+
+    def __init__(
+        self,
+        inode: int,
+        size: int,
+        checksum: int,
+        offsets: Sequence[int],
+        times: Sequence[float],
+    ) -> None:
+        self.inode = inode
+        self.size = size
+        self.checksum = checksum
+        self.offsets = offsets
+        self.times = times
+
+    @classmethod
+    def empty(cls) -> _AppendStoreIndex:
+        return cls(0, 0, 0, [], [])
+
+    @classmethod
+    def load(cls, path: Path) -> _AppendStoreIndex | None:
+        try:
+            raw = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        if len(raw) < cls._HEADER.size or (len(raw) - cls._HEADER.size) % cls._RECORD.size:
+            return None
+        magic, inode, size, checksum = cls._HEADER.unpack_from(raw)
+        if magic != cls._MAGIC:
+            return None
+        records = memoryview(raw)[cls._HEADER.size :]
+        offsets = records.cast("Q")[0::2]
+        # Records appended after the header has been written for the last time
+        count = bisect_left(offsets, size)
+        return cls(inode, size, checksum, offsets[:count], records.cast("d")[1::2][:count])
+
+    @classmethod
+    def _checksum(cls, f: BinaryIO, size: int) -> int:
+        f.seek(max(0, size - cls._CHECKED_BYTES))
+        return zlib.crc32(f.read(min(size, cls._CHECKED_BYTES)))
+
+    @classmethod
+    def _header_describes(cls, f: BinaryIO, inode: int, size: int, checksum: int) -> bool:
+        stat = os.fstat(f.fileno())
+        return stat.st_ino == inode and stat.st_size >= size and cls._checksum(f, size) == checksum
+
+    def describes(self, f: BinaryIO) -> bool:
+        return self._header_describes(f, self.inode, self.size, self.checksum)
+
+    def extended(
+        self, f: BinaryIO, records: Sequence[tuple[int, float]], size: int
+    ) -> _AppendStoreIndex:
+        return _AppendStoreIndex(
+            os.fstat(f.fileno()).st_ino,
+            size,
+            self._checksum(f, size),
+            [*self.offsets, *(offset for offset, _time in records)],
+            [*self.times, *(latest for _offset, latest in records)],
+        )
+
+    def serialize(self) -> bytes:
+        return self._HEADER.pack(self._MAGIC, self.inode, self.size, self.checksum) + b"".join(
+            self._RECORD.pack(offset, latest) for offset, latest in zip(self.offsets, self.times)
+        )
+
+    @classmethod
+    def append(cls, index_file: BinaryIO, f: BinaryIO, offset: int, entry_time: float) -> None:
+        """Add the entry appended to f at offset to the index file, in case it is up to date"""
+        header = index_file.read(cls._HEADER.size)
+        if len(header) != cls._HEADER.size:
+            return
+        magic, inode, size, checksum = cls._HEADER.unpack(header)
+        if (
+            magic != cls._MAGIC
+            or size != offset
+            or not cls._header_describes(f, inode, size, checksum)
+        ):
+            return
+
+        latest = entry_time
+        if (end := index_file.seek(0, os.SEEK_END)) > cls._HEADER.size:
+            index_file.seek(end - cls._RECORD.size)
+            latest = max(latest, cls._RECORD.unpack(index_file.read(cls._RECORD.size))[1])
+        # Write the record before the header, see load()
+        index_file.write(cls._RECORD.pack(offset, latest))
+        index_file.flush()
+        new_size = os.fstat(f.fileno()).st_size
+        index_file.seek(0)
+        index_file.write(cls._HEADER.pack(cls._MAGIC, inode, new_size, cls._checksum(f, new_size)))
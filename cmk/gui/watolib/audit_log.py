@@ -9,7 +9,7 @@ import copy
 import json
 import re
 import time
-from collections.abc import Sequence
+from collections.abc import Iterator, Sequence
 from pathlib import Path
 from typing import Any, NamedTuple
 
@@ -89,6 +89,10 @@ class AuditLogStore(ABCAppendStore["AuditLogStore.Entry"]):
     def _deserialize(raw: object) -> AuditLogStore.Entry:
         return AuditLogStore.Entry.deserialize(raw)
 
+    @staticmethod
+    def _entry_time(entry: AuditLogStore.Entry) -> float:
+        return entry.time
+
     def clear(self) -> None:
         """Instead of just removing, like ABCAppendStore, archive the existing file"""
         if not self.exists():
@@ -105,14 +109,34 @@ class AuditLogStore(ABCAppendStore["AuditLogStore.Entry"]):
                     break
 
         self._path.rename(newpath)
+        try:
+            self._index_path.rename(AuditLogStore(newpath)._index_path)
+        except FileNotFoundError:
+            pass
 
     def read(self, options: AuditLogFilter | None = None) -> Sequence[AuditLogStore.Entry]:
-        entries = super().read()
-
         if options is None:
-            return entries
-
-        return [entry for entry in entries if AuditLogStore.filter_entry(entry, options)]
+            return super().read()
+
+        if "timestamp_from" not in options:
+            return [entry for entry in super().read() if AuditLogStore.filter_entry(entry, options)]
+
+        return list(self.iter_filtered_entries(options, start=options["timestamp_from"]))
+
+    def iter_filtered_entries(
+        self,
+        options: AuditLogFilter,
+        start: float | None = None,
+        end: float | None = None,
+        *,
+        reverse: bool = False,
+    ) -> Iterator[AuditLogStore.Entry]:
+        """Iterate over the entries with start <= time < end matching the filter options"""
+        return (
+            entry
+            for entry in self.iter_entries(start, end, reverse=reverse)
+            if AuditLogStore.filter_entry(entry, options)
+        )
 
     @staticmethod
     def filter_entry(entry: AuditLogStore.Entry, options: AuditLogFilter) -> bool:
@@ -148,7 +172,7 @@ class AuditLogStore(ABCAppendStore["AuditLogStore.Entry"]):
         return True
 
     def get_entries_since(self, timestamp: int) -> Sequence[AuditLogStore.Entry]:
-        return [entry for entry in self.read() if entry.time > timestamp]
+        return [entry for entry in self.iter_entries(start=timestamp) if entry.time > timestamp]
 
     @classmethod
     def to_json(cls, entries: Sequence[AuditLogStore.Entry]) -> str:
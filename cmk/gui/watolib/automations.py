@@ -10,13 +10,14 @@ from __future__ import annotations
 
 import ast
 import logging
+import os
 import re
 import subprocess
 import uuid
-from collections.abc import Callable, Iterable, Mapping, Sequence
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
 from io import BytesIO
 from pathlib import Path
-from typing import NamedTuple
+from typing import BinaryIO, NamedTuple
 
 import requests
 import urllib3
@@ -269,7 +270,7 @@ def _do_remote_automation_serialized(
     site: SiteConfiguration,
     command: str,
     vars_: Sequence[tuple[str, str]],
-    files: Mapping[str, BytesIO] | None = None,
+    files: Mapping[str, BinaryIO] | None = None,
     timeout: float | None = None,
 ) -> str:
     auto_logger.info("RUN [%s]: %s", site, command)
@@ -323,7 +324,7 @@ def do_remote_automation(
     site: SiteConfiguration,
     command: str,
     vars_: Sequence[tuple[str, str]],
-    files: Mapping[str, BytesIO] | None = None,
+    files: Mapping[str, BinaryIO] | None = None,
     timeout: float | None = None,
 ) -> object:
     serialized_response = _do_remote_automation_serialized(
@@ -351,21 +352,26 @@ def get_url_raw(
     insecure: bool,
     auth: tuple[str, str] | None = None,
     data: Mapping[str, str] | None = None,
-    files: Mapping[str, BytesIO] | None = None,
+    files: Mapping[str, BinaryIO] | None = None,
     timeout: float | None = None,
 ) -> requests.Response:
+    headers = {
+        "x-checkmk-version": cmk_version.__version__,
+        "x-checkmk-edition": cmk_version.edition().short,
+        "x-checkmk-license-state": get_license_state().readable,
+    }
+    body: Mapping[str, str] | _MultipartStream | None = data
+    if files:
+        body = _MultipartStream(data or {}, files)
+        headers["Content-Type"] = body.content_type
+
     response = requests.post(
         url,
-        data=data,
+        data=body,
         verify=not insecure,
         auth=auth,
-        files=files,
         timeout=timeout,
-        headers={
-            "x-checkmk-version": cmk_version.__version__,
-            "x-checkmk-edition": cmk_version.edition().short,
-            "x-checkmk-license-state": get_license_state().readable,
-        },
+        headers=headers,
     )
 
     response.encoding = "utf-8"  # Always decode with utf-8
@@ -384,6 +390,63 @@ def get_url_raw(
     return response
 
 
+class _MultipartStream:
+    """A multipart/form-data request body which streams the uploaded files
+
+    requests reads the files completely into memory to build a multipart body. This body is read in
+    chunks while sending instead, so large uploads like the config sync archives are not kept in
+    memory.
+    """
+
+    def __init__(self, data: Mapping[str, str], files: Mapping[str, BinaryIO]) -> None:
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        self._parts: list[BinaryIO] = []
+        self._length = 0
+
+        for name, value in data.items():
+            self._add_bytes(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'.encode()
+                + value.encode()
+                + b"\r\n"
+            )
+        for name, file in files.items():
+            self._add_bytes(
+                (
+                    f"--{boundary}\r\n"
+                    f'Content-Disposition: form-data; name="{name}"; filename="{name}"\r\n'
+                    "Content-Type: application/octet-stream\r\n\r\n"
+                ).encode()
+            )
+            self._add_file(file)
+            self._add_bytes(b"\r\n")
+        self._add_bytes(f"--{boundary}--\r\n".encode())
+
+    def _add_bytes(self, content: bytes) -> None:
+        self._parts.append(BytesIO(content))
+        self._length += len(content)
+
+    def _add_file(self, file: BinaryIO) -> None:
+        position = file.tell()
+        self._length += file.seek(0, os.SEEK_END) - position
+        file.seek(position)
+        self._parts.append(file)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[bytes]:
+        while chunk := self.read(65536):
+            yield chunk
+
+    def read(self, size: int = -1) -> bytes:
+        while self._parts:
+            if chunk := self._parts[0].read(size):
+                return chunk
+            self._parts.pop(0)
+        return b""
+
+
 def _verify_compatibility(response: requests.Response) -> None:
     """Ensure we are compatible with the remote site
 
@@ -488,7 +551,7 @@ def get_url(
     insecure: bool,
     auth: tuple[str, str] | None = None,
     data: Mapping[str, str] | None = None,
-    files: Mapping[str, BytesIO] | None = None,
+    files: Mapping[str, BinaryIO] | None = None,
     timeout: float | None = None,
 ) -> str:
     return get_url_raw(url, insecure, auth, data, files, timeout).text
@@ -499,7 +562,7 @@ def get_url_json(
     insecure: bool,
     auth: tuple[str, str] | None = None,
     data: Mapping[str, str] | None = None,
-    files: Mapping[str, BytesIO] | None = None,
+    files: Mapping[str, BinaryIO] | None = None,
     timeout: float | None = None,
 ) -> object:
     return get_url_raw(url, insecure, auth, data, files, timeout).json()
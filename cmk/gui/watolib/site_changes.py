@@ -35,8 +35,13 @@ class SiteChanges(ABCAppendStore[ChangeSpec]):
         raw["object"] = ObjectRef.deserialize(raw["object"]) if raw["object"] else None
         return raw
 
+    @staticmethod
+    def _entry_time(entry: ChangeSpec) -> float:
+        return entry.get("time", 0.0)
+
     def clear(self) -> None:
         self._path.unlink(missing_ok=True)
+        self._index_path.unlink(missing_ok=True)
 
     @staticmethod
     def to_json(entries: Sequence[ChangeSpec]) -> str:
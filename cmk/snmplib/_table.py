@@ -6,7 +6,7 @@
 """
 
 import contextlib
-from collections.abc import Callable, MutableMapping, Sequence
+from collections.abc import Callable, Mapping, MutableMapping, Sequence
 from functools import partial
 from typing import assert_never
 
@@ -57,6 +57,18 @@ def get_snmp_table(
     max_len = 0
     max_len_col = -1
 
+    rowinfos = get_snmpwalks(
+        section_name,
+        tree.base,
+        {
+            f"{tree.base}.{oid.column}": oid.save_to_cache
+            for oid in tree.oids
+            if not isinstance(oid.column, SpecialColumn)
+        },
+        walk_cache=walk_cache,
+        backend=backend,
+    )
+
     for oid in tree.oids:
         fetchoid: OID = f"{tree.base}.{oid.column}"
         # column may be integer or string like "1.5.4.2.3"
@@ -77,14 +89,7 @@ def get_snmp_table(
             index_column = len(columns)
             index_format = oid.column
         else:
-            rowinfo = get_snmpwalk(
-                section_name,
-                tree.base,
-                fetchoid,
-                walk_cache=walk_cache,
-                save_walk_cache=oid.save_to_cache,
-                backend=backend,
-            )
+            rowinfo = rowinfos[fetchoid]
             if len(rowinfo) > max_len:
                 max_len_col = len(columns)
 
@@ -183,13 +188,39 @@ def get_snmpwalk(
     save_walk_cache: bool,
     backend: SNMPBackend,
 ) -> SNMPRowInfo:
-    with contextlib.suppress(KeyError):
-        cache_info = walk_cache[fetchoid][1]
-        console.vverbose(f"Already fetched OID: {fetchoid}\n")
-        return cache_info
+    return get_snmpwalks(
+        section_name,
+        base_oid,
+        {fetchoid: save_walk_cache},
+        walk_cache=walk_cache,
+        backend=backend,
+    )[fetchoid]
 
-    added_oids: set[OID] = set()
-    rowinfo: SNMPRowInfo = []
+
+def get_snmpwalks(
+    section_name: SectionName | None,
+    base_oid: str,
+    fetchoids: Mapping[OID, bool],
+    *,
+    walk_cache: MutableMapping[str, tuple[bool, SNMPRowInfo]],
+    backend: SNMPBackend,
+) -> Mapping[OID, SNMPRowInfo]:
+    """Walk the OIDs not yet in the walk cache, all at once per SNMP context
+
+    fetchoids maps the OIDs to whether their walks are saved to the cache.
+    """
+    rowinfos: dict[OID, SNMPRowInfo] = {}
+    for fetchoid in fetchoids:
+        with contextlib.suppress(KeyError):
+            rowinfos[fetchoid] = walk_cache[fetchoid][1]
+            console.vverbose(f"Already fetched OID: {fetchoid}\n")
+
+    missing = [fetchoid for fetchoid in fetchoids if fetchoid not in rowinfos]
+    if not missing:
+        return rowinfos
+
+    added_oids: dict[OID, set[OID]] = {fetchoid: set() for fetchoid in missing}
+    rowinfos.update({fetchoid: [] for fetchoid in missing})
 
     skip: set[SNMPContext] = set()
     for context in backend.config.snmpv3_contexts_of(section_name):
@@ -197,8 +228,8 @@ def get_snmpwalk(
             continue
 
         try:
-            rows = backend.walk(
-                fetchoid,
+            walks = backend.walk_many(
+                missing,
                 section_name=section_name,
                 table_base_oid=base_oid,
                 context=context,
@@ -211,28 +242,30 @@ def get_snmpwalk(
             skip.add(context)
             continue
 
-        # I've seen a broken device (Mikrotik Router), that broke after an
-        # update to RouterOS v6.22. It would return 9 time the same OID when
-        # .1.3.6.1.2.1.1.1.0 was being walked. We try to detect these situations
-        # by removing any duplicate OID information
-        if len(rows) > 1 and rows[0][0] == rows[1][0]:
-            console.vverbose(
-                "Detected broken SNMP agent. Ignoring duplicate OID %s.\n" % rows[0][0]
-            )
-            rows = rows[:1]
+        for fetchoid, rows in zip(missing, walks):
+            # I've seen a broken device (Mikrotik Router), that broke after an
+            # update to RouterOS v6.22. It would return 9 time the same OID when
+            # .1.3.6.1.2.1.1.1.0 was being walked. We try to detect these situations
+            # by removing any duplicate OID information
+            if len(rows) > 1 and rows[0][0] == rows[1][0]:
+                console.vverbose(
+                    "Detected broken SNMP agent. Ignoring duplicate OID %s.\n" % rows[0][0]
+                )
+                rows = rows[:1]
 
-        for row_oid, val in rows:
-            if row_oid in added_oids:
-                console.vverbose(f"Duplicate OID found: {row_oid} ({val!r})\n")
-            else:
-                rowinfo.append((row_oid, val))
-                added_oids.add(row_oid)
+            for row_oid, val in rows:
+                if row_oid in added_oids[fetchoid]:
+                    console.vverbose(f"Duplicate OID found: {row_oid} ({val!r})\n")
+                else:
+                    rowinfos[fetchoid].append((row_oid, val))
+                    added_oids[fetchoid].add(row_oid)
 
-    if skip and not rowinfo:
+    if skip and not all(rowinfos[fetchoid] for fetchoid in missing):
         raise MKSNMPError("SNMP Error on %s: SNMP query timed out" % backend.config.hostname)
 
-    walk_cache[fetchoid] = (save_walk_cache, rowinfo)
-    return rowinfo
+    for fetchoid in missing:
+        walk_cache[fetchoid] = (fetchoids[fetchoid], rowinfos[fetchoid])
+    return rowinfos
 
 
 def _decode_column(
@@ -51,6 +51,7 @@ SNMPTiming = dict
 class SNMPBackendEnum(enum.Enum):
     INLINE = "Inline"
     CLASSIC = "Classic"
+    NATIVE = "Native"
     STORED_WALK = "StoredWalk"
 
     def serialize(self) -> str:
@@ -178,6 +179,26 @@ class SNMPBackend(abc.ABC):
     ) -> SNMPRowInfo:
         return []
 
+    def walk_many(
+        self,
+        /,
+        oids: Sequence[OID],
+        *,
+        context: SNMPContext,
+        section_name: SectionName | None = None,
+        table_base_oid: OID | None = None,
+    ) -> Sequence[SNMPRowInfo]:
+        """Walk several OIDs in the same SNMP context
+        Backends which are able to have more than one request in flight
+        override this. The default walks one OID after the other.
+        """
+        return [
+            self.walk(
+                oid, context=context, section_name=section_name, table_base_oid=table_base_oid
+            )
+            for oid in oids
+        ]
+
 
 class SpecialColumn(enum.IntEnum):
     # Until we remove all but the first, its worth having an enum
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+from logging import Logger
+from pathlib import Path
+
+import cmk.utils.paths
+from cmk.utils.structured_data import IndexedTreeFile, load_tree, save_indexed_tree
+
+from cmk.update_config.registry import update_action_registry, UpdateAction
+from cmk.update_config.update_state import UpdateActionState
+
+
+class CreateIndexedInventoryTrees(UpdateAction):
+    """Create the indexed tree files of the current HW/SW inventory trees
+
+    The GUI loads only the requested nodes of a tree if an up to date indexed
+    tree file exists. New trees are written with an indexed tree file, the
+    existing ones are converted here.
+    """
+
+    def __call__(self, logger: Logger, update_action_state: UpdateActionState) -> None:
+        self.create_indexed_trees(Path(cmk.utils.paths.inventory_output_dir), logger)
+
+    @staticmethod
+    def create_indexed_trees(tree_dir: Path, logger: Logger) -> None:
+        try:
+            tree_files = sorted(tree_dir.iterdir())
+        except FileNotFoundError:
+            return
+
+        for tree_file in tree_files:
+            if (
+                tree_file.name.startswith(".")
+                or tree_file.suffix in (".gz", ".sdi")
+                or not tree_file.is_file()
+                or IndexedTreeFile.open(tree_file) is not None
+            ):
+                continue
+            try:
+                save_indexed_tree(tree_file, load_tree(tree_file).serialize())
+            except Exception as e:
+                logger.error("Cannot create indexed tree file of %s: %s", tree_file, e)
+
+
+update_action_registry.register(
+    CreateIndexedInventoryTrees(
+        name="create_indexed_inventory_trees",
+        title="Create indexed HW/SW inventory trees",
+        sort_index=103,  # can run whenever
+    )
+)
@@ -26,7 +26,11 @@ class VersionSpecificCachesCleaner(UpdateAction):
 
         walk_cache_dir = Path(paths_utils.var_dir, "snmp_cache")
         if walk_cache_dir.exists():
-            paths.extend(walk_cache_dir.iterdir())
+            for walk_cache in walk_cache_dir.iterdir():
+                if walk_cache.is_dir():
+                    paths.append(walk_cache)  # File per OID layout of former versions
+                else:
+                    walk_cache.unlink(missing_ok=True)
 
         for base_dir in paths:
             try:
@@ -3,15 +3,20 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
-import errno
+import bisect
+import itertools
 import logging
+import mmap
 import os
+import shutil
+import struct
 import tempfile
-from collections.abc import Container, Iterable, Iterator, Mapping, Sequence
+import time
+from collections.abc import Callable, Container, Iterator, Mapping, Sequence
 from contextlib import suppress
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Final, NamedTuple
+from typing import ClassVar, Final, NamedTuple
 
 import cmk.utils
 import cmk.utils.paths
@@ -50,22 +55,190 @@ PiggybackTimeSettings = Sequence[_PiggybackTimeSetting]
 _PiggybackTimeSettingsMap = Mapping[tuple[str | None, str], int]
 
 # ***** Terminology *****
-# "piggybacked_host_folder":
-# - tmp/check_mk/piggyback/HOST
+# "segment_file":
+# - tmp/check_mk/piggyback/.segments/SOURCE
+# - The piggyback data of SOURCE for all its piggybacked hosts, see `_Segment`.
 #
 # "piggybacked_hostname":
-# - Path(tmp/check_mk/piggyback/HOST).name
-#
-# "piggybacked_host_source":
-# - tmp/check_mk/piggyback/HOST/SOURCE
+# - A host name in the index of a segment file
 #
 # "source_state_file":
 # - tmp/check_mk/piggyback_sources/SOURCE
 #
 # "source_hostname":
-# - Path(tmp/check_mk/piggyback/HOST/SOURCE).name
+# - Path(tmp/check_mk/piggyback/.segments/SOURCE).name
 # - Path(tmp/check_mk/piggyback_sources/SOURCE).name
 
+_SEGMENTS_DIR: Final = ".segments"
+
+
+class _Entry(NamedTuple):
+    offset: int
+    length: int
+    mtime: float
+
+
+class _Segment:
+    """The piggyback data of a source for all its piggybacked hosts
+
+    The file starts with an index sorted by the piggybacked host names, followed
+    by the raw data:
+
+        header | name offsets (n + 1) | entries (n) | host names | raw data
+
+    Every entry holds the offset and length of the raw data and the time the
+    source stored it.  The file is memory mapped, so that looking up a host only
+    reads the pages it needs, and it is only ever replaced, never modified.
+
+    """
+
+    _MAGIC: Final = b"CMKPIGG1"
+    # Native byte order: the files never leave the site.
+    _HEADER: Final = struct.Struct("=8sQ")
+    _OFFSET: Final = struct.Struct("=Q")
+    _ENTRY: Final = struct.Struct("=QQd")
+
+    # Segment files are replaced but never modified, so the loaded ones can be
+    # reused as long as the file is the same. Segments of replaced or removed
+    # files are evicted, so that their memory is unmapped, see evict().
+    _loaded: ClassVar[dict[Path, tuple[tuple[int, int, int], "_Segment"]]] = {}
+
+    def __init__(self, path: Path, buffer: mmap.mmap) -> None:
+        magic, length = self._HEADER.unpack_from(buffer)
+        if magic != self._MAGIC:
+            raise ValueError(f"Not a piggyback segment file: {path}")
+        self.path: Final = path
+        self.source_hostname: Final = HostName(path.name)
+        self._buffer: Final = buffer
+        self._len: Final[int] = length
+        self._entries_at: Final = self._HEADER.size + (length + 1) * self._OFFSET.size
+        self._name_offsets: Final = memoryview(buffer)[self._HEADER.size : self._entries_at].cast(
+            "Q"
+        )
+        self._names_at: Final = self._entries_at + length * self._ENTRY.size
+
+    @classmethod
+    def load(cls, path: Path) -> "_Segment | None":
+        try:
+            with path.open("rb") as file:
+                stat = os.fstat(file.fileno())
+                identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                if (loaded := cls._loaded.pop(path, None)) is not None and loaded[0] == identity:
+                    cls._loaded[path] = loaded
+                    return loaded[1]
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            return None  # empty file, just created for locking
+        try:
+            segment = cls(path, buffer)
+        except (ValueError, TypeError, struct.error) as e:
+            logger.log(VERBOSE, "Ignoring piggyback segment file '%s': %s", path, e)
+            return None
+        cls._loaded[path] = (identity, segment)
+        return segment
+
+    @classmethod
+    def evict(cls, existing: Container[Path]) -> None:
+        """Forget the loaded segments of the files not existing anymore"""
+        for path in [path for path in cls._loaded if path not in existing]:
+            del cls._loaded[path]
+
+    def __len__(self) -> int:
+        return self._len
+
+    def _name(self, index: int) -> bytes:
+        start = self._names_at + self._name_offsets[index]
+        end = self._names_at + self._name_offsets[index + 1]
+        return self._buffer[start:end]
+
+    def _entry(self, index: int) -> _Entry:
+        return _Entry(
+            *self._ENTRY.unpack_from(self._buffer, self._entries_at + index * self._ENTRY.size)
+        )
+
+    def get(self, piggybacked_hostname: HostName | HostAddress) -> _Entry | None:
+        name = str(piggybacked_hostname).encode("utf-8")
+        index = bisect.bisect_left(range(self._len), name, key=self._name)
+        if index == self._len or self._name(index) != name:
+            return None
+        return self._entry(index)
+
+    def entries(self) -> Iterator[tuple[HostName, _Entry]]:
+        for index in range(self._len):
+            yield HostName(self._name(index).decode("utf-8")), self._entry(index)
+
+    def raw_data(self, entry: _Entry) -> AgentRawData:
+        return AgentRawData(self._buffer[entry.offset : entry.offset + entry.length])
+
+    def contents(self) -> dict[HostName, tuple[bytes, float]]:
+        return {name: (self.raw_data(entry), entry.mtime) for name, entry in self.entries()}
+
+    @classmethod
+    def serialize(cls, contents: Mapping[HostName, tuple[bytes, float]]) -> bytes:
+        indexed = sorted(
+            (str(name).encode("utf-8"), raw_data, mtime)
+            for name, (raw_data, mtime) in contents.items()
+        )
+        name_offsets = list(itertools.accumulate((len(n) for n, _d, _m in indexed), initial=0))
+        data_offsets = itertools.accumulate(
+            (len(d) for _n, d, _m in indexed),
+            initial=cls._HEADER.size
+            + len(name_offsets) * cls._OFFSET.size
+            + len(indexed) * cls._ENTRY.size
+            + name_offsets[-1],
+        )
+        return b"".join(
+            (
+                cls._HEADER.pack(cls._MAGIC, len(indexed)),
+                *(cls._OFFSET.pack(offset) for offset in name_offsets),
+                *(
+                    cls._ENTRY.pack(offset, len(raw_data), mtime)
+                    for offset, (_n, raw_data, mtime) in zip(data_offsets, indexed)
+                ),
+                *(name for name, _d, _m in indexed),
+                *(raw_data for _n, raw_data, _m in indexed),
+            )
+        )
+
+
+def _save_segment(path: Path, contents: Mapping[HostName, tuple[bytes, float]]) -> None:
+    if not contents:
+        path.unlink(missing_ok=True)
+        return
+    store.save_bytes_to_file(path, _Segment.serialize(contents))
+
+
+def _load_segments() -> Iterator[_Segment]:
+    paths = _get_segment_file_paths()
+    _Segment.evict(set(paths))
+    return (segment for path in paths if (segment := _Segment.load(path)) is not None)
+
+
+def _locate(
+    piggybacked_hostname: HostName | HostAddress,
+) -> Sequence[tuple[_Segment, _Entry]]:
+    return [
+        (segment, entry)
+        for segment in _load_segments()
+        if (entry := segment.get(piggybacked_hostname)) is not None
+    ]
+
+
+def _locate_all() -> Mapping[HostName, Sequence[tuple[_Segment, _Entry]]]:
+    located: dict[HostName, list[tuple[_Segment, _Entry]]] = {}
+    for segment in _load_segments():
+        for piggybacked_hostname, entry in segment.entries():
+            located.setdefault(piggybacked_hostname, []).append((segment, entry))
+    return located
+
+
+class _PiggybackData(NamedTuple):
+    info: PiggybackFileInfo
+    segment: _Segment
+    entry: _Entry
+
 
 def get_piggyback_raw_data(
     piggybacked_hostname: HostName | HostAddress | None,
@@ -80,8 +253,10 @@ def get_piggyback_raw_data(
     if not piggybacked_hostname:
         return []
 
-    piggyback_file_infos = _get_piggyback_processed_file_infos(piggybacked_hostname, time_settings)
-    if not piggyback_file_infos:
+    piggyback_data = _get_piggyback_processed_data(
+        piggybacked_hostname, _locate(piggybacked_hostname), time_settings
+    )
+    if not piggyback_data:
         logger.log(
             VERBOSE,
             "No piggyback files for '%s'. Skip processing.",
@@ -89,55 +264,29 @@ def get_piggyback_raw_data(
         )
         return []
 
-    piggyback_data = []
-    for file_info in piggyback_file_infos:
-        try:
-            # Raw data is always stored as bytes. Later the content is
-            # converted to unicode in abstact.py:_parse_info which respects
-            # 'encoding' in section options.
-            raw_data = AgentRawData(store.load_bytes_from_file(file_info.file_path))
-
-        except OSError as e:
-            reason = f"Cannot read piggyback raw data from source '{file_info.source_hostname}'"
-            piggyback_raw_data = PiggybackRawDataInfo(
-                PiggybackFileInfo(
-                    source_hostname=file_info.source_hostname,
-                    file_path=file_info.file_path,
-                    successfully_processed=False,
-                    message=reason,
-                    status=0,
-                ),
-                raw_data=AgentRawData(b""),
-            )
+    for data in piggyback_data:
+        if data.info.successfully_processed:
             logger.log(
                 VERBOSE,
-                "Piggyback file '%s': %s, %s",
-                file_info.file_path,
-                reason,
-                e,
+                "Piggyback data from '%s': %s",
+                data.info.source_hostname,
+                data.info.message,
             )
-
         else:
-            piggyback_raw_data = PiggybackRawDataInfo(
-                file_info,
-                raw_data,
+            logger.log(
+                VERBOSE,
+                "Piggyback data from '%s' is outdated (%s). Skip processing.",
+                data.info.source_hostname,
+                data.info.message,
             )
-            if file_info.successfully_processed:
-                logger.log(
-                    VERBOSE,
-                    "Piggyback file '%s': %s",
-                    file_info.file_path,
-                    file_info.message,
-                )
-            else:
-                logger.log(
-                    VERBOSE,
-                    "Piggyback file '%s' is outdated (%s). Skip processing.",
-                    file_info.file_path,
-                    file_info.message,
-                )
-        piggyback_data.append(piggyback_raw_data)
-    return piggyback_data
+
+    # Raw data is always stored as bytes. Later the content is
+    # converted to unicode in abstact.py:_parse_info which respects
+    # 'encoding' in section options.
+    return [
+        PiggybackRawDataInfo(data.info, data.segment.raw_data(data.entry))
+        for data in piggyback_data
+    ]
 
 
 def get_source_and_piggyback_hosts(
@@ -145,14 +294,11 @@ def get_source_and_piggyback_hosts(
 ) -> Iterator[tuple[HostName, HostName]]:
     """Generates all piggyback pig/piggybacked host pairs that have up-to-date data"""
 
-    for piggybacked_host_folder in _get_piggybacked_host_folders():
-        for file_info in _get_piggyback_processed_file_infos(
-            HostName(piggybacked_host_folder.name),
-            time_settings,
-        ):
-            if not file_info.successfully_processed:
+    for piggybacked_hostname, located in _locate_all().items():
+        for data in _get_piggyback_processed_data(piggybacked_hostname, located, time_settings):
+            if not data.info.successfully_processed:
                 continue
-            yield HostName(file_info.source_hostname), HostName(piggybacked_host_folder.name)
+            yield data.info.source_hostname, piggybacked_hostname
 
 
 def has_piggyback_raw_data(
@@ -160,8 +306,10 @@ def has_piggyback_raw_data(
     time_settings: PiggybackTimeSettings,
 ) -> bool:
     return any(
-        fi.successfully_processed
-        for fi in _get_piggyback_processed_file_infos(piggybacked_hostname, time_settings)
+        data.info.successfully_processed
+        for data in _get_piggyback_processed_data(
+            piggybacked_hostname, _locate(piggybacked_hostname), time_settings
+        )
     )
 
 
@@ -225,28 +373,36 @@ class _TimeSettingsMap:
             return 0
 
 
-def _get_piggyback_processed_file_infos(
+def _get_piggyback_processed_data(
     piggybacked_hostname: HostName | HostAddress,
+    located: Sequence[tuple[_Segment, _Entry]],
     time_settings: PiggybackTimeSettings,
-) -> Sequence[PiggybackFileInfo]:
-    """Gather a list of piggyback files to read for further processing.
+) -> Sequence[_PiggybackData]:
+    """Gather the piggyback data to read for further processing.
 
     Please note that there may be multiple parallel calls executing the
-    _get_piggyback_processed_file_infos(), store_piggyback_raw_data() or cleanup_piggyback_files()
-    functions. Therefor all these functions needs to deal with suddenly vanishing or
-    updated files/directories.
+    _get_piggyback_processed_data(), store_piggyback_raw_data() or cleanup_piggyback_files()
+    functions. The segment files are only ever replaced, so a loaded segment stays
+    consistent, but the source status files may vanish or be updated at any time.
     """
-    source_hostnames = get_source_hostnames(piggybacked_hostname)
-    expanded_time_settings = _TimeSettingsMap(source_hostnames, piggybacked_hostname, time_settings)
+    expanded_time_settings = _TimeSettingsMap(
+        [segment.source_hostname for segment, _entry in located],
+        piggybacked_hostname,
+        time_settings,
+    )
     return [
-        _get_piggyback_processed_file_info(
-            source_hostname,
-            piggybacked_hostname=piggybacked_hostname,
-            piggyback_file_path=_get_piggybacked_file_path(source_hostname, piggybacked_hostname),
-            settings=expanded_time_settings,
+        _PiggybackData(
+            _get_piggyback_processed_file_info(
+                segment.source_hostname,
+                piggybacked_hostname=piggybacked_hostname,
+                segment_file_path=segment.path,
+                mtime=entry.mtime,
+                settings=expanded_time_settings,
+            ),
+            segment,
+            entry,
         )
-        for source_hostname in source_hostnames
-        if not source_hostname.startswith(".")
+        for segment, entry in located
     ]
 
 
@@ -254,20 +410,16 @@ def _get_piggyback_processed_file_info(
     source_hostname: HostName,
     *,
     piggybacked_hostname: HostName | HostAddress,
-    piggyback_file_path: Path,
+    segment_file_path: Path,
+    mtime: float,
     settings: _TimeSettingsMap,
 ) -> PiggybackFileInfo:
-    try:
-        file_age = cmk.utils.cachefile_age(piggyback_file_path)
-    except FileNotFoundError:
-        return PiggybackFileInfo(
-            source_hostname, piggyback_file_path, False, "Piggyback file is missing", 0
-        )
+    file_age = time.time() - mtime
 
     if (outdated := file_age - settings.max_cache_age(source_hostname, piggybacked_hostname)) > 0:
         return PiggybackFileInfo(
             source_hostname,
-            piggyback_file_path,
+            segment_file_path,
             False,
             f"Piggyback file too old: {Age(outdated)}",
             0,
@@ -281,17 +433,17 @@ def _get_piggyback_processed_file_info(
         valid_msg = _validity_period_message(file_age, validity_period)
         return PiggybackFileInfo(
             source_hostname,
-            piggyback_file_path,
+            segment_file_path,
             bool(valid_msg),
             f"Source '{source_hostname}' not sending piggyback data{valid_msg}",
             validity_state if valid_msg else 0,
         )
 
-    if _is_piggyback_file_outdated(status_file_path, piggyback_file_path):
+    if _is_piggyback_file_outdated(status_file_path, mtime):
         valid_msg = _validity_period_message(file_age, validity_period)
         return PiggybackFileInfo(
             source_hostname,
-            piggyback_file_path,
+            segment_file_path,
             bool(valid_msg),
             f"Piggyback file not updated by source '{source_hostname}'{valid_msg}",
             validity_state if valid_msg else 0,
@@ -299,7 +451,7 @@ def _get_piggyback_processed_file_info(
 
     return PiggybackFileInfo(
         source_hostname,
-        piggyback_file_path,
+        segment_file_path,
         True,
         f"Successfully processed from source '{source_hostname}'",
         0,
@@ -315,16 +467,11 @@ def _validity_period_message(
     return f" (still valid, {Age(time_left)} left)"
 
 
-def _is_piggyback_file_outdated(
-    status_file_path: Path,
-    piggyback_file_path: Path,
-) -> bool:
+def _is_piggyback_file_outdated(status_file_path: Path, mtime: float) -> bool:
     try:
-        # TODO use Path.stat() but be aware of:
-        # On POSIX platforms Python reads atime and mtime at nanosecond resolution
-        # but only writes them at microsecond resolution.
-        # (We're using os.utime() in _store_status_file_of())
-        return os.stat(str(status_file_path))[8] > os.stat(str(piggyback_file_path))[8]
+        # The source stores its piggyback data with the mtime of its status file,
+        # see `_store_status_file_of()`.  Compare full seconds like we always did.
+        return int(status_file_path.stat().st_mtime) > int(mtime)
     except FileNotFoundError:
         return True
 
@@ -348,65 +495,97 @@ def store_piggyback_raw_data(
     source_hostname: HostName,
     piggybacked_raw_data: Mapping[HostName, Sequence[bytes]],
 ) -> None:
-    piggyback_file_paths = []
-    for piggybacked_hostname, lines in piggybacked_raw_data.items():
-        piggyback_file_path = _get_piggybacked_file_path(source_hostname, piggybacked_hostname)
+    # Only do this for hosts that sent piggyback data this turn, cleanup the status file when no
+    # piggyback data was sent this turn.
+    if not piggybacked_raw_data:
+        logger.debug("Received no piggyback data")
+        remove_source_status_file(source_hostname)
+        return
+
+    for piggybacked_hostname in piggybacked_raw_data:
         logger.log(
             VERBOSE,
             "Storing piggyback data for: %r",
             piggybacked_hostname,
         )
+    logger.log(VERBOSE, "Received piggyback data for %d hosts", len(piggybacked_raw_data))
+
+    segment_file_path = _get_segment_file_path(source_hostname)
+
+    def store_segment(mtime: float) -> None:
+        # Keep the data for hosts not sent this turn with their old time: it is
+        # outdated now, but may still be valid, see `validity_period`.
+        segment = _Segment.load(segment_file_path)
+        contents = {
+            piggybacked_hostname: content
+            for piggybacked_hostname, content in (
+                {} if segment is None else segment.contents()
+            ).items()
+            if piggybacked_hostname not in piggybacked_raw_data
+        }
         # Raw data is always stored as bytes. Later the content is
         # converted to unicode in abstact.py:_parse_info which respects
         # 'encoding' in section options.
-        store.save_bytes_to_file(piggyback_file_path, b"%s\n" % b"\n".join(lines))
-        piggyback_file_paths.append(piggyback_file_path)
+        contents.update(
+            (piggybacked_hostname, (b"%s\n" % b"\n".join(lines), mtime))
+            for piggybacked_hostname, lines in piggybacked_raw_data.items()
+        )
+        _save_segment(segment_file_path, contents)
 
     # Store the last contact with this piggyback source to be able to filter outdated data later
     # We use the mtime of this file later for comparison.
-    # Only do this for hosts that sent piggyback data this turn, cleanup the status file when no
-    # piggyback data was sent this turn.
-    if piggybacked_raw_data:
-        logger.log(VERBOSE, "Received piggyback data for %d hosts", len(piggybacked_raw_data))
-
-        status_file_path = _get_source_status_file_path(source_hostname)
-        _store_status_file_of(status_file_path, piggyback_file_paths)
-    else:
-        logger.debug("Received no piggyback data")
-        remove_source_status_file(source_hostname)
+    with store.locked(segment_file_path):
+        _store_status_file_of(_get_source_status_file_path(source_hostname), store_segment)
 
 
 def _store_status_file_of(
     status_file_path: Path,
-    piggyback_file_paths: Iterable[Path],
+    store_segment: Callable[[float], None],
 ) -> None:
     store.makedirs(status_file_path.parent)
 
     # Cannot use store.save_bytes_to_file like:
     # 1. store.save_bytes_to_file(status_file_path, b"")
-    # 2. set utime of piggybacked host files
+    # 2. store the piggyback data with the mtime of the status file
     # Between 1. and 2.:
-    # - the piggybacked host may check its files
-    # - status file is newer (before utime of piggybacked host files is set)
-    # => piggybacked host file is outdated
+    # - the piggybacked host may check its data
+    # - status file is newer than the data
+    # => piggybacked host data is outdated
     with tempfile.NamedTemporaryFile(
         "wb", dir=str(status_file_path.parent), prefix=f".{status_file_path.name}.new", delete=False
     ) as tmp:
         tmp_path = tmp.name
         tmp.write(b"")
+        store_segment(os.stat(tmp_path).st_mtime)
+    os.rename(tmp_path, str(status_file_path))
+
 
-        tmp_stats = os.stat(tmp_path)
-        status_file_times = (tmp_stats.st_atime, tmp_stats.st_mtime)
-        for piggyback_file_path in piggyback_file_paths:
-            try:
-                # TODO use Path.stat() but be aware of:
-                # On POSIX platforms Python reads atime and mtime at nanosecond resolution
-                # but only writes them at microsecond resolution.
-                # (We're using os.utime() in _store_status_file_of())
-                os.utime(str(piggyback_file_path), status_file_times)
-            except FileNotFoundError:
+def rename_piggybacked_host(oldname: HostName, newname: HostName) -> bool:
+    """Move the piggyback data of all sources for `oldname` to `newname`"""
+    renamed = False
+    for segment_file_path in _get_segment_file_paths():
+        with store.locked(segment_file_path):
+            if (segment := _Segment.load(segment_file_path)) is None or not segment.get(oldname):
                 continue
-    os.rename(tmp_path, str(status_file_path))
+            contents = segment.contents()
+            contents[newname] = contents.pop(oldname)
+            _save_segment(segment_file_path, contents)
+            renamed = True
+    return renamed
+
+
+def rename_source_host(oldname: HostName, newname: HostName) -> bool:
+    """Move the piggyback data sent by `oldname` to `newname`"""
+    old_path = _get_segment_file_path(oldname)
+    if not old_path.exists():
+        return False
+    with store.locked(old_path), store.locked(new_path := _get_segment_file_path(newname)):
+        # Locking creates the file in case it has been removed meanwhile
+        if old_path.stat().st_size == 0:
+            old_path.unlink()
+            return False
+        old_path.rename(new_path)
+    return True
 
 
 #   .--folders/files-------------------------------------------------------.
@@ -423,18 +602,13 @@ def get_source_hostnames(
     piggybacked_hostname: HostName | HostAddress | None = None,
 ) -> Sequence[HostName]:
     if piggybacked_hostname is None:
-        return [
-            HostName(source_host.name)
-            for piggybacked_host_folder in _get_piggybacked_host_folders()
-            for source_host in _files_in(piggybacked_host_folder)
-        ]
+        return [HostName(path.name) for path in _get_segment_file_paths()]
 
-    piggybacked_host_folder = cmk.utils.paths.piggyback_dir / Path(piggybacked_hostname)
-    return [HostName(source_host.name) for source_host in _files_in(piggybacked_host_folder)]
+    return [segment.source_hostname for segment, _entry in _locate(piggybacked_hostname)]
 
 
-def _get_piggybacked_host_folders() -> Sequence[Path]:
-    return _files_in(cmk.utils.paths.piggyback_dir)
+def _get_segment_file_paths() -> Sequence[Path]:
+    return _files_in(cmk.utils.paths.piggyback_dir / _SEGMENTS_DIR)
 
 
 def _get_source_state_files() -> Sequence[Path]:
@@ -452,11 +626,8 @@ def _get_source_status_file_path(source_hostname: HostName) -> Path:
     return cmk.utils.paths.piggyback_source_dir / str(source_hostname)
 
 
-def _get_piggybacked_file_path(
-    source_hostname: HostName,
-    piggybacked_hostname: HostName | HostAddress,
-) -> Path:
-    return cmk.utils.paths.piggyback_dir / piggybacked_hostname / source_hostname
+def _get_segment_file_path(source_hostname: HostName) -> Path:
+    return cmk.utils.paths.piggyback_dir / _SEGMENTS_DIR / str(source_hostname)
 
 
 # .
@@ -474,7 +645,7 @@ def cleanup_piggyback_files(time_settings: PiggybackTimeSettings) -> None:
     """This is a housekeeping job to clean up different old files from the
     piggyback directories.
 
-    # Source status files and/or piggybacked data files are cleaned up/deleted
+    # Source status files and/or piggybacked data are cleaned up/deleted
     # if and only if they have exceeded the maximum cache age configured in the
     # global settings or in the rule 'Piggybacked Host Files'."""
 
@@ -484,47 +655,56 @@ def cleanup_piggyback_files(time_settings: PiggybackTimeSettings) -> None:
         time_settings,
     )
 
-    piggybacked_hosts_settings = _get_piggybacked_hosts_settings(time_settings)
-
-    _cleanup_old_source_status_files(piggybacked_hosts_settings)
-    _cleanup_old_piggybacked_files(piggybacked_hosts_settings)
-
+    _cleanup_piggybacked_host_folders()
 
-def _get_piggybacked_hosts_settings(
-    time_settings: PiggybackTimeSettings,
-) -> Sequence[tuple[Path, Sequence[Path], _TimeSettingsMap]]:
-    piggybacked_hosts_settings = []
-    for piggybacked_host_folder in _get_piggybacked_host_folders():
-        source_hosts = _files_in(piggybacked_host_folder)
-        time_settings_map = _TimeSettingsMap(
-            [HostName(source_host.name) for source_host in source_hosts],
-            HostName(piggybacked_host_folder.name),
+    located = _locate_all()
+    piggybacked_hosts_settings = {
+        piggybacked_hostname: _TimeSettingsMap(
+            [segment.source_hostname for segment, _entry in segments_and_entries],
+            piggybacked_hostname,
             time_settings,
         )
-        piggybacked_hosts_settings.append(
-            (piggybacked_host_folder, source_hosts, time_settings_map)
+        for piggybacked_hostname, segments_and_entries in located.items()
+    }
+
+    _cleanup_old_source_status_files(located, piggybacked_hosts_settings)
+    _cleanup_old_piggybacked_data(piggybacked_hosts_settings, time_settings)
+
+
+def _cleanup_piggybacked_host_folders() -> None:
+    """Remove the folders of the former layout with one file per source and piggybacked host"""
+    for piggybacked_host_folder in _files_in(cmk.utils.paths.piggyback_dir):
+        logger.log(
+            VERBOSE,
+            "Piggyback folder '%s' is not used anymore. Remove it.",
+            piggybacked_host_folder,
         )
-    return piggybacked_hosts_settings
+        if piggybacked_host_folder.is_dir():
+            shutil.rmtree(piggybacked_host_folder, ignore_errors=True)
+        else:
+            _remove_piggyback_file(piggybacked_host_folder)
 
 
 def _cleanup_old_source_status_files(
-    piggybacked_hosts_settings: Iterable[tuple[Path, Iterable[Path], _TimeSettingsMap]]
+    located: Mapping[HostName, Sequence[tuple[_Segment, _Entry]]],
+    piggybacked_hosts_settings: Mapping[HostName, _TimeSettingsMap],
 ) -> None:
     """Remove source status files which exceed configured maximum cache age.
     There may be several 'Piggybacked Host Files' rules where the max age is configured.
     We simply use the greatest one per source."""
 
     max_cache_age_by_sources: dict[str, int] = {}
-    for piggybacked_host_folder, source_hosts, time_settings in piggybacked_hosts_settings:
-        for source_host in source_hosts:
+    for piggybacked_hostname, segments_and_entries in located.items():
+        time_settings = piggybacked_hosts_settings[piggybacked_hostname]
+        for segment, _entry in segments_and_entries:
             max_cache_age = time_settings.max_cache_age(
-                HostName(source_host.name),
-                HostName(piggybacked_host_folder.name),
+                segment.source_hostname,
+                piggybacked_hostname,
             )
 
-            max_cache_age_of_source = max_cache_age_by_sources.get(source_host.name)
+            max_cache_age_of_source = max_cache_age_by_sources.get(segment.source_hostname)
             if max_cache_age_of_source is None or max_cache_age_of_source <= max_cache_age:
-                max_cache_age_by_sources[source_host.name] = max_cache_age
+                max_cache_age_by_sources[segment.source_hostname] = max_cache_age
 
     for source_state_file in _get_source_state_files():
         try:
@@ -552,38 +732,41 @@ def _cleanup_old_source_status_files(
             _remove_piggyback_file(source_state_file)
 
 
-def _cleanup_old_piggybacked_files(
-    piggybacked_hosts_settings: Iterable[tuple[Path, Iterable[Path], _TimeSettingsMap]]
+def _cleanup_old_piggybacked_data(
+    piggybacked_hosts_settings: Mapping[HostName, _TimeSettingsMap],
+    time_settings: PiggybackTimeSettings,
 ) -> None:
-    """Remove piggybacked data files which exceed configured maximum cache age."""
-
-    for piggybacked_host_folder, source_hosts, time_settings in piggybacked_hosts_settings:
-        for piggybacked_host_source in source_hosts:
-            file_info = _get_piggyback_processed_file_info(
-                HostName(piggybacked_host_source.name),
-                piggybacked_hostname=HostName(piggybacked_host_folder.name),
-                piggyback_file_path=piggybacked_host_source,
-                settings=time_settings,
-            )
+    """Remove piggybacked data which exceeds configured maximum cache age."""
+
+    for segment_file_path in _get_segment_file_paths():
+        # Reload the segment under the lock, the source may have stored new data meanwhile.
+        with store.locked(segment_file_path):
+            if (segment := _Segment.load(segment_file_path)) is None:
+                continue
+
+            contents = {}
+            for piggybacked_hostname, entry in segment.entries():
+                file_info = _get_piggyback_processed_file_info(
+                    segment.source_hostname,
+                    piggybacked_hostname=piggybacked_hostname,
+                    segment_file_path=segment_file_path,
+                    mtime=entry.mtime,
+                    settings=piggybacked_hosts_settings.get(piggybacked_hostname)
+                    or _TimeSettingsMap(
+                        [segment.source_hostname], piggybacked_hostname, time_settings
+                    ),
+                )
+                if file_info.successfully_processed:
+                    contents[piggybacked_hostname] = (segment.raw_data(entry), entry.mtime)
+                    continue
 
-            if not file_info.successfully_processed:
                 logger.log(
                     VERBOSE,
-                    "Piggyback file '%s' is outdated (%s). Remove it.",
-                    piggybacked_host_source,
+                    "Piggyback data of '%s' from '%s' is outdated (%s). Remove it.",
+                    piggybacked_hostname,
+                    segment.source_hostname,
                     file_info.message,
                 )
-                _remove_piggyback_file(piggybacked_host_source)
 
-        # Remove empty backed host directory
-        try:
-            piggybacked_host_folder.rmdir()
-        except OSError as e:
-            if e.errno == errno.ENOTEMPTY:
-                continue
-            raise
-        logger.log(
-            VERBOSE,
-            "Piggyback folder '%s' is empty. Removed it.",
-            piggybacked_host_folder,
-        )
+            if len(contents) < len(segment):
+                _save_segment(segment_file_path, contents)
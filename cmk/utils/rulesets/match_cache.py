@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Persisted host matches of the rule conditions
+
+Resolving the host conditions of all rules is the most expensive part of the
+ruleset matching, and every cmk process does it again from scratch. The
+results are written to a file after the configuration has been activated, so
+short-lived processes like "cmk --check" or the automation calls can look
+them up instead.
+
+The file starts with a JSON header line: the format version, the signature of
+the configuration the matches have been computed for and the index of the
+matches. The matches themselves follow as host bitmasks (see HostBitsets). The
+file is memory mapped and only the bitmasks which are looked up are read.
+
+The signature covers the loaded configuration files (path, size and mtime),
+the configured hosts and the Checkmk version. If it does not match the current
+configuration, e.g. because something in etc/check_mk/conf.d has been
+changed, the file is not used.
+"""
+
+import contextlib
+import hashlib
+import json
+import mmap
+from collections.abc import Iterable, Mapping, Sequence
+from pathlib import Path
+from typing import Final
+
+import cmk.utils.store as store
+import cmk.utils.version as cmk_version
+
+FORMAT_VERSION: Final = 2
+
+
+def config_signature(config_files: Iterable[Path], hosts: Iterable[str]) -> str:
+    signature = hashlib.sha256(f"{FORMAT_VERSION} {cmk_version.__version__}\n".encode())
+    for path in config_files:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            signature.update(f"{path} missing\n".encode())
+            continue
+        signature.update(f"{path} {stat.st_size} {stat.st_mtime_ns}\n".encode())
+    for hostname in sorted(hosts):
+        signature.update(f"{hostname}\n".encode())
+    return signature.hexdigest()
+
+
+class RulesetMatchCache:
+    """Host matches of rule conditions, persisted across cmk invocations
+
+    The keys are up to the caller, the values are host bitmasks. Nothing is
+    read before the first lookup.
+    """
+
+    def __init__(self, path: Path, config_files: Sequence[Path], hosts: Iterable[str]) -> None:
+        self._path: Final = path
+        self._config_files: Final = config_files
+        self._hosts: Final = hosts
+        self._signature: str | None = None
+        self._mmap: mmap.mmap | None = None
+        self._data_offset = 0
+        self._index: dict[str, tuple[int, int]] | None = None
+        self._new_matches: dict[str, int] = {}
+
+    @property
+    def signature(self) -> str:
+        if self._signature is None:
+            self._signature = config_signature(self._config_files, self._hosts)
+        return self._signature
+
+    def _load_index(self) -> dict[str, tuple[int, int]]:
+        if self._index is not None:
+            return self._index
+
+        self._index = {}
+        try:
+            with self._path.open("rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):  # ValueError: empty file
+            return self._index
+
+        header_end = mapped.find(b"\n")
+        try:
+            header = json.loads(mapped[:header_end])
+        except ValueError:
+            mapped.close()
+            return self._index
+
+        if header.get("version") != FORMAT_VERSION or header.get("signature") != self.signature:
+            mapped.close()
+            return self._index
+
+        self._mmap = mapped
+        self._data_offset = header_end + 1
+        self._index = {key: (offset, length) for key, (offset, length) in header["index"].items()}
+        return self._index
+
+    def get(self, key: str) -> int | None:
+        with contextlib.suppress(KeyError):
+            return self._new_matches[key]
+        try:
+            offset, length = self._load_index()[key]
+        except KeyError:
+            return None
+        assert self._mmap is not None
+        start = self._data_offset + offset
+        return int.from_bytes(self._mmap[start : start + length], "little")
+
+    def add(self, key: str, hosts: int) -> None:
+        self._new_matches[key] = hosts
+
+    def save(self) -> None:
+        """Write the previously loaded and the added matches"""
+        matches: dict[str, int] = {}
+        for key in self._load_index():
+            if (hosts := self.get(key)) is not None:
+                matches[key] = hosts
+        matches.update(self._new_matches)
+
+        store.makedirs(self._path.parent)
+        store.save_bytes_to_file(self._path, _serialize(self.signature, matches))
+
+        self.close()
+        self._index = None
+        self._new_matches = {}
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+
+def _serialize(signature: str, matches: Mapping[str, int]) -> bytes:
+    index: dict[str, tuple[int, int]] = {}
+    data = bytearray()
+    for key, hosts in matches.items():
+        raw = hosts.to_bytes((hosts.bit_length() + 7) // 8, "little")
+        index[key] = (len(data), len(raw))
+        data += raw
+
+    header = json.dumps({"version": FORMAT_VERSION, "signature": signature, "index": index})
+    return header.encode() + b"\n" + bytes(data)
@@ -6,7 +6,8 @@
 
 import contextlib
 import dataclasses
-from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from collections.abc import Callable, Collection, Iterable, Iterator, Mapping, Sequence
+from itertools import compress
 from re import Pattern
 from typing import Any, cast, Generic, NamedTuple, NotRequired, TypeAlias, TypeVar
 
@@ -27,6 +28,7 @@ from cmk.utils.servicename import Item, ServiceName
 from cmk.utils.tags import TagConfig, TagGroupID, TagID
 
 from .conditions import HostOrServiceConditions, HostOrServiceConditionsSimple
+from .match_cache import RulesetMatchCache
 
 RulesetName = str  # Could move to a less cluttered module as it is often used on its own.
 TRuleValue = TypeVar("TRuleValue")
@@ -63,15 +65,14 @@ TagsOfHosts: TypeAlias = dict[HostName | HostAddress, Mapping[TagGroupID, TagID]
 LabelGroupsCacheId = tuple[tuple[AndOrNotLiteral, tuple[tuple[AndOrNotLiteral, str], ...]], ...]
 
 PreprocessedPattern: TypeAlias = tuple[bool, Pattern[str]]
-PreprocessedServiceRuleset: TypeAlias = list[
-    tuple[
-        TRuleValue,
-        set[HostName],
-        LabelGroups,
-        LabelGroupsCacheId,
-        PreprocessedPattern,
-    ]
+PreprocessedServiceRule: TypeAlias = tuple[
+    TRuleValue,
+    set[HostName],
+    LabelGroups,
+    LabelGroupsCacheId,
+    PreprocessedPattern,
 ]
+PreprocessedServiceRuleset: TypeAlias = list[PreprocessedServiceRule[TRuleValue]]
 
 # FIXME: A lot of signatures regarding rules and rule sets are simply lying:
 # They claim to expect a RuleConditionsSpec or Ruleset, but
@@ -148,6 +149,7 @@ class RulesetMatcher:
         all_configured_hosts: Sequence[HostName],
         clusters_of: Mapping[HostName, Sequence[HostName]],
         nodes_of: Mapping[HostName, Sequence[HostName]],
+        match_cache: RulesetMatchCache | None = None,
     ) -> None:
         super().__init__()
 
@@ -159,6 +161,7 @@ class RulesetMatcher:
             all_configured_hosts,
             clusters_of,
             nodes_of,
+            match_cache,
         )
         self.labels_of_host = self.ruleset_optimizer.labels_of_host
         self.labels_of_service = self.ruleset_optimizer.labels_of_service
@@ -329,33 +332,29 @@ class RulesetMatcher:
         ruleset: Sequence[RuleSpec[TRuleValue]],
     ) -> Iterator[TRuleValue]:
         """Returns a generator of the values of the matched rules"""
+        if match_object.service_description is None:
+            return
+
         with_foreign_hosts = (
             match_object.host_name not in self.ruleset_optimizer.all_processed_hosts()
         )
+
         optimized_ruleset = self.ruleset_optimizer.get_service_ruleset(ruleset, with_foreign_hosts)
 
+        service_labels_hash = hash(
+            None
+            if match_object.service_labels is None
+            else frozenset(match_object.service_labels.items())
+        )
         for (
             value,
-            hosts,
+            _hosts,
             service_label_groups,
             service_label_groups_cache_id,
             service_description_condition,
-        ) in optimized_ruleset:
-            if match_object.service_description is None:
-                continue
-
-            if match_object.host_name not in hosts:
-                continue
-
+        ) in optimized_ruleset.candidates(match_object.host_name, match_object.service_description):
             service_cache_id = (
-                (
-                    match_object.service_description,
-                    hash(
-                        None
-                        if match_object.service_labels is None
-                        else frozenset(match_object.service_labels.items())
-                    ),
-                ),
+                (match_object.service_description, service_labels_hash),
                 service_description_condition,
                 service_label_groups_cache_id,
             )
@@ -372,6 +371,177 @@ class RulesetMatcher:
                 yield value
 
 
+_REGEX_SPECIAL_CHARS = frozenset(".^$*+?{}[]()|\\")
+
+
+def _has_top_level_alternation(pattern: str) -> bool:
+    depth = 0
+    in_class = escaped = False
+    for char in pattern:
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth <= 0:
+            return True
+    return False
+
+
+def literal_prefix(pattern: str) -> str:
+    """Returns the text every match of the pattern starts with
+
+    The patterns of service conditions are matched at the beginning of the
+    service description. The result is conservative: An empty string is returned
+    whenever the pattern is not understood.
+    """
+    if _has_top_level_alternation(pattern):
+        return ""
+
+    prefix: list[str] = []
+    pos = 1 if pattern.startswith("^") else 0
+    while pos < len(pattern):
+        char = pattern[pos]
+        if char == "\\":
+            # Only escaped punctuation like "\\." or "\\ " is a literal character
+            if pos + 1 >= len(pattern) or pattern[pos + 1].isalnum():
+                break
+            literal, pos = pattern[pos + 1], pos + 2
+        elif char in _REGEX_SPECIAL_CHARS:
+            break
+        else:
+            literal, pos = char, pos + 1
+
+        if pattern[pos : pos + 1] in ("*", "?", "{"):
+            break  # The character is optional
+        prefix.append(literal)
+    return "".join(prefix)
+
+
+class ServiceRulesetIndex(Generic[TRuleValue]):
+    """Finds the candidate rules of a preprocessed service ruleset
+
+    The rules are partitioned by the hosts they apply to and by the literal
+    prefixes of their service description patterns. Both partitions are looked
+    up once per host and once per service description and are kept as bitmasks
+    of rule numbers, so matching a service only has to look at the rules which
+    can match at all. The candidates are returned in the order of the ruleset
+    and still have to be matched.
+    """
+
+    def __init__(
+        self,
+        rules: PreprocessedServiceRuleset[TRuleValue],
+        service_prefixes: Sequence[Collection[str]],
+    ) -> None:
+        """service_prefixes: For each rule the literal prefixes of its service
+        description patterns, empty if the rule is not restricted by them"""
+        self.rules = rules
+        self._unrestricted = 0
+        self._by_prefix: dict[str, int] = {}
+        for nr, prefixes in enumerate(service_prefixes):
+            if not prefixes:
+                self._unrestricted |= 1 << nr
+            for prefix in prefixes:
+                self._by_prefix[prefix] = self._by_prefix.get(prefix, 0) | 1 << nr
+        self._prefix_lengths = sorted({len(p) for p in self._by_prefix})
+
+        self._host_masks: dict[HostName | HostAddress, int] = {}
+        self._service_masks: dict[ServiceName, int] = {}
+
+    def candidates(
+        self, host_name: HostName | HostAddress, service_description: ServiceName
+    ) -> Iterator[PreprocessedServiceRule[TRuleValue]]:
+        try:
+            host_mask = self._host_masks[host_name]
+        except KeyError:
+            host_mask = self._host_masks.setdefault(host_name, self._host_mask(host_name))
+
+        try:
+            service_mask = self._service_masks[service_description]
+        except KeyError:
+            service_mask = self._service_masks.setdefault(
+                service_description, self._service_mask(service_description)
+            )
+
+        mask = host_mask & service_mask
+        while mask:
+            lowest = mask & -mask
+            yield self.rules[lowest.bit_length() - 1]
+            mask ^= lowest
+
+    def _host_mask(self, host_name: HostName | HostAddress) -> int:
+        mask = 0
+        for nr, (_value, hosts, *_rest) in enumerate(self.rules):
+            if host_name in hosts:
+                mask |= 1 << nr
+        return mask
+
+    def _service_mask(self, service_description: ServiceName) -> int:
+        mask = self._unrestricted
+        for length in self._prefix_lengths:
+            if length > len(service_description):
+                break
+            mask |= self._by_prefix.get(service_description[:length], 0)
+        return mask
+
+
+class HostBitsets:
+    """Sets of hosts represented as bitmasks
+
+    Every configured host is numbered, a set of hosts is the int with the bits
+    of its hosts set. This keeps the sets compact and makes intersections,
+    unions and complements cheap, even for many thousands of hosts. Hosts which
+    are not known to the numbering are never part of a set.
+
+    The hosts are numbered in sorted order, so the bitmasks of processes with the
+    same hosts are interchangeable (see RulesetMatchCache).
+    """
+
+    def __init__(self, hosts: Iterable[HostName]) -> None:
+        self._hosts = sorted(set(hosts))
+        self._host_ids: dict[str, int] = {hostname: nr for nr, hostname in enumerate(self._hosts)}
+        self.all = (1 << len(self._hosts)) - 1
+
+    def from_hosts(self, hosts: Iterable[str]) -> int:
+        bits = bytearray((len(self._hosts) + 7) // 8)
+        for hostname in hosts:
+            if (nr := self._host_ids.get(hostname)) is not None:
+                bits[nr >> 3] |= 1 << (nr & 7)
+        return int.from_bytes(bits, "little")
+
+    def to_hosts(self, bits: int) -> set[HostName]:
+        if bits.bit_count() > 64:
+            return set(compress(self._hosts, map("1".__eq__, reversed(bin(bits)[2:]))))
+
+        hosts = set()
+        while bits:
+            lowest = bits & -bits
+            hosts.add(self._hosts[lowest.bit_length() - 1])
+            bits ^= lowest
+        return hosts
+
+
+def _and_or_not_bits(
+    given_group_match: int, new_single_match: int, operator: AndOrNotLiteral
+) -> int:
+    """Same as _and_or_not_group_match(), for sets of hosts"""
+    match operator:
+        case "and":
+            return given_group_match & new_single_match
+        case "or":
+            return given_group_match | new_single_match
+        case "not":
+            return given_group_match & ~new_single_match
+
+
 # TODO: improve and cleanup types
 _ConditionCacheID: TypeAlias = tuple[
     tuple[str, ...],
@@ -394,43 +564,43 @@ class RulesetOptimizer:
         all_configured_hosts: Sequence[HostName],
         clusters_of: Mapping[HostName, Sequence[HostName]],
         nodes_of: Mapping[HostName, Sequence[HostName]],
+        match_cache: RulesetMatchCache | None = None,
     ) -> None:
         super().__init__()
         self.__labels_of_host: dict[HostName, Labels] = {}
         self._ruleset_matcher = ruleset_matcher
         self._label_manager = label_manager
-        self._host_tags = {hn: set(tags_of_host.items()) for hn, tags_of_host in host_tags.items()}
+        self._host_tags = host_tags
         self._host_paths = host_paths
         self._clusters_of = clusters_of
         self._nodes_of = nodes_of
 
         self._all_configured_hosts = all_configured_hosts
+        self._host_bits = HostBitsets(all_configured_hosts)
 
         # Contains all hostnames which are currently relevant for this cache.
         # Every active host or a subset of the active hosts when multiprocessing
         # is enabled.
-        self._all_processed_hosts = self._all_configured_hosts
-
-        # A factor which indicates how much hosts share the same host tag configuration (excluding folders).
-        # len(all_processed_hosts) / len(different tag combinations)
-        # It is used to determine the best rule evualation method
-        self._all_processed_hosts_similarity = 1.0
+        self._all_processed_hosts = frozenset(self._all_configured_hosts)
+        self._all_processed_hosts_bits = self._host_bits.all
 
-        self.__service_ruleset_cache: dict[tuple[int, bool], PreprocessedServiceRuleset] = {}
+        self.__service_ruleset_cache: dict[tuple[int, bool], ServiceRulesetIndex] = {}
         self.__host_ruleset_cache: dict[tuple[int, bool], Mapping[HostAddress, Sequence[Any]]] = {}
         self._all_matching_hosts_match_cache: dict[
             tuple[_ConditionCacheID, bool], set[HostName]
         ] = {}
+        # Matches persisted across processes, see _all_matching_hosts()
+        self._match_cache = match_cache
+
+        # Reference dirname -> configured hosts in this dir including subfolders
+        self._folder_host_lookup: dict[str, int] = {}
+        # Reference host path -> configured hosts with this path
+        self._hosts_by_path: dict[str, int] = {}
+        # Reference tag -> configured hosts with this tag
+        self._hosts_by_tag: dict[tuple[TagGroupID, TagID | None], int] = {}
+        # Reference label -> (hosts looked at so far, hosts with this label)
+        self._hosts_by_label: dict[tuple[str, str], tuple[int, int]] = {}
 
-        # Reference dirname -> hosts in this dir including subfolders
-        self._folder_host_lookup: dict[tuple[bool, str], set[HostName]] = {}
-
-        # Provides a list of hosts with the same hosttags, excluding the folder
-        self._hosts_grouped_by_tags: dict[tuple[tuple[TagGroupID, TagID], ...], set[HostName]] = {}
-        # Reference hostname -> tag group reference
-        self._host_grouped_ref: dict[HostName, tuple[tuple[TagGroupID, TagID], ...]] = {}
-
-        # TODO: Clean this one up?
         self._initialize_host_lookup()
 
     def clear_ruleset_caches(self) -> None:
@@ -441,7 +611,11 @@ class RulesetOptimizer:
         self.__host_ruleset_cache.clear()
         self._all_matching_hosts_match_cache.clear()
 
-    def all_processed_hosts(self) -> Sequence[HostName]:
+    def save_match_cache(self) -> None:
+        if self._match_cache is not None:
+            self._match_cache.save()
+
+    def all_processed_hosts(self) -> frozenset[HostName]:
         """Returns a set of all processed hosts"""
         return self._all_processed_hosts
 
@@ -460,25 +634,8 @@ class RulesetOptimizer:
 
         # Only add references to configured hosts
         nodes_and_clusters.intersection_update(self._all_configured_hosts)
-        self._all_processed_hosts = list(nodes_and_clusters)
-
-        # The folder host lookup includes a list of all -processed- hosts within a given
-        # folder. Any update with set_all_processed hosts invalidates this cache, because
-        # the scope of relevant hosts has changed. This is -good-, since the values in this
-        # lookup are iterated one by one later on in all_matching_hosts
-        self._folder_host_lookup = {}
-
-        used_groups = {
-            self._host_grouped_ref.get(hostname, ()) for hostname in self._all_processed_hosts
-        }
-
-        if not used_groups:
-            self._all_processed_hosts_similarity = 1.0
-            return
-
-        self._all_processed_hosts_similarity = (
-            1.0 * len(self._all_processed_hosts) / len(used_groups)
-        )
+        self._all_processed_hosts = frozenset(nodes_and_clusters)
+        self._all_processed_hosts_bits = self._host_bits.from_hosts(self._all_processed_hosts)
 
     def get_host_ruleset(
         self, ruleset: Sequence[RuleSpec[TRuleValue]], with_foreign_hosts: bool
@@ -504,11 +661,12 @@ class RulesetOptimizer:
 
     def get_service_ruleset(
         self, ruleset: Sequence[RuleSpec[TRuleValue]], with_foreign_hosts: bool
-    ) -> PreprocessedServiceRuleset[TRuleValue]:
+    ) -> ServiceRulesetIndex[TRuleValue]:
         def _impl(
             ruleset: Iterable[RuleSpec[TRuleValue]], with_foreign_hosts: bool
-        ) -> PreprocessedServiceRuleset[TRuleValue]:
+        ) -> ServiceRulesetIndex[TRuleValue]:
             new_rules: PreprocessedServiceRuleset[TRuleValue] = []
+            service_prefixes: list[frozenset[str]] = []
             for rule in ruleset:
                 if is_disabled(rule):
                     continue
@@ -538,7 +696,12 @@ class RulesetOptimizer:
                         ),
                     )
                 )
-            return new_rules
+                service_prefixes.append(
+                    RulesetOptimizer._service_description_prefixes(
+                        rule["condition"].get("service_description")
+                    )
+                )
+            return ServiceRulesetIndex(new_rules, service_prefixes)
 
         cache_id = id(ruleset), with_foreign_hosts
         with contextlib.suppress(KeyError):
@@ -567,7 +730,26 @@ class RulesetOptimizer:
 
         return negate, regex("(?:%s)" % "|".join("(?:%s)" % p for p in pattern_parts))
 
-    def _all_matching_hosts(  # pylint: disable=too-many-branches
+    @staticmethod
+    def _service_description_prefixes(
+        patterns: HostOrServiceConditions | None,
+    ) -> frozenset[str]:
+        """Literal prefixes of the service descriptions matched by the patterns
+
+        Empty, if the patterns may match service descriptions without one of them."""
+        if not patterns:
+            return frozenset()
+
+        negate, parsed_patterns = parse_negated_condition_list(patterns)
+        if negate:
+            return frozenset()
+
+        prefixes = frozenset(
+            literal_prefix(p["$regex"] if isinstance(p, dict) else p) for p in parsed_patterns
+        )
+        return frozenset() if "" in prefixes else prefixes
+
+    def _all_matching_hosts(
         self, condition: RuleConditionsSpec, with_foreign_hosts: bool
     ) -> set[HostName]:
         """Returns a set containing the names of hosts that match the given
@@ -577,78 +759,51 @@ class RulesetOptimizer:
         label_groups: LabelGroups = condition.get("host_label_groups", [])
         rule_path = condition.get("host_folder", "/")
 
-        cache_id = (
-            RulesetOptimizer._condition_cache_id(
-                hostlist,
-                tag_conditions,
-                label_groups,
-                rule_path,
-            ),
-            with_foreign_hosts,
+        condition_id = RulesetOptimizer._condition_cache_id(
+            hostlist,
+            tag_conditions,
+            label_groups,
+            rule_path,
         )
+        cache_id = condition_id, with_foreign_hosts
 
         try:
             return self._all_matching_hosts_match_cache[cache_id]
         except KeyError:
             pass
 
-        # Thin out the valid hosts further. If the rule is located in a folder
-        # we only need the intersection of the folders hosts and the previously determined valid_hosts
-        valid_hosts = self._get_hosts_within_folder(rule_path, with_foreign_hosts)
-
-        if tag_conditions and hostlist is None and not label_groups:
-            # TODO: Labels could also be optimized like the tags
-            matched_by_tags = self._match_hosts_by_tags(cache_id, valid_hosts, tag_conditions)
-            if matched_by_tags is not None:
-                return matched_by_tags
-
-        matching: set[HostName] = set()
-        only_specific_hosts = (
-            hostlist is not None
-            and not isinstance(hostlist, dict)
-            and all(not isinstance(x, dict) for x in hostlist)
-        )
-
-        if hostlist == []:
-            pass  # Empty host list -> Nothing matches
-
-        elif not tag_conditions and not label_groups and not hostlist:
-            # If no tags are specified and the hostlist only include @all (all hosts)
-            matching = valid_hosts
-
-        elif (
-            not tag_conditions and not label_groups and only_specific_hosts and hostlist is not None
-        ):
-            # If no tags are specified and there are only specific hosts we already have the matches
-            matching = valid_hosts.intersection(hostlist)
-
+        # The host labels may change without changing the configuration. The persisted matches
+        # cover all configured hosts, the processed hosts differ between the processes.
+        match_cache = None if label_groups else self._match_cache
+        if match_cache is not None:
+            if (matching := match_cache.get(repr(condition_id))) is None:
+                matching = self._match_hosts(condition, with_foreign_hosts=True)
+                match_cache.add(repr(condition_id), matching)
+            if not with_foreign_hosts:
+                matching &= self._all_processed_hosts_bits
         else:
-            # If the rule has only exact host restrictions, we can thin out the list of hosts to check
-            if only_specific_hosts and hostlist is not None:
-                hosts_to_check = valid_hosts.intersection(hostlist)
-            else:
-                hosts_to_check = valid_hosts
-
-            for hostname in hosts_to_check:
-                # When no tag matching is requested, do not filter by tags. Accept all hosts
-                # and filter only by hostlist
-                if tag_conditions and not matches_host_tags(
-                    self._host_tags[hostname],
-                    tag_conditions,
-                ):
-                    continue
+            matching = self._match_hosts(condition, with_foreign_hosts)
 
-                if label_groups:
-                    host_labels = self.labels_of_host(hostname)
-                    if not matches_labels(host_labels, label_groups):
-                        continue
-
-                if not matches_host_name(hostlist, hostname):
-                    continue
+        return self._all_matching_hosts_match_cache.setdefault(
+            cache_id, self._host_bits.to_hosts(matching)
+        )
 
-                matching.add(hostname)
+    def _match_hosts(self, condition: RuleConditionsSpec, with_foreign_hosts: bool) -> int:
+        hostlist = condition.get("host_name")
+        if hostlist == []:
+            return 0  # Empty host list -> Nothing matches
 
-        self._all_matching_hosts_match_cache[cache_id] = matching
+        # Thin out the valid hosts step by step, the cheap conditions first.
+        # The host labels are only computed for the hosts left over.
+        matching = self._get_hosts_within_folder(
+            condition.get("host_folder", "/"), with_foreign_hosts
+        )
+        if tag_conditions := condition.get("host_tags", {}):
+            matching = self._match_hosts_by_tags(matching, tag_conditions)
+        if hostlist:
+            matching = self._match_hosts_by_name(matching, hostlist)
+        if label_groups := condition.get("host_label_groups", []):
+            matching = self._match_hosts_by_labels(matching, label_groups)
         return matching
 
     @staticmethod
@@ -685,98 +840,106 @@ class RulesetOptimizer:
             rule_path,
         )
 
-    # TODO: Generalize this optimization: Build some kind of key out of the tag conditions
-    # (positive, negative, ...). Make it work with the new tag group based "$or" handling.
     def _match_hosts_by_tags(
-        self,
-        cache_id: tuple[_ConditionCacheID, bool],
-        valid_hosts: set[HostName],
-        tag_conditions: Mapping[TagGroupID, TagCondition],
-    ) -> set[HostName] | None:
-        matching = set()
-        negative_match_tags = set()
-        positive_match_tags = set()
+        self, valid_hosts: int, tag_conditions: Mapping[TagGroupID, TagCondition]
+    ) -> int:
+        matching = valid_hosts
         for taggroup_id, tag_condition in tag_conditions.items():
-            if isinstance(tag_condition, dict):
-                if "$ne" in tag_condition:
-                    negative_match_tags.add(
-                        (
-                            taggroup_id,
-                            cast(TagConditionNE, tag_condition)["$ne"],
-                        )
-                    )
-                    continue
-
-                if "$or" in tag_condition:
-                    return None  # Can not be optimized, makes _all_matching_hosts proceed
+            if not isinstance(tag_condition, dict):
+                matching &= self._hosts_by_tag.get((taggroup_id, tag_condition), 0)
+            elif "$ne" in tag_condition:
+                matching &= ~self._hosts_by_tag.get(
+                    (taggroup_id, cast(TagConditionNE, tag_condition)["$ne"]), 0
+                )
+            elif "$or" in tag_condition:
+                matching &= self._hosts_with_any_tag(
+                    taggroup_id, cast(TagConditionOR, tag_condition)["$or"]
+                )
+            elif "$nor" in tag_condition:
+                matching &= ~self._hosts_with_any_tag(taggroup_id, tag_condition["$nor"])
+            else:
+                raise NotImplementedError()
+        return matching
 
-                if "$nor" in tag_condition:
-                    return None  # Can not be optimized, makes _all_matching_hosts proceed
+    def _hosts_with_any_tag(self, taggroup_id: TagGroupID, tag_ids: Iterable[TagID | None]) -> int:
+        hosts = 0
+        for tag_id in tag_ids:
+            hosts |= self._hosts_by_tag.get((taggroup_id, tag_id), 0)
+        return hosts
+
+    def _match_hosts_by_name(self, valid_hosts: int, hostlist: HostOrServiceConditions) -> int:
+        negate, host_entries = parse_negated_condition_list(hostlist)
+        specific_hosts = [entry for entry in host_entries if not isinstance(entry, dict)]
+        if not negate and len(specific_hosts) == len(host_entries):
+            # Only specific hosts: No need to look at the other ones
+            return valid_hosts & self._host_bits.from_hosts(specific_hosts)
+
+        return self._host_bits.from_hosts(
+            hostname
+            for hostname in self._host_bits.to_hosts(valid_hosts)
+            if matches_host_name(hostlist, hostname)
+        )
 
-                raise NotImplementedError()
+    def _match_hosts_by_labels(self, valid_hosts: int, label_groups: LabelGroups) -> int:
+        """Same as matches_labels(), but for all valid hosts at once"""
+        matching = valid_hosts
+        for group_operator, label_group in label_groups:
+            group_matching = valid_hosts
+            for label_operator, label in label_group:
+                if not label:
+                    continue
 
-            positive_match_tags.add((taggroup_id, tag_condition))
-
-        # TODO:
-        # if has_specific_folder_tag or self._all_processed_hosts_similarity < 3.0:
-        if self._all_processed_hosts_similarity < 3.0:
-            # Without shared folders
-            for hostname in valid_hosts:
-                if positive_match_tags <= self._host_tags[
-                    hostname
-                ] and not negative_match_tags.intersection(self._host_tags[hostname]):
-                    matching.add(hostname)
-
-            self._all_matching_hosts_match_cache[cache_id] = matching
-            return matching
-
-        # With shared folders
-        checked_hosts: set[str] = set()
-        for hostname in valid_hosts:
-            if hostname in checked_hosts:
-                continue
+                key, value = _split_label_condition(label)
+                group_matching = _and_or_not_bits(
+                    group_matching, self._hosts_with_label(key, value, valid_hosts), label_operator
+                )
 
-            hosts_with_same_tag = self._filter_hosts_with_same_tags_as_host(hostname, valid_hosts)
-            checked_hosts.update(hosts_with_same_tag)
+            matching = _and_or_not_bits(matching, group_matching, group_operator)
 
-            if positive_match_tags <= self._host_tags[
-                hostname
-            ] and not negative_match_tags.intersection(self._host_tags[hostname]):
-                matching.update(hosts_with_same_tag)
+        return matching & valid_hosts
 
-        self._all_matching_hosts_match_cache[cache_id] = matching
-        return matching
+    def _hosts_with_label(self, key: str, value: str, valid_hosts: int) -> int:
+        """The valid hosts with the given label
 
-    def _filter_hosts_with_same_tags_as_host(
-        self,
-        hostname: HostName,
-        hosts: set[HostName],
-    ) -> set[HostName]:
-        return self._hosts_grouped_by_tags[self._host_grouped_ref[hostname]].intersection(hosts)
-
-    def _get_hosts_within_folder(self, folder_path: str, with_foreign_hosts: bool) -> set[HostName]:
-        cache_id = with_foreign_hosts, folder_path
-        if cache_id not in self._folder_host_lookup:
-            hosts_in_folder = set()
-            relevant_hosts = (
-                self._all_configured_hosts if with_foreign_hosts else self._all_processed_hosts
+        The labels of a host are only computed when it is looked at the first time."""
+        known_hosts, hosts_with_label = self._hosts_by_label.get((key, value), (0, 0))
+        if unknown_hosts := valid_hosts & ~known_hosts:
+            hosts_with_label |= self._host_bits.from_hosts(
+                hostname
+                for hostname in self._host_bits.to_hosts(unknown_hosts)
+                if self.labels_of_host(hostname).get(key) == value
             )
+            self._hosts_by_label[(key, value)] = (known_hosts | unknown_hosts, hosts_with_label)
+        return hosts_with_label & valid_hosts
 
-            for hostname in relevant_hosts:
-                host_path = self._host_paths.get(hostname, "/")
+    def _get_hosts_within_folder(self, folder_path: str, with_foreign_hosts: bool) -> int:
+        try:
+            hosts_in_folder = self._folder_host_lookup[folder_path]
+        except KeyError:
+            hosts_in_folder = 0
+            for host_path, hosts in self._hosts_by_path.items():
                 if host_path.startswith(folder_path):
-                    hosts_in_folder.add(hostname)
+                    hosts_in_folder |= hosts
+            self._folder_host_lookup[folder_path] = hosts_in_folder
 
-            self._folder_host_lookup[cache_id] = hosts_in_folder
+        if with_foreign_hosts:
             return hosts_in_folder
-
-        return self._folder_host_lookup[cache_id]
+        return hosts_in_folder & self._all_processed_hosts_bits
 
     def _initialize_host_lookup(self) -> None:
+        hosts_by_path: dict[str, list[HostName]] = {}
+        hosts_by_tag: dict[tuple[TagGroupID, TagID | None], list[HostName]] = {}
         for hostname in self._all_configured_hosts:
-            group_ref = tuple(sorted(self._host_tags[hostname]))
-            self._hosts_grouped_by_tags.setdefault(group_ref, set()).add(hostname)
-            self._host_grouped_ref[hostname] = group_ref
+            hosts_by_path.setdefault(self._host_paths.get(hostname, "/"), []).append(hostname)
+            for tag in self._host_tags.get(hostname, {}).items():
+                hosts_by_tag.setdefault(tag, []).append(hostname)
+
+        self._hosts_by_path = {
+            path: self._host_bits.from_hosts(hosts) for path, hosts in hosts_by_path.items()
+        }
+        self._hosts_by_tag = {
+            tag: self._host_bits.from_hosts(hosts) for tag, hosts in hosts_by_tag.items()
+        }
 
     def labels_of_host(self, hostname: HostName) -> Labels:
         """Returns the effective set of host labels from all available sources
@@ -962,6 +1125,14 @@ def matches_host_name(host_entries: HostOrServiceConditions | None, hostname: Ho
     return negate
 
 
+def _split_label_condition(label: str) -> tuple[str, str]:
+    try:
+        key, value = label.split(":")
+    except ValueError:
+        raise ValueError(f'Invalid label condition {label!r}, expected "key:value"')
+    return key, value
+
+
 def matches_labels(object_labels: Labels | None, required_label_groups: LabelGroups) -> bool:
     overall_match: bool = True
 
@@ -979,10 +1150,7 @@ def matches_labels(object_labels: Labels | None, required_label_groups: LabelGro
                     break
                 continue
 
-            try:
-                key, value = label.split(":")
-            except Exception:
-                raise NotImplementedError(f"HALLO DORT: wird hier zu wenig entpackt?  --  {label}")
+            key, value = _split_label_condition(label)
             label_match: bool = value == object_labels.get(key)
             group_match = _and_or_not_group_match(group_match, label_match, label_operator)
 
@@ -9,14 +9,19 @@ structured monitoring data of Check_MK.
 
 from __future__ import annotations
 
+import ast
 import gzip
 import io
+import json
+import mmap
+import os
 import pprint
+import zlib
 from collections import Counter
-from collections.abc import Callable, Iterable, Mapping, Sequence
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Generic, Literal, NamedTuple, Self, TypeVar
+from typing import Final, Generic, Literal, NamedTuple, Self, TypeVar
 
 from typing_extensions import TypedDict
 
@@ -38,8 +43,8 @@ from cmk.utils.hostaddress import HostName
 #   - MISSING (see mk/base/agent_based/inventory.py::_get_intervals_from_config) -> _use_nothing
 #   - 'all' -> _use_all
 # TODO Centralize different stores and loaders of tree files:
-#   - inventory/HOSTNAME, inventory/HOSTNAME.gz, inventory/.last
-#   - inventory_archive/HOSTNAME/TIMESTAMP,
+#   - inventory/HOSTNAME, inventory/HOSTNAME.gz, inventory/HOSTNAME.sdi, inventory/.last
+#   - inventory_archive/HOSTNAME/TIMESTAMP, inventory_archive/HOSTNAME/TIMESTAMP.delta,
 #   - inventory_delta_cache/HOSTNAME/TIMESTAMP_{TIMESTAMP,None}
 #   - status_data/HOSTNAME, status_data/HOSTNAME.gz
 
@@ -1157,6 +1162,29 @@ class ImmutableAttributes:
         }
 
 
+def _make_rows_by_ident(
+    key_columns: Sequence[SDKey], rows: Iterable[Mapping[SDKey, SDValue]]
+) -> Mapping[SDRowIdent, Mapping[SDKey, SDValue]]:
+    rows_by_ident: dict[SDRowIdent, dict[SDKey, SDValue]] = {}
+    for row in rows:
+        rows_by_ident.setdefault(_make_row_ident(key_columns, row), {}).update(row)
+    return rows_by_ident
+
+
+def _deserialize_table_retentions(
+    raw_retentions: Mapping[
+        SDRowIdent, Mapping[SDKey, tuple[int, int, int, Literal["previous", "current"]]]
+    ]
+) -> Mapping[SDRowIdent, Mapping[SDKey, RetentionInterval]]:
+    return {
+        ident: {
+            key: RetentionInterval.deserialize(raw_retention_interval)
+            for key, raw_retention_interval in raw_intervals_by_key.items()
+        }
+        for ident, raw_intervals_by_key in raw_retentions.items()
+    }
+
+
 @dataclass(frozen=True, kw_only=True)
 class ImmutableTable:
     key_columns: Sequence[SDKey] = field(default_factory=list)
@@ -1190,23 +1218,11 @@ class ImmutableTable:
 
     @classmethod
     def deserialize(cls, raw_table: SDRawTable) -> ImmutableTable:
-        rows = raw_table.get("Rows", [])
         key_columns = raw_table.get("KeyColumns", [])
-
-        rows_by_ident: dict[SDRowIdent, dict[SDKey, SDValue]] = {}
-        for row in rows:
-            rows_by_ident.setdefault(_make_row_ident(key_columns, row), {}).update(row)
-
         return ImmutableTable(
             key_columns=key_columns,
-            rows_by_ident=rows_by_ident,
-            retentions={
-                ident: {
-                    key: RetentionInterval.deserialize(raw_retention_interval)
-                    for key, raw_retention_interval in raw_intervals_by_key.items()
-                }
-                for ident, raw_intervals_by_key in raw_table.get("Retentions", {}).items()
-            },
+            rows_by_ident=_make_rows_by_ident(key_columns, raw_table.get("Rows", [])),
+            retentions=_deserialize_table_retentions(raw_table.get("Retentions", {})),
         )
 
     def serialize(self) -> SDRawTable:
@@ -1592,15 +1608,214 @@ class ImmutableDeltaTree:
 
 
 def load_tree(filepath: Path) -> ImmutableTree:
+    if (indexed_tree := IndexedTreeFile.open(filepath)) is not None:
+        return indexed_tree.get_tree(())
     if raw_tree := store.load_object_from_file(filepath, default=None):
         return ImmutableTree.deserialize(raw_tree)
     return ImmutableTree()
 
 
+# Indexed tree files
+# ==================
+# An indexed tree file "<tree file>.sdi" holds the same tree as the tree file next to it, but
+# every node is stored separately: its attributes and table meta data as one zlib compressed
+# Python literal and its table rows as zlib compressed JSON chunks of up to
+# _INDEXED_TREE_ROWS_PER_CHUNK rows. The header is a JSON object with the size and mtime of the
+# tree file it has been made for and the offsets and lengths of all nodes and row chunks:
+#
+#   b"CMKSDI1\n" <header length: 8 bytes, little endian> <header> <node data>...
+#
+# The file is memory mapped. Nodes are decoded when they are accessed for the first time, the
+# table rows of a node not before its table rows are accessed.
+
+_INDEXED_TREE_MAGIC = b"CMKSDI1\n"
+_INDEXED_TREE_ROWS_PER_CHUNK = 1000
+
+
+def indexed_tree_file(filepath: Path) -> Path:
+    return filepath.with_name(f"{filepath.name}.sdi")
+
+
+def save_indexed_tree(filepath: Path, raw_tree: SDRawTree) -> None:
+    """Write the indexed tree file of the (already written) tree file"""
+    stat = filepath.stat()
+    store.save_bytes_to_file(
+        indexed_tree_file(filepath),
+        _serialize_indexed_tree(raw_tree, (stat.st_size, stat.st_mtime_ns)),
+    )
+
+
+def _serialize_indexed_tree(raw_tree: SDRawTree, tree_file_stat: tuple[int, int]) -> bytes:
+    data = bytearray()
+    nodes: list[tuple[list[SDNodeName], int, int, list[tuple[int, int]]]] = []
+
+    def _add(payload: bytes) -> tuple[int, int]:
+        compressed = zlib.compress(payload)
+        offset = len(data)
+        data.extend(compressed)
+        return offset, len(compressed)
+
+    def _add_node(path: SDPath, raw_node: SDRawTree) -> None:
+        raw_table = raw_node["Table"]
+        node_offset, node_length = _add(
+            repr(
+                {
+                    "Attributes": raw_node["Attributes"],
+                    "KeyColumns": raw_table.get("KeyColumns", []),
+                    "Retentions": raw_table.get("Retentions", {}),
+                }
+            ).encode("utf-8")
+        )
+        rows = raw_table.get("Rows", [])
+        chunks = [
+            _add(json.dumps(rows[idx : idx + _INDEXED_TREE_ROWS_PER_CHUNK]).encode("utf-8"))
+            for idx in range(0, len(rows), _INDEXED_TREE_ROWS_PER_CHUNK)
+        ]
+        nodes.append((list(path), node_offset, node_length, chunks))
+        for name, raw_child in raw_node["Nodes"].items():
+            _add_node(path + (name,), raw_child)
+
+    _add_node((), raw_tree)
+    header = json.dumps({"tree_file": tree_file_stat, "nodes": nodes}).encode("utf-8")
+    return _INDEXED_TREE_MAGIC + len(header).to_bytes(8, "little") + header + data
+
+
+class _IndexedNode(NamedTuple):
+    offset: int
+    length: int
+    chunks: Sequence[tuple[int, int]]
+
+
+class IndexedTreeFile:
+    """Lazy access to the nodes and table rows of an indexed tree file"""
+
+    def __init__(self, data: bytes | mmap.mmap) -> None:
+        if data[: len(_INDEXED_TREE_MAGIC)] != _INDEXED_TREE_MAGIC:
+            raise ValueError("Not an indexed tree file")
+        header_start = len(_INDEXED_TREE_MAGIC) + 8
+        header_end = header_start + int.from_bytes(
+            data[len(_INDEXED_TREE_MAGIC) : header_start], "little"
+        )
+        header = json.loads(data[header_start:header_end])
+        # Size and mtime of the tree file this file has been made for
+        self.tree_file_stat: Final = tuple(header["tree_file"])
+
+        self._data = data
+        self._data_offset = header_end
+        self._nodes: dict[SDPath, _IndexedNode] = {}
+        self._child_names: dict[SDPath, list[SDNodeName]] = {}
+        for raw_path, offset, length, chunks in header["nodes"]:
+            path = tuple(raw_path)
+            self._nodes[path] = _IndexedNode(offset, length, [tuple(c) for c in chunks])
+            for idx in range(len(path)):
+                child_names = self._child_names.setdefault(path[:idx], [])
+                if path[idx] not in child_names:
+                    child_names.append(path[idx])
+
+    @classmethod
+    def open(cls, filepath: Path) -> IndexedTreeFile | None:
+        """Open the indexed tree file of the tree file if it is up to date"""
+        try:
+            stat = filepath.stat()
+            with indexed_tree_file(filepath).open("rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):  # ValueError: empty file
+            return None
+
+        try:
+            tree_file = cls(data)
+        except (ValueError, KeyError, TypeError):
+            return None
+        return tree_file if tree_file.tree_file_stat == (stat.st_size, stat.st_mtime_ns) else None
+
+    def _read(self, offset: int, length: int) -> bytes:
+        start = self._data_offset + offset
+        return zlib.decompress(self._data[start : start + length])
+
+    def get_tree(self, path: SDPath) -> ImmutableTree:
+        if path not in self._nodes and path not in self._child_names:
+            return ImmutableTree()
+
+        if (node := self._nodes.get(path)) is None:
+            attributes = ImmutableAttributes()
+            table = ImmutableTable()
+        else:
+            raw_node = ast.literal_eval(self._read(node.offset, node.length).decode("utf-8"))
+            attributes = ImmutableAttributes.deserialize(raw_node["Attributes"])
+            table = ImmutableTable(
+                key_columns=raw_node["KeyColumns"],
+                rows_by_ident=_LazyRowsByIdent(self, path, raw_node["KeyColumns"]),
+                retentions=_deserialize_table_retentions(raw_node["Retentions"]),
+            )
+
+        return ImmutableTree(
+            path=path,
+            attributes=attributes,
+            table=table,
+            nodes_by_name=_LazyNodesByName(self, path, self._child_names.get(path, [])),
+        )
+
+    def iter_rows(self, path: SDPath) -> Iterator[Mapping[SDKey, SDValue]]:
+        """Stream the table rows of a node as stored, chunk by chunk"""
+        if (node := self._nodes.get(path)) is None:
+            return
+        for offset, length in node.chunks:
+            yield from json.loads(self._read(offset, length))
+
+
+class _LazyNodesByName(Mapping[SDNodeName, ImmutableTree]):
+    def __init__(self, tree_file: IndexedTreeFile, path: SDPath, names: Sequence[SDNodeName]):
+        self._tree_file = tree_file
+        self._path = path
+        self._names = names
+        self._nodes: dict[SDNodeName, ImmutableTree] = {}
+
+    def __getitem__(self, name: SDNodeName) -> ImmutableTree:
+        if name not in self._names:
+            raise KeyError(name)
+        if (node := self._nodes.get(name)) is None:
+            node = self._nodes[name] = self._tree_file.get_tree(self._path + (name,))
+        return node
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._names
+
+    def __iter__(self) -> Iterator[SDNodeName]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+class _LazyRowsByIdent(Mapping[SDRowIdent, Mapping[SDKey, SDValue]]):
+    def __init__(self, tree_file: IndexedTreeFile, path: SDPath, key_columns: Sequence[SDKey]):
+        self._tree_file = tree_file
+        self._path = path
+        self._key_columns = key_columns
+        self._rows_by_ident: Mapping[SDRowIdent, Mapping[SDKey, SDValue]] | None = None
+
+    def _load(self) -> Mapping[SDRowIdent, Mapping[SDKey, SDValue]]:
+        if self._rows_by_ident is None:
+            self._rows_by_ident = _make_rows_by_ident(
+                self._key_columns, self._tree_file.iter_rows(self._path)
+            )
+        return self._rows_by_ident
+
+    def __getitem__(self, ident: SDRowIdent) -> Mapping[SDKey, SDValue]:
+        return self._load()[ident]
+
+    def __iter__(self) -> Iterator[SDRowIdent]:
+        return iter(self._load())
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+
 class TreeStore:
-    def __init__(self, tree_dir: Path | str) -> None:
+    def __init__(self, tree_dir: Path | str, *, indexed: bool = False) -> None:
         self._tree_dir = Path(tree_dir)
         self._last_filepath = Path(tree_dir) / ".last"
+        self._indexed = indexed
 
     def load(self, *, host_name: HostName) -> ImmutableTree:
         return load_tree(self._tree_file(host_name))
@@ -1618,12 +1833,18 @@ class TreeStore:
             f.write((repr(output) + "\n").encode("utf-8"))
         store.save_bytes_to_file(self._gz_file(host_name), buf.getvalue())
 
+        if self._indexed:
+            save_indexed_tree(tree_file, output)
+        else:
+            indexed_tree_file(tree_file).unlink(missing_ok=True)
+
         # Inform Livestatus about the latest inventory update
         self._last_filepath.touch()
 
     def remove(self, *, host_name: HostName) -> None:
         self._tree_file(host_name).unlink(missing_ok=True)
         self._gz_file(host_name).unlink(missing_ok=True)
+        indexed_tree_file(self._tree_file(host_name)).unlink(missing_ok=True)
 
     def _tree_file(self, host_name: HostName) -> Path:
         return self._tree_dir / str(host_name)
@@ -1632,34 +1853,349 @@ class TreeStore:
         return self._tree_dir / f"{host_name}.gz"
 
 
+# Tree archive
+# ============
+# The archive of a host holds the previous versions of its tree, one file per version named by
+# the time the version has been written. A keyframe "TIMESTAMP" holds the whole tree, a delta
+# "TIMESTAMP.delta" holds the timestamp of a keyframe and a patch of this keyframe (changed
+# attributes, changed rows, removed rows, removed nodes, ...). A version is restored by loading
+# one keyframe and applying one patch, no matter how many versions there are.
+#
+# Every keyframe_interval-th version is a new keyframe. Archives without deltas (keyframe
+# interval 1) are the same as the archives of previous versions.
+#
+# Removing a keyframe re-bases the deltas referring to it, see TreeArchive.remove. Versions
+# removed otherwise, e.g. by the cleanup of the oldest files, leave deltas which cannot be
+# restored anymore: loading them raises FileNotFoundError.
+#
+# The deltas are not stored as ImmutableDeltaTree: it has no retention intervals and it cannot
+# distinguish a removed value from a None value.
+
+ARCHIVE_KEYFRAME_INTERVAL: Final = 10
+_DELTA_SUFFIX = ".delta"
+
+
+class _SDRawTablePatch(TypedDict, total=False):
+    KeyColumns: Sequence[SDKey]
+    Rows: Sequence[Mapping[SDKey, SDValue]]
+    RemovedRows: Sequence[SDRowIdent]
+    Retentions: Mapping[
+        SDRowIdent, Mapping[SDKey, tuple[int, int, int, Literal["previous", "current"]]]
+    ]
+
+
+class _SDRawTreePatch(TypedDict, total=False):
+    Attributes: SDRawAttributes
+    Table: _SDRawTablePatch
+    Nodes: Mapping[SDNodeName, _SDRawTreePatch]
+    RemovedNodes: Sequence[SDNodeName]
+
+
+def _make_table_patch(base: ImmutableTable, table: ImmutableTable) -> _SDRawTablePatch:
+    patch: _SDRawTablePatch = {}
+    if list(base.key_columns) != list(table.key_columns):
+        patch["KeyColumns"] = table.key_columns
+        removed_rows = list(base.rows_by_ident)
+        rows = list(table.rows_by_ident.values())
+    else:
+        removed_rows = [i for i in base.rows_by_ident if i not in table.rows_by_ident]
+        rows = [r for i, r in table.rows_by_ident.items() if base.rows_by_ident.get(i) != r]
+    if rows:
+        patch["Rows"] = rows
+    if removed_rows:
+        patch["RemovedRows"] = removed_rows
+    if base.retentions != table.retentions:
+        patch["Retentions"] = {
+            i: {k: v.serialize() for k, v in ri.items()} for i, ri in table.retentions.items()
+        }
+    return patch
+
+
+def _make_tree_patch(base: ImmutableTree, tree: ImmutableTree) -> _SDRawTreePatch:
+    patch: _SDRawTreePatch = {}
+    if (
+        base.attributes.pairs != tree.attributes.pairs
+        or base.attributes.retentions != tree.attributes.retentions
+    ):
+        patch["Attributes"] = tree.attributes.serialize()
+    if table_patch := _make_table_patch(base.table, tree.table):
+        patch["Table"] = table_patch
+
+    nodes: dict[SDNodeName, _SDRawTreePatch] = {}
+    for name, node in tree.nodes_by_name.items():
+        if (base_node := base.nodes_by_name.get(name)) is None:
+            nodes[name] = _make_tree_patch(ImmutableTree(path=node.path), node)
+        elif node_patch := _make_tree_patch(base_node, node):
+            nodes[name] = node_patch
+    if nodes:
+        patch["Nodes"] = nodes
+    if removed_nodes := [name for name in base.nodes_by_name if name not in tree.nodes_by_name]:
+        patch["RemovedNodes"] = removed_nodes
+    return patch
+
+
+def _apply_table_patch(base: ImmutableTable, patch: _SDRawTablePatch) -> ImmutableTable:
+    key_columns = patch.get("KeyColumns", base.key_columns)
+    removed_rows = set(patch.get("RemovedRows", []))
+    rows_by_ident = {i: r for i, r in base.rows_by_ident.items() if i not in removed_rows}
+    for row in patch.get("Rows", []):
+        rows_by_ident[_make_row_ident(key_columns, row)] = row
+    return ImmutableTable(
+        key_columns=key_columns,
+        rows_by_ident=rows_by_ident,
+        retentions=(
+            _deserialize_table_retentions(patch["Retentions"])
+            if "Retentions" in patch
+            else base.retentions
+        ),
+    )
+
+
+def _apply_tree_patch(base: ImmutableTree, patch: _SDRawTreePatch) -> ImmutableTree:
+    raw_nodes = patch.get("Nodes", {})
+    removed_nodes = set(patch.get("RemovedNodes", []))
+    nodes_by_name = {
+        name: node
+        for name, node in base.nodes_by_name.items()
+        if name not in raw_nodes and name not in removed_nodes
+    }
+    for name, raw_node in raw_nodes.items():
+        nodes_by_name[name] = _apply_tree_patch(
+            base.nodes_by_name.get(name, ImmutableTree(path=base.path + (name,))), raw_node
+        )
+    return ImmutableTree(
+        path=base.path,
+        attributes=(
+            ImmutableAttributes.deserialize(patch["Attributes"])
+            if "Attributes" in patch
+            else base.attributes
+        ),
+        table=_apply_table_patch(base.table, patch["Table"]) if "Table" in patch else base.table,
+        nodes_by_name=nodes_by_name,
+    )
+
+
+class TreeArchive:
+    """The archived versions of the tree of a host, see above"""
+
+    def __init__(self, archive_dir: Path | str, host_name: HostName) -> None:
+        self._host_dir = Path(archive_dir) / str(host_name)
+        self._keyframes: dict[int, ImmutableTree] = {}
+
+    def files(self) -> Mapping[int, Path]:
+        """The files of the archived versions by their timestamps, the oldest first"""
+        try:
+            filepaths = list(self._host_dir.iterdir())
+        except FileNotFoundError:
+            return {}
+
+        files: dict[int, Path] = {}
+        for filepath in filepaths:
+            try:
+                timestamp = int(filepath.name.removesuffix(_DELTA_SUFFIX))
+            except ValueError:
+                continue
+            # A keyframe replaces the delta of the same version, which may be left over
+            if not filepath.name.endswith(_DELTA_SUFFIX) or timestamp not in files:
+                files[timestamp] = filepath
+        return dict(sorted(files.items()))
+
+    def load_file(self, filepath: Path) -> ImmutableTree:
+        """Load a tree file or restore the version of a delta file
+
+        Raises FileNotFoundError if the delta file or its keyframe does not exist."""
+        if not filepath.name.endswith(_DELTA_SUFFIX):
+            return load_tree(filepath)
+        if (raw_delta := store.load_object_from_file(filepath, default=None)) is None:
+            raise FileNotFoundError(f"Missing delta file {filepath}")
+        return _apply_tree_patch(self._load_keyframe(raw_delta["Keyframe"]), raw_delta["Patch"])
+
+    def load(self, timestamp: int) -> ImmutableTree:
+        if (filepath := self.files().get(timestamp)) is None:
+            return ImmutableTree()
+        return self.load_file(filepath)
+
+    def _load_keyframe(self, timestamp: int) -> ImmutableTree:
+        if (keyframe := self._keyframes.get(timestamp)) is None:
+            if not (filepath := self._host_dir / str(timestamp)).exists():
+                raise FileNotFoundError(f"Missing keyframe {filepath}")
+            keyframe = self._keyframes[timestamp] = load_tree(filepath)
+        return keyframe
+
+    def _save_delta(self, timestamp: int, keyframe_timestamp: int, tree: ImmutableTree) -> None:
+        store.save_object_to_file(
+            self._host_dir / f"{timestamp}{_DELTA_SUFFIX}",
+            {
+                "Keyframe": keyframe_timestamp,
+                "Patch": _make_tree_patch(self._load_keyframe(keyframe_timestamp), tree),
+            },
+        )
+
+    def add(self, tree_file: Path, timestamp: int, *, keyframe_interval: int) -> None:
+        """Move a tree file into the archive, as delta if the latest keyframe is recent enough"""
+        self._host_dir.mkdir(parents=True, exist_ok=True)
+
+        num_deltas = 0
+        for archived_timestamp, filepath in sorted(self.files().items(), reverse=True):
+            if filepath.name.endswith(_DELTA_SUFFIX):
+                num_deltas += 1
+                continue
+            if (
+                num_deltas < keyframe_interval - 1
+                and archived_timestamp != timestamp
+                and self._load_keyframe(archived_timestamp)
+            ):
+                self._save_delta(timestamp, archived_timestamp, load_tree(tree_file))
+                tree_file.unlink()
+                return
+            break
+
+        tree_file.rename(self._host_dir / str(timestamp))
+        (self._host_dir / f"{timestamp}{_DELTA_SUFFIX}").unlink(missing_ok=True)
+        self._keyframes.pop(timestamp, None)
+
+    def remove(self, timestamp: int) -> None:
+        """Remove an archived version
+
+        The oldest delta referring to a removed keyframe becomes the new keyframe of the others.
+        The files keep their modification times, so the cleanup of the oldest files still
+        removes the versions in their order."""
+        files = self.files()
+        if (filepath := files.get(timestamp)) is None:
+            return
+        if not filepath.name.endswith(_DELTA_SUFFIX):
+            self._rebase_deltas(timestamp, files)
+        filepath.unlink(missing_ok=True)
+        self._keyframes.pop(timestamp, None)
+
+    def _rebase_deltas(self, keyframe_timestamp: int, files: Mapping[int, Path]) -> None:
+        based = [
+            timestamp
+            for timestamp, filepath in files.items()
+            if filepath.name.endswith(_DELTA_SUFFIX)
+            and store.load_object_from_file(filepath, default={}).get("Keyframe")
+            == keyframe_timestamp
+        ]
+        if not based:
+            return
+
+        trees = {timestamp: self.load_file(files[timestamp]) for timestamp in based}
+        mtimes = {timestamp: files[timestamp].stat().st_mtime for timestamp in based}
+
+        new_keyframe_timestamp, *delta_timestamps = based
+        new_keyframe_file = self._host_dir / str(new_keyframe_timestamp)
+        store.save_object_to_file(new_keyframe_file, trees[new_keyframe_timestamp].serialize())
+        os.utime(new_keyframe_file, (mtimes[new_keyframe_timestamp],) * 2)
+        files[new_keyframe_timestamp].unlink()
+        self._keyframes[new_keyframe_timestamp] = trees[new_keyframe_timestamp]
+
+        for timestamp in delta_timestamps:
+            self._save_delta(timestamp, new_keyframe_timestamp, trees[timestamp])
+            os.utime(files[timestamp], (mtimes[timestamp],) * 2)
+
+    def compact(self, *, keyframe_interval: int) -> None:
+        """Replace archived trees by deltas, keep every keyframe_interval-th one as keyframe"""
+        files = self.files()
+        raw_deltas = {
+            timestamp: store.load_object_from_file(filepath, default={})
+            for timestamp, filepath in files.items()
+            if filepath.name.endswith(_DELTA_SUFFIX)
+        }
+        # These keyframes must be kept, even if they are not at the right position
+        referenced = {raw_delta.get("Keyframe") for raw_delta in raw_deltas.values()}
+
+        keyframe_timestamp: int | None = None
+        num_deltas = 0
+        for timestamp, filepath in files.items():
+            if timestamp in raw_deltas:
+                if raw_deltas[timestamp].get("Keyframe") == keyframe_timestamp:
+                    num_deltas += 1
+                continue
+            if (
+                keyframe_timestamp is not None
+                and timestamp not in referenced
+                and num_deltas < keyframe_interval - 1
+                and (tree := load_tree(filepath))
+            ):
+                self._save_delta(timestamp, keyframe_timestamp, tree)
+                filepath.unlink()
+                num_deltas += 1
+                continue
+            keyframe_timestamp = timestamp if self._load_keyframe(timestamp) else None
+            num_deltas = 0
+
+
 class TreeOrArchiveStore(TreeStore):
-    def __init__(self, tree_dir: Path | str, archive: Path | str) -> None:
-        super().__init__(tree_dir)
+    def __init__(
+        self,
+        tree_dir: Path | str,
+        archive: Path | str,
+        *,
+        indexed: bool = False,
+        delta_archive: bool = False,
+    ) -> None:
+        super().__init__(tree_dir, indexed=indexed)
         self._archive_dir = Path(archive)
+        self._delta_archive = delta_archive
+        self._archives: dict[HostName, TreeArchive] = {}
+
+    def _archive(self, host_name: HostName) -> TreeArchive:
+        if (tree_archive := self._archives.get(host_name)) is None:
+            tree_archive = self._archives[host_name] = TreeArchive(self._archive_dir, host_name)
+        return tree_archive
 
     def load_previous(self, *, host_name: HostName) -> ImmutableTree:
         if (tree_file := self._tree_file(host_name=host_name)).exists():
             return load_tree(tree_file)
 
-        try:
-            latest_archive_tree_file = max(
-                self._archive_host_dir(host_name).iterdir(), key=lambda tp: int(tp.name)
-            )
-        except (FileNotFoundError, ValueError):
+        if not (files := self._archive(host_name).files()):
             return ImmutableTree()
 
-        return load_tree(latest_archive_tree_file)
-
-    def _archive_host_dir(self, host_name: HostName) -> Path:
-        return self._archive_dir / str(host_name)
+        return self._archive(host_name).load_file(files[max(files)])
 
     def archive(self, *, host_name: HostName) -> None:
         if not (tree_file := self._tree_file(host_name)).exists():
             return
-        target_dir = self._archive_host_dir(host_name)
-        target_dir.mkdir(parents=True, exist_ok=True)
-        tree_file.rename(target_dir / str(int(tree_file.stat().st_mtime)))
+        self._archive(host_name).add(
+            tree_file,
+            int(tree_file.stat().st_mtime),
+            keyframe_interval=ARCHIVE_KEYFRAME_INTERVAL if self._delta_archive else 1,
+        )
         self._gz_file(host_name).unlink(missing_ok=True)
+        indexed_tree_file(tree_file).unlink(missing_ok=True)
+
+    def timestamps(self, *, host_name: HostName) -> Sequence[int]:
+        """The timestamps of the archived trees and of the current tree, the oldest first"""
+        timestamps = list(self._archive(host_name).files())
+        try:
+            timestamps.append(int(self._tree_file(host_name).stat().st_mtime))
+        except FileNotFoundError:
+            pass
+        return timestamps
+
+    def load_at(self, *, host_name: HostName, timestamp: int) -> ImmutableTree:
+        """The tree of the host as it was at the given time"""
+        tree_file = self._tree_file(host_name)
+        try:
+            if int(tree_file.stat().st_mtime) <= timestamp:
+                return load_tree(tree_file)
+        except FileNotFoundError:
+            pass
+
+        files = self._archive(host_name).files()
+        if not (timestamps := [t for t in files if t <= timestamp]):
+            return ImmutableTree()
+        return self._archive(host_name).load_file(files[max(timestamps)])
+
+    def difference(
+        self, *, host_name: HostName, previous: int | None, current: int
+    ) -> ImmutableDeltaTree:
+        """The changes between the trees at the given times"""
+        return self.load_at(host_name=host_name, timestamp=current).difference(
+            ImmutableTree()
+            if previous is None
+            else self.load_at(host_name=host_name, timestamp=previous)
+        )
 
 
 # .
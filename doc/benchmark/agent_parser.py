@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark of the section splitting of the agent parser
+
+Splits a synthetic agent output with the AgentParser and with the line by line
+state machine of former versions, once for all sections and once for a
+selection of a few sections.
+
+    OMD_SITE=NO_SITE PYTHONPATH=. python3 doc/benchmark/agent_parser.py --sections 100 --lines 1000
+"""
+
+import argparse
+import logging
+import time
+from collections.abc import Callable
+
+from cmk.utils.agentdatatype import AgentRawData
+from cmk.utils.hostaddress import HostName
+from cmk.utils.sectionname import SectionName
+from cmk.utils.translations import TranslationOptions
+
+from cmk.checkengine.parser import NO_SELECTION, SectionNameCollection
+from cmk.checkengine.parser._agent import AgentParser, NOOPParser, ParserState
+
+_LOGGER = logging.getLogger("benchmark")
+
+
+def _parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--sections", type=int, default=100)
+    parser.add_argument("--lines", type=int, default=1000)
+    parser.add_argument("--selected", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args()
+
+
+def _raw_data(num_sections: int, num_lines: int) -> AgentRawData:
+    return AgentRawData(
+        b"".join(
+            b"<<<section_%d>>>\n" % nr
+            + b"".join(b"  column %d of line %d  \n" % (nr, line) for line in range(num_lines))
+            for nr in range(num_sections)
+        )
+    )
+
+
+def _state_machine(parser: AgentParser, raw_data: AgentRawData) -> None:
+    state: ParserState = NOOPParser(
+        parser.hostname,
+        [],
+        {},
+        translation=parser.translation,
+        encoding_fallback=parser.encoding_fallback,
+        logger=_LOGGER,
+    )
+    for line in raw_data.split(b"\n"):
+        state = state(line.rstrip(b"\r"))
+
+
+def _measure(name: str, split: Callable[[], object], repeat: int) -> None:
+    start = time.perf_counter()
+    for _nr in range(repeat):
+        split()
+    print(f"{name:<30} {(time.perf_counter() - start) / repeat * 1000:8.1f} ms")
+
+
+def main() -> None:
+    args = _parse_arguments()
+    parser = AgentParser(
+        HostName("benchmark"),
+        None,  # type: ignore[arg-type]  # not needed for splitting
+        check_interval=60,
+        keep_outdated=True,
+        translation=TranslationOptions(),
+        encoding_fallback="ascii",
+        simulation=False,
+        logger=_LOGGER,
+    )
+    raw_data = _raw_data(args.sections, args.lines)
+    selection: SectionNameCollection = frozenset(
+        SectionName(f"section_{nr}") for nr in range(args.selected)
+    )
+    print(f"{len(raw_data) / 1e6:.1f} MB, {args.sections} sections of {args.lines} lines")
+    _measure("state machine", lambda: _state_machine(parser, raw_data), args.repeat)
+    _measure(
+        "AgentParser",
+        lambda: parser._parse_host_section(raw_data, selection=NO_SELECTION),
+        args.repeat,
+    )
+    _measure(
+        f"AgentParser, {args.selected} selected",
+        lambda: parser._parse_host_section(raw_data, selection=selection),
+        args.repeat,
+    )
+
+
+if __name__ == "__main__":
+    main()
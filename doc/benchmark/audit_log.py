@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark of the audit log store
+
+Reads a synthetic audit log completely, the entries of its last day (first
+without index, then with the index created by the first read) and the latest
+100 entries, and reports the durations.
+
+    OMD_SITE=NO_SITE PYTHONPATH=. python3 doc/benchmark/audit_log.py --entries 300000
+"""
+
+import argparse
+import itertools
+import json
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from cmk.gui.watolib.audit_log import AuditLogStore
+
+
+def _parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--entries", type=int, default=300000)
+    parser.add_argument("--days", type=int, default=365)
+    return parser.parse_args()
+
+
+def _create_log(path: Path, num_entries: int, days: int) -> float:
+    now = time.time()
+    interval = days * 86400 / num_entries
+    with path.open("wb") as f:
+        for nr in range(num_entries):
+            entry = AuditLogStore.Entry(
+                time=int(now - (num_entries - nr) * interval),
+                object_ref=None,
+                user_id="cmkadmin",
+                action="edit-host",
+                text=f"Modified host host{nr % 1000}",
+                diff_text=f"Attribute ipaddress changed from 10.0.0.{nr % 250} to 10.0.1.1",
+            )
+            f.write(json.dumps(AuditLogStore.Entry.serialize(entry)).encode() + b"\0")
+    return now
+
+
+def _measure(name: str, read: Callable[[], list[AuditLogStore.Entry]]) -> None:
+    start = time.perf_counter()
+    entries = read()
+    print(f"{name:<20} {time.perf_counter() - start:7.3f} s  {len(entries)} entries")
+
+
+def main() -> None:
+    args = _parse_arguments()
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AuditLogStore(Path(tmp) / "wato_audit.log")
+        now = _create_log(store._path, args.entries, args.days)
+        print(f"{args.entries} entries of {args.days} days")
+        _measure("read", lambda: list(store.read()))
+        _measure("last day (no index)", lambda: list(store.iter_entries(start=now - 86400)))
+        _measure("last day", lambda: list(store.iter_entries(start=now - 86400)))
+        _measure(
+            "latest 100", lambda: list(itertools.islice(store.iter_entries(reverse=True), 100))
+        )
+
+
+if __name__ == "__main__":
+    main()
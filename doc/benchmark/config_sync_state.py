@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark of the config sync state computation
+
+Computes the config sync file infos of a synthetic configuration tree without
+file hash cache, with an empty cache (which is saved afterwards) and with the
+saved cache of the previous run, and reports the durations.
+
+    OMD_SITE=NO_SITE PYTHONPATH=. python3 doc/benchmark/config_sync_state.py --files 100000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from cmk.gui.watolib.activate_changes import _get_config_sync_file_infos, ConfigSyncFileHashes
+from cmk.gui.watolib.config_sync import ReplicationPath
+
+
+def _parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--files-per-dir", type=int, default=100)
+    parser.add_argument("--size", type=int, default=2048)
+    return parser.parse_args()
+
+
+def _create_tree(base: Path, num_files: int, files_per_dir: int, size: int) -> None:
+    mtime = time.time() - 3600
+    for nr in range(num_files):
+        path = base / "etc" / f"folder{nr // files_per_dir}" / f"hosts{nr}.mk"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(os.urandom(size))
+        os.utime(path, (mtime, mtime))
+
+
+def _measure(
+    name: str, base: Path, hashes_path: Path | None, replication_paths: list[ReplicationPath]
+) -> None:
+    start = time.perf_counter()
+    file_hashes = None if hashes_path is None else ConfigSyncFileHashes.load(hashes_path)
+    infos = _get_config_sync_file_infos(replication_paths, base, file_hashes=file_hashes)
+    if file_hashes is not None:
+        file_hashes.save()
+    print(f"{name:<15} {time.perf_counter() - start:7.3f} s  {len(infos)} files")
+
+
+def main() -> None:
+    args = _parse_arguments()
+    replication_paths = [ReplicationPath("dir", "etc", "etc", [])]
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        _create_tree(base, args.files, args.files_per_dir, args.size)
+        print(f"{args.files} files of {args.size} bytes")
+        _measure("no cache", base, None, replication_paths)
+        _measure("cold cache", base, base / "config_sync_file_hashes", replication_paths)
+        _measure("warm cache", base, base / "config_sync_file_hashes", replication_paths)
+
+
+if __name__ == "__main__":
+    main()
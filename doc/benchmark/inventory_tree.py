@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark of loading HW/SW inventory trees with and without the indexed tree file
+
+Saves a synthetic tree with a large software package table and reports load
+time and peak RSS for displaying a small node ("hardware.cpu"), for
+iterating the package table and for loading the whole tree. Every measurement
+runs in a fresh process.
+
+    PYTHONPATH=. python3 doc/benchmark/inventory_tree.py --packages 50000
+"""
+
+import argparse
+import resource
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+from cmk.utils.hostaddress import HostName
+from cmk.utils.structured_data import (
+    indexed_tree_file,
+    IndexedTreeFile,
+    load_tree,
+    MutableTree,
+    TreeStore,
+)
+
+HOST_NAME = HostName("heute")
+
+
+def _parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--packages", type=int, default=20000)
+    parser.add_argument("--interfaces", type=int, default=200)
+    return parser.parse_args()
+
+
+def _make_tree(num_packages: int, num_interfaces: int) -> MutableTree:
+    tree = MutableTree()
+    tree.add(path=("hardware", "cpu"), pairs=[{"cores": 16, "model": "Xeon", "threads": 32}])
+    tree.add(path=("software", "os"), pairs=[{"name": "Debian", "version": "12"}])
+    tree.add(
+        path=("networking", "interfaces"),
+        key_columns=["index"],
+        rows=[
+            {"index": idx, "description": f"eth{idx}", "speed": 10**9, "oper_status": 1}
+            for idx in range(num_interfaces)
+        ],
+    )
+    tree.add(
+        path=("software", "packages"),
+        key_columns=["name"],
+        rows=[
+            {
+                "name": f"package-{idx}",
+                "version": f"1.{idx % 100}.{idx % 7}",
+                "arch": "x86_64",
+                "summary": f"Summary of the package number {idx}",
+                "package_type": "deb",
+            }
+            for idx in range(num_packages)
+        ],
+    )
+    return tree
+
+
+def _load_cpu(tree_file: Path) -> None:
+    load_tree(tree_file).get_tree(("hardware", "cpu"))
+
+
+def _iter_packages(tree_file: Path) -> None:
+    if (indexed := IndexedTreeFile.open(tree_file)) is not None:
+        for _row in indexed.iter_rows(("software", "packages")):
+            pass
+        return
+    for _row in load_tree(tree_file).get_rows(("software", "packages")):
+        pass
+
+
+def _load_all(tree_file: Path) -> None:
+    len(load_tree(tree_file))
+
+
+def _measure(func: Callable[[Path], None], tree_file: Path) -> tuple[float, int]:
+    before = time.perf_counter()
+    func(tree_file)
+    duration = time.perf_counter() - before
+    return duration, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure_in_new_process(func: Callable[[Path], None], tree_file: Path) -> tuple[float, int]:
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        return executor.submit(_measure, func, tree_file).result()
+
+
+def main() -> None:
+    args = _parse_arguments()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        plain_dir, indexed_dir = Path(tmp_dir, "plain"), Path(tmp_dir, "indexed")
+        tree = _make_tree(args.packages, args.interfaces)
+        TreeStore(plain_dir).save(host_name=HOST_NAME, tree=tree)
+        TreeStore(indexed_dir, indexed=True).save(host_name=HOST_NAME, tree=tree)
+        plain_file, indexed_file = plain_dir / HOST_NAME, indexed_dir / HOST_NAME
+
+        print(
+            f"{args.packages} packages, tree file: {plain_file.stat().st_size} bytes,"
+            f" indexed tree file: {indexed_tree_file(indexed_file).stat().st_size} bytes"
+        )
+        for name, func in [
+            ("hardware.cpu", _load_cpu),
+            ("packages", _iter_packages),
+            ("whole tree", _load_all),
+        ]:
+            for tree_file, kind in [(plain_file, "plain"), (indexed_file, "indexed")]:
+                duration, rss = _measure_in_new_process(func, tree_file)
+                print(f"{name:>12} {kind:>8}: {duration:7.3f} s, {rss / 1024:7.1f} MB max RSS")
+
+
+if __name__ == "__main__":
+    main()
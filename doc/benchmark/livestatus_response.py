@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark of receiving large livestatus responses
+
+Serves a synthetic "GET services" response on a local socket and reports the
+duration, the time until the first row and the peak RSS of receiving it with
+receive_raw_response() and parse_raw_response() and with the streamed rows of
+iter_query(), for the python, the JSON and the typed CSV format. Every
+measurement runs in a fresh process.
+
+    PYTHONPATH=packages/cmk-livestatus-client python3 doc/benchmark/livestatus_response.py --rows 1000000
+"""
+
+import argparse
+import json
+import socketserver
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Iterable, Mapping
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from pathlib import Path
+
+from livestatus import (
+    csv_list,
+    LivestatusOutputFormat,
+    LivestatusRow,
+    Query,
+    QuerySpecification,
+    SingleSiteConnection,
+)
+
+COLUMNS = ["host_name", "description", "state", "perf_data", "plugin_output", "contact_groups"]
+COLUMN_TYPES = [str, str, int, str, str, csv_list]
+
+
+def _parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    return parser.parse_args()
+
+
+def _rows(num_rows: int) -> Iterable[list[object]]:
+    for nr in range(num_rows):
+        yield [
+            f"host{nr // 50}",
+            f"Service {nr % 50}",
+            nr % 4,
+            f"load1={nr % 7}.5;5;10;0; load5=0.7;5;10;0;",
+            "OK - 15 min load: 0.70 at 8 cores (0.09 per core)",
+            ["all", f"group{nr % 10}"],
+        ]
+
+
+def _bodies(num_rows: int) -> Mapping[str, bytes]:
+    def _lines(dumps: Callable[[list[object]], str]) -> bytes:
+        return ("[" + ",\n".join(dumps(row) for row in _rows(num_rows)) + "]\n").encode()
+
+    return {
+        "python3": _lines(repr),
+        "json": _lines(json.dumps),
+        "csv": "".join(
+            "\x1f".join("\x1e".join(v) if isinstance(v, list) else str(v) for v in row) + "\n"
+            for row in _rows(num_rows)
+        ).encode(),
+    }
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        bodies: Mapping[str, bytes] = self.server.bodies  # type: ignore[attr-defined]
+        query = b""
+        while line := self.rfile.readline():
+            query += line
+            if line != b"\n":
+                continue
+            output_format = next(
+                l.split(": ")[1] for l in query.decode().splitlines() if l.startswith("Output")
+            )
+            query = b""
+            body = bodies[output_format]
+            self.wfile.write(b"200 %11d\n" % len(body))
+            self.wfile.write(body)
+            self.wfile.flush()
+
+
+def _query(output_format: str) -> Query:
+    if output_format == "json":
+        return Query(QuerySpecification("services", COLUMNS))
+    return Query(f"GET services\nColumns: {' '.join(COLUMNS)}\n")
+
+
+def _raw_response(connection: SingleSiteConnection, output_format: str) -> Iterable[LivestatusRow]:
+    query = _query(output_format)
+    if output_format == "json":
+        connection.set_output_format(LivestatusOutputFormat.JSON)
+    str_query = connection.build_query(query, "")
+    connection.send_query(str_query)
+    yield from connection.parse_raw_response(
+        connection.receive_raw_response(str_query, query.suppress_exceptions), query
+    )
+
+
+def _streamed(connection: SingleSiteConnection, output_format: str) -> Iterable[LivestatusRow]:
+    if output_format == "csv":
+        return connection.iter_query(_query(output_format), column_types=COLUMN_TYPES)
+    return connection.iter_query(_query(output_format))
+
+
+def _measure(socket_path: str, method: str, output_format: str, keep: bool) -> tuple[float, ...]:
+    connection = SingleSiteConnection(f"unix:{socket_path}")
+    receive = _raw_response if method == "raw" else _streamed
+    kept = []
+    before = time.perf_counter()
+    first_row = 0.0
+    for row in receive(connection, output_format):
+        if not first_row:
+            first_row = time.perf_counter() - before
+        if keep:
+            kept.append(row)
+    duration = time.perf_counter() - before
+    return duration, first_row, _peak_rss()
+
+
+def _peak_rss() -> int:
+    # Not ru_maxrss: On Linux it includes the memory of the parent before the exec
+    with open("/proc/self/status", encoding="utf-8") as status:
+        return next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+
+
+def main() -> None:
+    args = _parse_arguments()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        socket_path = str(Path(tmp_dir, "live"))
+        server = socketserver.ThreadingUnixStreamServer(socket_path, _Handler)
+        server.bodies = _bodies(args.rows)  # type: ignore[attr-defined]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        print(
+            f"{args.rows} rows, "
+            + ", ".join(f"{name}: {len(body)} bytes" for name, body in server.bodies.items())  # type: ignore[attr-defined]
+        )
+        for method, output_format, keep in [
+            ("raw", "python3", True),
+            ("streamed", "python3", True),
+            ("streamed", "python3", False),
+            ("raw", "json", True),
+            ("streamed", "json", True),
+            ("streamed", "json", False),
+            ("streamed", "csv", True),
+            ("streamed", "csv", False),
+        ]:
+            name = f"{method} {output_format}{'' if keep else ', rows not kept'}"
+            try:
+                with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as executor:
+                    duration, first_row, rss = executor.submit(
+                        _measure, socket_path, method, output_format, keep
+                    ).result()
+            except BrokenProcessPool:
+                print(f"{name:>30}: process died, out of memory?")
+                continue
+            print(
+                f"{name:>30}: {duration:7.2f} s, first row after {first_row:6.3f} s,"
+                f" {rss / 1024:7.1f} MB max RSS"
+            )
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
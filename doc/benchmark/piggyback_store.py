@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark of the piggyback store
+
+Stores the piggyback data of synthetic sources (think: one vCenter per source)
+with the segment files of cmk.utils.piggyback and with the file per source and
+piggybacked host layout of former versions, and reports the durations and the
+number of files. "lookup" reads the data of every piggybacked host, for the
+segments through get_piggyback_raw_data() including the time settings.
+
+    OMD_SITE=NO_SITE PYTHONPATH=. python3 doc/benchmark/piggyback_store.py --sources 5 --hosts 2000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from collections.abc import Callable, Mapping, Sequence
+from pathlib import Path
+
+import cmk.utils.paths
+import cmk.utils.piggyback as piggyback
+import cmk.utils.store as store
+from cmk.utils.hostaddress import HostName
+
+_TIME_SETTINGS: piggyback.PiggybackTimeSettings = [(None, "max_cache_age", 3600)]
+
+_Data = Mapping[HostName, Mapping[HostName, Sequence[bytes]]]
+
+
+def _parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--sources", type=int, default=5)
+    parser.add_argument("--hosts", type=int, default=1000)
+    parser.add_argument("--lines", type=int, default=50)
+    return parser.parse_args()
+
+
+def _data(num_sources: int, num_hosts: int, num_lines: int) -> _Data:
+    return {
+        HostName(f"source{src}"): {
+            HostName(f"vm{src}-{nr}"): [
+                b"<<<esx_vsphere_vm>>>",
+                *(b"property.%d value %d of vm %d" % (line, line, nr) for line in range(num_lines)),
+            ]
+            for nr in range(num_hosts)
+        }
+        for src in range(num_sources)
+    }
+
+
+def _store_file_per_host(data: _Data) -> None:
+    for source, piggybacked in data.items():
+        status_file = cmk.utils.paths.piggyback_source_dir / source
+        store.save_bytes_to_file(status_file, b"")
+        mtime = status_file.stat().st_mtime
+        for piggybacked_hostname, lines in piggybacked.items():
+            path = cmk.utils.paths.piggyback_dir / piggybacked_hostname / source
+            store.save_bytes_to_file(path, b"%s\n" % b"\n".join(lines))
+            os.utime(path, (mtime, mtime))
+
+
+def _lookup_file_per_host(data: _Data) -> None:
+    for source, piggybacked in data.items():
+        status_mtime = (cmk.utils.paths.piggyback_source_dir / source).stat().st_mtime
+        for piggybacked_hostname in piggybacked:
+            for path in (cmk.utils.paths.piggyback_dir / piggybacked_hostname).iterdir():
+                assert path.stat().st_mtime >= status_mtime
+                assert path.read_bytes()
+
+
+def _store_segments(data: _Data) -> None:
+    for source, piggybacked in data.items():
+        piggyback.store_piggyback_raw_data(source, piggybacked)
+
+
+def _lookup_segments(data: _Data) -> None:
+    for piggybacked in data.values():
+        for piggybacked_hostname in piggybacked:
+            (raw_data_info,) = piggyback.get_piggyback_raw_data(
+                piggybacked_hostname, _TIME_SETTINGS
+            )
+            assert raw_data_info.info.successfully_processed
+
+
+def _measure(
+    name: str,
+    save: Callable[[_Data], None],
+    lookup: Callable[[_Data], None],
+    data: _Data,
+) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        cmk.utils.paths.piggyback_dir = base / "piggyback"
+        cmk.utils.paths.piggyback_source_dir = base / "piggyback_sources"
+
+        start = time.perf_counter()
+        save(data)
+        save_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        lookup(data)
+        lookup_duration = time.perf_counter() - start
+
+        files = sum(1 for path in base.rglob("*") if path.is_file())
+        print(
+            f"{name:<15} store {save_duration:7.3f} s  lookup {lookup_duration:7.3f} s  {files} files"
+        )
+
+
+def main() -> None:
+    args = _parse_arguments()
+    data = _data(args.sources, args.hosts, args.lines)
+    print(f"{args.sources} sources with {args.hosts} piggybacked hosts of {args.lines} lines")
+    _measure("file per host", _store_file_per_host, _lookup_file_per_host, data)
+    _measure("segments", _store_segments, _lookup_segments, data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark of the service ruleset matching on a synthetic configuration
+
+Reports the number of RulesetMatcher.get_service_ruleset_values() calls per
+second, using the candidate index and using a linear scan over all rules.
+
+    PYTHONPATH=. python3 doc/benchmark/ruleset_matcher.py --hosts 2000 --services 80
+"""
+
+import argparse
+import random
+import time
+from collections.abc import Callable, Iterator, Sequence
+
+from cmk.utils.hostaddress import HostName
+from cmk.utils.rulesets.ruleset_matcher import (
+    LabelManager,
+    matches_service_conditions,
+    RulesetMatcher,
+    RulesetMatchObject,
+    RuleSpec,
+)
+from cmk.utils.servicename import ServiceName
+from cmk.utils.tags import TagGroupID, TagID
+
+SERVICE_PREFIXES = ["CPU", "Memory", "Filesystem /", "Interface ", "Check_MK", "Disk IO", "NTP"]
+
+
+def _parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--hosts", type=int, default=1000)
+    parser.add_argument("--services", type=int, default=80, help="services per host")
+    parser.add_argument("--rules", type=int, default=200, help="rules per ruleset")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def _service_descriptions(num_services: int) -> Sequence[ServiceName]:
+    return [
+        ServiceName(f"{SERVICE_PREFIXES[n % len(SERVICE_PREFIXES)]}{n}")
+        for n in range(num_services)
+    ]
+
+
+def _ruleset(
+    rng: random.Random, hosts: Sequence[HostName], num_rules: int
+) -> Sequence[RuleSpec[int]]:
+    rules: list[RuleSpec[int]] = []
+    for n in range(num_rules):
+        condition: dict[str, object] = {}
+        match rng.randrange(4):
+            case 0:
+                condition["host_name"] = rng.sample(list(hosts), min(len(hosts), 10))
+            case 1:
+                condition["host_tags"] = {TagGroupID("site"): TagID(f"site{rng.randrange(5)}")}
+            case 2:
+                condition["host_folder"] = f"/folder{rng.randrange(10)}/"
+        # Most rules are made for some specific services
+        match rng.randrange(10):
+            case 0:
+                pass
+            case 1:
+                condition["service_description"] = [{"$regex": f"{rng.choice(SERVICE_PREFIXES)}.*"}]
+            case _:
+                condition["service_description"] = [
+                    f"{rng.choice(SERVICE_PREFIXES)}{rng.randrange(100)}$"
+                ]
+        rules.append({"id": str(n), "value": n, "condition": condition})  # type: ignore[typeddict-item]
+    return rules
+
+
+def _matcher(hosts: Sequence[HostName]) -> RulesetMatcher:
+    return RulesetMatcher(
+        host_tags={
+            hostname: {TagGroupID("site"): TagID(f"site{nr % 5}")}
+            for nr, hostname in enumerate(hosts)
+        },
+        host_paths={hostname: f"/folder{nr % 10}/hosts.mk" for nr, hostname in enumerate(hosts)},
+        label_manager=LabelManager(
+            explicit_host_labels={},
+            host_label_rules=(),
+            service_label_rules=(),
+            discovered_labels_of_service=lambda *args, **kw: {},
+        ),
+        all_configured_hosts=hosts,
+        clusters_of={},
+        nodes_of={},
+    )
+
+
+def _linear_scan(
+    matcher: RulesetMatcher, match_object: RulesetMatchObject, ruleset: Sequence[RuleSpec[int]]
+) -> Iterator[int]:
+    """The matching without the index: Look at every rule"""
+    index = matcher.ruleset_optimizer.get_service_ruleset(ruleset, False)
+    for value, hosts, label_groups, _cache_id, condition in index.rules:
+        if match_object.host_name in hosts and matches_service_conditions(
+            condition, label_groups, match_object
+        ):
+            yield value
+
+
+def _measure(
+    name: str,
+    get_values: Callable[[RulesetMatchObject], Sequence[int]],
+    match_objects: Sequence[RulesetMatchObject],
+) -> Sequence[Sequence[int]]:
+    before = time.perf_counter()
+    results = [get_values(match_object) for match_object in match_objects]
+    duration = time.perf_counter() - before
+    print(f"{name:>12}: {len(match_objects) / duration:12.0f} calls/s ({duration:.2f} s)")
+    return results
+
+
+def main() -> None:
+    args = _parse_arguments()
+    rng = random.Random(args.seed)
+    hosts = [HostName(f"host{n}") for n in range(args.hosts)]
+    matcher = _matcher(hosts)
+    ruleset = _ruleset(rng, hosts, args.rules)
+    match_objects = [
+        RulesetMatchObject(hostname, service_description, {})
+        for hostname in hosts
+        for service_description in _service_descriptions(args.services)
+    ]
+    print(f"{len(hosts)} hosts, {len(match_objects)} services, {len(ruleset)} rules")
+
+    before = time.perf_counter()
+    matcher.ruleset_optimizer.get_service_ruleset(ruleset, False)
+    print(f"{'preprocess':>12}: {time.perf_counter() - before:.2f} s")
+
+    linear = _measure(
+        "linear", lambda obj: list(_linear_scan(matcher, obj, ruleset)), match_objects
+    )
+    indexed = _measure(
+        "indexed",
+        lambda obj: list(matcher.get_service_ruleset_values(obj, ruleset)),
+        match_objects,
+    )
+    if linear != indexed:
+        raise SystemExit("Results differ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark of sorting view rows
+
+Sorts synthetic livestatus service rows by service state (worst first), host
+site and name and service description, once by comparing the rows with the
+cmp functions of the sorters (as former versions did) and once with the key
+functions of the sorters, and reports the durations.
+
+    OMD_SITE=NO_SITE PYTHONPATH=. python3 doc/benchmark/sort_view_rows.py --rows 50000
+"""
+
+import argparse
+import functools
+import random
+import time
+from collections.abc import Callable
+
+from cmk.gui import main_modules
+from cmk.gui.type_defs import Row, Rows
+from cmk.gui.views.page_show_view import _sort_data
+from cmk.gui.views.sorter import sorter_registry, SorterEntry
+
+
+def _parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--services-per-host", type=int, default=50)
+    return parser.parse_args()
+
+
+def _rows(num_rows: int, services_per_host: int) -> Rows:
+    rnd = random.Random(4711)
+    return [
+        {
+            "site": f"site{nr % 3}",
+            "host_name": f"host{nr // services_per_host}",
+            "service_description": f"Interface {nr % services_per_host}",
+            "service_state": rnd.choice([0, 0, 0, 0, 1, 2, 3]),
+            "service_has_been_checked": 1,
+        }
+        for nr in range(num_rows)
+    ]
+
+
+def _sort_with_cmp(data: Rows, sorters: list[SorterEntry]) -> None:
+    def multisort(e1: Row, e2: Row) -> int:
+        for entry in sorters:
+            c = entry.sorter.cmp(e1, e2, entry.parameters)
+            if c != 0:
+                return -c if entry.negate else c
+        return 0
+
+    data.sort(key=functools.cmp_to_key(multisort))
+
+
+def _measure(
+    name: str,
+    sort: Callable[[Rows, list[SorterEntry]], None],
+    rows: Rows,
+    sorters: list[SorterEntry],
+) -> Rows:
+    data = list(rows)
+    start = time.perf_counter()
+    sort(data, sorters)
+    print(f"{name:<15} {time.perf_counter() - start:7.3f} s")
+    return data
+
+
+def main() -> None:
+    args = _parse_arguments()
+    main_modules.load_plugins()
+    sorters = [
+        SorterEntry(sorter_registry[ident](), negate, None, None)
+        for ident, negate in [("svcstate", True), ("site_host", False), ("svcdescr", False)]
+    ]
+    rows = _rows(args.rows, args.services_per_host)
+    print(f"{args.rows} rows")
+    by_cmp = _measure("cmp", _sort_with_cmp, rows, sorters)
+    by_key = _measure("key", _sort_data, rows, sorters)
+    assert by_cmp == by_key
+
+
+if __name__ == "__main__":
+    main()
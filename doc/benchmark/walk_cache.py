@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark of the SNMP walk cache
+
+Saves and loads the walk caches of synthetic hosts with the WalkCache (one file
+per host) and with the file per OID layout of former versions, and reports the
+durations and the number of files. "load" includes accessing all walks.
+
+    OMD_SITE=NO_SITE PYTHONPATH=. python3 doc/benchmark/walk_cache.py --hosts 200 --oids 100
+"""
+
+import argparse
+import tempfile
+import time
+from collections.abc import Callable, Mapping
+from pathlib import Path
+
+import cmk.utils.paths
+import cmk.utils.store as store
+from cmk.utils.hostaddress import HostName
+
+from cmk.snmplib import SNMPRowInfo
+
+from cmk.fetchers._snmp import WalkCache
+
+
+def _parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--hosts", type=int, default=100)
+    parser.add_argument("--oids", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=50)
+    return parser.parse_args()
+
+
+def _walks(num_oids: int, num_rows: int) -> Mapping[str, SNMPRowInfo]:
+    return {
+        f".1.3.6.1.4.1.9.9.{nr}": [
+            (f".1.3.6.1.4.1.9.9.{nr}.{row}", f"value {row} of column {nr}".encode())
+            for row in range(num_rows)
+        ]
+        for nr in range(num_oids)
+    }
+
+
+def _save_file_per_oid(base: Path, hosts: list[str], walks: Mapping[str, SNMPRowInfo]) -> None:
+    for host in hosts:
+        path = base / "snmp_cache" / host
+        path.mkdir(parents=True, exist_ok=True)
+        for fetchoid, rowinfo in walks.items():
+            store.save_object_to_file(path / f"OID{fetchoid}", rowinfo, pretty=False)
+
+
+def _load_file_per_oid(base: Path, hosts: list[str], walks: Mapping[str, SNMPRowInfo]) -> None:
+    for host in hosts:
+        loaded = {
+            path.name[3:]: store.load_object_from_file(path, default=None)
+            for path in (base / "snmp_cache" / host).iterdir()
+        }
+        assert len(loaded) == len(walks)
+
+
+def _save_walk_cache(base: Path, hosts: list[str], walks: Mapping[str, SNMPRowInfo]) -> None:
+    for host in hosts:
+        cache = WalkCache(HostName(host))
+        cache.update((fetchoid, (True, rowinfo)) for fetchoid, rowinfo in walks.items())
+        cache.save()
+
+
+def _load_walk_cache(base: Path, hosts: list[str], walks: Mapping[str, SNMPRowInfo]) -> None:
+    for host in hosts:
+        cache = WalkCache(HostName(host))
+        cache.load(trees=[])
+        assert len({fetchoid: cache[fetchoid] for fetchoid in cache}) == len(walks)
+
+
+def _measure(
+    name: str,
+    save: Callable[[Path, list[str], Mapping[str, SNMPRowInfo]], None],
+    load: Callable[[Path, list[str], Mapping[str, SNMPRowInfo]], None],
+    hosts: list[str],
+    walks: Mapping[str, SNMPRowInfo],
+) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        cmk.utils.paths.var_dir = tmp
+
+        start = time.perf_counter()
+        save(base, hosts, walks)
+        save_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        load(base, hosts, walks)
+        load_duration = time.perf_counter() - start
+
+        files = sum(1 for path in base.rglob("*") if path.is_file())
+        print(f"{name:<15} save {save_duration:7.3f} s  load {load_duration:7.3f} s  {files} files")
+
+
+def main() -> None:
+    args = _parse_arguments()
+    hosts = [f"host{nr}" for nr in range(args.hosts)]
+    walks = _walks(args.oids, args.rows)
+    print(f"{args.hosts} hosts with {args.oids} walks of {args.rows} rows")
+    _measure("file per OID", _save_file_per_oid, _load_file_per_oid, hosts, walks)
+    _measure("WalkCache", _save_walk_cache, _load_walk_cache, hosts, walks)
+
+
+if __name__ == "__main__":
+    main()
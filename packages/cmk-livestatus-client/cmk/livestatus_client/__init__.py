@@ -12,6 +12,7 @@
 from __future__ import annotations
 
 import ast
+import asyncio
 import contextlib
 import json
 import os
@@ -21,18 +22,20 @@ import socket
 import ssl
 import threading
 import time
-from collections.abc import Iterator, Sequence
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator, Sequence
 from dataclasses import dataclass, field
 from enum import Enum
 from functools import cache
 from io import BytesIO
-from typing import Any, Literal, NamedTuple, NewType
+from typing import Any, Literal, NamedTuple, NewType, TypeVar
 
 from typing_extensions import TypedDict
 
 UserId = NewType("UserId", str)
 SiteId = NewType("SiteId", str)
 
+_T = TypeVar("_T")
+
 
 class TLSParams(TypedDict, total=False):
     verify: bool  # missing key means: True
@@ -132,6 +135,8 @@ LivestatusResponse = NewType("LivestatusResponse", list[LivestatusRow])
 class LivestatusOutputFormat(Enum):
     PYTHON = "python3"
     JSON = "json"
+    # Only for the typed rows of iter_query(), see _CSVRowDecoder
+    CSV = "csv"
 
 
 class LivestatusTestingError(RuntimeError):
@@ -153,6 +158,15 @@ class LivestatusTestingError(RuntimeError):
 # Keep a global array of persistent connections
 persistent_connections: dict[str, socket.socket] = {}
 
+# Chunk size when reading the responses row by row
+_READ_CHUNK_SIZE = 64 * 1024
+
+# Separators of the CSV responses: Line feed between the rows and ASCII unit, record
+# and group separator between the columns, list elements and host/service pairs
+_CSV_SEPARATORS_HEADER = "Separators: 10 31 30 29\n"
+_CSV_COLUMN_SEPARATOR = "\x1f"
+_CSV_LIST_SEPARATOR = "\x1e"
+
 # Regular expression for removing Cache: headers if caching is not allowed
 remove_cache_regex = re.compile("\nCache:[^\n]*")
 
@@ -234,6 +248,13 @@ def create_client_socket(
     if not tls:
         return sock
 
+    return create_client_ssl_context(verify, ca_file_path).wrap_socket(
+        sock, do_handshake_on_connect=do_handshake_on_connect
+    )
+
+
+def create_client_ssl_context(verify: bool, ca_file_path: str | None) -> ssl.SSLContext:
+    """Create the TLS context for encrypted livestatus connections"""
     context = ssl.create_default_context()
     context.check_hostname = False
     context.verify_mode = ssl.CERT_REQUIRED if verify else ssl.CERT_NONE
@@ -245,7 +266,7 @@ def create_client_socket(
     except Exception as e:
         raise MKLivestatusConfigError(f"Failed to load CA file '{ca_file_path}': {e}")
 
-    return context.wrap_socket(sock, do_handshake_on_connect=do_handshake_on_connect)
+    return context
 
 
 # .
@@ -447,6 +468,127 @@ QueryTypes = str | Query
 OnlySites = list[SiteId] | None
 DeadSite = dict[str, str | int | Exception | SiteConfiguration]
 
+
+def csv_list(value: str) -> list[str]:
+    """Column type for list columns of the CSV responses of iter_query()"""
+    return value.split(_CSV_LIST_SEPARATOR) if value else []
+
+
+def _literal_eval_bytes(data: bytes) -> Any:
+    return ast.literal_eval(data.decode("utf-8"))
+
+
+class _ResponseRowDecoder:
+    """Decodes the rows of a python or JSON response while it is being received
+
+    Livestatus renders the rows of a response one per line:
+
+        [[row 1],
+        [row 2]]
+
+    The received chunks are collected in a buffer. Whenever there are complete
+    lines in it, they are decoded at once and cut off the buffer. So the rows
+    of the already received chunks are available before the rest of the
+    response arrives and only the current chunk has to be kept. Responses
+    which do not put their rows on lines of their own are decoded as a whole
+    at the end.
+    """
+
+    def __init__(self, json_format: bool) -> None:
+        self._loads: Callable[[bytes], Any] = json.loads if json_format else _literal_eval_bytes
+        self._buffer = bytearray()
+        self._started = False
+        self._done = False
+        self._decode_at_end = False
+
+    def feed(self, chunk: bytes | memoryview) -> list[LivestatusRow]:
+        self._buffer += chunk
+        if self._decode_at_end or (end := self._buffer.rfind(b"\n")) == -1:
+            return []
+        if (rows := self._decode_lines(bytes(self._buffer[:end]))) is None:
+            self._decode_at_end = True
+            return []
+        del self._buffer[: end + 1]
+        return rows
+
+    def finish(self) -> list[LivestatusRow]:
+        rows = self._decode_lines(bytes(self._buffer))
+        self._buffer.clear()
+        if rows is None or not self._done:
+            raise MKLivestatusQueryError("Malformed raw response output")
+        return rows
+
+    def _decode_lines(self, lines: bytes) -> list[LivestatusRow] | None:
+        text = lines.strip()
+        if not text:
+            return []
+        if self._done:
+            return None
+        if not self._started:
+            if not text.startswith(b"["):
+                return None
+            text = text[1:].lstrip()
+            if not text:
+                self._started = True
+                return []
+
+        # Strip the separating "," or the "]" closing the response
+        if text.endswith(b","):
+            done = False
+        elif text.endswith(b"]"):
+            done = True
+        else:
+            return None
+        try:
+            rows = self._loads(b"[" + text[:-1] + b"]")
+        except (ValueError, SyntaxError):
+            return None
+        if not isinstance(rows, list) or not all(isinstance(row, list) for row in rows):
+            return None
+        self._started = True
+        self._done = done
+        return rows
+
+
+class _CSVRowDecoder:
+    """Decodes the rows of a CSV response while it is being received
+
+    The CSV format has no quoting, so the queries use control characters as
+    separators (see _CSV_SEPARATORS_HEADER). Every column is converted with the
+    callable given for it, no generic parsing of the values is needed.
+    """
+
+    def __init__(self, column_types: Sequence[Callable[[str], LivestatusColumn]]) -> None:
+        self._column_types = column_types
+        self._buffer = bytearray()
+
+    def feed(self, chunk: bytes | memoryview) -> list[LivestatusRow]:
+        self._buffer += chunk
+        if (end := self._buffer.rfind(b"\n")) == -1:
+            return []
+        lines = self._buffer[:end].decode("utf-8")
+        del self._buffer[: end + 1]
+        return [self._decode_line(line) for line in lines.split("\n")]
+
+    def finish(self) -> list[LivestatusRow]:
+        rows = [self._decode_line(self._buffer.decode("utf-8"))] if self._buffer else []
+        self._buffer.clear()
+        return rows
+
+    def _decode_line(self, line: str) -> LivestatusRow:
+        values = line.split(_CSV_COLUMN_SEPARATOR)
+        if len(values) != len(self._column_types):
+            raise MKLivestatusQueryError(
+                f"Malformed CSV response: {len(values)} columns instead of {len(self._column_types)}"
+            )
+        try:
+            return LivestatusRow(
+                [column_type(value) for column_type, value in zip(self._column_types, values)]
+            )
+        except ValueError as e:
+            raise MKLivestatusQueryError(f"Malformed CSV response: {e}")
+
+
 # .
 #   .--SingleSiteConn------------------------------------------------------.
 #   |  ____  _             _      ____  _ _        ____                    |
@@ -534,6 +676,8 @@ class SingleSiteConnection(Helpers):
         self.timeout: int | None = None
         self.successful_persistence = False
         self._output_format = LivestatusOutputFormat.PYTHON
+        # Reused for receiving the responses chunk by chunk
+        self._receive_buffer = bytearray(_READ_CHUNK_SIZE)
 
         # Whether to establish an encrypted connection
         self.tls = tls
@@ -679,37 +823,88 @@ class SingleSiteConnection(Helpers):
 
         return data.getvalue()
 
+    def receive_chunks(self, size: int, timeout: float | None = None) -> Iterator[memoryview]:
+        """Like receive_data(), but yield the data as it arrives
+
+        The chunks are views of a buffer which is reused for the next chunk. The
+        timeout applies to waiting for each chunk, the time the caller needs for
+        processing the chunks does not count."""
+        if self.socket is None:
+            raise MKLivestatusSocketError("Socket to '%s' is not connected" % self.socketurl)
+
+        view = memoryview(self._receive_buffer)
+        self.socket.settimeout(timeout)
+        receive_start = time.time()
+        while size > 0:
+            if is_socket_readable(self.socket, 0.1):
+                received = self.socket.recv_into(view, min(size, len(view)))
+                if not received:
+                    raise MKLivestatusSocketClosed(
+                        "Read zero data from socket, remote peer closed connection."
+                    )
+                size -= received
+                yield view[:received]
+                receive_start = time.time()
+            if timeout is not None and (time.time() - receive_start) > timeout:
+                raise MKLivestatusSocketError(
+                    f"{timeout}s while reading data from socket. Missing data: {size} bytes"
+                )
+
     def do_query(self, query: Query, add_headers: str = "") -> LivestatusResponse:
         with _livestatus_output_format_switcher(query, self):
             str_query = self.build_query(query, add_headers)
             self.send_query(str_query)
             try:
-                return self.parse_raw_response(
-                    self.receive_raw_response(str_query, query.suppress_exceptions), query
-                )
+                return LivestatusResponse(list(self.receive_rows(str_query, query)))
             except MKLivestatusQueryError:
                 self.disconnect()
                 raise
 
+    def iter_query(
+        self,
+        query: QueryTypes,
+        add_headers: str = "",
+        column_types: Sequence[Callable[[str], LivestatusColumn]] | None = None,
+    ) -> Iterator[LivestatusRow]:
+        """Issue a query and yield the rows while the response is being received
+
+        With column_types, the response is requested in the CSV format and the
+        columns are converted with the given callables, e.g. int, float, str or
+        csv_list. This is considerably faster than decoding the python format,
+        but the callables have to match the columns of the query. The rows must
+        be consumed completely, otherwise the connection is closed.
+        """
+        normalized_query = Query(query) if not isinstance(query, Query) else query
+        if self.limit is not None:
+            add_headers += "Limit: %d\n" % self.limit
+
+        if column_types is not None:
+            str_query = _build_query(
+                normalized_query,
+                self.auth_header,
+                self.allow_cache,
+                LivestatusOutputFormat.CSV,
+                add_headers + "ColumnHeaders: off\n" + _CSV_SEPARATORS_HEADER,
+            )
+        else:
+            with _livestatus_output_format_switcher(normalized_query, self):
+                str_query = self.build_query(normalized_query, add_headers)
+
+        self.send_query(str_query)
+        try:
+            yield from self.receive_rows(str_query, normalized_query, column_types)
+        except MKLivestatusQueryError:
+            self.disconnect()
+            raise
+
     def build_query(self, query_obj: Query, add_headers: str) -> str:
         # Prevent injection of further livestatus commands inside AuthUser header.
         if "\n" in self.auth_header[:-1]:
             raise MKLivestatusQueryError("Refusing to build query with invalid AuthUser header.")
 
-        query = str(query_obj)
-        if not self.allow_cache:
-            query = remove_cache_regex.sub("", query)
-
-        headers = [
-            self.auth_header,
-            f"Localtime: {int(time.time()):d}",
-            "OutputFormat: %s" % self._output_format.value,
-            "KeepAlive: on",
-            "ResponseHeader: fixed16",
-            add_headers,
-        ]
-
-        return _combine_query(query, headers)
+        return _build_query(
+            query_obj, self.auth_header, self.allow_cache, self._output_format, add_headers
+        )
 
     def send_query(self, query: str, do_reconnect: bool = True) -> None:
         if self.socket is None:
@@ -743,17 +938,7 @@ class SingleSiteConnection(Helpers):
         timeout_at: float | None = None,
     ) -> bytes:
         try:
-            # Headers are always ASCII encoded
-            resp = self.receive_data(16)
-            code = resp[0:3].decode("ascii")
-            try:
-                length = int(resp[4:15].lstrip())
-            except Exception:
-                self.disconnect()
-                raise MKLivestatusSocketError(
-                    f"Malformed response header {resp!r}. Livestatus TCP socket might be "
-                    "unreachable or wrong encryption settings are used."
-                )
+            code, length = self._receive_response_header()
 
             # Apply a lower timeout for the content because the data is already available
             # in the socket. The liveproxyd (same system) has the complete data available
@@ -764,42 +949,14 @@ class SingleSiteConnection(Helpers):
             if code == "200":
                 return data
 
-            error_info = data.decode("utf-8")
-            if code == "404":
-                raise MKLivestatusTableNotFoundError(f"Not Found ({code}): {error_info!r}")
-
-            if code == "502":
-                raise MKLivestatusBadGatewayError(error_info)
-
-            raise MKLivestatusQueryError(f"{code}: {error_info}")
+            raise _response_error(code, data.decode("utf-8"))
 
         except (MKLivestatusSocketClosed, OSError) as e:
             # In case of an IO error or the other side having
             # closed the socket do a reconnect and try again
-            self.disconnect()
-
-            # In case of unix socket connections, do not start any reconnection attempts
-            # The other side (liveproxyd) might have had a good reason to disconnect
-            # Note: In most scenarios the liveproxyd still tries to send back a reasonable
-            # error response back to the client
-            if self.socket and self.socket.family == socket.AF_UNIX:
-                raise MKLivestatusSocketError("Unix socket was closed by peer")
-
-            now = time.time()
-            if not timeout_at or timeout_at > now:
-                if timeout_at is None:
-                    # Try until timeout reached in case there was a timeout configured.
-                    # Otherwise only retry once.
-                    timeout_at = now
-                    if self.timeout:
-                        timeout_at += self.timeout
-
-                time.sleep(0.1)
-                self.connect()
-                self.send_query(query)
-                # do not send query again -> danger of infinite loop
-                return self.receive_raw_response(query, suppress_exceptions, timeout_at)
-            raise MKLivestatusSocketError(str(e))
+            timeout_at = self._reconnect_and_resend(query, e, timeout_at)
+            # do not send query again -> danger of infinite loop
+            return self.receive_raw_response(query, suppress_exceptions, timeout_at)
 
         except suppress_exceptions:
             raise
@@ -811,6 +968,105 @@ class SingleSiteConnection(Helpers):
             # FIXME: ? self.disconnect()
             raise MKLivestatusSocketError("Unhandled exception: %s" % e)
 
+    def _reconnect_and_resend(
+        self, query: str, error: Exception, timeout_at: float | None
+    ) -> float:
+        """Reconnect and send the query again after its response could not be received
+
+        Returns the time until which further reconnects are tried."""
+        is_unix_socket = self.socket is not None and self.socket.family == socket.AF_UNIX
+        self.disconnect()
+
+        # In case of unix socket connections, do not start any reconnection attempts
+        # The other side (liveproxyd) might have had a good reason to disconnect
+        # Note: In most scenarios the liveproxyd still tries to send back a reasonable
+        # error response back to the client
+        if is_unix_socket:
+            raise MKLivestatusSocketError("Unix socket was closed by peer")
+
+        now = time.time()
+        if timeout_at and timeout_at <= now:
+            raise MKLivestatusSocketError(str(error))
+
+        if timeout_at is None:
+            # Try until timeout reached in case there was a timeout configured.
+            # Otherwise only retry once.
+            timeout_at = now
+            if self.timeout:
+                timeout_at += self.timeout
+
+        time.sleep(0.1)
+        self.connect()
+        self.send_query(query)
+        return timeout_at
+
+    def _receive_response_header(self) -> tuple[str, int]:
+        # Headers are always ASCII encoded
+        resp = self.receive_data(16)
+        code = resp[0:3].decode("ascii")
+        try:
+            length = int(resp[4:15].lstrip())
+        except Exception:
+            self.disconnect()
+            raise MKLivestatusSocketError(
+                f"Malformed response header {resp!r}. Livestatus TCP socket might be "
+                "unreachable or wrong encryption settings are used."
+            )
+        return code, length
+
+    def receive_rows(
+        self,
+        query: str,
+        query_obj: Query,
+        column_types: Sequence[Callable[[str], LivestatusColumn]] | None = None,
+    ) -> Iterator[LivestatusRow]:
+        """Receive the response to a sent query and yield its rows while they arrive
+
+        Unlike with receive_raw_response() and parse_raw_response(), the response
+        is never held in memory as a whole. Only the reconnects in case the peer
+        closed the connection happen before the first row, see
+        receive_raw_response().
+        """
+        timeout_at: float | None = None
+        try:
+            while True:
+                try:
+                    code, length = self._receive_response_header()
+                    break
+                except (MKLivestatusSocketClosed, OSError) as e:
+                    timeout_at = self._reconnect_and_resend(query, e, timeout_at)
+
+            if code != "200":
+                raise _response_error(code, self.receive_data(length, 30).decode("utf-8"))
+
+        except query_obj.suppress_exceptions:
+            raise
+
+        except MKLivestatusSocketError:
+            raise
+
+        except Exception as e:
+            # See receive_raw_response()
+            raise MKLivestatusSocketError("Unhandled exception: %s" % e)
+
+        decoder = (
+            _ResponseRowDecoder(query_obj.supports_json_format())
+            if column_types is None
+            else _CSVRowDecoder(column_types)
+        )
+        try:
+            # See receive_raw_response() for the timeout
+            for chunk in self.receive_chunks(length, 30):
+                yield from decoder.feed(chunk)
+            yield from decoder.finish()
+        except OSError as e:
+            self.disconnect()
+            raise MKLivestatusSocketError(str(e)) from e
+        except BaseException:
+            # The rest of the response is still pending on the socket
+            self.disconnect()
+            raise
+
     def parse_raw_response(self, raw_response: bytes, query: Query) -> LivestatusResponse:
         data = raw_response.decode("utf-8")
         try:
@@ -1221,42 +1477,19 @@ class MultiSiteConnection(Helpers):
                     "site": connected_site.config,
                 }
 
-        # Then retrieve all raw responses. We will be as slow as the slowest of all connections.
-        site_responses: list[tuple[ConnectedSite, bytes]] = []
-        for str_query, connected_site in retrieve_responses:
-            try:
-                site_responses.append(
-                    (
-                        connected_site,
-                        connected_site.connection.receive_raw_response(
-                            str_query, query.suppress_exceptions
-                        ),
-                    )
-                )
-            except query.suppress_exceptions:
-                # Mostly handles exception types MKLivestatusTableNotFoundError
-                stillalive.append(connected_site)
-                continue
-            except LivestatusTestingError:
-                raise
-            except Exception as e:
-                connected_site.connection.disconnect()
-                self.deadsites[connected_site.id] = {
-                    "exception": e,
-                    "site": connected_site.config,
-                }
-
-        # Convert responses to python format
+        # Then retrieve all responses. We will be as slow as the slowest of all connections.
+        # The rows are decoded while they are received, the raw responses are not kept.
         result: list[LivestatusRow] = []
-        for connected_site, raw_response in site_responses:
+        for str_query, connected_site in retrieve_responses:
             try:
-                rows = connected_site.connection.parse_raw_response(raw_response, query)
+                rows = list(connected_site.connection.receive_rows(str_query, query))
                 stillalive.append(connected_site)
                 if self.prepend_site:
                     for row in rows:
                         row.insert(0, connected_site.id)
                 result.extend(rows)
             except query.suppress_exceptions:
+                # Mostly handles exception types MKLivestatusTableNotFoundError
                 stillalive.append(connected_site)
                 continue
             except LivestatusTestingError:
@@ -1298,6 +1531,313 @@ class MultiSiteConnection(Helpers):
         raise KeyError("Connection does not exist")
 
 
+class _AsyncStream(NamedTuple):
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class _AsyncSitePool:
+    """Pool of the livestatus connections to one site"""
+
+    def __init__(self, site_name: SiteId, site: SiteConfiguration, max_connections: int) -> None:
+        url = site["socket"]
+        assert isinstance(url, str)
+        self.site_name = site_name
+        self.config = site
+        self.socketurl = url
+        self.allow_cache = site.get("cache", False)
+        # Applies to establishing the connection and to every read from it
+        self.timeout: float | None = float(site["timeout"]) if "timeout" in site else None
+        self._family, self._address = parse_socket_url(url)
+        tls_type, tls_params = site.get("tls", ("plain_text", TLSParams()))
+        self._tls = tls_type != "plain_text"
+        self._tls_verify = tls_params.get("verify", True)
+        self._tls_ca_file_path = tls_params.get("ca_file_path", None)
+        self._idle: list[_AsyncStream] = []
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def wait(self, awaitable: Awaitable[_T]) -> _T:
+        try:
+            return await asyncio.wait_for(awaitable, self.timeout)
+        except TimeoutError:
+            raise MKLivestatusSocketError(
+                f"Timeout ({self.timeout}s) while talking to '{self.socketurl}'"
+            )
+
+    async def connect(self) -> _AsyncStream:
+        ssl_context = (
+            create_client_ssl_context(self._tls_verify, self._tls_ca_file_path)
+            if self._tls
+            else None
+        )
+        try:
+            if self._family == socket.AF_UNIX:
+                assert isinstance(self._address, str)
+                reader, writer = await self.wait(
+                    asyncio.open_unix_connection(
+                        self._address,
+                        ssl=ssl_context,
+                        server_hostname="" if ssl_context else None,
+                    )
+                )
+            else:
+                assert isinstance(self._address, tuple)
+                host, port = self._address
+                reader, writer = await self.wait(
+                    asyncio.open_connection(host, port, ssl=ssl_context)
+                )
+        except (OSError, MKLivestatusSocketError) as e:
+            raise MKLivestatusSocketError(f"Cannot connect to '{self.socketurl}': {e}")
+        return _AsyncStream(reader, writer)
+
+    async def acquire(self) -> tuple[_AsyncStream, bool]:
+        """Get an idle or a new connection and whether it has been used before"""
+        await self._slots.acquire()
+        if self._idle:
+            return self._idle.pop(), True
+        try:
+            return await self.connect(), False
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, stream: _AsyncStream, reusable: bool) -> None:
+        if reusable:
+            self._idle.append(stream)
+        else:
+            stream.close()
+        self._slots.release()
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for stream in idle:
+            stream.close()
+            with contextlib.suppress(OSError):
+                await stream.writer.wait_closed()
+
+
+class AsyncMultiSiteConnection:
+    """Asyncio based connection to a list of local and remote sites
+
+    All sites are queried concurrently. In contrast to MultiSiteConnection the
+    rows are handed out while the responses are being received: iter_rows()
+    yields the rows of every site as soon as a chunk of its response arrives,
+    so nobody has to wait for the slowest site and the complete responses are
+    never held in memory.
+
+    Every site has a pool of up to max_connections_per_site connections which
+    are kept open between the queries ("KeepAlive: on"). The "timeout" of a
+    site applies to connecting and to every read from its connection. A site
+    failing a query is recorded in dead_sites() and not queried again. Status
+    hosts are not evaluated.
+
+    Use it as an async context manager or call aclose() to close the pooled
+    connections.
+    """
+
+    def __init__(self, sites: SiteConfigurations, max_connections_per_site: int = 2) -> None:
+        self.sites = sites
+        self.deadsites: dict[SiteId, DeadSite] = {}
+        self.prepend_site = False
+        self.only_sites: OnlySites = None
+        self.limit: int | None = None
+        self.auth_users: dict[str, UserId] = {}
+        self.auth_header = ""
+        self._pools = {
+            site_name: _AsyncSitePool(site_name, site, max_connections_per_site)
+            for site_name, site in sites.items()
+        }
+
+    async def __aenter__(self) -> AsyncMultiSiteConnection:
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        for pool in self._pools.values():
+            await pool.close()
+
+    def set_prepend_site(self, p: bool) -> None:
+        self.prepend_site = p
+
+    def set_only_sites(self, sites: OnlySites = None) -> None:
+        self.only_sites = sites
+
+    def set_limit(self, limit: int | None = None) -> None:
+        """Impose Limit on number of returned datasets (applied to each site)"""
+        self.limit = limit
+
+    def dead_sites(self) -> dict[SiteId, DeadSite]:
+        return self.deadsites
+
+    def alive_sites(self) -> list[SiteId]:
+        return [site_name for site_name in self._pools if site_name not in self.deadsites]
+
+    def set_auth_user(self, domain: str, user: UserId) -> None:
+        if user and validate_user_id_regex.match(user) is None:
+            raise ValueError("Invalid user ID")
+
+        if user:
+            self.auth_users[domain] = user
+        elif domain in self.auth_users:
+            del self.auth_users[domain]
+
+    def set_auth_domain(self, domain: str) -> None:
+        auth_user = self.auth_users.get(domain)
+        self.auth_header = "AuthUser: %s\n" % auth_user if auth_user else ""
+
+    async def query(self, query: QueryTypes, add_headers: str = "") -> LivestatusResponse:
+        return LivestatusResponse(
+            [
+                LivestatusRow([site_name] + row) if self.prepend_site else row
+                async for site_name, row in self.iter_rows(query, add_headers)
+            ]
+        )
+
+    async def iter_rows(
+        self,
+        query: QueryTypes,
+        add_headers: str = "",
+        column_types: Sequence[Callable[[str], LivestatusColumn]] | None = None,
+    ) -> AsyncIterator[tuple[SiteId, LivestatusRow]]:
+        """Yield the rows of all queried sites in the order they are received
+
+        See SingleSiteConnection.iter_query() for the column_types."""
+        normalized_query = Query(query) if not isinstance(query, Query) else query
+        if "\n" in self.auth_header[:-1]:
+            raise MKLivestatusQueryError("Refusing to build query with invalid AuthUser header.")
+        if self.limit is not None:
+            add_headers += "Limit: %d\n" % self.limit
+
+        pools = [
+            pool
+            for site_name, pool in self._pools.items()
+            if site_name not in self.deadsites
+            and (self.only_sites is None or site_name in self.only_sites)
+        ]
+        # Bounded, so a slow consumer stops the reading instead of piling up the responses
+        queue: asyncio.Queue[tuple[SiteId, list[LivestatusRow] | None]] = asyncio.Queue(
+            maxsize=max(1, len(pools))
+        )
+        tasks = [
+            asyncio.create_task(
+                self._query_site(pool, normalized_query, add_headers, column_types, queue)
+            )
+            for pool in pools
+        ]
+        try:
+            running = len(tasks)
+            while running:
+                site_name, rows = await queue.get()
+                if rows is None:
+                    running -= 1
+                    continue
+                for row in rows:
+                    yield site_name, row
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _query_site(
+        self,
+        pool: _AsyncSitePool,
+        query: Query,
+        add_headers: str,
+        column_types: Sequence[Callable[[str], LivestatusColumn]] | None,
+        queue: asyncio.Queue[tuple[SiteId, list[LivestatusRow] | None]],
+    ) -> None:
+        try:
+            await self._receive_rows(pool, query, add_headers, column_types, queue)
+        except query.suppress_exceptions:
+            pass
+        except Exception as e:
+            self.deadsites[pool.site_name] = {
+                "exception": e,
+                "site": pool.config,
+            }
+        await queue.put((pool.site_name, None))
+
+    async def _receive_rows(
+        self,
+        pool: _AsyncSitePool,
+        query: Query,
+        add_headers: str,
+        column_types: Sequence[Callable[[str], LivestatusColumn]] | None,
+        queue: asyncio.Queue[tuple[SiteId, list[LivestatusRow] | None]],
+    ) -> None:
+        decoder: _ResponseRowDecoder | _CSVRowDecoder
+        if column_types is not None:
+            output_format = LivestatusOutputFormat.CSV
+            add_headers += "ColumnHeaders: off\n" + _CSV_SEPARATORS_HEADER
+            decoder = _CSVRowDecoder(column_types)
+        elif query.supports_json_format():
+            output_format = LivestatusOutputFormat.JSON
+            decoder = _ResponseRowDecoder(json_format=True)
+        else:
+            output_format = LivestatusOutputFormat.PYTHON
+            decoder = _ResponseRowDecoder(json_format=False)
+        str_query = _build_query(
+            query, self.auth_header, pool.allow_cache, output_format, add_headers
+        )
+        if getattr(SingleSiteConnection.collect_queries, "active", False):
+            SingleSiteConnection.collect_queries.queries.append(str_query)
+
+        stream, reused = await pool.acquire()
+        reusable = False
+        try:
+            try:
+                header = await self._send_query(pool, stream, str_query)
+            except (OSError, asyncio.IncompleteReadError):
+                if not reused:
+                    raise
+                # The peer has closed the idle connection in the meantime, e.g. due to
+                # its keepalive timeout. Try again with a new connection, but only once.
+                stream.close()
+                stream = await pool.connect()
+                header = await self._send_query(pool, stream, str_query)
+
+            code = header[0:3].decode("ascii")
+            try:
+                length = int(header[4:15].lstrip())
+            except ValueError:
+                raise MKLivestatusSocketError(
+                    f"Malformed response header {header!r}. Livestatus TCP socket might be "
+                    "unreachable or wrong encryption settings are used."
+                )
+
+            if code != "200":
+                data = await pool.wait(stream.reader.readexactly(length))
+                reusable = True
+                raise _response_error(code, data.decode("utf-8"))
+
+            while length:
+                chunk = await pool.wait(stream.reader.read(min(length, _READ_CHUNK_SIZE)))
+                if not chunk:
+                    raise MKLivestatusSocketClosed(
+                        "Read zero data from socket, remote peer closed connection."
+                    )
+                length -= len(chunk)
+                if rows := decoder.feed(chunk):
+                    await queue.put((pool.site_name, rows))
+            rows = decoder.finish()
+            reusable = True
+            if rows:
+                await queue.put((pool.site_name, rows))
+        finally:
+            pool.release(stream, reusable)
+
+    @staticmethod
+    async def _send_query(pool: _AsyncSitePool, stream: _AsyncStream, str_query: str) -> bytes:
+        stream.writer.write(str_query.encode("utf-8") + b"\n\n")
+        await pool.wait(stream.writer.drain())
+        return await pool.wait(stream.reader.readexactly(16))
+
+
 @contextlib.contextmanager
 def _livestatus_output_format_switcher(
     query: Query, connection: MultiSiteConnection | SingleSiteConnection
@@ -1336,6 +1876,39 @@ class LocalConnection(SingleSiteConnection):
         super().__init__("unix:" + omd_root + "/tmp/run/live", SiteId("local"), *args, **kwargs)
 
 
+def _build_query(
+    query_obj: Query,
+    auth_header: str,
+    allow_cache: bool,
+    output_format: LivestatusOutputFormat,
+    add_headers: str,
+) -> str:
+    query = str(query_obj)
+    if not allow_cache:
+        query = remove_cache_regex.sub("", query)
+
+    headers = [
+        auth_header,
+        f"Localtime: {int(time.time()):d}",
+        "OutputFormat: %s" % output_format.value,
+        "KeepAlive: on",
+        "ResponseHeader: fixed16",
+        add_headers,
+    ]
+
+    return _combine_query(query, headers)
+
+
+def _response_error(code: str, error_info: str) -> MKLivestatusException:
+    if code == "404":
+        return MKLivestatusTableNotFoundError(f"Not Found ({code}): {error_info!r}")
+
+    if code == "502":
+        return MKLivestatusBadGatewayError(error_info)
+
+    return MKLivestatusQueryError(f"{code}: {error_info}")
+
+
 def _combine_query(query: str, headers: str | list[str]) -> str:
     """Combine a query with additional headers
 
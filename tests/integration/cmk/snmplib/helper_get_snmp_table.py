@@ -23,6 +23,7 @@ from cmk.snmplib import (
 
 from cmk.fetchers.snmp_backend import (  # pylint: disable=cmk-module-layer-violation
     ClassicSNMPBackend,
+    NativeSNMPBackend,
     StoredWalkSNMPBackend,
 )
 
@@ -47,6 +48,8 @@ match backend_type:
         backend = InlineSNMPBackend
     case SNMPBackendEnum.CLASSIC:
         backend = ClassicSNMPBackend
+    case SNMPBackendEnum.NATIVE:
+        backend = NativeSNMPBackend
     case SNMPBackendEnum.STORED_WALK:
         backend = StoredWalkSNMPBackend
     case _:
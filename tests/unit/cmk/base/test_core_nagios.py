@@ -21,7 +21,9 @@ from tests.testlib.base import Scenario
 import cmk.utils.debug
 import cmk.utils.version as cmk_version
 from cmk.utils.config_path import VersionedConfigPath
-from cmk.utils.hostaddress import HostName
+from cmk.utils.hostaddress import HostAddress, HostName
+from cmk.utils.licensing.cre_handler import CRELicensingHandler
+from cmk.utils.licensing.handler import UserEffect
 
 from cmk.checkengine.checking import CheckPluginName
 
@@ -436,6 +438,52 @@ def test_compile_delayed_host_check(
         assert f.read().startswith(importlib.util.MAGIC_NUMBER)
 
 
+@pytest.mark.parametrize("processes", [1, 2])
+def test_precompile_hostchecks_links_unchanged_host_checks(
+    monkeypatch: MonkeyPatch, processes: int
+) -> None:
+    ts = Scenario()
+    ts.add_host(HostName("unchanged"), ipaddress=HostAddress("127.0.0.1"))
+    ts.add_host(HostName("changed"), ipaddress=HostAddress("127.0.0.2"))
+    ts.set_option("nagios_config_processes", processes)
+    ts.apply(monkeypatch)
+    monkeypatch.setattr(config, "save_packed_config", lambda *args: None)
+
+    monkeypatch.setattr(
+        core_nagios,
+        "_get_needed_plugin_names",
+        lambda *args, **kw: (set(), {CheckPluginName("uptime")}, set()),
+    )
+
+    def precompile(config_path: VersionedConfigPath, address_of_changed: str) -> None:
+        monkeypatch.setitem(config.ipaddresses, HostName("changed"), address_of_changed)
+        with config_path.create(is_cmc=False):
+            core_nagios._precompile_hostchecks(config_path)
+
+    def inode(config_path: VersionedConfigPath, hostname: str) -> int:
+        return (
+            core_nagios.HostCheckStore.host_check_file_path(config_path, HostName(hostname))
+            .stat()
+            .st_ino
+        )
+
+    first, second = VersionedConfigPath(1), VersionedConfigPath(2)
+    precompile(first, "127.0.0.2")
+    precompile(second, "127.0.0.3")
+
+    assert inode(second, "unchanged") == inode(first, "unchanged")
+    assert inode(second, "changed") != inode(first, "changed")
+    store = core_nagios.HostCheckStore()
+    assert (
+        store.load_manifest(second)[HostName("unchanged")]
+        == store.load_manifest(first)[HostName("unchanged")]
+    )
+    assert (
+        store.load_manifest(second)[HostName("changed")]
+        != store.load_manifest(first)[HostName("changed")]
+    )
+
+
 def mock_argument_function(params: Mapping[str, str]) -> str:
     return "--arg1 arument1 --host_alias $HOSTALIAS$"
 
@@ -928,3 +976,38 @@ def test_create_nagios_config_commands(
 
     assert license_counter["services"] == 1
     assert outfile.getvalue() == expected_result
+
+
+def test_create_config_in_processes_equals_sequential(
+    monkeypatch: MonkeyPatch, config_path: VersionedConfigPath
+) -> None:
+    class LicensingHandler(CRELicensingHandler):
+        def effect_core(self, num_services: int, num_hosts_shadow: int) -> UserEffect:
+            counted.append(num_services)
+            return super().effect_core(num_services, num_hosts_shadow)
+
+    ts = Scenario()
+    for nr in range(12):
+        ts.add_host(HostName(f"host{nr:02}"), ipaddress=HostAddress(f"127.0.0.{nr}"))
+    ts.set_option(
+        "host_check_commands",
+        [
+            {"id": "01", "condition": {"host_name": ["host03"]}, "value": ("service", "PING")},
+            {"id": "02", "condition": {"host_name": ["host05"]}, "value": ("custom", "true")},
+            {"id": "03", "condition": {"host_name": ["host07"]}, "value": ("service", "PING")},
+        ],
+    )
+    ts.apply(monkeypatch)
+
+    def create_config(processes: int) -> str:
+        monkeypatch.setattr(config, "nagios_config_processes", processes)
+        outfile = io.StringIO()
+        core_nagios.create_config(outfile, config_path, None, LicensingHandler())
+        return outfile.getvalue()
+
+    counted: list[int] = []
+    sequential = create_config(1)
+
+    assert "check-mk-host-custom-2" in sequential
+    assert create_config(3) == sequential
+    assert counted == [24, 24]
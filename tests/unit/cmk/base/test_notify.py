@@ -4,7 +4,10 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 
 import os
+import time
+import uuid
 from collections.abc import Mapping
+from pathlib import Path
 
 import pytest
 from pytest import MonkeyPatch
@@ -16,6 +19,7 @@ from cmk.utils.notify_types import (
     EventContext,
     NotificationContext,
     NotifyPluginParams,
+    UUIDs,
 )
 from cmk.utils.store.host_storage import ContactgroupName
 
@@ -110,3 +114,79 @@ def test_rbn_groups_contacts(
     assert notify.rbn_groups_contacts(["all"]) == {"dong"}
     assert notify.rbn_groups_contacts(["foo"]) == {"ding", "harry"}
     assert notify.rbn_groups_contacts(["foo", "all"]) == {"ding", "dong", "harry"}
+
+
+def _store_for_bulk(bulk_dir: Path, mtime: float) -> str:
+    bulk_dir.mkdir(parents=True, exist_ok=True)
+    notify_uuid = str(uuid.uuid4())
+    (bulk_dir / notify_uuid).write_text("({}, {})\n")
+    os.utime(bulk_dir / notify_uuid, (mtime, mtime))
+    return notify_uuid
+
+
+def test_bulk_index(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(notify, "notification_bulkdir", str(tmp_path))
+    now = time.time()
+    by_count = tmp_path / "harri" / "mail" / "3600,3,host,heute"
+    by_age = tmp_path / "harri" / "mail" / "60,100,host,morgen"
+    _store_for_bulk(by_count, now - 10)
+    _store_for_bulk(by_age, now - 10)
+
+    index = notify._BulkIndex()
+    assert not index.pop_ripe(now)
+    assert len(index) == 2
+
+    index.add(by_count, _store_for_bulk(by_count, now), now)
+    assert not index.pop_ripe(now)
+    index.add(by_count, _store_for_bulk(by_count, now), now)
+    (ripe,) = index.pop_ripe(now)
+    assert ripe[0] == str(by_count)
+    assert len(ripe[-1]) == 3
+
+    (ripe,) = index.pop_ripe(now + 50)
+    assert ripe[0] == str(by_age)
+    assert not index.pop_ripe(now + 50)
+    assert not index
+
+
+def test_bulk_index_rescans_bulk_dirs(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(notify, "notification_bulkdir", str(tmp_path))
+    now = time.time()
+    index = notify._BulkIndex()
+    assert not index.pop_ripe(now)
+
+    # stored by another process
+    bulk_dir = tmp_path / "harri" / "mail" / "60,1,host,heute"
+    _store_for_bulk(bulk_dir, now)
+    assert not index.pop_ripe(now)
+    assert [ripe[0] for ripe in index.pop_ripe(now + index.RESCAN_INTERVAL)] == [str(bulk_dir)]
+    assert [ripe[0] for ripe in notify.find_bulks(only_ripe=True)] == [str(bulk_dir)]
+
+
+def test_bulk_index_checks_not_ripe_bulks_again(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(notify, "notification_bulkdir", str(tmp_path))
+    now = time.time()
+    bulk_dir = tmp_path / "harri" / "mail" / "60,100,host,heute"
+    _store_for_bulk(bulk_dir, now - 100)
+    index = notify._BulkIndex()
+
+    check_bulk = notify._check_bulk
+    monkeypatch.setattr(notify, "_check_bulk", lambda bulk, now, only_ripe: None)
+    assert not index.pop_ripe(now)
+    monkeypatch.setattr(notify, "_check_bulk", check_bulk)
+    assert [ripe[0] for ripe in index.pop_ripe(now)] == [str(bulk_dir)]
+
+
+def test_send_ripe_bulks_retries_failed_bulks(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(notify, "notification_bulkdir", str(tmp_path))
+    bulk_dir = tmp_path / "harri" / "mail" / "60,100,host,heute"
+    _store_for_bulk(bulk_dir, time.time() - 100)
+    index = notify._BulkIndex()
+    monkeypatch.setattr(notify, "_bulk_index", index)
+
+    def notify_bulk(dirname: str, uuids: UUIDs) -> None:
+        raise OSError("no space left on device")
+
+    monkeypatch.setattr(notify, "notify_bulk", notify_bulk)
+    notify.send_ripe_bulks()
+    assert [ripe[0] for ripe in index.pop_ripe(time.time())] == [str(bulk_dir)]
@@ -3,6 +3,9 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+from pathlib import Path
+
+import pytest
 from pytest import MonkeyPatch
 
 from tests.testlib.base import Scenario
@@ -114,3 +117,25 @@ def test_service_labels(monkeypatch):
             "CPU temp": {"label1": "val1"},
         }
     )
+
+
+@pytest.mark.parametrize(
+    "automation",
+    [automations.AutomationDeleteHosts(), automations.AutomationDeleteHostsKnownRemote()],
+)
+def test_delete_host_inventory_files(
+    monkeypatch: MonkeyPatch, tmp_path: Path, automation: automations.ABCDeleteHosts
+) -> None:
+    monkeypatch.setattr(automations, "var_dir", str(tmp_path))
+    inventory_dir = tmp_path / "inventory"
+    inventory_dir.mkdir()
+    for name in ["host", "host.gz", "host.sdi", "other", "other.gz", "other.sdi"]:
+        (inventory_dir / name).touch()
+
+    automation._execute(["host"])
+
+    assert sorted(path.name for path in inventory_dir.iterdir()) == [
+        "other",
+        "other.gz",
+        "other.sdi",
+    ]
@@ -25,8 +25,19 @@ from cmk.snmplib import SNMPRawData
 
 from cmk.fetchers.cache import SectionStore
 
-from cmk.checkengine.parser import AgentParser, AgentRawDataSectionElem, NO_SELECTION, SNMPParser
-from cmk.checkengine.parser._agent import is_valid_hostname
+from cmk.checkengine.parser import (
+    AgentParser,
+    AgentRawDataSectionElem,
+    NO_SELECTION,
+    SectionNameCollection,
+    SNMPParser,
+)
+from cmk.checkengine.parser._agent import (
+    is_valid_hostname,
+    NOOPParser,
+    ParserState,
+    SectionWithHeader,
+)
 from cmk.checkengine.parser._markers import PiggybackMarker, SectionMarker
 
 StringTable = list[list[str]]
@@ -761,6 +772,90 @@ class TestAgentParser:
         }
         assert store.load() == {}
 
+    @pytest.mark.parametrize(
+        "selection",
+        [NO_SELECTION, frozenset({SectionName("section"), SectionName("other")}), frozenset()],
+    )
+    def test_section_splitting_matches_state_machine(
+        self, parser: AgentParser, selection: SectionNameCollection
+    ) -> None:
+        cmk.utils.debug.disable()
+        raw_data = AgentRawData(
+            b"\n".join(
+                (
+                    b"before any section",
+                    b"<<<section>>>\r",
+                    b"  a b  \r",
+                    b"   ",
+                    b"<<<section:nostrip>>>",
+                    b"  c d  ",
+                    b"\r",
+                    b"x<<<not_a_header>>>",
+                    b"<<<not_a_header>>> ",
+                    b"<<<section>>>",
+                    b"e",
+                    b"<<<>>>",
+                    b"ignored",
+                    b"<<<other:sep(44):cached(1,2)>>>",
+                    b"f,g",
+                    b"<<<i n v a l i d>>>",
+                    b"ignored",
+                    b"<<<<piggy>>>>",
+                    b"ignored",
+                    b"<<<section>>>",
+                    b"  h  \r",
+                    b"<<<>>>",
+                    b"ignored",
+                    b"<<<unselected>>>",
+                    b"i",
+                    b"<<<<.>>>>",
+                    b"<<<section>>>",
+                    b"ignored",
+                    b"<<<<>>>>",
+                    b"<<<<testhost>>>>",
+                    b"<<<unselected>>>",
+                    b"j",
+                    b"<<<<piggy>>>>",
+                    b"<<<section>>>",
+                    b"k",
+                    b"<<<<>>>>",
+                    b"<<<section>>>",
+                    b"l",
+                    b"",
+                )
+            )
+        )
+        state: ParserState = NOOPParser(
+            parser.hostname,
+            [],
+            {},
+            translation=parser.translation,
+            encoding_fallback=parser.encoding_fallback,
+            logger=parser._logger,
+        )
+        for line in raw_data.split(b"\n"):
+            state = state(line.rstrip(b"\r"))
+
+        def selected(
+            sections: Sequence[SectionWithHeader],
+        ) -> list[tuple[SectionMarker, list[AgentRawData]]]:
+            return [
+                (header, content if selection is NO_SELECTION or header.name in selection else [])
+                for header, content in sections
+            ]
+
+        sections, piggyback_sections = parser._parse_host_section(raw_data, selection=selection)
+        assert selected(sections) == selected(state.sections)
+        assert {host: selected(content) for host, content in piggyback_sections.items()} == {
+            host: selected(content) for host, content in state.piggyback_sections.items()
+        }
+        assert [header.name for header, _content in sections] == [
+            SectionName("section"),
+            SectionName("other"),
+            SectionName("unselected"),
+            SectionName("section"),
+        ]
+
 
 class TestSectionMarker:
     def test_options_serialize_options(self) -> None:
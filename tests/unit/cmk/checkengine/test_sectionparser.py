@@ -7,6 +7,7 @@ from collections.abc import Callable, Iterable, Sequence
 
 import pytest
 
+from cmk.utils.everythingtype import EVERYTHING
 from cmk.utils.hostaddress import HostName
 from cmk.utils.sectionname import SectionMap, SectionName
 
@@ -15,8 +16,11 @@ from cmk.checkengine.fetcher import HostKey, SourceType
 from cmk.checkengine.parser import AgentRawDataSection, AgentRawDataSectionElem, HostSections
 from cmk.checkengine.sectionparser import _ParsingResult as ParsingResult
 from cmk.checkengine.sectionparser import (
+    demanded_section_plugins,
+    make_providers,
     ParsedSectionName,
     ParsedSectionsResolver,
+    ParsingStatistics,
     ResolvedResult,
     SectionPlugin,
     SectionsParser,
@@ -214,6 +218,48 @@ def test_parse_sections_superseded() -> None:
     )
 
 
+@pytest.mark.parametrize(
+    "demanded, expected",
+    [
+        (EVERYTHING, {"one", "two", "three", "four"}),
+        ({ParsedSectionName("parsed")}, {"one", "two", "four"}),
+        ({ParsedSectionName("parsed2")}, {"three"}),
+        ({ParsedSectionName("parsed_four")}, {"four"}),
+        (set(), set()),
+    ],
+)
+def test_demanded_section_plugins(demanded: set[ParsedSectionName], expected: set[str]) -> None:
+    assert set(
+        demanded_section_plugins(
+            dict((SECTION_ONE, SECTION_TWO, SECTION_THREE, SECTION_FOUR)), demanded
+        )
+    ) == {SectionName(n) for n in expected}
+
+
+def test_make_providers_parses_demanded_sections_only() -> None:
+    host_key = HostKey(HostName("some-host"), SourceType.HOST)
+    providers = make_providers(
+        {
+            host_key: HostSections[AgentRawDataSection](
+                sections={
+                    SectionName("one"): NODE_1,
+                    SectionName("three"): NODE_1,
+                    SectionName("four"): NODE_1,
+                }
+            )
+        },
+        dict((SECTION_ONE, SECTION_TWO, SECTION_THREE, SECTION_FOUR)),
+        error_handling=lambda *args, **kw: "error",
+        demanded={ParsedSectionName("parsed")},
+    )
+
+    assert [r.section_name for r in all_parsing_results(host_key, providers)] == [
+        SectionName("four")
+    ]
+    # "four" has been parsed to find out that it supersedes "one".
+    assert providers[host_key].statistics == ParsingStatistics(parsed=1, skipped=2)
+
+
 class TestSectionsParser:
     @pytest.fixture
     def sections_parser(self) -> SectionsParser[AgentRawDataSectionElem]:
@@ -273,6 +319,17 @@ class TestSectionsParser:
         sections_parser.disable([section_name])
 
         assert sections_parser.parse(section_name, lambda *args, **kw: 42) is None
+        assert sections_parser.statistics == ParsingStatistics(parsed=0, skipped=2)
+
+    @staticmethod
+    def test_statistics(sections_parser: SectionsParser[AgentRawDataSectionElem]) -> None:
+        assert sections_parser.statistics == ParsingStatistics(parsed=0, skipped=2)
+
+        _ = sections_parser.parse(SectionName("one"), lambda *args, **kw: 42)
+        _ = sections_parser.parse(SectionName("one"), lambda *args, **kw: 42)
+        _ = sections_parser.parse(SectionName("missing_section"), lambda *args, **kw: 42)
+
+        assert sections_parser.statistics == ParsingStatistics(parsed=1, skipped=1)
 
     @staticmethod
     def test_parse_missing_section(
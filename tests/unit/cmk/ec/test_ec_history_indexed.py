@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""EC History indexed backend"""
+
+import logging
+from collections.abc import Sequence
+
+import pytest
+
+from cmk.utils.hostaddress import HostName
+
+import cmk.ec.history_indexed
+from cmk.ec.config import Config
+from cmk.ec.event import Event
+from cmk.ec.history_file import FileHistory
+from cmk.ec.history_indexed import IndexedHistory, read_index
+from cmk.ec.main import create_history, StatusTableEvents, StatusTableHistory
+from cmk.ec.query import QueryGET, StatusTable
+from cmk.ec.settings import Settings
+
+logger = logging.getLogger("cmk.mkeventd")
+
+
+@pytest.fixture(name="history_indexed")
+def fixture_history_indexed(
+    settings: Settings, config: Config, monkeypatch: pytest.MonkeyPatch
+) -> IndexedHistory:
+    monkeypatch.setattr(cmk.ec.history_indexed, "BLOCK_SIZE", 4)
+    history = create_history(
+        settings,
+        {**config, "archive_mode": "indexed"},
+        logger,
+        StatusTableEvents.columns,
+        StatusTableHistory.columns,
+    )
+    assert isinstance(history, IndexedHistory)
+    history.flush()
+    return history
+
+
+def _query(history: FileHistory | IndexedHistory, *headers: str) -> list[Sequence[object]]:
+    def get_table(name: str) -> StatusTable:
+        assert name == "history"
+        return StatusTableHistory(logger, history)
+
+    return list(history.get(QueryGET(get_table, ["GET history", *headers], logger)))
+
+
+def _column(name: str) -> int:
+    return StatusTableHistory(logger, None).column_names.index(name)  # type: ignore[arg-type]
+
+
+def _add_events(history: FileHistory | IndexedHistory) -> None:
+    for n in range(10):
+        history.add(
+            Event(id=n, host=HostName(f"Host{n % 3}"), text=f"text {n}", core_host=None),
+            what="NEW",
+        )
+
+
+def test_indexed_add_get(history_indexed: IndexedHistory) -> None:
+    _add_events(history_indexed)
+
+    rows = _query(history_indexed, "Filter: event_host = Host1")
+
+    assert [row[_column("event_text")] for row in rows] == ["text 7", "text 4", "text 1"]
+    assert [row[_column("history_line")] for row in rows] == [8, 5, 2]
+
+
+def test_indexed_writes_blocks(history_indexed: IndexedHistory, settings: Settings) -> None:
+    _add_events(history_indexed)
+
+    (path,) = settings.paths.history_dir.value.glob("*.log")
+    blocks = read_index(path)
+
+    # The last two events are in the open block, which is not indexed yet
+    assert [block.count for block in blocks] == [4, 4]
+    assert blocks[0].event_ids == {0, 1, 2, 3}
+    assert blocks[1].hosts == {"host0", "host1", "host2"}
+    assert blocks[1].offset == blocks[0].end
+
+
+def test_indexed_get_skips_blocks(history_indexed: IndexedHistory) -> None:
+    _add_events(history_indexed)
+
+    rows = _query(history_indexed, "Filter: event_id = 5")
+    (row,) = rows
+    assert row[_column("event_text")] == "text 5"
+
+    rows = _query(history_indexed, "Filter: event_host in host0 host2", "Limit: 3")
+    assert [row[_column("event_id")] for row in rows] == [9, 8, 6]
+
+
+def test_indexed_matches_file_history(
+    history: FileHistory, history_indexed: IndexedHistory
+) -> None:
+    """The indexed history reads and converts the log files of the file backend"""
+    _add_events(history)
+
+    for headers in [
+        (),
+        ("Filter: event_host = Host2",),
+        ("Filter: event_host ~ Host[12]",),
+        ("Filter: event_id = 3",),
+        ("Filter: history_time > 0",),
+    ]:
+        assert _query(history_indexed, *headers) == _query(history, *headers)
+
+    history_indexed.housekeeping()
+    assert _query(history_indexed, "Filter: event_host = Host0") == _query(
+        history, "Filter: event_host = Host0"
+    )
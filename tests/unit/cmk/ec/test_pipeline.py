@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import logging
+import select
+import threading
+from collections.abc import Iterable, Iterator
+
+from cmk.utils.hostaddress import HostName
+
+from cmk.ec.event import Event
+from cmk.ec.perfcounters import Perfcounters
+from cmk.ec.pipeline import CreateEventsFromTrap, EventPipeline
+
+logger = logging.getLogger("cmk.mkeventd")
+
+
+def _create_events_from_trap(data: bytes, address: tuple[str, int]) -> Iterator[Event]:
+    yield Event(text=data.decode(), host=HostName(address[0]), application="trap")
+
+
+def _make_create_events_from_trap() -> CreateEventsFromTrap:
+    return _create_events_from_trap
+
+
+def _create_other_events_from_trap(data: bytes, address: tuple[str, int]) -> Iterator[Event]:
+    yield Event(text="reloaded", host=HostName(address[0]), application="trap")
+
+
+def _make_create_other_events_from_trap() -> CreateEventsFromTrap:
+    return _create_other_events_from_trap
+
+
+def test_pipeline_keeps_order_of_reception() -> None:
+    processed: list[Event] = []
+
+    def process_events(events: Iterable[Event]) -> None:
+        processed.extend(events)
+
+    pipeline = EventPipeline(
+        2, _make_create_events_from_trap, process_events, Perfcounters(logger), logger
+    )
+    for n in range(20):
+        pipeline.submit_syslog_messages(
+            [(f"<78>Mar 1 12:00:0{n % 10} myhost app: message {n}".encode(), ("1.2.3.4", 514))],
+            None,
+        )
+    pipeline.submit_snmp_trap(b"trap", ("5.6.7.8", 162))
+    pipeline.submit_syslog_messages([], None)
+    pipeline.terminate()
+
+    assert [event["text"] for event in processed] == [f"message {n}" for n in range(20)] + ["trap"]
+    assert processed[0]["host"] == "myhost"
+    assert processed[0]["ipaddress"] == "1.2.3.4"
+    assert processed[-1]["host"] == "5.6.7.8"
+
+
+def test_pipeline_reload_configuration() -> None:
+    processed: list[Event] = []
+
+    pipeline = EventPipeline(
+        1, _make_create_events_from_trap, processed.extend, Perfcounters(logger), logger
+    )
+    pipeline.submit_snmp_trap(b"trap", ("5.6.7.8", 162))
+    pipeline.reload_configuration(_make_create_other_events_from_trap)
+    pipeline.submit_snmp_trap(b"trap", ("5.6.7.8", 162))
+    pipeline.terminate()
+
+    assert [event["text"] for event in processed] == ["trap", "reloaded"]
+
+
+def test_pipeline_processes_in_calling_thread() -> None:
+    processing_threads: list[threading.Thread] = []
+
+    def process_events(events: Iterable[Event]) -> None:
+        processing_threads.extend(threading.current_thread() for _event in events)
+
+    pipeline = EventPipeline(
+        1, _make_create_events_from_trap, process_events, Perfcounters(logger), logger
+    )
+    pipeline.submit_snmp_trap(b"trap", ("5.6.7.8", 162))
+    assert select.select([pipeline], [], [], 30)[0] == [pipeline]
+    pipeline.process_parsed()
+    assert processing_threads == [threading.current_thread()]
+    pipeline.terminate()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import pytest
+
+from livestatus import SiteId
+
+from cmk.utils.hostaddress import HostName
+
+from cmk.ec.config import Rule
+from cmk.ec.event import Event
+from cmk.ec.rule_index import benchmark_rule_matching, RuleIndex
+from cmk.ec.rule_matcher import compile_rule, MatchSuccess, RuleMatcher
+
+
+def _rule(rule_id: str, **conditions: object) -> Rule:
+    rule = Rule(id=rule_id, pack="pack", state=0)
+    rule.update(conditions)  # type: ignore[typeddict-item]
+    compile_rule(rule)
+    return rule
+
+
+def _event(text: str, host: str = "myhost", application: str = "myapp") -> Event:
+    return Event(
+        text=text,
+        host=HostName(host),
+        application=application,
+        facility=1,
+        priority=0,
+        ipaddress="",
+    )
+
+
+RULES = [
+    _rule("literal", match="disk full"),
+    _rule("regex", match="^kernel: .* oom$"),
+    _rule("with_ok", match="link down", match_ok="link up"),
+    _rule("literal_host", match_host="Server1"),
+    _rule("regex_host", match_host="^web[0-9]+$"),
+    _rule("application", match_application="sshd"),
+    _rule("cancel_application", match_application="cron", cancel_application="anacron"),
+    _rule("inverted", match="disk full", invert_matching=True),
+    _rule("named_group_1", match="(?P<user>[a-z]+) logged in"),
+    _rule("named_group_2", match="(?P<user>[a-z]+) logged out"),
+    _rule("back_reference", match=r"(\w+) \1"),
+    _rule("unconditional"),
+]
+
+
+@pytest.mark.parametrize(
+    "event",
+    [
+        _event("Disk full on /var"),
+        _event("kernel: process killed by oom"),
+        _event("eth0 link up"),
+        _event("eth0 link down"),
+        _event("whatever", host="server1"),
+        _event("whatever", host="server10"),
+        _event("whatever", host="web17"),
+        _event("whatever", application="sshd[123]"),
+        _event("whatever", application="anacron"),
+        _event("alice logged out"),
+        _event("again again"),
+        _event("nothing interesting"),
+    ],
+)
+def test_candidates_keep_all_matching_rules(event: Event) -> None:
+    matcher = RuleMatcher(None, SiteId("NO_SITE"), lambda _name: True)
+    matching = [
+        rule["id"]
+        for rule in RULES
+        if isinstance(matcher.event_rule_matches(rule, event), MatchSuccess)
+    ]
+    candidates = [rule["id"] for rule in RuleIndex(RULES).candidates(RULES, event)]
+
+    assert [rule_id for rule_id in candidates if rule_id in matching] == matching
+    assert "inverted" in candidates
+    assert "unconditional" in candidates
+
+
+def test_candidates_skip_rules_which_can_not_match() -> None:
+    candidates = [
+        rule["id"] for rule in RuleIndex(RULES).candidates(RULES, _event("nothing interesting"))
+    ]
+    assert candidates == ["inverted", "unconditional"]
+
+
+def test_candidates_keep_rules_referencing_group_numbers() -> None:
+    rules = [
+        _rule("group", match="(a+)b"),
+        _rule("back_reference", match=r"(x)y\1"),
+        _rule("conditional", match=r"^(x)?y(?(1)z|$)"),
+    ]
+    index = RuleIndex(rules)
+    assert [rule["id"] for rule in index.candidates(rules, _event("xyx"))] == ["back_reference"]
+    assert [rule["id"] for rule in index.candidates(rules, _event("xyz"))] == ["conditional"]
+
+
+def test_candidates_of_unknown_rules_are_kept() -> None:
+    unknown = _rule("unknown", match="never")
+    assert list(RuleIndex(RULES).candidates([unknown], _event("nothing"))) == [unknown]
+
+
+def test_benchmark_rule_matching() -> None:
+    matcher = RuleMatcher(None, SiteId("NO_SITE"), lambda _name: True)
+    result = benchmark_rule_matching(
+        RULES, [_event("Disk full"), _event("foo", host="web1")], matcher.event_rule_matches
+    )
+    assert result.num_events == 2
+    assert result.num_rules == len(RULES)
+    assert result.mismatches == 0
@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=redefined-outer-name
+
+import asyncio
+import logging
+import select
+import socket
+import threading
+import time
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+import cmk.utils.resulttype as result
+from cmk.utils.exceptions import MKFetcherError, MKSNMPError, OnError
+from cmk.utils.hostaddress import HostAddress, HostName
+from cmk.utils.sectionname import SectionName
+
+from cmk.snmplib import (
+    BackendOIDSpec,
+    BackendSNMPTree,
+    SNMPBackendEnum,
+    SNMPContextTimeout,
+    SNMPDetectSpec,
+    SNMPHostConfig,
+    SpecialColumn,
+)
+
+from cmk.fetchers import Mode, SNMPFetcher, SNMPSectionMeta
+from cmk.fetchers.snmp import SNMPPluginStore, SNMPPluginStoreItem
+from cmk.fetchers.snmp_backend import NativeSNMPBackend, SNMPEngine, StoredWalkSNMPBackend
+from cmk.fetchers.snmp_backend._utils import strip_snmp_value
+from cmk.fetchers.snmp_backend.native import (
+    CommunityMessages,
+    encode_pdu,
+    localize_key,
+    MalformedMessage,
+    password_to_key,
+    PDU,
+    USMMessages,
+)
+
+ENGINE_ID = bytes.fromhex("80001f8880e9bd0c1d12667a5100000000")
+
+WALK = """\
+.1.3.6.1.2.1.1.1.0 Linux heute 6.1.0-13-amd64 #1 SMP
+.1.3.6.1.2.1.1.3.0 1234567
+.1.3.6.1.2.1.2.1.0 3
+.1.3.6.1.2.1.2.2.1.1.1 1
+.1.3.6.1.2.1.2.2.1.1.2 2
+.1.3.6.1.2.1.2.2.1.1.3 3
+.1.3.6.1.2.1.2.2.1.2.1 lo
+.1.3.6.1.2.1.2.2.1.2.2 "eth0"
+.1.3.6.1.2.1.2.2.1.2.3 wlan0
+.1.3.6.1.2.1.2.2.1.6.1 ""
+.1.3.6.1.2.1.2.2.1.6.2 "52 54 00 12 34 56 "
+.1.3.6.1.2.1.2.2.1.6.3 "00 1B 21 0A 0B 0C "
+.1.3.6.1.2.1.2.2.1.10.1 -5
+.1.3.6.1.2.1.2.2.1.10.2 123456789
+.1.3.6.1.2.1.2.2.1.10.3 0
+.1.3.6.1.2.1.25.1.1.0 4711
+"""
+
+
+def _encode_value(tag: int, payload: bytes) -> bytes:
+    assert len(payload) < 0x80
+    return bytes((tag, len(payload))) + payload
+
+
+def _walk_value(value: str) -> bytes:
+    """Serve numbers as INTEGER and everything else as OCTET STRING"""
+    if value.lstrip("-").isdigit():
+        number = int(value)
+        return _encode_value(
+            0x02, number.to_bytes(number.bit_length() // 8 + 1, "big", signed=True)
+        )
+    return _encode_value(0x04, strip_snmp_value(value))
+
+
+class FakeAgent:
+    """A stand-in of an SNMP agent serving the values of a walk
+
+    All requests which arrive within `delay` are answered together.
+    """
+
+    def __init__(
+        self,
+        values: Sequence[tuple[str, bytes]],
+        messages: CommunityMessages | USMMessages,
+        *,
+        delay: float = 0.0,
+    ) -> None:
+        self.values = sorted(
+            ((tuple(map(int, oid.strip(".").split("."))), oid, value) for oid, value in values)
+        )
+        self.messages = messages
+        self.delay = delay
+        self.requests: list[PDU] = []
+        self.batch_sizes: list[int] = []
+        self.drop = 0
+        self.report_engine: USMMessages | None = None
+        self.reports = 0
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(("127.0.0.1", 0))
+        self.port: int = self.socket.getsockname()[1]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    def __enter__(self) -> "FakeAgent":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.socket.close()
+
+    def _serve(self) -> None:
+        while not self._stop.is_set():
+            if not select.select([self.socket], [], [], 0.01)[0]:
+                continue
+            time.sleep(self.delay)
+            batch = []
+            while select.select([self.socket], [], [], 0)[0]:
+                batch.append(self.socket.recvfrom(65535))
+            self.batch_sizes.append(len(batch))
+            for data, address in batch:
+                if self.drop:
+                    self.drop -= 1
+                    continue
+                try:
+                    answer = self._answer(data)
+                except MKSNMPError:
+                    continue  # Like an agent not knowing the credentials
+                self.socket.sendto(answer, address)
+
+    def _answer(self, data: bytes) -> bytes:
+        if self.report_engine is not None:
+            # The discovery of the engine is not authenticated
+            try:
+                pdu = USMMessages(("noAuthNoPriv", "")).decode(data)
+            except MKSNMPError:
+                pass
+            else:
+                if not pdu.varbinds:
+                    self.reports += 1
+                    report = encode_pdu(0xA8, 0, [(".1.3.6.1.6.3.15.1.1.4.0", b"\x41\x01\x01")])
+                    return self.report_engine.encode(report, pdu.request_id, "")
+        pdu = self.messages.decode(data)
+        self.requests.append(pdu)
+        varbinds = []
+        for oid, _tag, _value in pdu.varbinds:
+            key = tuple(map(int, oid.strip(".").split(".")))
+            if pdu.tag == 0xA0:  # GET
+                varbinds.append(
+                    next(
+                        ((o, v) for k, o, v in self.values if k == key),
+                        (oid, b"\x81\x00"),
+                    )
+                )
+                continue
+            repetitions = pdu.error_index if pdu.tag == 0xA5 else 1
+            following = [(o, v) for k, o, v in self.values if k > key][:repetitions]
+            varbinds.extend(following or [(oid, b"\x82\x00")])
+        return self.messages.encode(encode_pdu(0xA2, pdu.request_id, varbinds), pdu.request_id, "")
+
+
+def _config(port: int, **kwargs: Any) -> SNMPHostConfig:
+    return SNMPHostConfig(
+        is_ipv6_primary=False,
+        hostname=HostName("heute"),
+        ipaddress=HostAddress("127.0.0.1"),
+        credentials="public",
+        port=port,
+        is_bulkwalk_host=True,
+        is_snmpv2or3_without_bulkwalk_host=False,
+        bulk_walk_size_of=2,
+        timing={"timeout": 0.2, "retries": 1},
+        oid_range_limits={},
+        snmpv3_contexts=[],
+        snmpv3_contexts_skip_on_timeout=False,
+        character_encoding=None,
+        snmp_backend=SNMPBackendEnum.NATIVE,
+    )._replace(**kwargs)
+
+
+@pytest.fixture
+def walk_file(tmp_path: Path) -> Path:
+    path = tmp_path / "heute"
+    path.write_text(WALK)
+    return path
+
+
+@pytest.fixture
+def agent(walk_file: Path) -> Iterator[FakeAgent]:
+    with FakeAgent(
+        [
+            (line.split(None, 1)[0], _walk_value(line.split(None, 1)[1].strip()))
+            for line in walk_file.read_text().splitlines()
+        ],
+        CommunityMessages(1, "public"),
+    ) as fake_agent:
+        yield fake_agent
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        pytest.param({}, id="bulkwalk"),
+        pytest.param({"is_bulkwalk_host": False}, id="getnext"),
+        pytest.param({"bulk_walk_size_of": 50}, id="large bulks"),
+    ],
+)
+@pytest.mark.parametrize(
+    "oids",
+    [
+        [".1.3.6.1.2.1.2.2.1.2", ".1.3.6.1.2.1.2.2.1.6", ".1.3.6.1.2.1.2.2.1.10"],
+        [".1.3.6.1.2.1.1", ".1.3.6.1.2.1.1.1.0", ".1.3.6.1.2.1.99", "1.3.6.1.2.1.25"],
+    ],
+)
+def test_walk_many_as_stored_walk(
+    agent: FakeAgent, walk_file: Path, config: dict[str, Any], oids: Sequence[str]
+) -> None:
+    logger = logging.getLogger("test")
+    stored_walk = StoredWalkSNMPBackend(_config(agent.port), logger, path=walk_file)
+    assert NativeSNMPBackend(_config(agent.port, **config), logger).walk_many(oids, context="") == [
+        stored_walk.walk(oid, context="") for oid in oids
+    ]
+
+
+def test_walk_values(agent: FakeAgent) -> None:
+    agent.values = [
+        ((1, 3, 1), ".1.3.1", b"\x04\x04 ab\t"),
+        ((1, 3, 2), ".1.3.2", b"\x04\x03\xc3\xa4 "),
+        ((1, 3, 3), ".1.3.3", b"\x41\x05\x00\xff\xff\xff\xff"),
+        ((1, 3, 4), ".1.3.4", b"\x43\x02\x01\x00"),
+        ((1, 3, 5), ".1.3.5", b"\x46\x02\x01\x00"),
+        ((1, 3, 6), ".1.3.6", b"\x40\x04\x7f\x00\x00\x01"),
+        ((1, 3, 7), ".1.3.7", b"\x06\x05\x2b\x06\x01\x82\x37"),
+        ((1, 3, 8), ".1.3.8", b"\x05\x00"),
+        ((1, 3, 9), ".1.3.9", b"\x80\x00"),
+    ]
+    assert NativeSNMPBackend(_config(agent.port), logging.getLogger("test")).walk(
+        ".1.3", context=""
+    ) == [
+        (".1.3.1", b"ab"),
+        (".1.3.2", b"\xc3\xa4 "),
+        (".1.3.3", b"4294967295"),
+        (".1.3.4", b"256"),
+        (".1.3.5", b"256"),
+        (".1.3.6", b"127.0.0.1"),
+        (".1.3.7", b".1.3.6.1.311"),
+        (".1.3.8", b""),
+    ]
+
+
+def test_walks_are_pipelined(agent: FakeAgent) -> None:
+    agent.delay = 0.05
+    oids = [f".1.3.6.1.2.1.2.2.1.{column}" for column in (1, 2, 6, 10)] + [".1.3.6.1.2.1.1"]
+    backend = NativeSNMPBackend(
+        _config(agent.port, timing={"timeout": 1.0}),
+        logging.getLogger("test"),
+        max_requests_in_flight=3,
+    )
+    rowinfos = backend.walk_many(oids, context="")
+    assert [len(rows) for rows in rowinfos] == [3, 3, 3, 3, 2]
+    assert max(agent.batch_sizes) == 3
+    assert len(agent.batch_sizes) < len(agent.requests)
+
+
+def test_get(agent: FakeAgent) -> None:
+    backend = NativeSNMPBackend(_config(agent.port), logging.getLogger("test"))
+    assert backend.get(".1.3.6.1.2.1.1.3.0", context="") == b"1234567"
+    assert backend.get(".1.3.6.1.2.1.1.2.0", context="") is None
+    assert backend.get(".1.3.6.1.2.1.2.2.1.2.*", context="") == b"lo"
+    assert backend.get(".1.3.6.1.2.1.2.2.1.99.*", context="") is None
+    assert [pdu.tag for pdu in agent.requests] == [0xA0, 0xA0, 0xA1, 0xA1]
+
+
+def test_repeats_lost_requests(agent: FakeAgent) -> None:
+    agent.drop = 1
+    assert NativeSNMPBackend(_config(agent.port), logging.getLogger("test")).walk(
+        ".1.3.6.1.2.1.2.2.1.2", context=""
+    ) == [
+        (".1.3.6.1.2.1.2.2.1.2.1", b"lo"),
+        (".1.3.6.1.2.1.2.2.1.2.2", b"eth0"),
+        (".1.3.6.1.2.1.2.2.1.2.3", b"wlan0"),
+    ]
+
+
+def test_timeout(agent: FakeAgent) -> None:
+    agent.drop = 100
+    with pytest.raises(MKSNMPError, match="Timeout"):
+        NativeSNMPBackend(_config(agent.port), logging.getLogger("test")).walk(
+            ".1.3.6.1.2.1.1", context=""
+        )
+    with pytest.raises(SNMPContextTimeout):
+        NativeSNMPBackend(
+            _config(agent.port, credentials=("noAuthNoPriv", "user")), logging.getLogger("test")
+        ).walk(".1.3.6.1.2.1.1", context="")
+    assert len(agent.requests) == 0
+
+
+@pytest.mark.parametrize(
+    "hash_name, key, localized",
+    [
+        # RFC 3414, A.3
+        (
+            "md5",
+            "9faf3283884e92834ebc9847d8edd963",
+            "526f5eed9fcce26f8964c2930787d82b",
+        ),
+        (
+            "sha1",
+            "9fb5cc0381497b3793528939ff788d5d79145211",
+            "6695febc9288e36282235fc7151f128497b38f3f",
+        ),
+    ],
+)
+def test_localize_key(hash_name: str, key: str, localized: str) -> None:
+    assert password_to_key("maplesyrup", hash_name).hex() == key
+    assert localize_key(bytes.fromhex(key), bytes(11) + b"\x02", hash_name).hex() == localized
+
+
+@pytest.mark.parametrize(
+    "credentials",
+    [
+        ("noAuthNoPriv", "heute"),
+        ("authNoPriv", "md5", "heute", "authpass"),
+        ("authNoPriv", "SHA-512", "heute", "authpass"),
+        ("authPriv", "sha", "heute", "authpass", "DES", "privpass"),
+        ("authPriv", "SHA-256", "heute", "authpass", "AES", "privpass"),
+        ("authPriv", "md5", "heute", "authpass", "AES-256", "privpass"),
+    ],
+)
+def test_walk_snmpv3(walk_file: Path, credentials: tuple[str, ...]) -> None:
+    with FakeAgent(
+        [
+            (line.split(None, 1)[0], _walk_value(line.split(None, 1)[1].strip()))
+            for line in walk_file.read_text().splitlines()
+        ],
+        USMMessages(credentials, engine_id=ENGINE_ID, boots=3),
+    ) as fake_agent:
+        fake_agent.report_engine = USMMessages(("noAuthNoPriv", "heute"), engine_id=ENGINE_ID)
+        backend = NativeSNMPBackend(
+            _config(fake_agent.port, credentials=credentials), logging.getLogger("test")
+        )
+        assert backend.walk(".1.3.6.1.2.1.2.2.1.2", context="") == [
+            (".1.3.6.1.2.1.2.2.1.2.1", b"lo"),
+            (".1.3.6.1.2.1.2.2.1.2.2", b"eth0"),
+            (".1.3.6.1.2.1.2.2.1.2.3", b"wlan0"),
+        ]
+        # The engine is only discovered once
+        assert backend.get(".1.3.6.1.2.1.1.3.0", context="") == b"1234567"
+
+
+def test_walk_snmpv3_without_retries(walk_file: Path) -> None:
+    credentials = ("authPriv", "sha", "heute", "authpass", "AES", "privpass")
+    with FakeAgent(
+        [(".1.3.6.1.2.1.1.3.0", b"\x02\x01\x01")],
+        USMMessages(credentials, engine_id=ENGINE_ID, boots=3),
+    ) as fake_agent:
+        fake_agent.report_engine = USMMessages(("noAuthNoPriv", "heute"), engine_id=ENGINE_ID)
+        backend = NativeSNMPBackend(
+            _config(
+                fake_agent.port, credentials=credentials, timing={"timeout": 0.2, "retries": 0}
+            ),
+            logging.getLogger("test"),
+        )
+        # The request is repeated after the discovery of the engine
+        assert backend.get(".1.3.6.1.2.1.1.3.0", context="") == b"1"
+        assert fake_agent.reports == 1
+
+
+@pytest.mark.parametrize(
+    "credentials, spoofed",
+    [
+        (
+            ("authNoPriv", "md5", "heute", "authpass"),
+            ("noAuthNoPriv", "heute"),
+        ),
+        (
+            ("authPriv", "sha", "heute", "authpass", "AES", "privpass"),
+            ("noAuthNoPriv", "heute"),
+        ),
+        (
+            ("authPriv", "sha", "heute", "authpass", "AES", "privpass"),
+            ("authNoPriv", "sha", "heute", "authpass"),
+        ),
+    ],
+)
+def test_usm_rejects_response_below_security_level(
+    credentials: tuple[str, ...], spoofed: tuple[str, ...]
+) -> None:
+    messages = USMMessages(credentials, engine_id=ENGINE_ID, boots=3)
+    response = encode_pdu(0xA2, 42, [(".1.3.6.1.2.1.1.1.0", b"\x04\x04evil")])
+    agent_messages = USMMessages(credentials, engine_id=ENGINE_ID, boots=3)
+    assert messages.decode(agent_messages.encode(response, 42, "")).varbinds == [
+        (".1.3.6.1.2.1.1.1.0", 0x04, b"evil")
+    ]
+
+    with pytest.raises(MalformedMessage):
+        messages.decode(USMMessages(spoofed, engine_id=ENGINE_ID, boots=3).encode(response, 42, ""))
+
+
+def test_walk_snmpv3_wrong_password(walk_file: Path) -> None:
+    with FakeAgent(
+        [(".1.3.6.1.2.1.1.3.0", b"\x02\x01\x01")],
+        USMMessages(("authNoPriv", "md5", "heute", "authpass"), engine_id=ENGINE_ID),
+    ) as fake_agent:
+        fake_agent.report_engine = USMMessages(("noAuthNoPriv", "heute"), engine_id=ENGINE_ID)
+        with pytest.raises(SNMPContextTimeout):
+            NativeSNMPBackend(
+                _config(fake_agent.port, credentials=("authNoPriv", "md5", "heute", "wrongpass")),
+                logging.getLogger("test"),
+            ).walk(".1.3.6.1.2.1.1", context="")
+
+
+def test_prefetch(agent: FakeAgent) -> None:
+    backend = NativeSNMPBackend(_config(agent.port), logging.getLogger("test"))
+    oids = [".1.3.6.1.2.1.2.2.1.2", ".1.3.6.1.2.1.2.2.1.6"]
+
+    async def prefetch() -> None:
+        async with SNMPEngine() as engine:
+            await backend.prefetch(oids, context="", engine=engine)
+
+    asyncio.run(prefetch())
+    requests = len(agent.requests)
+    rowinfos = backend.walk_many([".1.3.6.1.2.1.2.2.1.10", *oids], context="")
+    assert [len(rows) for rows in rowinfos] == [3, 3, 3]
+    # Only the OID which has not been prefetched is walked
+    assert len(agent.requests) == requests + 2
+    # The prefetched rows are served once
+    assert backend.walk_many(oids[:1], context="") == rowinfos[1:2]
+    assert len(agent.requests) == requests + 4
+
+
+def test_prefetch_error(agent: FakeAgent) -> None:
+    agent.drop = 100
+    backend = NativeSNMPBackend(_config(agent.port), logging.getLogger("test"))
+
+    async def prefetch() -> None:
+        async with SNMPEngine() as engine:
+            await backend.prefetch([".1.3.6.1.2.1.1"], context="", engine=engine)
+
+    asyncio.run(prefetch())
+    agent.drop = 0
+    with pytest.raises(MKSNMPError, match="Timeout"):
+        backend.walk_many([".1.3.6.1.2.1.1"], context="")
+
+
+@pytest.fixture
+def device(agent: FakeAgent) -> FakeAgent:
+    # The detection needs the sysObjectID
+    agent.values = sorted(
+        [*agent.values, ((1, 3, 6, 1, 2, 1, 1, 2, 0), ".1.3.6.1.2.1.1.2.0", b"\x06\x02\x2b\x06")]
+    )
+    return agent
+
+
+@pytest.fixture
+def plugin_store(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(
+        SNMPFetcher,
+        "plugin_store",
+        SNMPPluginStore(
+            {
+                SectionName("interfaces"): SNMPPluginStoreItem(
+                    trees=[
+                        BackendSNMPTree(
+                            base=".1.3.6.1.2.1.2.2.1",
+                            oids=[
+                                BackendOIDSpec(SpecialColumn.END, "string", False),
+                                BackendOIDSpec("2", "string", False),
+                                BackendOIDSpec("6", "binary", False),
+                                BackendOIDSpec("10", "string", False),
+                            ],
+                        )
+                    ],
+                    detect_spec=SNMPDetectSpec([[(".1.3.6.1.2.1.1.1.0", "Linux.*", True)]]),
+                    inventory=False,
+                ),
+                SectionName("uptime"): SNMPPluginStoreItem(
+                    trees=[
+                        BackendSNMPTree(
+                            base=".1.3.6.1.2.1.1", oids=[BackendOIDSpec("3.0", "string", False)]
+                        )
+                    ],
+                    detect_spec=SNMPDetectSpec([[(".1.3.6.1.2.1.1.1.0", "Windows.*", True)]]),
+                    inventory=False,
+                ),
+            }
+        ),
+    )
+
+
+def _fetcher(tmp_path: Path, config: SNMPHostConfig) -> SNMPFetcher:
+    return SNMPFetcher(
+        sections={
+            SectionName("uptime"): SNMPSectionMeta(
+                checking=True, disabled=False, redetect=False, fetch_interval=None
+            )
+        },
+        on_error=OnError.RAISE,
+        missing_sys_description=False,
+        do_status_data_inventory=False,
+        section_store_path=tmp_path / str(config.hostname),
+        snmp_config=config,
+    )
+
+
+@pytest.mark.usefixtures("plugin_store")
+@pytest.mark.parametrize("mode", [Mode.DISCOVERY, Mode.CHECKING])
+def test_fetch_many_as_fetch(device: FakeAgent, tmp_path: Path, mode: Mode) -> None:
+    fetchers = [
+        _fetcher(tmp_path, _config(device.port, hostname=HostName("bulk"))),
+        _fetcher(tmp_path, _config(device.port, hostname=HostName("v1"), is_bulkwalk_host=False)),
+        _fetcher(tmp_path, _config(1, hostname=HostName("dead"), timing={"timeout": 0.05})),
+    ]
+    expected = []
+    for fetcher in fetchers:
+        with fetcher:
+            try:
+                expected.append(fetcher.fetch(mode))
+            except MKFetcherError as e:
+                expected.append(result.Error(e))
+
+    fetched = SNMPFetcher.fetch_many(fetchers, mode)
+
+    assert [r.is_ok() for r in fetched] == [True, True, False]
+    assert fetched[:2] == expected[:2]
+    assert str(fetched[2].error) == str(expected[2].error)
+
+
+@pytest.mark.usefixtures("plugin_store")
+@pytest.mark.parametrize("max_devices, batch_size", [(1, 3), (2, 6)])
+def test_fetch_many_concurrently(
+    device: FakeAgent, tmp_path: Path, max_devices: int, batch_size: int
+) -> None:
+    device.delay = 0.05
+    # Both devices are served by the same agent, so it sees all requests
+    fetchers = [
+        _fetcher(
+            tmp_path,
+            _config(device.port, hostname=HostName(name), timing={"timeout": 1.0}),
+        )
+        for name in ("one", "two")
+    ]
+
+    fetched = SNMPFetcher.fetch_many(fetchers, Mode.DISCOVERY, max_devices=max_devices)
+
+    assert [r.ok for r in fetched] == [
+        {
+            SectionName("interfaces"): [
+                [
+                    ["1", "lo", [], "-5"],
+                    ["2", "eth0", [0x52, 0x54, 0x00, 0x12, 0x34, 0x56], "123456789"],
+                    ["3", "wlan0", [0x00, 0x1B, 0x21, 0x0A, 0x0B, 0x0C], "0"],
+                ]
+            ]
+        }
+    ] * 2
+    # The three columns of each device are walked at the same time
+    assert max(device.batch_sizes) == batch_size
@@ -3,12 +3,50 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import logging
+import os
 from pathlib import Path
 
 import pytest
 
+from cmk.utils.hostaddress import HostAddress, HostName
+
+from cmk.snmplib import SNMPBackendEnum, SNMPHostConfig
+
 import cmk.fetchers.snmp_backend._utils as utils
-from cmk.fetchers.snmp_backend import StoredWalkSNMPBackend
+from cmk.fetchers.snmp_backend import compile_walk, StoredWalkSNMPBackend
+
+WALK = """\
+.1.3.6.1.2.1.1.1.0 Linux heute 6.1.0-13-amd64
+.1.3.6.1.2.1.1.3.0 1234567
+.1.3.6.1.2.1.2.2.1.2.1 lo
+.1.3.6.1.2.1.2.2.1.2.2 wlan0
+.1.3.6.1.2.1.2.2.1.2.10 "eth0"
+.1.3.6.1.2.1.2.2.1.6.1 ""
+.1.3.6.1.2.1.2.2.1.6.2 "52 54 00 12 34 56 "
+.1.3.6.1.2.1.2.2.1.10 17
+.1.3.6.1.2.1.2.2.1.10.1 0
+.1.3.6.1.2.1.2.2.1.22.1 "multi
+line"
+.1.3.6.1.2.1.25.1.1.0
+"""
+
+SNMP_CONFIG = SNMPHostConfig(
+    is_ipv6_primary=False,
+    hostname=HostName("heute"),
+    ipaddress=HostAddress("127.0.0.1"),
+    credentials="public",
+    port=161,
+    is_bulkwalk_host=False,
+    is_snmpv2or3_without_bulkwalk_host=False,
+    bulk_walk_size_of=0,
+    timing={},
+    oid_range_limits={},
+    snmpv3_contexts=[],
+    snmpv3_contexts_skip_on_timeout=False,
+    character_encoding=None,
+    snmp_backend=SNMPBackendEnum.STORED_WALK,
+)
 
 
 @pytest.mark.parametrize(
@@ -52,6 +90,68 @@ class TestStoredWalkSNMPBackend:
         ]
 
 
+class TestCompiledWalk:
+    @pytest.fixture
+    def walk_file(self, tmp_path: Path) -> Path:
+        path = tmp_path / "heute"
+        path.write_text(WALK)
+        return path
+
+    @pytest.mark.parametrize(
+        "oid",
+        [
+            ".1.3.6.1.2.1",
+            ".1.3.6.1.2.1.1.1.0",
+            "1.3.6.1.2.1.1",
+            ".1.3.6.1.2.1.2.2.1.2",
+            ".1.3.6.1.2.1.2.2.1.10",
+            ".1.3.6.1.2.1.2.2.1.1",
+            ".1.3.6.1.2.1.2.2.1.10.*",
+            ".1.3.6.1.2.1.2.2.1.22.*",
+            ".1.3.6.1.2.1.25",
+            ".1.3.6.1.2.1.99",
+            ".1.4",
+            ".0",
+        ],
+    )
+    def test_walk_as_text_walk(self, walk_file: Path, oid: str) -> None:
+        text = StoredWalkSNMPBackend(SNMP_CONFIG, logging.getLogger("test"), path=walk_file)
+        compile_walk(walk_file)
+        compiled = StoredWalkSNMPBackend(SNMP_CONFIG, logging.getLogger("test"), path=walk_file)
+        assert compiled._compiled is not None
+
+        assert compiled.walk(oid, context="") == text.walk(oid, context="")
+        assert compiled.get(oid, context="") == text.get(oid, context="")
+
+    def test_walk_sorted_numerically(self, walk_file: Path) -> None:
+        walk_file.write_text(
+            WALK.replace(".1.3.6.1.2.1.2.2.1.2.2 wlan0\n", "").replace(
+                '"eth0"\n', '"eth0"\n.1.3.6.1.2.1.2.2.1.2.2 wlan0\n'
+            )
+        )
+        compile_walk(walk_file)
+        assert [
+            oid
+            for oid, _value in StoredWalkSNMPBackend(
+                SNMP_CONFIG, logging.getLogger("test"), path=walk_file
+            ).walk(".1.3.6.1.2.1.2.2.1.2", context="")
+        ] == [".1.3.6.1.2.1.2.2.1.2.1", ".1.3.6.1.2.1.2.2.1.2.2", ".1.3.6.1.2.1.2.2.1.2.10"]
+
+    def test_outdated_compiled_walk(self, walk_file: Path) -> None:
+        compile_walk(walk_file)
+        walk_file.write_text(WALK.replace("1234567", "7654321"))
+        os.utime(walk_file, ns=(0, 0))
+
+        backend = StoredWalkSNMPBackend(SNMP_CONFIG, logging.getLogger("test"), path=walk_file)
+        assert backend._compiled is None
+        assert backend.get(".1.3.6.1.2.1.1.3.0", context="") == b"7654321"
+
+    def test_broken_compiled_walk(self, walk_file: Path) -> None:
+        compile_walk(walk_file).write_bytes(b"CMKSWLK1")
+        backend = StoredWalkSNMPBackend(SNMP_CONFIG, logging.getLogger("test"), path=walk_file)
+        assert backend._compiled is None
+
+
 @pytest.fixture
 def create_files(tmpdir):
     tmpdir.mkdir("walkdata")
@@ -3,55 +3,47 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
-from collections.abc import Iterable, MutableMapping
 from pathlib import Path
 
+import pytest
+
+import cmk.utils.paths
 from cmk.utils.hostaddress import HostName
 
-from cmk.snmplib import BackendOIDSpec, BackendSNMPTree, SNMPRowInfo
+from cmk.snmplib import BackendOIDSpec, BackendSNMPTree
 
 from cmk.fetchers._snmp import WalkCache
 
+CACHED_TREE = BackendSNMPTree(base=".1.2", oids=[BackendOIDSpec("3", "string", True)])
+LIVE_TREE = BackendSNMPTree(base=".1.2", oids=[BackendOIDSpec("3", "string", False)])
 
-class MockWalkCache(WalkCache):
-    def __init__(self, mockdata: MutableMapping[str, SNMPRowInfo]) -> None:
-        super().__init__(HostName("testhost"))
-        self.mock_stored_on_fs = mockdata
 
-    def _read_row(self, path: Path) -> SNMPRowInfo:
-        return self.mock_stored_on_fs[str(path.name)]
+@pytest.fixture(autouse=True)
+def var_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(cmk.utils.paths, "var_dir", str(tmp_path))
+    return tmp_path
 
-    def _write_row(self, path: Path, rowinfo: SNMPRowInfo) -> None:
-        self.mock_stored_on_fs[str(path.name)] = rowinfo
 
-    def _iterfiles(self) -> Iterable[Path]:
-        return (Path(k) for k in self.mock_stored_on_fs)
+def _stored_cache(walks: dict[str, tuple[bool, list[tuple[str, bytes]]]]) -> None:
+    cache = WalkCache(HostName("testhost"))
+    cache.update(walks)
+    cache.save()
 
 
 class TestWalkCache:
-    def test_oid2name_roundtrip(self) -> None:
-        fetchoid = ".3.1.4.1.5.9.2.6.5.3.5"
-        assert fetchoid == WalkCache._name2oid(WalkCache._oid2name(fetchoid))
-
-    def test_cache_keeps_stored_data(self) -> None:
+    def test_cache_keeps_stored_data(self, var_dir: Path) -> None:
         fetchoid = ".1.2.3"
-        path = f"OID{fetchoid}"
-        cache = MockWalkCache({path: [("23", b"43")]})
+        _stored_cache({fetchoid: (True, [("23", b"43")])})
+        cache = WalkCache(HostName("testhost"))
 
         assert not cache
 
-        cache.load(
-            trees=[
-                BackendSNMPTree(
-                    base=".1.2",
-                    oids=[BackendOIDSpec("3", "string", True)],
-                ),
-            ],
-        )
+        cache.load(trees=[CACHED_TREE])
 
         assert fetchoid in cache
+        assert cache[fetchoid] == (False, [("23", b"43")])
         cache.save()
-        assert path in cache.mock_stored_on_fs
+        assert [p.name for p in (var_dir / "snmp_cache").iterdir()] == ["testhost"]
 
     def test_cache_ignores_non_save_oids(self) -> None:
         """
@@ -60,22 +52,71 @@ class TestWalkCache:
         """
 
         fetchoid = ".1.2.3"
-        path = f"OID{fetchoid}"
-        cache = MockWalkCache({path: [("23", b"42")]})
+        _stored_cache({fetchoid: (True, [("23", b"42")])})
+        cache = WalkCache(HostName("testhost"))
 
         assert not cache
 
-        cache.load(
-            trees=[
-                BackendSNMPTree(
-                    base=".1.2",
-                    oids=[BackendOIDSpec("3", "string", False)],
-                ),
-                BackendSNMPTree(
-                    base=".1.2",
-                    oids=[BackendOIDSpec("3", "string", True)],
-                ),
-            ]
-        )
+        cache.load(trees=[LIVE_TREE, CACHED_TREE])
 
         assert fetchoid not in cache
+
+    def test_save_keeps_walks_not_loaded(self) -> None:
+        _stored_cache({".1.2.3": (True, [("23", b"42")]), ".1.2.4": (True, [("24", b"0")])})
+        cache = WalkCache(HostName("testhost"))
+        cache.load(trees=[LIVE_TREE])
+        assert list(cache) == [".1.2.4"]
+        cache[".1.2.4"] = (True, [("24", b"1")])
+        cache[".1.2.5"] = (False, [("25", b"2")])
+        cache.save()
+
+        cache = WalkCache(HostName("testhost"))
+        cache.load(trees=[])
+        assert dict(cache) == {
+            ".1.2.3": (False, [("23", b"42")]),
+            ".1.2.4": (False, [("24", b"1")]),
+        }
+
+    def test_nothing_to_save(self, var_dir: Path) -> None:
+        cache = WalkCache(HostName("testhost"))
+        cache[".1.2.3"] = (False, [("23", b"42")])
+        cache.save()
+        assert not (var_dir / "snmp_cache").exists()
+
+    def test_clear(self, var_dir: Path) -> None:
+        _stored_cache({".1.2.3": (True, [("23", b"42")])})
+        cache = WalkCache(HostName("testhost"))
+        cache.load(trees=[])
+        cache.clear()
+        assert not (var_dir / "snmp_cache" / "testhost").exists()
+
+        cache[".1.2.4"] = (True, [("24", b"0")])
+        cache.save()
+        cache = WalkCache(HostName("testhost"))
+        cache.load(trees=[])
+        assert list(cache) == [".1.2.4"]
+
+    def test_replaces_file_per_oid_layout(self, var_dir: Path) -> None:
+        legacy = var_dir / "snmp_cache" / "testhost"
+        legacy.mkdir(parents=True)
+        (legacy / "OID.1.2.3").write_text("[('23', b'42')]")
+
+        cache = WalkCache(HostName("testhost"))
+        cache.load(trees=[])
+        assert not cache
+        cache[".1.2.3"] = (True, [("23", b"43")])
+        cache.save()
+
+        assert legacy.is_file()
+        cache = WalkCache(HostName("testhost"))
+        cache.load(trees=[])
+        assert dict(cache) == {".1.2.3": (False, [("23", b"43")])}
+
+    @pytest.mark.usefixtures("disable_debug")
+    @pytest.mark.parametrize("content", [b"garbage", b"CMKWALK1\x00\x00\x00\x05trunc"])
+    def test_ignores_broken_file(self, var_dir: Path, content: bytes) -> None:
+        (var_dir / "snmp_cache").mkdir()
+        (var_dir / "snmp_cache" / "testhost").write_bytes(content)
+        cache = WalkCache(HostName("testhost"))
+        cache.load(trees=[])
+        assert not cache
@@ -3,8 +3,19 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import functools
+import random
+
+import pytest
+
+from cmk.gui.type_defs import Row, Rows, ViewPage
 from cmk.gui.view import View
-from cmk.gui.views.page_show_view import _get_needed_regular_columns
+from cmk.gui.views.page_show_view import (
+    _get_livestatus_limit,
+    _get_needed_regular_columns,
+    _sort_data,
+)
+from cmk.gui.views.sorter import sorter_registry, SorterEntry
 from cmk.gui.visuals.filter import Filter
 
 
@@ -67,3 +78,94 @@ def test_get_needed_regular_columns(view: View) -> None:
             "some_column",
         ]
     )
+
+
+def _service_rows() -> Rows:
+    rnd = random.Random(42)
+    return [
+        {
+            "id": nr,
+            "site": rnd.choice(["heute", "morgen"]),
+            "host_name": rnd.choice(["host2", "host10", "Host10", "host1"]),
+            "service_description": rnd.choice(["Check_MK", "CPU load", "cpu load", "Interface 10"]),
+            "service_state": rnd.choice([0, 1, 2, 3]),
+            "service_has_been_checked": rnd.choice([0, 1]),
+            "service_last_state_change": rnd.randrange(5),
+            "JOIN": (
+                {"CPU load": {"service_state": rnd.choice([0, 2]), "service_has_been_checked": 1}}
+                if nr % 3
+                else {}
+            ),
+        }
+        for nr in range(200)
+    ]
+
+
+def _sort_with_cmp(data: Rows, sorters: list[SorterEntry]) -> None:
+    def multisort(e1: Row, e2: Row) -> int:
+        for entry in sorters:
+            r1, r2 = e1, e2
+            if entry.join_key:
+                r1, r2 = e1["JOIN"].get(entry.join_key), e2["JOIN"].get(entry.join_key)
+                if r1 is None or r2 is None:
+                    c = (r1 is not None) - (r2 is not None)
+                    if c != 0:
+                        return -c if entry.negate else c
+                    continue
+            c = entry.sorter.cmp(r1, r2, entry.parameters)
+            if c != 0:
+                return -c if entry.negate else c
+        return 0
+
+    data.sort(key=functools.cmp_to_key(multisort))
+
+
+@pytest.mark.parametrize(
+    "sorter_specs",
+    [
+        [("svcstate", True, None), ("site_host", False, None), ("svcdescr", False, None)],
+        [("stateage", False, None), ("svcdescr", True, None)],
+        [("svcstate", False, "CPU load"), ("host_name", True, None), ("site", False, None)],
+    ],
+)
+def test_sort_data_like_cmp(sorter_specs: list[tuple[str, bool, str | None]]) -> None:
+    sorters = [
+        SorterEntry(sorter_registry[ident](), negate, join_key, None)
+        for ident, negate, join_key in sorter_specs
+    ]
+    assert all(entry.sorter.key(entry.parameters) is not None for entry in sorters)
+    rows = _service_rows()
+    expected = list(rows)
+    _sort_with_cmp(expected, sorters)
+
+    _sort_data(rows, sorters)
+
+    assert [row["id"] for row in rows] == [row["id"] for row in expected]
+
+
+@pytest.mark.parametrize(
+    "row_limit, page, has_sorters, only_count, expected",
+    [
+        (1000, None, False, False, 1000),
+        (1000, ViewPage(number=2, size=50), True, False, 1000),
+        (1000, ViewPage(number=2, size=50), False, True, 1000),
+        (1000, ViewPage(number=2, size=50), False, False, 150),
+        (100, ViewPage(number=2, size=50), False, False, 100),
+        (None, ViewPage(number=2, size=50), False, False, 150),
+    ],
+)
+def test_get_livestatus_limit(
+    view: View,
+    row_limit: int | None,
+    page: ViewPage | None,
+    has_sorters: bool,
+    only_count: bool,
+    expected: int | None,
+) -> None:
+    view.row_limit = row_limit
+    view.page = page
+    if not has_sorters:
+        view.spec["sorters"] = []
+    assert bool(view.sorters) is has_sorters
+
+    assert _get_livestatus_limit(view, only_count) == expected
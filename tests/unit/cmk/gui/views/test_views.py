@@ -1925,6 +1925,33 @@ def test_gui_view_row_limit(
         assert get_limit() == result
 
 
+@pytest.mark.parametrize(
+    "limit,permissions,result",
+    [
+        (None, {}, 1000),
+        ("hard", {}, 1000),
+        ("none", {}, 1000),
+        (None, {"general.ignore_soft_limit": True}, 5000),
+        ("soft", {"general.ignore_soft_limit": True}, 5000),
+        ("none", {"general.ignore_soft_limit": True}, 5000),
+        ("none", {"general.ignore_soft_limit": True, "general.ignore_hard_limit": True}, None),
+    ],
+)
+@pytest.mark.usefixtures("request_context")
+def test_gui_view_row_limit_paged(
+    monkeypatch: pytest.MonkeyPatch,
+    limit: Literal["soft", "hard", "none"] | None,
+    permissions: dict[str, bool],
+    result: int | None,
+) -> None:
+    with monkeypatch.context() as m:
+        if limit is not None:
+            monkeypatch.setitem(request._vars, "limit", limit)
+        m.setattr(active_config, "roles", {"nobody": {"permissions": permissions}})
+        m.setattr(user, "role_ids", ["nobody"])
+        assert get_limit(paged=True) == result
+
+
 def test_view_only_sites(view: View) -> None:
     assert view.only_sites is None
     view.only_sites = [SiteId("unit")]
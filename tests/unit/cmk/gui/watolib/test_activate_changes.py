@@ -3,9 +3,12 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import hashlib
 import io
 import logging
+import os
 import tarfile
+import time
 from pathlib import Path
 
 import pytest
@@ -277,6 +280,7 @@ def test_automation_get_config_sync_state() -> None:
             ),
         },
         0,
+        True,
     )
 
 
@@ -359,6 +363,86 @@ def test_get_config_sync_file_infos() -> None:
     }
 
 
+def test_get_config_sync_file_infos_uses_stored_file_hashes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    base_dir = tmp_path / "replication"
+    base_dir.joinpath("etc").mkdir(parents=True)
+    for name in ("unchanged", "changed", "recent"):
+        base_dir.joinpath("etc", name).write_text(name)
+        os.utime(base_dir / "etc" / name, (time.time() - 3600,) * 2)
+    os.utime(base_dir / "etc" / "recent")
+    replication_paths = [ReplicationPath("dir", "etc", "etc", [])]
+    hashes_path = tmp_path / "config_sync_file_hashes"
+
+    file_hashes = activate_changes.ConfigSyncFileHashes.load(hashes_path)
+    expected = activate_changes._get_config_sync_file_infos(
+        replication_paths, base_dir, file_hashes=file_hashes
+    )
+    file_hashes.save()
+    assert expected == activate_changes._get_config_sync_file_infos(replication_paths, base_dir)
+
+    base_dir.joinpath("etc", "changed").write_text("CHANGED")
+    os.utime(base_dir / "etc" / "changed", (time.time() - 3600,) * 2)
+    hashed = []
+    create_digest = activate_changes._create_config_sync_file_digest
+
+    def _create_digest(file_path: str) -> bytes:
+        hashed.append(os.path.basename(file_path))
+        return create_digest(file_path)
+
+    monkeypatch.setattr(activate_changes, "_create_config_sync_file_digest", _create_digest)
+    file_hashes = activate_changes.ConfigSyncFileHashes.load(hashes_path)
+    sync_infos = activate_changes._get_config_sync_file_infos(
+        replication_paths, base_dir, file_hashes=file_hashes
+    )
+
+    assert sorted(hashed) == ["changed", "recent"]
+    assert sync_infos["etc/unchanged"] == expected["etc/unchanged"]
+    assert sync_infos["etc/changed"].file_hash == (
+        "b6f00f283e24783b68eb63deb8c6f492dfafd29a45a11fa7c2725869596f81f4"
+    )
+
+
+@pytest.mark.parametrize("content", [b"", b"garbage"])
+def test_config_sync_file_hashes_ignore_missing_or_broken_file(
+    tmp_path: Path, content: bytes
+) -> None:
+    hashes_path = tmp_path / "config_sync_file_hashes"
+    if content:
+        hashes_path.write_bytes(content)
+    file_path = tmp_path / "file"
+    file_path.write_text("Däng")
+    os.utime(file_path, (time.time() - 3600,) * 2)
+
+    file_hashes = activate_changes.ConfigSyncFileHashes.load(hashes_path)
+    assert file_hashes.file_hash(str(file_path), file_path.stat()) == (
+        "780518619e3c5dfc931121362c7f14fa8d06457995c762bd818072ed42e6e69e"
+    )
+    file_hashes.save()
+    assert len(hashes_path.read_bytes()) == 64
+
+
+def test_config_sync_file_hashes_detect_rewrite_keeping_mtime_and_size(tmp_path: Path) -> None:
+    hashes_path = tmp_path / "config_sync_file_hashes"
+    file_path = tmp_path / "file"
+    file_path.write_text("Däng")
+    os.utime(file_path, (time.time() - 3600,) * 2)
+    stat = file_path.stat()
+
+    file_hashes = activate_changes.ConfigSyncFileHashes.load(hashes_path)
+    file_hashes.file_hash(str(file_path), stat)
+    file_hashes.save()
+
+    time.sleep(0.05)  # Beyond the granularity of the status change time
+    file_path.write_text("Döng")
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    file_hashes = activate_changes.ConfigSyncFileHashes.load(hashes_path)
+    assert file_hashes.file_hash(str(file_path), file_path.stat()) == (
+        hashlib.sha256("Döng".encode()).hexdigest()
+    )
+
+
 def _create_get_config_sync_file_infos_test_config(base_dir: Path) -> None:
     base_dir.joinpath("etc/d1").mkdir(parents=True, exist_ok=True)
 
@@ -556,9 +640,10 @@ def _get_test_file_infos() -> tuple[dict[str, ConfigSyncFileInfo], dict[str, Con
     return remote, central
 
 
-def test_get_sync_archive(tmp_path: Path) -> None:
-    sync_archive = _get_test_sync_archive(tmp_path)
-    with tarfile.TarFile(mode="r", fileobj=io.BytesIO(sync_archive)) as f:
+@pytest.mark.parametrize("compressed", [False, True])
+def test_get_sync_archive(tmp_path: Path, compressed: bool) -> None:
+    sync_archive = _get_test_sync_archive(tmp_path, compressed)
+    with tarfile.open(mode="r:gz" if compressed else "r:", fileobj=io.BytesIO(sync_archive)) as f:
         assert sorted(f.getnames()) == sorted(
             [
                 "etc/abc",
@@ -571,25 +656,27 @@ def test_get_sync_archive(tmp_path: Path) -> None:
         )
 
 
-def _get_test_sync_archive(tmp_path: Path) -> bytes:
-    tmp_path.joinpath("etc").mkdir(parents=True, exist_ok=True)
-    with tmp_path.joinpath("etc/abc").open("w", encoding="utf-8") as f:
+def _get_test_sync_archive(tmp_path: Path, compressed: bool = False) -> bytes:
+    central_path = tmp_path / "central"
+    central_path.joinpath("etc").mkdir(parents=True, exist_ok=True)
+    with central_path.joinpath("etc/abc").open("w", encoding="utf-8") as f:
         f.write("gä")
 
-    tmp_path.joinpath("file-to-dir").mkdir(parents=True, exist_ok=True)
-    with tmp_path.joinpath("file-to-dir/aaa").open("w", encoding="utf-8") as f:
+    central_path.joinpath("file-to-dir").mkdir(parents=True, exist_ok=True)
+    with central_path.joinpath("file-to-dir/aaa").open("w", encoding="utf-8") as f:
         f.write("gä")
 
-    with tmp_path.joinpath("dir-to-file").open("w", encoding="utf-8") as f:
+    with central_path.joinpath("dir-to-file").open("w", encoding="utf-8") as f:
         f.write("di")
 
-    with tmp_path.joinpath("ding").open("w", encoding="utf-8") as f:
+    with central_path.joinpath("ding").open("w", encoding="utf-8") as f:
         f.write("dong")
 
-    tmp_path.joinpath("broken-symlink").symlink_to("eeg")
-    tmp_path.joinpath("working-symlink").symlink_to("ding")
+    central_path.joinpath("broken-symlink").symlink_to("eeg")
+    central_path.joinpath("working-symlink").symlink_to("ding")
 
-    return activate_changes._get_sync_archive(
+    archive_path = tmp_path / "sync_archive"
+    activate_changes._create_sync_archive(
         [
             "etc/abc",
             "file-to-dir/aaa",
@@ -598,15 +685,48 @@ def _get_test_sync_archive(tmp_path: Path) -> bytes:
             "broken-symlink",
             "working-symlink",
         ],
-        tmp_path,
+        central_path,
+        archive_path,
+        compressed=compressed,
+    )
+    return archive_path.read_bytes()
+
+
+def test_sync_archive_cache_shares_archives(tmp_path: Path) -> None:
+    file_infos = {
+        "a": ConfigSyncFileInfo(
+            33200, 1, None, "ca978112ca1bbdcafac231b39a23dc4da786eff8147c4e72b9807785afee48bb"
+        ),
+        "b": ConfigSyncFileInfo(
+            33200, 1, None, "3e23e8160039594a33894f6564e1b1348bbd7a0088d42c4acb73eeaed59c009d"
+        ),
+    }
+    for site_id in ("site1", "site2"):
+        tmp_path.joinpath(site_id).mkdir()
+        tmp_path.joinpath(site_id, "a").write_text("a")
+        tmp_path.joinpath(site_id, "b").write_text("b")
+    sync_archives = activate_changes.SyncArchiveCache(tmp_path / "sync_archives")
+
+    archive = sync_archives.get(["a", "b"], file_infos, tmp_path / "site1", compressed=True)
+    assert sync_archives.get(["b", "a"], file_infos, tmp_path / "site2", compressed=True) == archive
+    assert sync_archives.get(["a"], file_infos, tmp_path / "site2", compressed=True) != archive
+    assert (
+        sync_archives.get(["a", "b"], file_infos, tmp_path / "site2", compressed=False) != archive
     )
+    with tarfile.open(archive, mode="r:gz") as f:
+        assert f.getnames() == ["a", "b"]
+
+    sync_archives.clear()
+    assert not tmp_path.joinpath("sync_archives").exists()
 
 
 class TestAutomationReceiveConfigSync:
+    @pytest.mark.parametrize("compressed", [False, True])
     def test_automation_receive_config_sync(
         self,
         monkeypatch: pytest.MonkeyPatch,
         tmp_path: Path,
+        compressed: bool,
     ) -> None:
         remote_path = tmp_path / "remote"
         monkeypatch.setattr(cmk.utils.paths, "omd_root", remote_path)
@@ -646,13 +766,14 @@ class TestAutomationReceiveConfigSync:
         automation.execute(
             activate_changes.ReceiveConfigSyncRequest(
                 site_id=SiteId("remote"),
-                sync_archive=_get_test_sync_archive(tmp_path.joinpath("central")),
+                sync_archive=_get_test_sync_archive(tmp_path, compressed),
                 to_delete=[
                     "to_delete",
                     "working-symlink/file",
                     "file-to-dir",
                 ],
                 config_generation=0,
+                compressed=compressed,
             )
         )
 
@@ -677,6 +798,7 @@ class TestAutomationReceiveConfigSync:
         request.set_var("site_id", "NO_SITE")
         request.set_var("to_delete", "['x/y/z.txt', 'abc.ending', '/ä/☃/☕']")
         request.set_var("config_generation", "123")
+        request.set_var("sync_archive_compression", "gzip")
         request.files = werkzeug_datastructures.ImmutableMultiDict(
             {
                 "sync_archive": werkzeug_datastructures.FileStorage(
@@ -698,6 +820,7 @@ class TestAutomationReceiveConfigSync:
                 sync_archive=b"some data",
                 to_delete=["x/y/z.txt", "abc.ending", "/ä/☃/☕"],
                 config_generation=123,
+                compressed=True,
             )
         )
 
@@ -78,6 +78,7 @@ class TestAuditLogStore:
             yield store
         finally:
             store._path.unlink(missing_ok=True)
+            store._index_path.unlink(missing_ok=True)
 
     def test_read_not_existing(self, store: AuditLogStore) -> None:
         assert not store.exists()
@@ -136,6 +137,41 @@ class TestAuditLogStore:
 
                 assert archive_path.exists()
 
+    def test_iter_entries_time_range(self, store: AuditLogStore) -> None:
+        entries = [
+            AuditLogStore.Entry(t, None, "user", "action", f"Entry {t}", None)
+            for t in range(1000, 4000, 10)
+        ]
+        for entry in entries:
+            store.append(entry)
+
+        assert list(store.iter_entries()) == entries
+        assert list(store.iter_entries(2000, 2500)) == entries[100:150]
+        assert list(store.iter_entries(end=1500, reverse=True)) == entries[:50][::-1]
+        assert store.get_entries_since(3950) == entries[-4:]
+
+    def test_iter_entries_of_rewritten_file(self, store: AuditLogStore) -> None:
+        for t in range(10):
+            store.append(AuditLogStore.Entry(t, None, "user", "action", "old", None))
+        assert len(list(store.iter_entries())) == 10
+
+        store._path.unlink()
+        entry = AuditLogStore.Entry(5, None, "user", "action", "new", None)
+        store.append(entry)
+        assert list(store.iter_entries(start=3)) == [entry]
+
+    def test_read_entries_of_former_versions(self, store: AuditLogStore) -> None:
+        entries = [
+            AuditLogStore.Entry(t, None, "user", "action", f"Entry {t}", None) for t in range(3)
+        ]
+        store._path.write_text(
+            "".join(repr(AuditLogStore.Entry.serialize(entry)) + "\0" for entry in entries[:2])
+        )
+        store.append(entries[2])
+
+        assert list(store.read()) == entries
+        assert list(store.iter_entries(start=1)) == entries[1:]
+
 
 class TestSiteChanges:
     @pytest.fixture(name="store")
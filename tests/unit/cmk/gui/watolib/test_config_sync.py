@@ -539,9 +539,12 @@ def _synchronize_site(
 
     sync_result = activate_changes.synchronize_files(
         sync_delta,
-        sync_state.remote_config_generation,
+        sync_state,
         Path(snapshot_settings.work_dir),
         site_activation_state,
         sync_start,
+        activate_changes.SyncArchiveCache(
+            Path(snapshot_settings.work_dir).parent / ".sync_archives"
+        ),
     )
     assert sync_result is not None
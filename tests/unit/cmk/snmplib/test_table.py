@@ -106,6 +106,36 @@ def test_get_snmp_table(
     assert get_all_snmp_tables(snmp_info) == expected_values
 
 
+def test_get_snmp_table_walks_columns_at_once() -> None:
+    class Backend(SNMPTestBackend):
+        def walk_many(self, /, oids, *, context, **kw):
+            walked.append(list(oids))
+            return super().walk_many(oids, context=context, **kw)
+
+    walked: list[list[str]] = []
+    walk_cache = {".1.2.3": (False, [(f".1.2.3.{r}", b"cached") for r in (1, 2, 3)])}
+    assert get_snmp_table(
+        section_name=SectionName("unit_test"),
+        tree=BackendSNMPTree(
+            base=".1.2",
+            oids=[
+                BackendOIDSpec(SpecialColumn.END, "string", False),
+                BackendOIDSpec("3", "string", False),
+                BackendOIDSpec("4", "string", True),
+                BackendOIDSpec("5", "string", False),
+            ],
+        ),
+        walk_cache=walk_cache,
+        backend=Backend(SNMPConfig, logger),
+    ) == [[str(r), "cached", "C0FEFE", "C0FEFE"] for r in (1, 2, 3)]
+    assert walked == [[".1.2.4", ".1.2.5"]]
+    assert {oid: save for oid, (save, _rows) in walk_cache.items()} == {
+        ".1.2.3": False,
+        ".1.2.4": True,
+        ".1.2.5": False,
+    }
+
+
 @pytest.mark.parametrize(
     "encoding, columns, expected",
     [
@@ -178,6 +208,22 @@ def test_is_classic_at_snmp_v1_host(monkeypatch: MonkeyPatch) -> None:
     assert config_cache.get_snmp_backend(HostName("not_included")) is SNMPBackendEnum.INLINE
 
 
+def test_native_backend(monkeypatch: MonkeyPatch) -> None:
+    ts = Scenario()
+    ts.set_option("snmp_backend_default", "native")
+    ts.set_ruleset(
+        "snmp_backend_hosts",
+        [{"condition": {"host_name": ["classic_h"]}, "id": "01", "value": "classic"}],
+    )
+    ts.add_host(HostName("classic_h"))
+    ts.add_host(HostName("v1_h"))
+    config_cache = ts.apply(monkeypatch)
+
+    assert config_cache.get_snmp_backend(HostName("classic_h")) is SNMPBackendEnum.CLASSIC
+    # The native backend is not affected by the memory leak of netsnmp with SNMPv1
+    assert config_cache.get_snmp_backend(HostName("v1_h")) is SNMPBackendEnum.NATIVE
+
+
 def test_walk_passes_on_timeout_with_snmpv3_context_skip_on_timeout() -> None:
     class Backend(SNMPBackend):
         def get(self, /, *args: object, **kw: object) -> NoReturn:
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import logging
+from pathlib import Path
+
+from cmk.utils.hostaddress import HostName
+from cmk.utils.structured_data import (
+    indexed_tree_file,
+    IndexedTreeFile,
+    load_tree,
+    MutableTree,
+    TreeStore,
+)
+
+from cmk.update_config.plugins.actions.inventory_trees import CreateIndexedInventoryTrees
+
+
+def test_create_indexed_trees(tmp_path: Path) -> None:
+    tree = MutableTree()
+    tree.add(path=("hardware", "cpu"), pairs=[{"cores": 4}])
+    TreeStore(tmp_path).save(host_name=HostName("heute"), tree=tree)
+    (tmp_path / "broken").write_text("{")
+
+    CreateIndexedInventoryTrees.create_indexed_trees(tmp_path, logging.getLogger())
+
+    assert IndexedTreeFile.open(tmp_path / "heute") is not None
+    assert load_tree(tmp_path / "heute") == tree
+    assert not indexed_tree_file(tmp_path / "broken").exists()
+    assert not indexed_tree_file(tmp_path / ".last").exists()
+    assert not indexed_tree_file(tmp_path / "heute.gz").exists()
+
+
+def test_create_indexed_trees_missing_dir(tmp_path: Path) -> None:
+    CreateIndexedInventoryTrees.create_indexed_trees(tmp_path / "missing", logging.getLogger())
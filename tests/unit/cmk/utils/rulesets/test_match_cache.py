@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import os
+from pathlib import Path
+
+import pytest
+
+from cmk.utils.hostaddress import HostName
+from cmk.utils.rulesets.match_cache import RulesetMatchCache
+from cmk.utils.rulesets.ruleset_matcher import (
+    LabelManager,
+    RuleConditionsSpec,
+    RulesetMatcher,
+    RulesetOptimizer,
+)
+from cmk.utils.tags import TagGroupID, TagID
+
+HOSTS = [HostName("host1"), HostName("host2"), HostName("host3")]
+
+
+@pytest.fixture(name="config_file")
+def fixture_config_file(tmp_path: Path) -> Path:
+    config_file = tmp_path / "rules.mk"
+    config_file.write_text("# rules\n")
+    return config_file
+
+
+def test_match_cache_save_and_get(tmp_path: Path, config_file: Path) -> None:
+    cache = RulesetMatchCache(tmp_path / "cache", [config_file], HOSTS)
+    assert cache.get("a") is None
+    cache.add("a", 0b101)
+    cache.add("b", 0)
+    cache.add("c", 1 << 1000)
+    assert cache.get("a") == 0b101
+    cache.save()
+
+    cache = RulesetMatchCache(tmp_path / "cache", [config_file], HOSTS)
+    cache.add("d", 0b10)
+    cache.save()
+
+    cache = RulesetMatchCache(tmp_path / "cache", [config_file], HOSTS)
+    assert [cache.get(key) for key in "abcde"] == [0b101, 0, 1 << 1000, 0b10, None]
+
+
+def test_match_cache_invalidated_by_config_change(tmp_path: Path, config_file: Path) -> None:
+    cache = RulesetMatchCache(tmp_path / "cache", [config_file], HOSTS)
+    cache.add("a", 0b101)
+    cache.save()
+
+    assert RulesetMatchCache(tmp_path / "cache", [config_file], HOSTS).get("a") == 0b101
+    assert RulesetMatchCache(tmp_path / "cache", [config_file], HOSTS[:2]).get("a") is None
+    assert (
+        RulesetMatchCache(tmp_path / "cache", [config_file, tmp_path / "new.mk"], HOSTS).get("a")
+        is None
+    )
+
+    stat = config_file.stat()
+    os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert RulesetMatchCache(tmp_path / "cache", [config_file], HOSTS).get("a") is None
+
+
+def test_match_cache_broken_file(tmp_path: Path, config_file: Path) -> None:
+    (tmp_path / "cache").write_bytes(b"")
+    assert RulesetMatchCache(tmp_path / "cache", [config_file], HOSTS).get("a") is None
+
+    (tmp_path / "cache").write_bytes(b"garbage\n\x00")
+    assert RulesetMatchCache(tmp_path / "cache", [config_file], HOSTS).get("a") is None
+
+
+def _matcher(match_cache: RulesetMatchCache) -> RulesetMatcher:
+    return RulesetMatcher(
+        host_tags={
+            hostname: {TagGroupID("criticality"): TagID("prod" if nr else "test")}
+            for nr, hostname in enumerate(HOSTS)
+        },
+        host_paths={},
+        label_manager=LabelManager(
+            explicit_host_labels={HostName("host2"): {"os": "linux"}},
+            host_label_rules=(),
+            service_label_rules=(),
+            discovered_labels_of_service=lambda *args, **kw: {},
+        ),
+        all_configured_hosts=HOSTS,
+        clusters_of={},
+        nodes_of={},
+        match_cache=match_cache,
+    )
+
+
+def test_ruleset_matcher_uses_match_cache(
+    tmp_path: Path, config_file: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    tags_condition: RuleConditionsSpec = {"host_tags": {TagGroupID("criticality"): TagID("prod")}}
+    labels_condition: RuleConditionsSpec = {"host_label_groups": [("and", [("and", "os:linux")])]}
+
+    matcher = _matcher(RulesetMatchCache(tmp_path / "cache", [config_file], HOSTS))
+    optimizer = matcher.ruleset_optimizer
+    assert optimizer._all_matching_hosts(tags_condition, False) == {"host2", "host3"}
+    assert optimizer._all_matching_hosts(labels_condition, False) == {"host2"}
+    optimizer.save_match_cache()
+
+    def _fail(*args: object) -> int:
+        raise AssertionError("Persisted matches have not been used")
+
+    monkeypatch.setattr(RulesetOptimizer, "_match_hosts_by_tags", _fail)
+    monkeypatch.setattr(RulesetOptimizer, "_match_hosts_by_labels", _fail)
+
+    optimizer = _matcher(
+        RulesetMatchCache(tmp_path / "cache", [config_file], HOSTS)
+    ).ruleset_optimizer
+    assert optimizer._all_matching_hosts(tags_condition, False) == {"host2", "host3"}
+    # The host labels are not part of the configuration, their matches are not persisted
+    with pytest.raises(AssertionError):
+        optimizer._all_matching_hosts(labels_condition, False)
+
+
+def test_ruleset_matcher_match_cache_of_other_processed_hosts(
+    tmp_path: Path, config_file: Path
+) -> None:
+    tags_condition: RuleConditionsSpec = {"host_tags": {TagGroupID("criticality"): TagID("prod")}}
+
+    optimizer = _matcher(
+        RulesetMatchCache(tmp_path / "cache", [config_file], HOSTS)
+    ).ruleset_optimizer
+    optimizer.set_all_processed_hosts([HostName("host2")])
+    assert optimizer._all_matching_hosts(tags_condition, False) == {"host2"}
+    optimizer.save_match_cache()
+
+    optimizer = _matcher(
+        RulesetMatchCache(tmp_path / "cache", [config_file], HOSTS)
+    ).ruleset_optimizer
+    optimizer.set_all_processed_hosts([HostName("host3")])
+    assert optimizer._all_matching_hosts(tags_condition, False) == {"host3"}
+    assert optimizer._all_matching_hosts(tags_condition, True) == {"host2", "host3"}
@@ -12,8 +12,15 @@ from pytest import MonkeyPatch
 from tests.testlib.base import Scenario
 
 from cmk.utils.hostaddress import HostName
+from cmk.utils.labels import LabelGroups, Labels
 from cmk.utils.rulesets.ruleset_matcher import (
+    HostBitsets,
     LabelManager,
+    literal_prefix,
+    matches_host_name,
+    matches_host_tags,
+    matches_labels,
+    matches_service_conditions,
     matches_tag_condition,
     RuleConditionsSpec,
     RulesetMatcher,
@@ -857,3 +864,234 @@ def test_matches_tag_condition(
         )
         is expected_result
     )
+
+
+@pytest.mark.parametrize(
+    "pattern, expected_result",
+    [
+        ("CPU load", "CPU load"),
+        ("^CPU", "CPU"),
+        ("Filesystem /var$", "Filesystem /var"),
+        ("Interface 1.*", "Interface 1"),
+        (r"Interface\ 1\.2", "Interface 1.2"),
+        (r"Disk\d", "Disk"),
+        ("Memoryx?", "Memory"),
+        ("Memo(ry)?", "Memo"),
+        ("Memory+", "Memory"),
+        ("Memory{0,1}", "Memor"),
+        ("Memory|CPU", ""),
+        ("Mem(ory|CPU)", "Mem"),
+        ("Mem[|]", "Mem"),
+        ("Mem)|(CPU", ""),
+        ("(?i)memory", ""),
+        (".*", ""),
+        ("", ""),
+    ],
+)
+def test_literal_prefix(pattern: str, expected_result: str) -> None:
+    assert literal_prefix(pattern) == expected_result
+
+
+service_description_ruleset: Sequence[RuleSpec[str]] = [
+    {"id": "1", "value": "cpu", "condition": {"service_description": ["CPU"]}},
+    {
+        "id": "2",
+        "value": "fs",
+        "condition": {
+            "host_name": ["host1"],
+            "service_description": [{"$regex": "Filesystem /var"}, "Filesystem /$"],
+        },
+    },
+    {"id": "3", "value": "not_cpu", "condition": {"service_description": {"$nor": ["CPU"]}}},
+    {"id": "4", "value": "any_interface", "condition": {"service_description": [".*Interface"]}},
+    {"id": "5", "value": "all", "condition": {}},
+    {
+        "id": "6",
+        "value": "label",
+        "condition": {
+            "service_description": ["Interface 1"],
+            "service_label_groups": [("and", [("and", "speed:fast")])],
+        },
+    },
+    {"id": "7", "value": "alternatives", "condition": {"service_description": ["Inter|CPU"]}},
+    {"id": "8", "value": "disabled", "condition": {}, "options": {"disabled": True}},
+]
+
+
+@pytest.mark.parametrize("hostname", [HostName("host1"), HostName("host2")])
+@pytest.mark.parametrize(
+    "service_description",
+    [
+        ServiceName("CPU load"),
+        ServiceName("CP"),
+        ServiceName("Filesystem /var/log"),
+        ServiceName("Filesystem /"),
+        ServiceName("Filesystem /home"),
+        ServiceName("Interface 10"),
+        ServiceName("Uplink Interface 2"),
+        ServiceName("Memory"),
+    ],
+)
+def test_service_ruleset_index_candidates(
+    hostname: HostName, service_description: ServiceName
+) -> None:
+    matcher = RulesetMatcher(
+        host_tags={HostName("host1"): {}, HostName("host2"): {}},
+        host_paths={},
+        label_manager=LabelManager(
+            explicit_host_labels={},
+            host_label_rules=(),
+            service_label_rules=(),
+            discovered_labels_of_service=lambda *args, **kw: {"speed": "fast"},
+        ),
+        all_configured_hosts=[HostName("host1"), HostName("host2")],
+        clusters_of={},
+        nodes_of={},
+    )
+    match_object = matcher._service_match_object(hostname, service_description)
+    index = matcher.ruleset_optimizer.get_service_ruleset(service_description_ruleset, False)
+
+    candidates = list(index.candidates(hostname, service_description))
+    expected_result = [
+        value
+        for value, hosts, label_groups, _cache_id, condition in index.rules
+        if hostname in hosts and matches_service_conditions(condition, label_groups, match_object)
+    ]
+
+    assert [value for value, *_rest in candidates if value in expected_result] == expected_result
+    assert (
+        list(matcher.get_service_ruleset_values(match_object, service_description_ruleset))
+        == expected_result
+    )
+
+
+def test_service_ruleset_index_skips_rules() -> None:
+    matcher = RulesetMatcher(
+        host_tags={HostName("host1"): {}, HostName("host2"): {}},
+        host_paths={},
+        label_manager=LabelManager(
+            explicit_host_labels={},
+            host_label_rules=(),
+            service_label_rules=(),
+            discovered_labels_of_service=lambda *args, **kw: {},
+        ),
+        all_configured_hosts=[HostName("host1"), HostName("host2")],
+        clusters_of={},
+        nodes_of={},
+    )
+    index = matcher.ruleset_optimizer.get_service_ruleset(service_description_ruleset, False)
+
+    assert [
+        value for value, *_rest in index.candidates(HostName("host2"), ServiceName("Memory"))
+    ] == ["not_cpu", "any_interface", "all", "alternatives"]
+
+
+@pytest.mark.parametrize("num_hosts", [0, 10, 200])
+def test_host_bitsets(num_hosts: int) -> None:
+    hosts = [HostName(f"host{n}") for n in range(num_hosts)]
+    bitsets = HostBitsets(hosts)
+
+    assert bitsets.to_hosts(bitsets.all) == set(hosts)
+    assert bitsets.to_hosts(0) == set()
+    assert bitsets.to_hosts(bitsets.from_hosts(hosts[::3])) == set(hosts[::3])
+    assert bitsets.to_hosts(bitsets.from_hosts(hosts[::50])) == set(hosts[::50])
+    assert bitsets.from_hosts([HostName("unknown")]) == 0
+
+
+@pytest.mark.parametrize(
+    "condition",
+    [
+        {},
+        {"host_name": []},
+        {"host_name": ["host1", "host7", "unknown"]},
+        {"host_name": [{"$regex": "host1"}, "host2"]},
+        {"host_name": {"$nor": ["host1", {"$regex": "host2"}]}},
+        {"host_folder": "/lvl1/"},
+        {"host_folder": "/lvl1/lvl2/", "host_name": {"$nor": ["host13"]}},
+        {"host_tags": {"site": "site1"}},
+        {"host_tags": {"site": {"$ne": "site1"}, "os": "linux"}},
+        {"host_tags": {"site": {"$or": ["site0", "site2"]}}},
+        {"host_tags": {"site": {"$nor": ["site0", "site2"]}}, "host_folder": "/lvl1/"},
+        {"host_tags": {"site": None}},
+        {"host_label_groups": [("and", [("and", "env:prod")])]},
+        {"host_label_groups": [("and", [("and", "env:prod"), ("or", "os:windows")])]},
+        {
+            "host_label_groups": [
+                ("and", [("not", "env:prod")]),
+                ("or", [("and", "os:windows"), ("not", "env:test")]),
+            ],
+            "host_tags": {"os": "linux"},
+        },
+        {"host_label_groups": [("not", [("and", "env:prod")])], "host_name": ["host2", "host3"]},
+    ],
+)
+def test_all_matching_hosts_bitsets(condition: RuleConditionsSpec) -> None:
+    hosts = [HostName(f"host{n}") for n in range(30)]
+    host_tags: dict[HostName, Mapping[TagGroupID, TagID]] = {
+        hostname: {
+            TagGroupID("site"): TagID(f"site{n % 3}"),
+            TagGroupID("os"): TagID("linux" if n % 2 else "windows"),
+        }
+        for n, hostname in enumerate(hosts)
+    }
+    host_paths = {
+        hostname: ["/", "/lvl1/", "/lvl1/lvl2/", "/other/"][n % 4] + "hosts.mk"
+        for n, hostname in enumerate(hosts)
+    }
+    host_labels: dict[HostName, Labels] = {
+        hostname: {"env": ["prod", "test", "dev"][n % 3], "os": "windows" if n % 2 else "linux"}
+        for n, hostname in enumerate(hosts)
+    }
+    matcher = RulesetMatcher(
+        host_tags=host_tags,
+        host_paths=host_paths,
+        label_manager=LabelManager(
+            explicit_host_labels=host_labels,
+            host_label_rules=(),
+            service_label_rules=(),
+            discovered_labels_of_service=lambda *args, **kw: {},
+        ),
+        all_configured_hosts=hosts,
+        clusters_of={},
+        nodes_of={},
+    )
+    matcher.ruleset_optimizer.set_all_processed_hosts(hosts[:20])
+
+    for with_foreign_hosts, relevant_hosts in [(False, hosts[:20]), (True, hosts)]:
+        expected_result = {
+            hostname
+            for hostname in relevant_hosts
+            if condition.get("host_name") != []
+            and host_paths[hostname].startswith(condition.get("host_folder", "/"))
+            and matches_host_tags(set(host_tags[hostname].items()), condition.get("host_tags", {}))
+            and matches_labels(
+                matcher.labels_of_host(hostname), condition.get("host_label_groups", [])
+            )
+            and matches_host_name(condition.get("host_name"), hostname)
+        }
+        assert (
+            matcher.ruleset_optimizer._all_matching_hosts(condition, with_foreign_hosts)
+            == expected_result
+        )
+
+
+def test_invalid_label_condition() -> None:
+    label_groups: LabelGroups = [("and", [("and", "env")])]
+    with pytest.raises(ValueError, match="Invalid label condition"):
+        matches_labels({"env": "prod"}, label_groups)
+
+    matcher = RulesetMatcher(
+        host_tags={},
+        host_paths={},
+        label_manager=LabelManager(
+            explicit_host_labels={},
+            host_label_rules=(),
+            service_label_rules=(),
+            discovered_labels_of_service=lambda *args, **kw: {},
+        ),
+        all_configured_hosts=[HostName("host1")],
+        clusters_of={},
+        nodes_of={},
+    )
+    with pytest.raises(ValueError, match="Invalid label condition"):
+        matcher.ruleset_optimizer._all_matching_hosts({"host_label_groups": label_groups}, False)
@@ -4,6 +4,7 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 
 import gzip
+import os
 import shutil
 from collections.abc import Iterable, Mapping, Sequence
 from pathlib import Path
@@ -13,14 +14,20 @@ import pytest
 
 from tests.testlib import repo_path
 
+from cmk.utils import store, structured_data
 from cmk.utils.hostaddress import HostName
 from cmk.utils.structured_data import (
+    _apply_tree_patch,
+    _make_tree_patch,
     _MutableAttributes,
     _MutableTable,
+    ARCHIVE_KEYFRAME_INTERVAL,
     ImmutableAttributes,
     ImmutableDeltaTree,
     ImmutableTable,
     ImmutableTree,
+    indexed_tree_file,
+    IndexedTreeFile,
     MutableTree,
     parse_visible_raw_path,
     RetentionInterval,
@@ -28,6 +35,8 @@ from cmk.utils.structured_data import (
     SDNodeName,
     SDPath,
     SDRetentionFilterChoices,
+    TreeArchive,
+    TreeOrArchiveStore,
     TreeStore,
     UpdateResult,
 )
@@ -937,6 +946,293 @@ def test_save_and_load_real_tree(tree_name: HostName, tmp_path: Path) -> None:
         shutil.rmtree(str(tmp_path))
 
 
+@pytest.mark.parametrize(
+    "tree_name",
+    [
+        HostName("tree_old_addresses_arrays_memory"),
+        HostName("tree_old_heute"),
+        HostName("tree_new_addresses_arrays_memory"),
+        HostName("tree_new_interfaces"),
+        HostName("tree_new_memory"),
+        HostName("tree_new_heute"),
+    ],
+)
+def test_save_and_load_real_tree_indexed(tree_name: HostName, tmp_path: Path) -> None:
+    orig_tree = _get_tree_store().load(host_name=tree_name)
+    tree_store = TreeStore(tmp_path / "inventory", indexed=True)
+    tree_store.save(host_name=HostName("foo"), tree=_make_mutable_tree(orig_tree))
+
+    assert IndexedTreeFile.open(tmp_path / "inventory" / "foo") is not None
+    loaded_tree = tree_store.load(host_name=HostName("foo"))
+    assert orig_tree == loaded_tree
+    assert len(orig_tree) == len(loaded_tree)
+
+
+def _make_indexed_tree_store(tmp_path: Path) -> TreeStore:
+    tree = MutableTree()
+    tree.add(path=("hardware", "cpu"), pairs=[{"cores": 4, "model": "Xeon"}])
+    tree.add(
+        path=("software", "packages"),
+        key_columns=["name"],
+        rows=[{"name": f"package{idx}", "version": "1.0"} for idx in range(5)],
+    )
+    tree_store = TreeStore(tmp_path, indexed=True)
+    tree_store.save(host_name=HostName("heute"), tree=tree)
+    return tree_store
+
+
+def test_indexed_tree_loads_nodes_lazily(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    tree_store = _make_indexed_tree_store(tmp_path)
+    read = IndexedTreeFile._read
+    reads: list[int] = []
+
+    def _read(self: IndexedTreeFile, offset: int, length: int) -> bytes:
+        reads.append(offset)
+        return read(self, offset, length)
+
+    monkeypatch.setattr(IndexedTreeFile, "_read", _read)
+
+    tree = tree_store.load(host_name=HostName("heute"))
+    assert tree.get_attribute(("hardware", "cpu"), "cores") == 4
+    # The root node, "hardware" and "hardware.cpu"
+    assert len(reads) == 3
+
+    table = tree.get_tree(("software", "packages")).table
+    assert len(reads) == 5
+    assert table.key_columns == ["name"]
+    assert len(table.rows) == 5
+    assert len(reads) == 6
+
+
+def test_indexed_tree_iter_rows(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(structured_data, "_INDEXED_TREE_ROWS_PER_CHUNK", 2)
+    _make_indexed_tree_store(tmp_path)
+
+    tree_file = IndexedTreeFile.open(tmp_path / "heute")
+    assert tree_file is not None
+    assert [row["name"] for row in tree_file.iter_rows(("software", "packages"))] == [
+        f"package{idx}" for idx in range(5)
+    ]
+    assert not list(tree_file.iter_rows(("hardware", "cpu")))
+    assert not list(tree_file.iter_rows(("unknown",)))
+    assert tree_file.get_tree(("software",)).path == ("software",)
+    assert tree_file.get_tree(("unknown",)) == ImmutableTree()
+
+
+def test_indexed_tree_retentions(tmp_path: Path) -> None:
+    tree = MutableTree(
+        attributes=_MutableAttributes(
+            pairs={"key": "value"},
+            retentions={"key": RetentionInterval(1, 2, 3, "previous")},
+        ),
+        table=_MutableTable(
+            key_columns=["ident"],
+            rows_by_ident={("a",): {"ident": "a", "value": 1.5}},
+            retentions={("a",): {"value": RetentionInterval(4, 5, 6, "current")}},
+        ),
+    )
+    tree_store = TreeStore(tmp_path, indexed=True)
+    tree_store.save(host_name=HostName("heute"), tree=tree)
+
+    loaded_tree = tree_store.load(host_name=HostName("heute"))
+    assert loaded_tree.attributes.retentions == {"key": RetentionInterval(1, 2, 3, "previous")}
+    assert loaded_tree.table.retentions == {
+        ("a",): {"value": RetentionInterval(4, 5, 6, "current")}
+    }
+    assert loaded_tree == tree
+
+
+def test_indexed_tree_outdated(tmp_path: Path) -> None:
+    tree_store = _make_indexed_tree_store(tmp_path)
+    tree_file = tmp_path / "heute"
+    assert IndexedTreeFile.open(tree_file) is not None
+
+    tree = MutableTree()
+    tree.add(path=("hardware", "cpu"), pairs=[{"cores": 8}])
+    store.save_object_to_file(tree_file, tree.serialize())
+
+    assert indexed_tree_file(tree_file).exists()
+    assert IndexedTreeFile.open(tree_file) is None
+    assert tree_store.load(host_name=HostName("heute")) == tree
+
+    TreeStore(tmp_path).save(host_name=HostName("heute"), tree=tree)
+    assert not indexed_tree_file(tree_file).exists()
+
+
+def test_indexed_tree_broken(tmp_path: Path) -> None:
+    tree_store = _make_indexed_tree_store(tmp_path)
+    indexed_tree_file(tmp_path / "heute").write_bytes(b"garbage")
+    assert IndexedTreeFile.open(tmp_path / "heute") is None
+    assert (
+        tree_store.load(host_name=HostName("heute")).get_attribute(("hardware", "cpu"), "cores")
+        == 4
+    )
+
+
+@pytest.mark.parametrize(
+    "tree_name_base, tree_name",
+    [
+        (
+            HostName("tree_old_addresses_arrays_memory"),
+            HostName("tree_new_addresses_arrays_memory"),
+        ),
+        (HostName("tree_old_interfaces"), HostName("tree_new_interfaces")),
+        (HostName("tree_new_interfaces"), HostName("tree_old_interfaces")),
+        (HostName("tree_old_heute"), HostName("tree_new_heute")),
+        (HostName("tree_new_heute"), HostName("tree_new_memory")),
+        (HostName("tree_new_memory"), HostName("tree_new_memory")),
+    ],
+)
+def test_tree_patch(tree_name_base: HostName, tree_name: HostName) -> None:
+    tree_store = _get_tree_store()
+    base = tree_store.load(host_name=tree_name_base)
+    tree = tree_store.load(host_name=tree_name)
+
+    patch = _make_tree_patch(base, tree)
+    assert bool(patch) is (base != tree)
+    assert _apply_tree_patch(base, patch) == tree
+    assert _apply_tree_patch(ImmutableTree(), _make_tree_patch(ImmutableTree(), tree)) == tree
+
+
+def test_tree_patch_retentions_and_key_columns() -> None:
+    base = ImmutableTree(
+        attributes=ImmutableAttributes(
+            pairs={"key": "value"},
+            retentions={"key": RetentionInterval(1, 2, 3, "previous")},
+        ),
+        table=ImmutableTable(
+            key_columns=["ident"],
+            rows_by_ident={("a",): {"ident": "a", "value": None}},
+        ),
+    )
+    tree = ImmutableTree(
+        attributes=ImmutableAttributes(pairs={"key": "value"}),
+        table=ImmutableTable(
+            key_columns=["ident", "value"],
+            rows_by_ident={("a", 1): {"ident": "a", "value": 1}},
+            retentions={("a", 1): {"value": RetentionInterval(4, 5, 6, "current")}},
+        ),
+    )
+
+    restored = _apply_tree_patch(base, _make_tree_patch(base, tree))
+    assert restored == tree
+    assert restored.attributes.retentions == {}
+    assert restored.table.key_columns == ["ident", "value"]
+    assert restored.table.retentions == tree.table.retentions
+
+
+def _archive_versions(
+    tree_or_archive_store: TreeOrArchiveStore, tree_dir: Path, num_versions: int
+) -> Mapping[int, MutableTree]:
+    host_name = HostName("heute")
+    trees: dict[int, MutableTree] = {}
+    for idx in range(num_versions):
+        tree = MutableTree()
+        tree.add(path=("hardware", "cpu"), pairs=[{"cores": idx % 3}])
+        tree.add(
+            path=("software", "packages"),
+            key_columns=["name"],
+            rows=[{"name": f"package{n}", "version": idx} for n in range(idx + 1)],
+        )
+        tree_or_archive_store.archive(host_name=host_name)
+        tree_or_archive_store.save(host_name=host_name, tree=tree)
+        timestamp = 1000 * (idx + 1)
+        os.utime(tree_dir / str(host_name), (timestamp, timestamp))
+        trees[timestamp] = tree
+    return trees
+
+
+def test_tree_or_archive_store_delta_archive(tmp_path: Path) -> None:
+    tree_or_archive_store = TreeOrArchiveStore(
+        tmp_path / "inventory", tmp_path / "archive", delta_archive=True
+    )
+    host_name = HostName("heute")
+    trees = _archive_versions(tree_or_archive_store, tmp_path / "inventory", 25)
+
+    assert [p.name for p in TreeArchive(tmp_path / "archive", host_name).files().values()] == [
+        str(1000 * (idx + 1))
+        if idx % ARCHIVE_KEYFRAME_INTERVAL == 0
+        else f"{1000 * (idx + 1)}.delta"
+        for idx in range(24)
+    ]
+    assert tree_or_archive_store.timestamps(host_name=host_name) == list(trees)
+
+    for timestamp, tree in trees.items():
+        assert tree_or_archive_store.load_at(host_name=host_name, timestamp=timestamp) == tree
+        assert tree_or_archive_store.load_at(host_name=host_name, timestamp=timestamp + 1) == tree
+    assert not tree_or_archive_store.load_at(host_name=host_name, timestamp=999)
+
+    delta_tree = tree_or_archive_store.difference(host_name=host_name, previous=3000, current=15000)
+    assert (
+        delta_tree.get_stats()
+        == _make_immutable_tree(trees[15000])
+        .difference(_make_immutable_tree(trees[3000]))
+        .get_stats()
+    )
+    assert tree_or_archive_store.difference(
+        host_name=host_name, previous=None, current=2000
+    ).get_stats() == {"new": 5}
+
+    assert tree_or_archive_store.load_previous(host_name=host_name) == trees[25000]
+    (tmp_path / "inventory" / str(host_name)).unlink()
+    assert tree_or_archive_store.load_previous(host_name=host_name) == trees[24000]
+
+
+def test_tree_archive_compact(tmp_path: Path) -> None:
+    tree_or_archive_store = TreeOrArchiveStore(tmp_path / "inventory", tmp_path / "archive")
+    host_name = HostName("heute")
+    trees = _archive_versions(tree_or_archive_store, tmp_path / "inventory", 15)
+    tree_archive = TreeArchive(tmp_path / "archive", host_name)
+    assert not [p for p in tree_archive.files().values() if p.suffix == ".delta"]
+
+    tree_archive.compact(keyframe_interval=5)
+    tree_archive.compact(keyframe_interval=3)
+
+    assert [p.suffix for p in tree_archive.files().values()] == [
+        "" if idx % 5 == 0 else ".delta" for idx in range(14)
+    ]
+    for timestamp, tree in list(trees.items())[:-1]:
+        assert TreeArchive(tmp_path / "archive", host_name).load(timestamp) == tree
+
+
+def test_tree_archive_remove_keyframe(tmp_path: Path) -> None:
+    tree_or_archive_store = TreeOrArchiveStore(
+        tmp_path / "inventory", tmp_path / "archive", delta_archive=True
+    )
+    host_name = HostName("heute")
+    trees = _archive_versions(tree_or_archive_store, tmp_path / "inventory", 15)
+    tree_archive = TreeArchive(tmp_path / "archive", host_name)
+    mtimes = {t: p.stat().st_mtime for t, p in tree_archive.files().items()}
+
+    tree_archive.remove(1000)
+    tree_archive.remove(3000)
+
+    files = TreeArchive(tmp_path / "archive", host_name).files()
+    assert [p.name for p in files.values()] == [
+        "2000",
+        *(f"{t}.delta" for t in range(4000, 11000, 1000)),
+        "11000",
+        *(f"{t}.delta" for t in range(12000, 15000, 1000)),
+    ]
+    assert {t: p.stat().st_mtime for t, p in files.items()} == {
+        t: m for t, m in mtimes.items() if t not in (1000, 3000)
+    }
+    for timestamp in files:
+        assert TreeArchive(tmp_path / "archive", host_name).load(timestamp) == trees[timestamp]
+
+
+def test_tree_archive_missing_keyframe(tmp_path: Path) -> None:
+    tree_or_archive_store = TreeOrArchiveStore(
+        tmp_path / "inventory", tmp_path / "archive", delta_archive=True
+    )
+    host_name = HostName("heute")
+    _archive_versions(tree_or_archive_store, tmp_path / "inventory", 3)
+    (tmp_path / "archive" / str(host_name) / "1000").unlink()
+
+    with pytest.raises(FileNotFoundError):
+        TreeArchive(tmp_path / "archive", host_name).load(2000)
+
+
 @pytest.mark.parametrize(
     "tree_name, result",
     [
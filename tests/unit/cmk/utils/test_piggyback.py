@@ -4,6 +4,7 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 
 import os
+import tempfile
 from collections.abc import Iterable
 from datetime import datetime, timezone
 from pathlib import Path
@@ -27,25 +28,29 @@ _REF_TIME = 1640000000.0
 _FREEZE_DATETIME = datetime.fromtimestamp(_REF_TIME + 10.0, tz=timezone.utc)
 
 
+def _set_stored_time(source: HostName, piggybacked_hostname: HostName, mtime: float) -> None:
+    segment_file_path = piggyback._get_segment_file_path(source)
+    segment = piggyback._Segment.load(segment_file_path)
+    assert segment is not None
+    contents = segment.contents()
+    contents[piggybacked_hostname] = (contents[piggybacked_hostname][0], mtime)
+    piggyback._save_segment(segment_file_path, contents)
+
+
 @pytest.fixture(name="setup_files")
 def fixture_setup_files(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
     monkeypatch.setattr("cmk.utils.paths.piggyback_dir", tmp_path / "piggyback")
     monkeypatch.setattr("cmk.utils.paths.piggyback_source_dir", tmp_path / "piggyback_source")
 
-    host_dir = cmk.utils.paths.piggyback_dir / str(_TEST_HOST_NAME)
-    host_dir.mkdir(parents=True, exist_ok=False)
-
-    source_file = host_dir / "source1"
-    with source_file.open(mode="wb") as f2:
-        f2.write(_PAYLOAD)
-
-    cmk.utils.paths.piggyback_source_dir.mkdir(parents=True, exist_ok=False)
-    source_status_file = cmk.utils.paths.piggyback_source_dir / "source1"
-    with source_status_file.open("wb") as f3:
-        f3.write(b"")
+    piggyback.store_piggyback_raw_data(
+        HostName("source1"), {_TEST_HOST_NAME: [b"<<<check_mk>>>", b"lala"]}
+    )
 
-    os.utime(str(source_file), (_REF_TIME, _REF_TIME))
-    os.utime(str(source_status_file), (_REF_TIME, _REF_TIME))
+    _set_stored_time(HostName("source1"), _TEST_HOST_NAME, _REF_TIME)
+    os.utime(
+        str(cmk.utils.paths.piggyback_source_dir / "source1"),
+        (_REF_TIME, _REF_TIME),
+    )
 
 
 def test_piggyback_default_time_settings() -> None:
@@ -60,10 +65,7 @@ def test_piggyback_default_time_settings() -> None:
 
 def test_cleanup_piggyback_files() -> None:
     piggyback.cleanup_piggyback_files([(None, "max_cache_age", -1)])
-    assert not any(
-        list(piggybacked_dir.glob("*"))
-        for piggybacked_dir in cmk.utils.paths.piggyback_dir.glob("*")
-    )
+    assert not list(cmk.utils.paths.piggyback_dir.glob("*/*"))
     assert not list(cmk.utils.paths.piggyback_source_dir.glob("*"))
 
 
@@ -153,7 +155,7 @@ def test_get_piggyback_raw_data_successful(time_settings: piggyback.PiggybackTim
     raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
 
     assert raw_data.info.source_hostname == "source1"
-    assert raw_data.info.file_path.parts[-2:] == ("test-host", "source1")
+    assert raw_data.info.file_path.name == "source1"
     assert raw_data.info.successfully_processed is True
     assert raw_data.info.message == "Successfully processed from source 'source1'"
     assert raw_data.info.status == 0
@@ -166,16 +168,13 @@ def test_get_piggyback_raw_data_not_updated() -> None:
         (None, "max_cache_age", _PIGGYBACK_MAX_CACHEFILE_AGE)
     ]
 
-    # Fake age the test-host piggyback file
-    os.utime(
-        str(cmk.utils.paths.piggyback_dir / str(_TEST_HOST_NAME) / "source1"),
-        (_REF_TIME - 10, _REF_TIME - 10),
-    )
+    # Fake age the test-host piggyback data
+    _set_stored_time(HostName("source1"), _TEST_HOST_NAME, _REF_TIME - 10)
 
     raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
 
     assert raw_data.info.source_hostname == HostName("source1")
-    assert raw_data.info.file_path.parts[-2:] == ("test-host", "source1")
+    assert raw_data.info.file_path.name == "source1"
     assert raw_data.info.successfully_processed is False
     assert raw_data.info.message == "Piggyback file not updated by source 'source1'"
     assert raw_data.info.status == 0
@@ -195,7 +194,7 @@ def test_get_piggyback_raw_data_not_sending() -> None:
     raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
 
     assert raw_data.info.source_hostname == "source1"
-    assert raw_data.info.file_path.parts[-2:] == ("test-host", "source1")
+    assert raw_data.info.file_path.name == "source1"
     assert raw_data.info.successfully_processed is False
     assert raw_data.info.message == "Source 'source1' not sending piggyback data"
     assert raw_data.info.status == 0
@@ -209,7 +208,7 @@ def test_get_piggyback_raw_data_too_old_global() -> None:
     raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
 
     assert raw_data.info.source_hostname == "source1"
-    assert raw_data.info.file_path.parts[-2:] == ("test-host", "source1")
+    assert raw_data.info.file_path.name == "source1"
     assert raw_data.info.successfully_processed is False
     assert raw_data.info.message.startswith("Piggyback file too old:")
     assert raw_data.info.status == 0
@@ -226,7 +225,7 @@ def test_get_piggyback_raw_data_too_old_source() -> None:
     raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
 
     assert raw_data.info.source_hostname == "source1"
-    assert raw_data.info.file_path.parts[-2:] == ("test-host", "source1")
+    assert raw_data.info.file_path.name == "source1"
     assert raw_data.info.successfully_processed is False
     assert raw_data.info.message.startswith("Piggyback file too old:")
     assert raw_data.info.status == 0
@@ -244,7 +243,7 @@ def test_get_piggyback_raw_data_too_old_piggybacked_host() -> None:
     raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
 
     assert raw_data.info.source_hostname == "source1"
-    assert raw_data.info.file_path.parts[-2:] == ("test-host", "source1")
+    assert raw_data.info.file_path.name == "source1"
     assert raw_data.info.successfully_processed is False
     assert raw_data.info.message.startswith("Piggyback file too old:")
     assert raw_data.info.status == 0
@@ -294,7 +293,7 @@ def test_store_piggyback_raw_data_new_host() -> None:
     raw_data = _get_only_raw_data_element(HostName("pig"), time_settings)
 
     assert raw_data.info.source_hostname == "source2"
-    assert raw_data.info.file_path.parts[-2:] == ("pig", "source2")
+    assert raw_data.info.file_path.name == "source2"
     assert raw_data.info.successfully_processed is True
     assert raw_data.info.message.startswith("Successfully processed from source 'source2'")
     assert raw_data.info.status == 0
@@ -326,13 +325,13 @@ def test_store_piggyback_raw_data_second_source() -> None:
 
     raw_data1, raw_data2 = raw_data_map[HostName("source1")], raw_data_map[HostName("source2")]
 
-    assert raw_data1.info.file_path.parts[-2:] == (str(_TEST_HOST_NAME), "source1")
+    assert raw_data1.info.file_path.name == "source1"
     assert raw_data1.info.successfully_processed is True
     assert raw_data1.info.message.startswith("Successfully processed from source 'source1'")
     assert raw_data1.info.status == 0
     assert raw_data1.raw_data == _PAYLOAD
 
-    assert raw_data2.info.file_path.parts[-2:] == (str(_TEST_HOST_NAME), "source2")
+    assert raw_data2.info.file_path.name == "source2"
     assert raw_data2.info.successfully_processed is True
     assert raw_data2.info.message.startswith("Successfully processed from source 'source2'")
     assert raw_data2.info.status == 0
@@ -358,11 +357,8 @@ def test_get_source_and_piggyback_hosts() -> None:
         },
     )
 
-    # Fake age the test-host piggyback file
-    os.utime(
-        str(cmk.utils.paths.piggyback_dir / "test-host" / "source1"),
-        (_REF_TIME - 10, _REF_TIME - 10),
-    )
+    # Fake age the test-host piggyback data
+    _set_stored_time(HostName("source1"), _TEST_HOST_NAME, _REF_TIME - 10)
 
     piggyback.store_piggyback_raw_data(
         HostName("source1"),
@@ -435,7 +431,7 @@ def test_get_piggyback_raw_data_source_validity(
     raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
 
     assert raw_data.info.source_hostname == "source1"
-    assert raw_data.info.file_path.parts[-2:] == ("test-host", "source1")
+    assert raw_data.info.file_path.name == "source1"
     assert raw_data.info.successfully_processed is successfully_processed
     assert raw_data.info.message.startswith(reason)
     assert raw_data.info.status == reason_status
@@ -470,7 +466,7 @@ def test_get_piggyback_raw_data_source_validity2(
     raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
 
     assert raw_data.info.source_hostname == "source1"
-    assert raw_data.info.file_path.parts[-2:] == ("test-host", "source1")
+    assert raw_data.info.file_path.name == "source1"
     assert raw_data.info.successfully_processed is successfully_processed
     assert raw_data.info.message == reason
     assert raw_data.info.status == reason_status
@@ -511,16 +507,13 @@ def test_get_piggyback_raw_data_piggybacked_host_validity(
     reason: str,
     reason_status: int,
 ) -> None:
-    # Fake age the test-host piggyback file
-    os.utime(
-        str(cmk.utils.paths.piggyback_dir / "test-host" / "source1"),
-        (_REF_TIME - 10, _REF_TIME - 10),
-    )
+    # Fake age the test-host piggyback data
+    _set_stored_time(HostName("source1"), _TEST_HOST_NAME, _REF_TIME - 10)
 
     raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
 
     assert raw_data.info.source_hostname == "source1"
-    assert raw_data.info.file_path.parts[-2:] == ("test-host", "source1")
+    assert raw_data.info.file_path.name == "source1"
     assert raw_data.info.successfully_processed is successfully_processed
     assert raw_data.info.message.startswith(reason)
     assert raw_data.info.status == reason_status
@@ -551,16 +544,13 @@ def test_get_piggyback_raw_data_piggybacked_host_validity2(
     reason: str,
     reason_status: int,
 ) -> None:
-    # Fake age the test-host piggyback file
-    os.utime(
-        str(cmk.utils.paths.piggyback_dir / "test-host" / "source1"),
-        (_REF_TIME - 10, _REF_TIME - 10),
-    )
+    # Fake age the test-host piggyback data
+    _set_stored_time(HostName("source1"), _TEST_HOST_NAME, _REF_TIME - 10)
 
     raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
 
     assert raw_data.info.source_hostname == "source1"
-    assert raw_data.info.file_path.parts[-2:] == ("test-host", "source1")
+    assert raw_data.info.file_path.name == "source1"
     assert raw_data.info.successfully_processed is successfully_processed
     assert raw_data.info.message.startswith(reason)
     assert raw_data.info.status == reason_status
@@ -589,3 +579,118 @@ def test_get_piggyback_matching_time_settings(
             [HostName("source-host")], HostName("piggybacked-host"), time_settings
         )._expanded_settings.keys()
     ) == sorted(expected_time_setting_keys)
+
+
+@pytest.mark.usefixtures("setup_files")
+def test_store_piggyback_raw_data_keeps_other_piggybacked_hosts() -> None:
+    time_settings: piggyback.PiggybackTimeSettings = [
+        (None, "max_cache_age", _PIGGYBACK_MAX_CACHEFILE_AGE),
+        ("test-host", "validity_period", 1000),
+    ]
+
+    with freeze_time(_FREEZE_DATETIME):
+        piggyback.store_piggyback_raw_data(
+            HostName("source1"), {HostName("other-host"): [b"<<<check_mk>>>", b"lulu"]}
+        )
+        os.utime(
+            str(cmk.utils.paths.piggyback_source_dir / "source1"),
+            (_REF_TIME + 5, _REF_TIME + 5),
+        )
+
+    raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
+
+    assert raw_data.info.successfully_processed is True
+    assert raw_data.info.message.startswith(
+        "Piggyback file not updated by source 'source1' (still valid"
+    )
+    assert raw_data.raw_data == _PAYLOAD
+    assert sorted(piggyback.get_source_hostnames()) == [HostName("source1")]
+    assert piggyback.get_source_hostnames(HostName("other-host")) == [HostName("source1")]
+    assert not piggyback.get_source_hostnames(HostName("no-host"))
+
+
+@pytest.mark.usefixtures("setup_files")
+def test_cleanup_piggyback_files_keeps_valid_data() -> None:
+    piggyback.store_piggyback_raw_data(
+        HostName("source1"),
+        {
+            _TEST_HOST_NAME: [b"<<<check_mk>>>", b"lala"],
+            HostName("other-host"): [b"<<<check_mk>>>", b"lulu"],
+        },
+    )
+    _set_stored_time(HostName("source1"), _TEST_HOST_NAME, _REF_TIME)
+    legacy_folder = cmk.utils.paths.piggyback_dir / str(_TEST_HOST_NAME)
+    legacy_folder.mkdir()
+    (legacy_folder / "source1").write_bytes(_PAYLOAD)
+
+    piggyback.cleanup_piggyback_files([(None, "max_cache_age", _PIGGYBACK_MAX_CACHEFILE_AGE)])
+
+    assert not legacy_folder.exists()
+    assert not piggyback.get_source_hostnames(_TEST_HOST_NAME)
+    assert piggyback.get_source_hostnames(HostName("other-host")) == [HostName("source1")]
+
+
+@pytest.mark.usefixtures("setup_files")
+def test_rename_piggyback_hosts() -> None:
+    time_settings: piggyback.PiggybackTimeSettings = [
+        (None, "max_cache_age", _PIGGYBACK_MAX_CACHEFILE_AGE)
+    ]
+
+    assert piggyback.rename_piggybacked_host(_TEST_HOST_NAME, HostName("new-host")) is True
+    assert piggyback.rename_source_host(HostName("source1"), HostName("new-source")) is True
+    assert piggyback.rename_piggybacked_host(_TEST_HOST_NAME, HostName("new-host")) is False
+    assert piggyback.rename_source_host(HostName("source1"), HostName("new-source")) is False
+
+    (raw_data,) = piggyback.get_piggyback_raw_data(HostName("new-host"), time_settings)
+    assert raw_data.info.source_hostname == "new-source"
+    assert raw_data.raw_data == _PAYLOAD
+
+
+def test_segment_lookup() -> None:
+    contents = {
+        HostName(f"host-{nr}"): (b"<<<check_mk>>>\n%d\n" % nr, float(nr)) for nr in range(100)
+    }
+    with tempfile.NamedTemporaryFile() as file:
+        file.write(piggyback._Segment.serialize(contents))
+        file.flush()
+        segment = piggyback._Segment.load(Path(file.name))
+
+        assert segment is not None
+        assert len(segment) == 100
+        assert segment.contents() == contents
+        assert (entry := segment.get(HostName("host-42"))) is not None
+        assert entry.mtime == 42.0
+        assert segment.raw_data(entry) == b"<<<check_mk>>>\n42\n"
+        assert segment.get(HostName("host-100")) is None
+        assert segment.get(HostName("a-host")) is None
+
+
+@pytest.mark.usefixtures("setup_files")
+@pytest.mark.parametrize("content", [b"garbage", b"CMKPIGG1\x05\x00\x00\x00\x00\x00\x00\x00trunc"])
+def test_broken_segment_is_ignored(content: bytes) -> None:
+    piggyback._get_segment_file_path(HostName("source1")).write_bytes(content)
+    assert not piggyback.get_piggyback_raw_data(
+        _TEST_HOST_NAME, [(None, "max_cache_age", _PIGGYBACK_MAX_CACHEFILE_AGE)]
+    )
+
+
+@pytest.mark.usefixtures("setup_files")
+def test_segments_of_removed_files_are_evicted() -> None:
+    time_settings: piggyback.PiggybackTimeSettings = [
+        (None, "max_cache_age", _PIGGYBACK_MAX_CACHEFILE_AGE)
+    ]
+    segment_file_path = piggyback._get_segment_file_path(HostName("source1"))
+    assert piggyback.get_source_hostnames(_TEST_HOST_NAME) == [HostName("source1")]
+    assert segment_file_path in piggyback._Segment._loaded
+
+    piggyback.cleanup_piggyback_files([(None, "max_cache_age", -1)])
+    assert not piggyback.get_piggyback_raw_data(_TEST_HOST_NAME, time_settings)
+    assert segment_file_path not in piggyback._Segment._loaded
+
+
+@pytest.mark.usefixtures("setup_files")
+def test_rename_source_host_keeps_data_of_new_host() -> None:
+    piggyback._get_segment_file_path(HostName("gone")).touch()  # just created for locking
+    assert piggyback.rename_source_host(HostName("gone"), HostName("source1")) is False
+    assert not piggyback._get_segment_file_path(HostName("gone")).exists()
+    assert piggyback.get_source_hostnames(_TEST_HOST_NAME) == [HostName("source1")]
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import asyncio
+from collections.abc import Callable, Coroutine, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import livestatus
+
+
+@dataclass
+class FakeSite:
+    """A livestatus socket answering every query with the same response"""
+
+    path: Path
+    body: bytes
+    code: int = 200
+    chunk_size: int = 1 << 20
+    delay: float = 0.0
+    queries: list[str] = field(default_factory=list)
+    connections: int = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while query := await reader.readuntil(b"\n\n"):
+                self.queries.append(query.decode())
+                await asyncio.sleep(self.delay)
+                writer.write(b"%3d %11d\n" % (self.code, len(self.body)))
+                for start in range(0, len(self.body), self.chunk_size):
+                    writer.write(self.body[start : start + self.chunk_size])
+                    await writer.drain()
+                    await asyncio.sleep(0)
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+    def config(self, **kwargs: Any) -> livestatus.SiteConfiguration:
+        return livestatus.SiteConfiguration(socket=f"unix:{self.path}", **kwargs)
+
+
+def _run(
+    fake_sites: Sequence[FakeSite],
+    test: Callable[[], Coroutine[Any, Any, None]],
+) -> None:
+    async def _main() -> None:
+        servers = [
+            await asyncio.start_unix_server(fake_site.handle, path=fake_site.path)
+            for fake_site in fake_sites
+        ]
+        try:
+            await test()
+        finally:
+            for server in servers:
+                server.close()
+
+    asyncio.run(_main())
+
+
+def test_iter_rows_yields_rows_of_fast_sites_first(tmp_path: Path) -> None:
+    slow = FakeSite(tmp_path / "slow", b'[["slow1",1],\n["slow2",2]]\n', delay=0.3)
+    fast = FakeSite(tmp_path / "fast", b'[["fast1",1],\n["fast2",2]]\n', chunk_size=3)
+
+    async def _test() -> None:
+        sites = livestatus.SiteConfigurations(
+            {livestatus.SiteId("slow"): slow.config(), livestatus.SiteId("fast"): fast.config()}
+        )
+        async with livestatus.AsyncMultiSiteConnection(sites) as live:
+            assert [row async for row in live.iter_rows("GET hosts\nColumns: name state\n")] == [
+                ("fast", ["fast1", 1]),
+                ("fast", ["fast2", 2]),
+                ("slow", ["slow1", 1]),
+                ("slow", ["slow2", 2]),
+            ]
+            assert not live.dead_sites()
+
+    _run([slow, fast], _test)
+    assert slow.queries[0].startswith("GET hosts\nColumns: name state\nLocaltime: ")
+    assert "OutputFormat: python3\n" in slow.queries[0]
+
+
+def test_query_json_format_and_prepend_site(tmp_path: Path) -> None:
+    site = FakeSite(tmp_path / "site", b'[["heute",null,"a\\nb"]]\n')
+
+    async def _test() -> None:
+        sites = livestatus.SiteConfigurations({livestatus.SiteId("site"): site.config()})
+        async with livestatus.AsyncMultiSiteConnection(sites) as live:
+            live.set_prepend_site(True)
+            live.set_limit(10)
+            assert await live.query(
+                livestatus.Query(livestatus.QuerySpecification("hosts", ["name", "x", "y"]))
+            ) == [["site", "heute", None, "a\nb"]]
+
+    _run([site], _test)
+    assert "OutputFormat: json\n" in site.queries[0]
+    assert "Limit: 10\n" in site.queries[0]
+
+
+def test_connections_are_reused(tmp_path: Path) -> None:
+    site = FakeSite(tmp_path / "site", b"[]\n")
+
+    async def _test() -> None:
+        sites = livestatus.SiteConfigurations({livestatus.SiteId("site"): site.config()})
+        async with livestatus.AsyncMultiSiteConnection(sites) as live:
+            for _nr in range(3):
+                assert await live.query("GET hosts\n") == []
+
+    _run([site], _test)
+    assert len(site.queries) == 3
+    assert site.connections == 1
+
+
+def test_timeout_marks_site_dead(tmp_path: Path) -> None:
+    slow = FakeSite(tmp_path / "slow", b'[["slow"]]\n', delay=5)
+    fast = FakeSite(tmp_path / "fast", b'[["fast"]]\n')
+
+    async def _test() -> None:
+        sites = livestatus.SiteConfigurations(
+            {
+                livestatus.SiteId("slow"): slow.config(timeout=0.2),
+                livestatus.SiteId("fast"): fast.config(),
+            }
+        )
+        async with livestatus.AsyncMultiSiteConnection(sites) as live:
+            assert await live.query("GET hosts\n") == [["fast"]]
+            assert list(live.dead_sites()) == ["slow"]
+            assert isinstance(
+                live.dead_sites()["slow"]["exception"], livestatus.MKLivestatusSocketError
+            )
+            assert live.alive_sites() == ["fast"]
+
+    _run([slow, fast], _test)
+
+
+def test_suppressed_exception_keeps_site_alive(tmp_path: Path) -> None:
+    site = FakeSite(tmp_path / "site", b"Invalid GET request, no such table 'foo'", code=404)
+
+    async def _test() -> None:
+        sites = livestatus.SiteConfigurations({livestatus.SiteId("site"): site.config()})
+        async with livestatus.AsyncMultiSiteConnection(sites) as live:
+            assert await live.query("GET foo\n") == []
+            assert not live.dead_sites()
+
+            assert await live.query(livestatus.Query("GET foo\n", suppress_exceptions=())) == []
+            assert isinstance(
+                live.dead_sites()["site"]["exception"], livestatus.MKLivestatusTableNotFoundError
+            )
+
+    _run([site], _test)
+
+
+def test_unreachable_site(tmp_path: Path) -> None:
+    async def _test() -> None:
+        sites = livestatus.SiteConfigurations(
+            {livestatus.SiteId("gone"): {"socket": f"unix:{tmp_path / 'gone'}"}}
+        )
+        async with livestatus.AsyncMultiSiteConnection(sites) as live:
+            assert await live.query("GET hosts\n") == []
+            assert "Cannot connect" in str(live.dead_sites()["gone"]["exception"])
+
+    _run([], _test)
+
+
+def test_malformed_response(tmp_path: Path) -> None:
+    site = FakeSite(tmp_path / "site", b'[["ok"],\n["broken"\n')
+
+    async def _test() -> None:
+        sites = livestatus.SiteConfigurations({livestatus.SiteId("site"): site.config()})
+        async with livestatus.AsyncMultiSiteConnection(sites) as live:
+            await live.query("GET hosts\n")
+            assert isinstance(
+                live.dead_sites()["site"]["exception"], livestatus.MKLivestatusQueryError
+            )
+
+    _run([site], _test)
+
+
+def test_iter_rows_column_types(tmp_path: Path) -> None:
+    site = FakeSite(tmp_path / "site", b"heute\x1f0\x1fa\x1eb\ngestern\x1f1\x1f\n", chunk_size=5)
+
+    async def _test() -> None:
+        sites = livestatus.SiteConfigurations({livestatus.SiteId("site"): site.config()})
+        async with livestatus.AsyncMultiSiteConnection(sites) as live:
+            assert [
+                row
+                async for row in live.iter_rows(
+                    "GET hosts\nColumns: name state x\n",
+                    column_types=[str, int, livestatus.csv_list],
+                )
+            ] == [("site", ["heute", 0, ["a", "b"]]), ("site", ["gestern", 1, []])]
+
+    _run([site], _test)
+    assert "OutputFormat: csv\n" in site.queries[0]
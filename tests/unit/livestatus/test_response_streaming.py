@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=redefined-outer-name
+
+import socket
+import socketserver
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+import livestatus
+
+
+# Override top level fixture to make livestatus connects possible here
+@pytest.fixture(autouse=True)
+def prevent_livestatus_connect() -> None:
+    pass
+
+
+class FakeLivestatus(socketserver.ThreadingUnixStreamServer):
+    """Answers every query with the configured body, sent in small chunks"""
+
+    daemon_threads = True
+
+    def __init__(self, path: Path) -> None:
+        super().__init__(str(path), _Handler)
+        self.body = b"[]\n"
+        self.code = 200
+        self.answer = True
+        self.queries: list[str] = []
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: FakeLivestatus
+
+    def handle(self) -> None:
+        query = b""
+        while line := self.rfile.readline():
+            query += line
+            if line != b"\n":
+                continue
+            self.server.queries.append(query.decode())
+            query = b""
+            if not self.server.answer:
+                return
+            body = self.server.body
+            self.wfile.write(b"%3d %11d\n" % (self.server.code, len(body)))
+            for start in range(0, len(body), 7):
+                self.wfile.write(body[start : start + 7])
+                self.wfile.flush()
+
+
+@pytest.fixture
+def fake_livestatus(tmp_path: Path) -> Iterator[FakeLivestatus]:
+    server = FakeLivestatus(tmp_path / "live")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _connection(server: FakeLivestatus) -> livestatus.SingleSiteConnection:
+    return livestatus.SingleSiteConnection(f"unix:{server.server_address}")
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        pytest.param(b'[["heute",0,1.5,["a","b"]],\n["gestern",1,null,[]]]\n', id="lines"),
+        pytest.param(b'[["heute",0,1.5,["a","b"]],["gestern",1,null,[]]]', id="one line"),
+    ],
+)
+def test_query_json(fake_livestatus: FakeLivestatus, body: bytes) -> None:
+    fake_livestatus.body = body
+    assert _connection(fake_livestatus).query(
+        livestatus.Query(livestatus.QuerySpecification("hosts", ["name", "a", "b", "c"]))
+    ) == [["heute", 0, 1.5, ["a", "b"]], ["gestern", 1, None, []]]
+    assert "OutputFormat: json\n" in fake_livestatus.queries[0]
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b"[['heute', 0, b'blob'],\n['ga,\\nga', 1, b'']]\n",
+        b"[['heute', 0, b'blob'], ['ga,\\nga', 1, b'']]\n",
+    ],
+)
+def test_query_python(fake_livestatus: FakeLivestatus, body: bytes) -> None:
+    fake_livestatus.body = body
+    assert _connection(fake_livestatus).query("GET hosts\nColumns: name state x\n") == [
+        ["heute", 0, b"blob"],
+        ["ga,\nga", 1, b""],
+    ]
+    assert "OutputFormat: python3\n" in fake_livestatus.queries[0]
+
+
+@pytest.mark.parametrize("body", [b"[]\n", b"[\n]\n"])
+def test_query_empty(fake_livestatus: FakeLivestatus, body: bytes) -> None:
+    fake_livestatus.body = body
+    assert not _connection(fake_livestatus).query("GET hosts\n")
+
+
+@pytest.mark.parametrize(
+    "body",
+    [b"", b"[['heute'],\n", b"[['heute']]\n['gestern']\n", b"{}"],
+)
+def test_query_malformed(fake_livestatus: FakeLivestatus, body: bytes) -> None:
+    fake_livestatus.body = body
+    connection = _connection(fake_livestatus)
+    with pytest.raises(livestatus.MKLivestatusQueryError):
+        connection.query("GET hosts\n")
+    assert connection.socket is None
+
+
+def test_query_error_code(fake_livestatus: FakeLivestatus) -> None:
+    fake_livestatus.body = b"No such table"
+    fake_livestatus.code = 404
+    with pytest.raises(livestatus.MKLivestatusTableNotFoundError):
+        _connection(fake_livestatus).query("GET foo\n")
+
+
+def test_iter_query(fake_livestatus: FakeLivestatus) -> None:
+    fake_livestatus.body = b"[['heute'],\n['gestern'],\n['morgen']]\n"
+    connection = _connection(fake_livestatus)
+    rows = connection.iter_query("GET hosts\nColumns: name\n")
+    assert next(rows) == ["heute"]
+    # The rest of the response is pending, the connection can not be used anymore
+    rows.close()
+    assert connection.socket is None
+
+    assert list(connection.iter_query("GET hosts\nColumns: name\n")) == [
+        ["heute"],
+        ["gestern"],
+        ["morgen"],
+    ]
+    assert connection.query("GET hosts\nColumns: name\n") == [["heute"], ["gestern"], ["morgen"]]
+
+
+def test_iter_query_column_types(fake_livestatus: FakeLivestatus) -> None:
+    fake_livestatus.body = b"heute\x1f0\x1f1.5\x1fa\x1eb\ngestern;\x1f1\x1f2\x1f\n"
+    connection = _connection(fake_livestatus)
+    connection.set_limit(10)
+    assert list(
+        connection.iter_query(
+            "GET hosts\nColumns: name state x y\n",
+            column_types=[str, int, float, livestatus.csv_list],
+        )
+    ) == [["heute", 0, 1.5, ["a", "b"]], ["gestern;", 1, 2.0, []]]
+
+    query = fake_livestatus.queries[0]
+    assert "OutputFormat: csv\n" in query
+    assert "ColumnHeaders: off\n" in query
+    assert "Separators: 10 31 30 29\n" in query
+    assert "Limit: 10\n" in query
+
+    with pytest.raises(livestatus.MKLivestatusQueryError, match="4 columns instead of 3"):
+        list(
+            connection.iter_query(
+                "GET hosts\nColumns: name state x\n", column_types=[str, int, float]
+            )
+        )
+    with pytest.raises(livestatus.MKLivestatusQueryError):
+        list(connection.iter_query("GET hosts\n", column_types=[int, int, int, int]))
+
+
+def test_query_unix_socket_closed_by_peer(fake_livestatus: FakeLivestatus) -> None:
+    fake_livestatus.answer = False
+    with pytest.raises(livestatus.MKLivestatusSocketError, match="Unix socket was closed"):
+        _connection(fake_livestatus).query("GET hosts\n")
+    # No reconnect on unix sockets
+    assert len(fake_livestatus.queries) == 1
+
+
+def test_query_connection_reset(
+    fake_livestatus: FakeLivestatus, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Much more than one chunk is received at once
+    fake_livestatus.body = b"[" + b",\n".join(b"['heute']" for _n in range(100000)) + b"]\n"
+
+    def recv_into(*args: object, **kwargs: object) -> int:
+        raise ConnectionResetError("Connection reset by peer")
+
+    connection = _connection(fake_livestatus)
+    rows = connection.iter_query("GET hosts\nColumns: name\n")
+    assert next(rows) == ["heute"]
+    monkeypatch.setattr(socket.socket, "recv_into", recv_into)
+    with pytest.raises(livestatus.MKLivestatusSocketError, match="Connection reset"):
+        list(rows)
+    assert connection.socket is None
@@ -0,0 +1 @@
+{'changed': '9f0df809c5d408c760bf2126b266440c397aefd2130e4f3ebfcf3461ae405669', 'unchanged': 'dab726e6a1cb5b09169fea48e967f17eca56acea53aa0e358b135b6b2cfee608'}
@@ -0,0 +1 @@
+{'changed': 'b627d00956e701ce06f6a178d757db1b8ac0e4cafc0c840d1f045e89958cf644', 'unchanged': 'dab726e6a1cb5b09169fea48e967f17eca56acea53aa0e358b135b6b2cfee608'}